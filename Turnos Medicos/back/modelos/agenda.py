@@ -2,7 +2,8 @@ from datetime import datetime, time
 import re
 
 class Agenda:
-    
+    __slots__ = ("nro_matricula_medico", "mes", "dias_semana", "hora_inicio", "hora_fin", "duracion_minutos")
+
     # Días de la semana válidos (en español)
     DIAS_VALIDOS_ES = {
         "lunes", "martes", "miércoles", "miercoles", 
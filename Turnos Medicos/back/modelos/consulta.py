@@ -1,6 +1,8 @@
 from datetime import datetime
 
 class Consulta:
+    __slots__ = ("id_consulta", "fecha_hora", "diagnostico", "observaciones", "dni_paciente", "nro_matricula_medico")
+
     def __init__(self, id_consulta=None, fecha_hora=None, diagnostico=None,
                  observaciones=None, dni_paciente=None,
                  nro_matricula_medico=None):
@@ -1,5 +1,7 @@
 import re
 class Especialidad:
+    __slots__ = ("id_especialidad", "nombre", "descripcion", "activo")
+
     def __init__(self, id_especialidad=None, nombre=None, descripcion=None, activo=1):
         self.id_especialidad = id_especialidad
         self.nombre = nombre
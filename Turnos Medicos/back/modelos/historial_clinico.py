@@ -1,4 +1,6 @@
 class HistorialClinico:
+    __slots__ = ("dni_paciente",)
+
     def __init__(self, dni_paciente):
         self.dni_paciente = dni_paciente
         self._validar()
@@ -1,5 +1,7 @@
 import re
 class Medico:
+    __slots__ = ("nro_matricula", "nombre", "apellido", "email", "id_especialidad", "activo")
+
     def __init__(self, nro_matricula, nombre, apellido, email, id_especialidad, activo=1):
         self.nro_matricula = nro_matricula
         self.nombre = nombre
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+class MensajeMail:
+    """Mail pendiente de envío en la tabla MailOutbox."""
+    __slots__ = ("id_mail", "tipo", "destinatario", "asunto", "cuerpo", "id_turno", "estado", "intentos",
+                 "proximo_intento", "ultimo_error", "fecha_creacion", "fecha_envio", "clave_idempotencia",
+                 "cuerpo_html")
+
+    ESTADOS = ("pendiente", "enviando", "enviado", "muerto")
+
+    def __init__(self, id_mail=None, tipo=None, destinatario=None, asunto=None, cuerpo=None, id_turno=None,
+                 estado="pendiente", intentos=0, proximo_intento=None, ultimo_error=None,
+                 fecha_creacion=None, fecha_envio=None, clave_idempotencia=None, cuerpo_html=None):
+        ahora = datetime.now()
+        self.id_mail = id_mail
+        self.tipo = tipo
+        self.destinatario = destinatario.strip() if isinstance(destinatario, str) else destinatario
+        self.asunto = asunto
+        self.cuerpo = cuerpo
+        self.id_turno = id_turno
+        self.estado = estado
+        self.intentos = intentos
+        self.proximo_intento = proximo_intento or ahora
+        self.ultimo_error = ultimo_error
+        self.fecha_creacion = fecha_creacion or ahora
+        self.fecha_envio = fecha_envio
+        # Evita encolar dos veces el mismo mail (ver MailOutboxDAO.encolar_sin_repetir)
+        self.clave_idempotencia = clave_idempotencia
+        # Versión HTML opcional del cuerpo (se envía junto con el texto)
+        self.cuerpo_html = cuerpo_html
+        self._validar()
+
+    def _validar(self):
+        if not isinstance(self.tipo, str) or not self.tipo.strip():
+            raise ValueError("El tipo de mail es obligatorio.")
+        if not isinstance(self.destinatario, str) or "@" not in self.destinatario:
+            raise ValueError("El destinatario del mail debe ser una dirección de email.")
+        if not isinstance(self.asunto, str) or not self.asunto.strip():
+            raise ValueError("El asunto del mail es obligatorio.")
+        if not isinstance(self.cuerpo, str):
+            raise ValueError("El cuerpo del mail debe ser texto.")
+        if self.cuerpo_html is not None and not isinstance(self.cuerpo_html, str):
+            raise ValueError("El cuerpo HTML del mail debe ser texto.")
+        if self.estado not in self.ESTADOS:
+            raise ValueError(f"Estado de mail inválido. Debe ser uno de: {', '.join(self.ESTADOS)}.")
+        if not isinstance(self.intentos, int) or self.intentos < 0:
+            raise ValueError("La cantidad de intentos debe ser un entero no negativo.")
+
+        # Fechas: la base las devuelve como texto
+        for campo in ("proximo_intento", "fecha_creacion", "fecha_envio"):
+            valor = getattr(self, campo)
+            if isinstance(valor, str):
+                try:
+                    setattr(self, campo, datetime.strptime(valor, "%Y-%m-%d %H:%M:%S"))
+                except ValueError:
+                    raise ValueError(f"{campo} debe tener formato 'YYYY-MM-DD HH:MM:SS'.")
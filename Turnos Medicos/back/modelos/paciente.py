@@ -2,6 +2,8 @@ import re
 from datetime import datetime, date
 
 class Paciente:
+    __slots__ = ("dni", "nombre", "apellido", "fecha_nacimiento", "email", "direccion", "activo")
+
     def __init__(self, dni, nombre, apellido, fecha_nacimiento, email, direccion, activo=1):
         # Asignamos los atributos y normalizamos cadenas
         self.dni = dni
@@ -1,6 +1,8 @@
 from datetime import datetime, date
 
 class Receta:
+    __slots__ = ("id_receta", "fecha_emision", "medicamentos", "detalle", "id_consulta")
+
     def __init__(self, id_receta=None, fecha_emision=None, medicamentos=None,
                  detalle=None, id_consulta=None):
         self.id_receta = id_receta
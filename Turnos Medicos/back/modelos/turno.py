@@ -2,6 +2,8 @@ from datetime import datetime
 import re
 
 class Turno:
+    __slots__ = ("id_turno", "fecha_hora_inicio", "motivo", "observaciones", "estado", "dni_paciente", "nro_matricula_medico")
+
     def __init__(self, id_turno=None, fecha_hora_inicio=None, motivo=None,
                  observaciones=None, estado="disponible", dni_paciente=None,
                  nro_matricula_medico=None):
@@ -0,0 +1,92 @@
+from array import array
+from datetime import datetime, timedelta
+
+class TurnoBatch:
+    """
+    Contenedor columnar de turnos para lecturas masivas (reportes, estadísticas).
+    En lugar de un objeto Turno por fila guarda arreglos paralelos de tipos fijos:
+    - ids: id_turno
+    - minutos: fecha_hora_inicio en minutos desde 1970-01-01 (hora local tal cual se guarda)
+    - estados: código de estado (índice en ESTADOS)
+    - dni_pacientes: dni del paciente (SIN_PACIENTE si el turno no tiene paciente)
+    - matriculas: nro_matricula_medico
+    No incluye motivo ni observaciones: para eso usar la lista de objetos Turno.
+    """
+    __slots__ = ("ids", "minutos", "estados", "dni_pacientes", "matriculas")
+
+    ESTADOS = ("disponible", "programado", "atendido", "cancelado", "ausente")
+    SIN_PACIENTE = 0
+    _EPOCA = datetime(1970, 1, 1)
+
+    def __init__(self):
+        self.ids = array("q")
+        self.minutos = array("i")
+        self.estados = array("b")
+        self.dni_pacientes = array("i")
+        self.matriculas = array("i")
+
+    @classmethod
+    def codigo_estado(cls, estado):
+        try:
+            return cls.ESTADOS.index(estado)
+        except ValueError:
+            raise ValueError(f"Estado inválido. Debe ser uno de: {', '.join(cls.ESTADOS)}.")
+
+    @classmethod
+    def desde_filas(cls, filas):
+        """Arma el batch a partir de filas (id_turno, minutos, codigo_estado, dni_paciente, nro_matricula_medico)."""
+        batch = cls()
+        for fila in filas:
+            batch.agregar(*fila)
+        return batch
+
+    def agregar(self, id_turno, minutos, codigo_estado, dni_paciente, nro_matricula_medico):
+        self.ids.append(id_turno)
+        self.minutos.append(minutos)
+        self.estados.append(codigo_estado)
+        self.dni_pacientes.append(dni_paciente or self.SIN_PACIENTE)
+        self.matriculas.append(nro_matricula_medico)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def fecha_hora(self, i):
+        return self._EPOCA + timedelta(minutes=self.minutos[i])
+
+    def estado(self, i):
+        return self.ESTADOS[self.estados[i]]
+
+    def dni_paciente(self, i):
+        dni = self.dni_pacientes[i]
+        return None if dni == self.SIN_PACIENTE else dni
+
+    def fila(self, i):
+        """Retorna el turno i como tupla (id_turno, fecha_hora_inicio, estado, dni_paciente, nro_matricula_medico)."""
+        return (self.ids[i], self.fecha_hora(i), self.estado(i), self.dni_paciente(i), self.matriculas[i])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.fila(i)
+
+    def contar_por_estado(self):
+        """Cantidad de turnos por estado, con el mismo formato que TurnoDAO.contar_turnos_por_estado."""
+        conteo = [0] * len(self.ESTADOS)
+        for codigo in self.estados:
+            conteo[codigo] += 1
+        return {estado: cantidad for estado, cantidad in zip(self.ESTADOS, conteo) if cantidad}
+
+    def filtrar_estado(self, *estados):
+        """Retorna un nuevo batch solo con los turnos en alguno de los estados indicados."""
+        codigos = {self.codigo_estado(e) for e in estados}
+        batch = TurnoBatch()
+        for i, codigo in enumerate(self.estados):
+            if codigo in codigos:
+                batch.agregar(self.ids[i], self.minutos[i], codigo, self.dni_pacientes[i], self.matriculas[i])
+        return batch
+
+    def tamanio_bytes(self):
+        """Memoria ocupada por los datos de los arreglos."""
+        return sum(a.itemsize * len(a) for a in (self.ids, self.minutos, self.estados, self.dni_pacientes, self.matriculas))
+
+    def __repr__(self):
+        return f"TurnoBatch(turnos={len(self)}, bytes={self.tamanio_bytes()})"
@@ -0,0 +1,128 @@
+# persistencia/cache_consultas.py
+import weakref
+import threading
+from collections import OrderedDict
+
+
+class CacheConsultas:
+    """
+    Cache de resultados de consultas de lectura, compartido por todos los DAOs (singleton).
+    - La clave es (sql, params); cada entrada guarda las tablas que lee y la versión
+      que tenía cada una al momento de cargarla.
+    - Toda escritura hecha por un DAO incrementa la versión de su tabla (`invalidar`),
+      por lo que las entradas que dependen de ella dejan de ser válidas.
+    - Los cambios confirmados por otras conexiones se detectan con PRAGMA data_version
+      y vacían el cache completo; cada vaciado incrementa una generación global, así una
+      consulta que empezó antes del vaciado no guarda su resultado (puede ser viejo).
+      El último data_version de cada conexión se guarda con una referencia débil, así se
+      olvida al cerrarla y liberarla. Una conexión que no admite referencias débiles (no
+      abierta con db_connection.Conexion) no usa el cache.
+    - Tamaño acotado: al superar `max_entradas` se descarta la entrada usada hace más tiempo.
+    """
+    _instance = None
+    MAX_ENTRADAS = 512
+
+    def __new__(cls, max_entradas=None):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialize(max_entradas or cls.MAX_ENTRADAS)
+        return cls._instance
+
+    def _initialize(self, max_entradas):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._versiones = {}
+        self._data_version = weakref.WeakKeyDictionary()
+        self._generacion = 0
+        self._lock = threading.Lock()
+        self._stats = {"aciertos": 0, "fallos": 0, "desalojos": 0, "invalidaciones": 0}
+
+    def obtener(self, conn, sql, params, tablas, cargar):
+        """
+        Retorna las filas de (sql, params) desde el cache si ninguna de `tablas` cambió;
+        si no, llama a `cargar()` y guarda el resultado.
+        Dentro de una transacción abierta no se usa el cache, para respetar la foto
+        de la base que ve esa transacción (por ejemplo, en los reportes).
+        """
+        if conn.in_transaction or not self._verificar_data_version(conn):
+            return cargar()
+
+        clave = (sql, tuple(params))
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and self._vigente(entrada[0]):
+                self._entradas.move_to_end(clave)
+                self._stats["aciertos"] += 1
+                return list(entrada[1])
+            self._stats["fallos"] += 1
+            versiones = {t: self._versiones.get(t, 0) for t in tablas}
+            generacion = self._generacion
+
+        filas = cargar()
+
+        with self._lock:
+            # Si hubo una escritura o un vaciado mientras se cargaba, la entrada nace vencida y no se guarda
+            if generacion == self._generacion and self._vigente(versiones):
+                self._entradas[clave] = (versiones, tuple(filas))
+                self._entradas.move_to_end(clave)
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+                    self._stats["desalojos"] += 1
+        return list(filas)
+
+    def invalidar(self, *tablas):
+        """Incrementa la versión de las tablas modificadas."""
+        with self._lock:
+            for tabla in tablas:
+                self._versiones[tabla] = self._versiones.get(tabla, 0) + 1
+            self._stats["invalidaciones"] += 1
+
+    def limpiar(self):
+        """Descarta todas las entradas."""
+        with self._lock:
+            self._vaciar()
+
+    def version(self, conn, *tablas):
+        """
+        Versión de `tablas` vista desde `conn`: cambia con cualquier escritura confirmada sobre
+        ellas, de un DAO de este proceso o de otra conexión (que vacía el cache). Sirve para
+        saber si algo calculado a partir de esas tablas sigue al día.
+        """
+        if not self._verificar_data_version(conn):
+            # Sin seguimiento de la conexión no se sabe si algo cambió: una versión que no se repite
+            return (object(),)
+        with self._lock:
+            return (self._generacion,) + tuple(self._versiones.get(t, 0) for t in tablas)
+
+    def estadisticas(self):
+        """Contadores de uso del cache."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entradas"] = len(self._entradas)
+            stats["max_entradas"] = self.max_entradas
+        consultas = stats["aciertos"] + stats["fallos"]
+        stats["tasa_aciertos"] = round(stats["aciertos"] / consultas, 3) if consultas else 0.0
+        return stats
+
+    def _vigente(self, versiones):
+        return all(self._versiones.get(t, 0) == v for t, v in versiones.items())
+
+    def _verificar_data_version(self, conn):
+        """Vacía el cache si otra conexión escribió. Retorna False si `conn` no se puede seguir."""
+        # data_version cambia cuando otra conexión confirma una escritura sobre la base
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        with self._lock:
+            try:
+                anterior = self._data_version.get(conn)
+                self._data_version[conn] = version
+            except TypeError:
+                return False
+            if anterior is not None and anterior != version:
+                self._vaciar()
+                self._stats["invalidaciones"] += 1
+        return True
+
+    def _vaciar(self):
+        # Llamar con self._lock tomado
+        self._entradas.clear()
+        self._generacion += 1
@@ -4,6 +4,8 @@ from datetime import datetime
 from persistencia.persistencia_errores import DatabaseError, IntegridadError
 import sqlite3 # Necesario para atrapar errores específicos de SQLite
 class AgendaDAO(BaseDAO):
+    TABLAS = ("Agenda",)
+
     def crear(self, agenda: Agenda):
         try:
             horario_inicio_str = agenda.hora_inicio.strftime('%H:%M')
@@ -14,7 +16,7 @@ class AgendaDAO(BaseDAO):
                 (agenda.nro_matricula_medico, agenda.mes, agenda.dias_semana,
                  horario_inicio_str, horario_fin_str, agenda.duracion_minutos)
             )
-            self.conn.commit()
+            self._commit()
         # Captura errores específicos de integridad (como Foreign Key o NOT NULL)
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
@@ -59,7 +61,7 @@ class AgendaDAO(BaseDAO):
                 (agenda.dias_semana, hora_inicio_str, hora_fin_str,
                  agenda.duracion_minutos, agenda.nro_matricula_medico, agenda.mes)
             )
-            self.conn.commit()
+            self._commit()
             return self.obtener_por_medico_y_mes(agenda.nro_matricula_medico, agenda.mes)
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
@@ -1,12 +1,22 @@
 from abc import ABC, abstractmethod
 from persistencia.db_connection import DBConnection
 import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from persistencia.utils_fecha import format_date_for_db, format_datetime_for_db
+from persistencia.utils_busqueda import tokenizar_busqueda, construir_consulta_fts
+from persistencia.cache_consultas import CacheConsultas
+
+# Transacciones abiertas con BaseDAO.transaccion(), por conexión: {id(conn): tablas escritas}
+_transacciones = {}
 
 class BaseDAO(ABC):
-    def __init__(self):
-        db = DBConnection()
-        self.conn = db.conn
+    # Tablas que escribe el DAO; al confirmar cambios se invalidan en el cache de consultas
+    TABLAS = ()
+
+    def __init__(self, conn=None):
+        # Por defecto se usa la conexión compartida; los reportes pasan una conexión de solo lectura
+        self.conn = conn or DBConnection().conn
         self.cur = self.conn.cursor()
 
     @abstractmethod
@@ -34,4 +44,188 @@ class BaseDAO(ABC):
         return format_date_for_db(value)
 
     def _fmt_datetime(self, value):
-        return format_datetime_for_db(value)
\ No newline at end of file
+        return format_datetime_for_db(value)
+
+    def _commit(self):
+        pendientes = _transacciones.get(id(self.conn))
+        if pendientes is not None:
+            # Dentro de transaccion(): se confirma todo junto al salir del bloque
+            pendientes.update(self.TABLAS)
+            return
+        self.conn.commit()
+        CacheConsultas().invalidar(*self.TABLAS)
+
+    @contextmanager
+    def transaccion(self):
+        """
+        Agrupa las escrituras de varios DAOs que comparten la conexión en una única transacción:
+        dentro del bloque `_commit()` no confirma, y al salir se confirma todo junto o, si hubo
+        una excepción, se revierte todo. Un bloque anidado se une a la transacción de afuera.
+        """
+        clave = id(self.conn)
+        if clave in _transacciones:
+            yield self
+            return
+        tablas = _transacciones[clave] = set()
+        try:
+            yield self
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            del _transacciones[clave]
+        CacheConsultas().invalidar(*tablas)
+
+    def _fetchall_cacheado(self, query, params=(), tablas=None):
+        """
+        Ejecuta una consulta de lectura usando el cache de resultados.
+        `tablas` son las tablas que lee la consulta (por defecto, las del DAO).
+        """
+        def cargar():
+            cur = self.conn.cursor()
+            cur.execute(query, params)
+            return cur.fetchall()
+        return CacheConsultas().obtener(self.conn, query, params, tablas or self.TABLAS, cargar)
+
+    def _fetchone_cacheado(self, query, params=(), tablas=None):
+        filas = self._fetchall_cacheado(query, params, tablas)
+        return filas[0] if filas else None
+
+    def _iterar_filas(self, query, params=(), tamanio_bloque=1000):
+        """
+        Ejecuta una consulta de lectura y retorna (columnas, filas), donde filas es un iterador
+        de tuplas que lee de a `tamanio_bloque` con fetchmany: recorre resultados grandes
+        (exportaciones, listados) con memoria constante.
+        """
+        cur = self.conn.cursor()
+        cur.row_factory = None
+        cur.execute(query, tuple(params))
+        columnas = [d[0] for d in cur.description]
+
+        def _filas():
+            try:
+                while True:
+                    bloque = cur.fetchmany(tamanio_bloque)
+                    if not bloque:
+                        break
+                    yield from bloque
+            finally:
+                cur.close()
+        return columnas, _filas()
+
+    def iterar_tabla(self, tamanio_bloque=1000):
+        """Todas las filas de la tabla principal del DAO, como (columnas, filas)."""
+        return self._iterar_filas(f"SELECT * FROM {self.TABLAS[0]} ORDER BY rowid", tamanio_bloque=tamanio_bloque)
+
+    def _rango_fechas(self, columna, fecha_inicio=None, fecha_fin=None):
+        """
+        Condiciones de un rango de fechas inclusivo sobre una columna DATE/DATETIME guardada como texto.
+        Compara la columna directamente (sin date()) para que pueda usar índices.
+        Retorna (condiciones, params).
+        """
+        condiciones = []
+        params = []
+        if fecha_inicio:
+            condiciones.append(f"{columna} >= ?")
+            params.append(self._fmt_date(fecha_inicio))
+        if fecha_fin:
+            hasta = datetime.strptime(self._fmt_date(fecha_fin), "%Y-%m-%d") + timedelta(days=1)
+            condiciones.append(f"{columna} < ?")
+            params.append(hasta.strftime("%Y-%m-%d"))
+        return condiciones, params
+
+    def _buscar_texto(self, fts, tabla, pk, columnas, texto, limit=None, condicion=None, orden=None, orden_sin_fts=None):
+        """
+        Búsqueda por coincidencia parcial de todos los términos de `texto` en `columnas`,
+        usando el índice FTS5 `fts`.
+        Los términos de menos de 3 caracteres (que el tokenizador trigram no indexa),
+        o una base sin soporte FTS5, se resuelven con LIKE.
+        Se ordena por `orden` si se indica; si no, por relevancia (bm25) cuando se usa el
+        índice, o por `orden_sin_fts` cuando todo se resuelve con LIKE.
+        Retorna las filas de `tabla`.
+        """
+        terminos = tokenizar_busqueda(texto)
+        if not terminos:
+            return []
+
+        usar_fts = getattr(DBConnection(), "fts_disponible", False)
+        largos = [t for t in terminos if len(t) >= 3] if usar_fts else []
+        cortos = [t for t in terminos if t not in largos]
+
+        condiciones = []
+        params = []
+        if largos:
+            condiciones.append(f"{fts} MATCH ?")
+            params.append(construir_consulta_fts(largos, columnas))
+        if cortos:
+            condicion_like, params_like = self._condicion_like(columnas, cortos)
+            condiciones.append(condicion_like)
+            params.extend(params_like)
+        if condicion:
+            condiciones.append(condicion)
+
+        if largos:
+            query = f"SELECT t.* FROM {fts} JOIN {tabla} t ON t.{pk} = {fts}.rowid"
+            orden = orden or f"{fts}.rank"
+        else:
+            query = f"SELECT t.* FROM {tabla} t"
+            orden = orden or orden_sin_fts
+        query += " WHERE " + " AND ".join(condiciones)
+        if orden:
+            query += f" ORDER BY {orden}"
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+
+        self.cur.execute(query, tuple(params))
+        return self.cur.fetchall()
+
+    def _buscar_fragmentos(self, fts, tabla, pk, columnas, texto, limit=20, offset=0, marcas=("<b>", "</b>")):
+        """
+        Búsqueda de texto libre (por prefijo de palabra, sin distinguir acentos) sobre el
+        índice FTS5 `fts`, ordenada por relevancia y paginada con limit/offset.
+        Cada fila trae además la columna `fragmento` con los términos resaltados entre `marcas`.
+        Sin soporte FTS5 se usa LIKE y el fragmento es el texto de la primera columna.
+        """
+        terminos = tokenizar_busqueda(texto)
+        if not terminos:
+            return []
+
+        if getattr(DBConnection(), "fts_disponible", False):
+            query = f"""SELECT t.*, snippet({fts}, -1, ?, ?, '…', 12) AS fragmento
+                        FROM {fts} JOIN {tabla} t ON t.{pk} = {fts}.rowid
+                        WHERE {fts} MATCH ?
+                        ORDER BY {fts}.rank
+                        LIMIT ? OFFSET ?"""
+            params = (marcas[0], marcas[1], construir_consulta_fts(terminos, prefijo=True), int(limit), int(offset))
+        else:
+            condicion, params = self._condicion_like(columnas, terminos)
+            query = f"""SELECT t.*, t.{columnas[0]} AS fragmento FROM {tabla} t
+                        WHERE {condicion} ORDER BY t.{pk} DESC LIMIT ? OFFSET ?"""
+            params = tuple(params) + (int(limit), int(offset))
+
+        self.cur.execute(query, params)
+        return self.cur.fetchall()
+
+    def _contar_texto(self, fts, tabla, columnas, texto):
+        """Cantidad total de coincidencias de `_buscar_fragmentos` (para paginar)."""
+        terminos = tokenizar_busqueda(texto)
+        if not terminos:
+            return 0
+        if getattr(DBConnection(), "fts_disponible", False):
+            self.cur.execute(f"SELECT COUNT(*) FROM {fts} WHERE {fts} MATCH ?",
+                             (construir_consulta_fts(terminos, prefijo=True),))
+        else:
+            condicion, params = self._condicion_like(columnas, terminos)
+            self.cur.execute(f"SELECT COUNT(*) FROM {tabla} t WHERE {condicion}", tuple(params))
+        return self.cur.fetchone()[0]
+
+    def _condicion_like(self, columnas, terminos):
+        """Arma 'todos los términos en alguna de las columnas' con LIKE (alias de tabla t)."""
+        condiciones = []
+        params = []
+        for termino in terminos:
+            condiciones.append("(" + " OR ".join(f"t.{c} LIKE ?" for c in columnas) + ")")
+            params.extend([f"%{termino}%"] * len(columnas))
+        return " AND ".join(condiciones), params
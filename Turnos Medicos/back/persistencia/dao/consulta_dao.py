@@ -3,6 +3,8 @@ from modelos.consulta import Consulta
 from persistencia.persistencia_errores import DatabaseError, IntegridadError
 import sqlite3 # Necesario para atrapar errores específicos de SQLite
 class ConsultaDAO(BaseDAO):
+    TABLAS = ("Consulta",)
+
     def crear(self, consulta: Consulta):
         try:
             fecha_hora_str = self._fmt_datetime(consulta.fecha_hora)
@@ -13,7 +15,7 @@ class ConsultaDAO(BaseDAO):
                  consulta.dni_paciente, consulta.nro_matricula_medico)
             )
             consulta.id_consulta = self.cur.lastrowid
-            self.conn.commit()
+            self._commit()
 
         # Captura errores específicos de integridad (como Foreign Key o NOT NULL)
         except sqlite3.IntegrityError as e:
@@ -34,6 +36,40 @@ class ConsultaDAO(BaseDAO):
         row = self.cur.fetchone()
         return Consulta(**row) if row else None
 
+    def buscar(self, texto, limit=20, offset=0, marcas=("<b>", "</b>")):
+        """
+        Búsqueda de texto libre en diagnóstico y observaciones, ordenada por relevancia.
+        Retorna lista de tuplas (Consulta, fragmento resaltado).
+        """
+        rows = self._buscar_fragmentos("ConsultaFTS", "Consulta", "id_consulta", ["diagnostico", "observaciones"],
+                                       texto, limit, offset, marcas)
+        resultados = []
+        for row in rows:
+            datos = dict(row)
+            fragmento = datos.pop("fragmento")
+            resultados.append((Consulta(**datos), fragmento))
+        return resultados
+
+    def contar_busqueda(self, texto):
+        return self._contar_texto("ConsultaFTS", "Consulta", ["diagnostico", "observaciones"], texto)
+
+    def iterar_para_exportar(self, dni_paciente=None, nro_matricula_medico=None, fecha_inicio=None,
+                             fecha_fin=None, tamanio_bloque=1000):
+        """Consultas para exportación masiva, filtradas opcionalmente. Retorna (columnas, filas) leídas en bloques."""
+        query = """SELECT c.id_consulta, c.fecha_hora, c.diagnostico, c.observaciones, c.dni_paciente, c.nro_matricula_medico
+                   FROM Consulta c"""
+        condiciones, params = self._rango_fechas("c.fecha_hora", fecha_inicio, fecha_fin)
+        if dni_paciente is not None:
+            condiciones.append("c.dni_paciente = ?")
+            params.append(dni_paciente)
+        if nro_matricula_medico is not None:
+            condiciones.append("c.nro_matricula_medico = ?")
+            params.append(nro_matricula_medico)
+        if condiciones:
+            query += " WHERE " + " AND ".join(condiciones)
+        query += " ORDER BY c.rowid"
+        return self._iterar_filas(query, params, tamanio_bloque)
+
     def actualizar(self, consulta: Consulta):
         try:
             self.cur.execute(
@@ -42,7 +78,7 @@ class ConsultaDAO(BaseDAO):
                    WHERE id_consulta=?""",
                 (consulta.diagnostico, consulta.observaciones, consulta.id_consulta)
             )
-            self.conn.commit()
+            self._commit()
             return self.obtener_por_id(consulta.id_consulta)
         
         # Captura errores específicos de integridad (como Foreign Key o NOT NULL)
@@ -3,6 +3,8 @@ from modelos.especialidad import Especialidad
 from persistencia.persistencia_errores import DatabaseError, IntegridadError
 import sqlite3 # Necesario para atrapar errores específicos de SQLite
 class EspecialidadDAO(BaseDAO):
+    TABLAS = ("Especialidad",)
+
     def crear(self, especialidad: Especialidad):
         try:
             self.cur.execute(
@@ -10,7 +12,7 @@ class EspecialidadDAO(BaseDAO):
                 (especialidad.nombre, especialidad.descripcion)
             )
             especialidad.id_especialidad = self.cur.lastrowid
-            self.conn.commit()
+            self._commit()
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
             raise IntegridadError(f"Error de integridad al crear la especialidad: {e}")
@@ -19,18 +21,15 @@ class EspecialidadDAO(BaseDAO):
             raise DatabaseError(f"Error de base de datos no especificado al crear la especialidad: {e}")
 
     def obtener_todos(self):
-        self.cur.execute("SELECT * FROM Especialidad WHERE activo = 1")
-        rows = self.cur.fetchall()
+        rows = self._fetchall_cacheado("SELECT * FROM Especialidad WHERE activo = 1")
         return [Especialidad(row["id_especialidad"], row["nombre"], row["descripcion"]) for row in rows]
 
     def obtener_todos_inactivos(self):
-        self.cur.execute("SELECT * FROM Especialidad WHERE activo = 0")
-        rows = self.cur.fetchall()
+        rows = self._fetchall_cacheado("SELECT * FROM Especialidad WHERE activo = 0")
         return [Especialidad(row["id_especialidad"], row["nombre"], row["descripcion"]) for row in rows]
      
     def obtener_por_id(self, id_especialidad):
-        self.cur.execute("SELECT * FROM Especialidad WHERE id_especialidad=?", (id_especialidad,))
-        row = self.cur.fetchone()
+        row = self._fetchone_cacheado("SELECT * FROM Especialidad WHERE id_especialidad=?", (id_especialidad,))
         if row:
             return Especialidad(row["id_especialidad"], row["nombre"], row["descripcion"], row["activo"])
         return None
@@ -48,7 +47,7 @@ class EspecialidadDAO(BaseDAO):
                 "UPDATE Especialidad SET nombre=?, descripcion=? WHERE id_especialidad=? AND activo=1",
                 (especialidad.nombre, especialidad.descripcion, especialidad.id_especialidad)
             )
-            self.conn.commit()
+            self._commit()
             return self.obtener_por_id(especialidad.id_especialidad)
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
@@ -61,7 +60,7 @@ class EspecialidadDAO(BaseDAO):
         """Baja lógica del Medico"""
         try:
             self.cur.execute("UPDATE Especialidad SET activo = 0 WHERE id_especialidad=?", (id_especialidad,))
-            self.conn.commit()
+            self._commit()
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
             raise IntegridadError(f"Error de integridad al eliminar la especialidad: {e}")
@@ -73,7 +72,7 @@ class EspecialidadDAO(BaseDAO):
         """Reactivar un médico inactivo"""
         try:
             self.cur.execute("UPDATE Especialidad SET activo = 1 WHERE id_especialidad=?", (id_especialidad,))
-            self.conn.commit()
+            self._commit()
 
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
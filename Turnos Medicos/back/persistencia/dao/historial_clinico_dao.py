@@ -3,13 +3,15 @@ from modelos.historial_clinico import HistorialClinico
 from persistencia.persistencia_errores import DatabaseError, IntegridadError
 import sqlite3 # Necesario para atrapar errores específicos de SQLite
 class HistorialClinicoDAO(BaseDAO):
+    TABLAS = ("HistorialClinico",)
+
     def crear(self, historial: HistorialClinico):
         try:
             self.cur.execute(
                 "INSERT INTO HistorialClinico (dni_paciente) VALUES (?)",
                 (historial.dni_paciente,)
             )
-            self.conn.commit()
+            self._commit()
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
             raise IntegridadError(f"Error de integridad al crear el historial clínico: {e}")
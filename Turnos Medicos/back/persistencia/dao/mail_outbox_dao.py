@@ -0,0 +1,217 @@
+from datetime import datetime, timedelta
+from .base_dao import BaseDAO
+from modelos.mensaje_mail import MensajeMail
+from persistencia.persistencia_errores import DatabaseError, IntegridadError
+import sqlite3 # Necesario para atrapar errores específicos de SQLite
+class MailOutboxDAO(BaseDAO):
+    TABLAS = ("MailOutbox",)
+    # Plazo para registrar el resultado de un mail reclamado: vencido, se puede volver a reclamar
+    PLAZO_ENVIO = timedelta(minutes=5)
+
+    def crear(self, mensaje: MensajeMail):
+        try:
+            self.cur.execute(
+                """INSERT INTO MailOutbox (tipo, destinatario, asunto, cuerpo, id_turno, estado, intentos,
+                                           proximo_intento, ultimo_error, fecha_creacion, fecha_envio,
+                                           clave_idempotencia, cuerpo_html)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                self._valores(mensaje)
+            )
+            mensaje.id_mail = self.cur.lastrowid
+            self._commit()
+        except sqlite3.IntegrityError as e:
+            self.conn.rollback()
+            raise IntegridadError(f"Error de integridad al encolar el mail: {e}")
+        except Exception as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Error de base de datos no especificado al encolar el mail: {e}")
+
+    def encolar_sin_repetir(self, mensajes):
+        """
+        Encola varios mails en una sola transacción, salteando los que tienen una
+        clave_idempotencia ya encolada antes (INSERT OR IGNORE sobre el índice único).
+        Retorna la cantidad de mails nuevos.
+        """
+        try:
+            antes = self.conn.total_changes
+            self.cur.executemany(
+                """INSERT OR IGNORE INTO MailOutbox (tipo, destinatario, asunto, cuerpo, id_turno, estado, intentos,
+                                                     proximo_intento, ultimo_error, fecha_creacion, fecha_envio,
+                                                     clave_idempotencia, cuerpo_html)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                [self._valores(mensaje) for mensaje in mensajes]
+            )
+            nuevos = self.conn.total_changes - antes
+            self._commit()
+            return nuevos
+        except Exception as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Error de base de datos no especificado al encolar los mails: {e}")
+
+    def _valores(self, mensaje):
+        return (mensaje.tipo, mensaje.destinatario, mensaje.asunto, mensaje.cuerpo, mensaje.id_turno,
+                mensaje.estado, mensaje.intentos, self._fmt_datetime(mensaje.proximo_intento),
+                mensaje.ultimo_error, self._fmt_datetime(mensaje.fecha_creacion),
+                self._fmt_datetime(mensaje.fecha_envio) if mensaje.fecha_envio else None,
+                mensaje.clave_idempotencia, mensaje.cuerpo_html)
+
+    def obtener_todos(self):
+        self.cur.execute("SELECT * FROM MailOutbox ORDER BY id_mail")
+        rows = self.cur.fetchall()
+        return [MensajeMail(**row) for row in rows]
+
+    def obtener_por_id(self, id_mail):
+        self.cur.execute("SELECT * FROM MailOutbox WHERE id_mail=?", (id_mail,))
+        row = self.cur.fetchone()
+        return MensajeMail(**row) if row else None
+
+    def obtener_por_estado(self, estado, limit=100):
+        self.cur.execute("SELECT * FROM MailOutbox WHERE estado=? ORDER BY id_mail LIMIT ?", (estado, int(limit)))
+        rows = self.cur.fetchall()
+        return [MensajeMail(**row) for row in rows]
+
+    def actualizar(self, mensaje: MensajeMail):
+        try:
+            self.cur.execute(
+                """UPDATE MailOutbox
+                   SET estado=?, intentos=?, proximo_intento=?, ultimo_error=?, fecha_envio=?
+                   WHERE id_mail=?""",
+                (mensaje.estado, mensaje.intentos, self._fmt_datetime(mensaje.proximo_intento),
+                 mensaje.ultimo_error, self._fmt_datetime(mensaje.fecha_envio) if mensaje.fecha_envio else None,
+                 mensaje.id_mail)
+            )
+            self._commit()
+            return self.obtener_por_id(mensaje.id_mail)
+        except sqlite3.IntegrityError as e:
+            self.conn.rollback()
+            raise IntegridadError(f"Error de integridad al actualizar el mail: {e}")
+        except Exception as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Error de base de datos no especificado al actualizar el mail: {e}")
+
+    def eliminar(self, id_mail):
+        try:
+            self.cur.execute("DELETE FROM MailOutbox WHERE id_mail=?", (id_mail,))
+            self._commit()
+        except Exception as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Error de base de datos no especificado al eliminar el mail: {e}")
+
+    def reclamar_pendientes(self, limite=10, ahora=None, tipo=None, plazo=None):
+        """
+        Toma hasta `limite` mails pendientes (de `tipo`, si se indica) cuyo próximo intento ya
+        venció, los pasa a 'enviando' y suma un intento. Se hace en una transacción IMMEDIATE,
+        así dos workers (con conexiones distintas) nunca reclaman el mismo mail.
+        Mientras está en 'enviando', proximo_intento es el vencimiento del reclamo (`plazo`, por
+        defecto PLAZO_ENVIO): si el worker no registra el resultado a tiempo (se colgó, o falló
+        la base al marcarlo enviado), el mail se vuelve a reclamar como uno pendiente.
+        Retorna la lista de MensajeMail reclamados.
+        """
+        ahora = ahora or datetime.now()
+        vencimiento = ahora + (plazo or self.PLAZO_ENVIO)
+        params = [self._fmt_datetime(ahora)]
+        filtro_tipo = ""
+        if tipo is not None:
+            filtro_tipo = " AND tipo = ?"
+            params.append(tipo)
+        params.append(int(limite))
+        try:
+            self.cur.execute("BEGIN IMMEDIATE")
+            self.cur.execute(
+                f"""SELECT * FROM MailOutbox
+                   WHERE estado IN ('pendiente', 'enviando') AND proximo_intento <= ?{filtro_tipo}
+                   ORDER BY proximo_intento, id_mail
+                   LIMIT ?""",
+                tuple(params)
+            )
+            rows = self.cur.fetchall()
+            if rows:
+                self.cur.executemany(
+                    "UPDATE MailOutbox SET estado = 'enviando', intentos = intentos + 1, proximo_intento = ? "
+                    "WHERE id_mail = ?",
+                    [(self._fmt_datetime(vencimiento), row["id_mail"]) for row in rows]
+                )
+            self._commit()
+        except Exception as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Error de base de datos al reclamar mails pendientes: {e}")
+
+        mensajes = []
+        for row in rows:
+            mensaje = MensajeMail(**row)
+            mensaje.estado = "enviando"
+            mensaje.intentos += 1
+            mensaje.proximo_intento = vencimiento
+            mensajes.append(mensaje)
+        return mensajes
+
+    def marcar_enviado(self, id_mail):
+        self._cambiar_estado(id_mail, "enviado", fecha_envio=self._fmt_datetime(datetime.now()), ultimo_error=None)
+
+    def reprogramar(self, id_mail, proximo_intento, error, devolver_intento=False):
+        """
+        Vuelve el mail a 'pendiente' para reintentarlo a partir de `proximo_intento`.
+        Con `devolver_intento` no se cuenta el intento (no se llegó a probar con el proveedor);
+        se descuenta en el mismo UPDATE que cambia el estado.
+        """
+        intentos = "MAX(intentos - 1, 0)" if devolver_intento else "intentos"
+        try:
+            self.cur.execute(
+                f"""UPDATE MailOutbox SET estado = 'pendiente', proximo_intento = ?, ultimo_error = ?, intentos = {intentos}
+                   WHERE id_mail = ?""",
+                (self._fmt_datetime(proximo_intento), error, id_mail)
+            )
+            self._commit()
+        except Exception as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Error de base de datos al actualizar el estado del mail {id_mail}: {e}")
+
+    def descartar_pendientes(self, id_turno, tipo):
+        """
+        Borra los mails `tipo` del turno que todavía no se enviaron (por ej. el recordatorio de un
+        turno cancelado). Al borrarlos se libera su clave_idempotencia. Retorna la cantidad borrada.
+        """
+        try:
+            self.cur.execute("DELETE FROM MailOutbox WHERE id_turno = ? AND tipo = ? AND estado = 'pendiente'",
+                             (id_turno, tipo))
+            cantidad = self.cur.rowcount
+            self._commit()
+            return cantidad
+        except Exception as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Error de base de datos al descartar los mails del turno {id_turno}: {e}")
+
+    def marcar_muerto(self, id_mail, error):
+        """Mail que agotó los reintentos (dead letter): queda para revisión, no se vuelve a enviar."""
+        self._cambiar_estado(id_mail, "muerto", ultimo_error=error)
+
+    def _cambiar_estado(self, id_mail, estado, **campos):
+        asignaciones = ", ".join(["estado = ?"] + [f"{campo} = ?" for campo in campos])
+        try:
+            self.cur.execute(f"UPDATE MailOutbox SET {asignaciones} WHERE id_mail = ?",
+                             (estado, *campos.values(), id_mail))
+            self._commit()
+        except Exception as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Error de base de datos al actualizar el estado del mail {id_mail}: {e}")
+
+    def liberar_en_envio(self, ahora=None):
+        """
+        Devuelve a 'pendiente' los mails en 'enviando' cuyo reclamo ya venció (por ej. si la
+        aplicación se cerró en medio de un envío). Los reclamos vigentes no se tocan: pueden ser
+        de otra instancia que los está enviando ahora. Retorna la cantidad liberada.
+        """
+        ahora = self._fmt_datetime(ahora or datetime.now())
+        try:
+            self.cur.execute("UPDATE MailOutbox SET estado = 'pendiente' "
+                             "WHERE estado = 'enviando' AND proximo_intento <= ?", (ahora,))
+            cantidad = self.cur.rowcount
+            self._commit()
+            return cantidad
+        except Exception as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Error de base de datos al liberar mails en envío: {e}")
+
+    def contar_por_estado(self):
+        self.cur.execute("SELECT estado, COUNT(*) AS cantidad FROM MailOutbox GROUP BY estado")
+        return {row["estado"]: row["cantidad"] for row in self.cur.fetchall()}
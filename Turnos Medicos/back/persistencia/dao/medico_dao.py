@@ -3,13 +3,15 @@ from modelos.medico import Medico
 from persistencia.persistencia_errores import DatabaseError, IntegridadError
 import sqlite3 # Necesario para atrapar errores específicos de SQLite
 class MedicoDAO(BaseDAO):
+    TABLAS = ("Medico",)
+
     def crear(self, medico: Medico):
         try:
             self.cur.execute(
                 "INSERT INTO Medico (nro_matricula, nombre, apellido, email, id_especialidad) VALUES (?, ?, ?, ?, ?)",
                 (medico.nro_matricula, medico.nombre, medico.apellido, medico.email, medico.id_especialidad)
             )
-            self.conn.commit()
+            self._commit()
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
             raise IntegridadError(f"Error de integridad al crear el médico: {e}")
@@ -18,8 +20,7 @@ class MedicoDAO(BaseDAO):
             raise DatabaseError(f"Error de base de datos no especificado al crear el médico: {e}")
 
     def obtener_todos(self):
-        self.cur.execute("SELECT * FROM Medico WHERE activo = 1")
-        rows = self.cur.fetchall()
+        rows = self._fetchall_cacheado("SELECT * FROM Medico WHERE activo = 1")
         return [Medico(row["nro_matricula"], row["nombre"], row["apellido"], row["email"], row["id_especialidad"]) for row in rows]
 
     def obtener_todos_inactivos(self):
@@ -28,20 +29,24 @@ class MedicoDAO(BaseDAO):
         return [Medico(row["nro_matricula"], row["nombre"], row["apellido"], row["email"], row["id_especialidad"], row["activo"]) for row in rows]
     
     def obtener_por_id(self, nro_matricula):
-        self.cur.execute("SELECT * FROM Medico WHERE nro_matricula=?", (nro_matricula,))
-        row = self.cur.fetchone()
+        row = self._fetchone_cacheado("SELECT * FROM Medico WHERE nro_matricula=?", (nro_matricula,))
         if row:
             return Medico(row["nro_matricula"], row["nombre"], row["apellido"], row["email"], row["id_especialidad"], row["activo"])
         return None
 
     def obtener_por_especialidad(self, id_especialidad):
-        self.cur.execute("SELECT * FROM Medico WHERE id_especialidad=? AND activo = 1", (id_especialidad,))
-        rows = self.cur.fetchall()
+        rows = self._fetchall_cacheado("SELECT * FROM Medico WHERE id_especialidad=? AND activo = 1", (id_especialidad,))
         return [Medico(row["nro_matricula"], row["nombre"], row["apellido"], row["email"], row["id_especialidad"]) for row in rows]
     
     def obtener_por_apellido(self, apellido):
-        self.cur.execute("SELECT * FROM Medico WHERE apellido LIKE ? AND activo = 1", (f"%{apellido}%",))
-        rows = self.cur.fetchall()
+        rows = self._buscar_texto("MedicoFTS", "Medico", "nro_matricula", ["apellido"], apellido,
+                                  condicion="t.activo = 1", orden="t.apellido, t.nombre")
+        return [Medico(row["nro_matricula"], row["nombre"], row["apellido"], row["email"], row["id_especialidad"]) for row in rows]
+
+    def buscar(self, texto, limit=20):
+        """Búsqueda de médicos activos por nombre, apellido, matrícula o email, ordenada por relevancia."""
+        rows = self._buscar_texto("MedicoFTS", "Medico", "nro_matricula", ["nro_matricula", "nombre", "apellido", "email"], texto,
+                                  limit=limit, condicion="t.activo = 1", orden_sin_fts="t.apellido, t.nombre")
         return [Medico(row["nro_matricula"], row["nombre"], row["apellido"], row["email"], row["id_especialidad"]) for row in rows]
     
     def actualizar(self, medico: Medico):
@@ -49,7 +54,7 @@ class MedicoDAO(BaseDAO):
             self.cur.execute('''
                 UPDATE Medico SET nombre=?, apellido=?, email=?, id_especialidad=? WHERE nro_matricula=? AND activo = 1
             ''', (medico.nombre, medico.apellido, medico.email, medico.id_especialidad, medico.nro_matricula))
-            self.conn.commit()
+            self._commit()
             return self.obtener_por_id(medico.nro_matricula)
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
@@ -62,7 +67,7 @@ class MedicoDAO(BaseDAO):
         """Baja lógica del Medico"""
         try:
             self.cur.execute("UPDATE Medico SET activo = 0 WHERE nro_matricula=?", (nro_matricula,))
-            self.conn.commit()
+            self._commit()
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
             raise IntegridadError(f"Error de integridad al eliminar el médico: {e}")
@@ -74,7 +79,7 @@ class MedicoDAO(BaseDAO):
         """Reactivar un médico inactivo"""
         try:
             self.cur.execute("UPDATE Medico SET activo = 1 WHERE nro_matricula=?", (nro_matricula,))
-            self.conn.commit()
+            self._commit()
             
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
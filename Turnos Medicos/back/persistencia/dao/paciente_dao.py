@@ -4,6 +4,8 @@ from modelos.paciente import Paciente
 from persistencia.persistencia_errores import DatabaseError, IntegridadError
 import sqlite3 # Necesario para atrapar errores específicos de SQLite
 class PacienteDAO(BaseDAO):
+    TABLAS = ("Paciente",)
+
     def crear(self, paciente: Paciente):
         try:
             fecha_nacimiento_str = self._fmt_date(paciente.fecha_nacimiento)
@@ -11,7 +13,7 @@ class PacienteDAO(BaseDAO):
                 "INSERT INTO Paciente (dni, nombre, apellido, fecha_nacimiento, email, direccion) VALUES (?, ?, ?, ?, ?, ?)",
                 (paciente.dni, paciente.nombre, paciente.apellido, fecha_nacimiento_str, paciente.email, paciente.direccion)
             )
-            self.conn.commit()
+            self._commit()
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
             raise IntegridadError(f"Error de integridad al crear el paciente: {e}")
@@ -30,18 +32,28 @@ class PacienteDAO(BaseDAO):
         return [Paciente(row["dni"], row["nombre"], row["apellido"], datetime.strptime(row["fecha_nacimiento"], '%Y-%m-%d').date(), row["email"], row["direccion"], row["activo"]) for row in rows]
  
     def obtener_por_id(self, dni):
-        self.cur.execute("SELECT * FROM Paciente WHERE dni = ?", (dni,))
-        row = self.cur.fetchone()
+        row = self._fetchone_cacheado("SELECT * FROM Paciente WHERE dni = ?", (dni,))
         if row:
             return Paciente(row["dni"], row["nombre"], row["apellido"], datetime.strptime(row["fecha_nacimiento"], '%Y-%m-%d').date(), row["email"], row["direccion"], row["activo"])
         return None
 
+    def obtener_por_apellido(self, apellido):
+        rows = self._buscar_texto("PacienteFTS", "Paciente", "dni", ["apellido"], apellido,
+                                  condicion="t.activo = 1", orden="t.apellido, t.nombre")
+        return [Paciente(row["dni"], row["nombre"], row["apellido"], datetime.strptime(row["fecha_nacimiento"], '%Y-%m-%d').date(), row["email"], row["direccion"], row["activo"]) for row in rows]
+
+    def buscar(self, texto, limit=20):
+        """Búsqueda de pacientes activos por nombre, apellido, DNI o email, ordenada por relevancia."""
+        rows = self._buscar_texto("PacienteFTS", "Paciente", "dni", ["dni", "nombre", "apellido", "email"], texto,
+                                  limit=limit, condicion="t.activo = 1", orden_sin_fts="t.apellido, t.nombre")
+        return [Paciente(row["dni"], row["nombre"], row["apellido"], datetime.strptime(row["fecha_nacimiento"], '%Y-%m-%d').date(), row["email"], row["direccion"], row["activo"]) for row in rows]
+
     def actualizar(self, paciente: Paciente):
         try:
             self.cur.execute('''
                 UPDATE Paciente SET nombre=?, apellido=?, email=?, direccion=? WHERE dni=? AND activo = 1
             ''', (paciente.nombre, paciente.apellido, paciente.email, paciente.direccion, paciente.dni))
-            self.conn.commit()
+            self._commit()
             return self.obtener_por_id(paciente.dni)
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
@@ -54,7 +66,7 @@ class PacienteDAO(BaseDAO):
         """Baja lógica del paciente"""
         try:
             self.cur.execute("UPDATE Paciente SET activo = 0 WHERE dni=?", (dni,))
-            self.conn.commit()
+            self._commit()
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
             raise IntegridadError(f"Error de integridad al eliminar el paciente: {e}")
@@ -66,7 +78,7 @@ class PacienteDAO(BaseDAO):
         """Reactivar un paciente inactivo"""
         try:
             self.cur.execute("UPDATE Paciente SET activo = 1 WHERE dni=?", (dni,))
-            self.conn.commit()
+            self._commit()
 
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
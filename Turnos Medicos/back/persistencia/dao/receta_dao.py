@@ -3,6 +3,8 @@ from modelos.receta import Receta
 from persistencia.persistencia_errores import DatabaseError, IntegridadError
 import sqlite3 # Necesario para atrapar errores específicos de SQLite
 class RecetaDAO(BaseDAO):
+    TABLAS = ("Receta",)
+
     def crear(self, receta: Receta):
         try:
             fecha_emision_str = self._fmt_date(receta.fecha_emision)
@@ -13,7 +15,7 @@ class RecetaDAO(BaseDAO):
                 (fecha_emision_str, receta.medicamentos, receta.detalle, receta.id_consulta)
             )
             receta.id_receta = self.cur.lastrowid
-            self.conn.commit()
+            self._commit()
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
             raise IntegridadError(f"Error de integridad al crear la receta: {e}")
@@ -36,6 +38,79 @@ class RecetaDAO(BaseDAO):
         row = self.cur.fetchone()
         return Receta(**row) if row else None
 
+    def buscar(self, texto, limit=20, offset=0, marcas=("<b>", "</b>")):
+        """
+        Búsqueda de texto libre en medicamentos y detalle, ordenada por relevancia.
+        Retorna lista de tuplas (Receta, fragmento resaltado).
+        """
+        rows = self._buscar_fragmentos("RecetaFTS", "Receta", "id_receta", ["medicamentos", "detalle"],
+                                       texto, limit, offset, marcas)
+        resultados = []
+        for row in rows:
+            datos = dict(row)
+            fragmento = datos.pop("fragmento")
+            resultados.append((Receta(**datos), fragmento))
+        return resultados
+
+    def contar_busqueda(self, texto):
+        return self._contar_texto("RecetaFTS", "Receta", ["medicamentos", "detalle"], texto)
+
+    def iterar_para_exportar(self, dni_paciente=None, nro_matricula_medico=None, fecha_inicio=None,
+                             fecha_fin=None, tamanio_bloque=1000):
+        """
+        Recetas para exportación masiva (con el paciente y el médico de su consulta), filtradas
+        opcionalmente. Retorna (columnas, filas) leídas en bloques.
+        """
+        query = """SELECT r.id_receta, r.fecha_emision, r.medicamentos, r.detalle, r.id_consulta, c.dni_paciente, c.nro_matricula_medico
+                   FROM Receta r JOIN Consulta c ON r.id_consulta = c.id_consulta"""
+        condiciones, params = self._rango_fechas("r.fecha_emision", fecha_inicio, fecha_fin)
+        if dni_paciente is not None:
+            condiciones.append("c.dni_paciente = ?")
+            params.append(dni_paciente)
+        if nro_matricula_medico is not None:
+            condiciones.append("c.nro_matricula_medico = ?")
+            params.append(nro_matricula_medico)
+        if condiciones:
+            query += " WHERE " + " AND ".join(condiciones)
+        query += " ORDER BY r.rowid"
+        return self._iterar_filas(query, params, tamanio_bloque)
+
+    def obtener_datos_emision(self, ids_recetas, tamanio_bloque=500):
+        """
+        Datos para emitir el PDF de varias recetas (receta, consulta, paciente, médico y
+        especialidad) con una consulta con joins por cada bloque de `tamanio_bloque` ids.
+        Retorna {id_receta: dict con las columnas}; los ids inexistentes no aparecen.
+        """
+        ids = list(dict.fromkeys(ids_recetas))
+        datos = {}
+        for i in range(0, len(ids), tamanio_bloque):
+            bloque = ids[i:i + tamanio_bloque]
+            self.cur.execute(
+                f"""SELECT r.id_receta, r.fecha_emision, r.medicamentos, r.detalle, r.id_consulta,
+                           c.diagnostico, p.dni, p.nombre AS nombre_paciente, p.apellido AS apellido_paciente,
+                           m.nro_matricula, m.nombre AS nombre_medico, m.apellido AS apellido_medico,
+                           e.nombre AS especialidad
+                    FROM Receta r
+                    JOIN Consulta c ON r.id_consulta = c.id_consulta
+                    JOIN Paciente p ON c.dni_paciente = p.dni
+                    JOIN Medico m ON c.nro_matricula_medico = m.nro_matricula
+                    LEFT JOIN Especialidad e ON m.id_especialidad = e.id_especialidad
+                    WHERE r.id_receta IN ({', '.join('?' for _ in bloque)})""",
+                tuple(bloque)
+            )
+            for row in self.cur.fetchall():
+                datos[row["id_receta"]] = dict(row)
+        return datos
+
+    def obtener_ids_por_fecha_emision(self, fecha_inicio, fecha_fin):
+        """Ids de las recetas emitidas en el rango de fechas (inclusivo), en orden de emisión."""
+        condiciones, params = self._rango_fechas("fecha_emision", fecha_inicio, fecha_fin)
+        self.cur.execute(
+            "SELECT id_receta FROM Receta WHERE " + " AND ".join(condiciones) + " ORDER BY fecha_emision, id_receta",
+            tuple(params)
+        )
+        return [row["id_receta"] for row in self.cur.fetchall()]
+
     """
     Una vez creada, una receta no se debe modificar
     def actualizar(self, receta: Receta):
@@ -65,7 +140,7 @@ class RecetaDAO(BaseDAO):
     def eliminar(self, id_receta):
         try:
             self.cur.execute("DELETE FROM Receta WHERE id_receta=?", (id_receta,))
-            self.conn.commit()
+            self._commit()
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
             raise IntegridadError(f"Error de integridad al eliminar la receta: {e}")
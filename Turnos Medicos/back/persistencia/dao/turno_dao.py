@@ -1,9 +1,12 @@
 from datetime import datetime
 from .base_dao import BaseDAO
 from modelos.turno import Turno
+from modelos.turno_batch import TurnoBatch
 from persistencia.persistencia_errores import DatabaseError, IntegridadError
 import sqlite3 # Necesario para atrapar errores específicos de SQLite
 class TurnoDAO(BaseDAO):
+    TABLAS = ("Turno",)
+
     def crear(self, turno: Turno):
         try:
             fecha_str = self._fmt_datetime(turno.fecha_hora_inicio)
@@ -14,7 +17,7 @@ class TurnoDAO(BaseDAO):
                  turno.estado, turno.dni_paciente, turno.nro_matricula_medico)
             )
             turno.id_turno = self.cur.lastrowid
-            self.conn.commit()
+            self._commit()
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
             raise IntegridadError(f"Error de integridad al crear el turno: {e}")
@@ -40,7 +43,7 @@ class TurnoDAO(BaseDAO):
                    WHERE id_turno=?""",
                 (turno.motivo, turno.observaciones, turno.estado, turno.dni_paciente, turno.id_turno)
             )
-            self.conn.commit()
+            self._commit()
             return self.obtener_por_id(turno.id_turno)
         except sqlite3.IntegrityError as e:
             self.conn.rollback()
@@ -95,14 +98,13 @@ class TurnoDAO(BaseDAO):
         except ValueError as e:
             raise ValueError(f"Fecha inválida: {e}")
 
-        self.cur.execute(
+        rows = self._fetchall_cacheado(
             """SELECT * FROM Turno
                WHERE nro_matricula_medico=?
                  AND date(fecha_hora_inicio)=?
                ORDER BY datetime(fecha_hora_inicio) ASC""",
             (nro_matricula_medico, fecha_str)
         )
-        rows = self.cur.fetchall()
         return [Turno(**row) for row in rows]
     
     def obtener_turnos_disponibles_por_medico_y_mes(self, nro_matricula_medico, mes_actual, anio_actual):
@@ -112,7 +114,7 @@ class TurnoDAO(BaseDAO):
         mes_str = f"{mes_actual:02d}"
         anio_str = str(anio_actual)
 
-        self.cur.execute(
+        rows = self._fetchall_cacheado(
             """SELECT * FROM Turno
                WHERE nro_matricula_medico=?
                  AND strftime('%m', fecha_hora_inicio)=?
@@ -121,7 +123,6 @@ class TurnoDAO(BaseDAO):
                ORDER BY datetime(fecha_hora_inicio) ASC""",
             (nro_matricula_medico, mes_str, anio_str)
         )
-        rows = self.cur.fetchall()
         return [Turno(**row) for row in rows]
     
     def obtener_turnos_disponibles_por_especialidad_y_fecha(self, id_especialidad, fecha):
@@ -133,16 +134,15 @@ class TurnoDAO(BaseDAO):
         except ValueError as e:
             raise ValueError(f"Fecha inválida: {e}")
 
-        self.cur.execute(
+        rows = self._fetchall_cacheado(
             """SELECT t.* FROM Turno t
                JOIN Medico m ON t.nro_matricula_medico = m.nro_matricula
                WHERE m.id_especialidad=?
                  AND date(t.fecha_hora_inicio)=?
                  AND t.estado='disponible'
                ORDER BY datetime(t.fecha_hora_inicio) ASC""",
-            (id_especialidad, fecha_str)
+            (id_especialidad, fecha_str), tablas=("Turno", "Medico")
         )
-        rows = self.cur.fetchall()
         return [Turno(**row) for row in rows]
     
     def obtener_turnos_disponibles_por_especialidad_y_mes(self, id_especialidad, mes_actual, anio_actual):
@@ -152,7 +152,7 @@ class TurnoDAO(BaseDAO):
         mes_str = f"{mes_actual:02d}"
         anio_str = str(anio_actual)
 
-        self.cur.execute(
+        rows = self._fetchall_cacheado(
             """SELECT t.* FROM Turno t
                JOIN Medico m ON t.nro_matricula_medico = m.nro_matricula
                WHERE m.id_especialidad=?
@@ -160,9 +160,8 @@ class TurnoDAO(BaseDAO):
                  AND strftime('%Y', t.fecha_hora_inicio)=?
                  AND t.estado='disponible'
                ORDER BY datetime(t.fecha_hora_inicio) ASC""",
-            (id_especialidad, mes_str, anio_str)
+            (id_especialidad, mes_str, anio_str), tablas=("Turno", "Medico")
         )
-        rows = self.cur.fetchall()
         return [Turno(**row) for row in rows]
     
     def obtener_turnos_por_medico_en_un_periodo(self, nro_matricula_medico, fecha_inicio, fecha_fin):
@@ -172,14 +171,13 @@ class TurnoDAO(BaseDAO):
         fecha_inicio_str = self._fmt_date(fecha_inicio)
         fecha_fin_str = self._fmt_date(fecha_fin)
 
-        self.cur.execute(
+        rows = self._fetchall_cacheado(
             """SELECT * FROM Turno
                WHERE nro_matricula_medico=?
                  AND date(fecha_hora_inicio) BETWEEN ? AND ?
                ORDER BY datetime(fecha_hora_inicio) ASC""",
             (nro_matricula_medico, fecha_inicio_str, fecha_fin_str)
         )
-        rows = self.cur.fetchall()
         return [Turno(**row) for row in rows]
 
     def obtener_turnos_por_especialidad_en_un_periodo(self, id_especialidad, fecha_inicio, fecha_fin):
@@ -189,18 +187,186 @@ class TurnoDAO(BaseDAO):
         fecha_inicio_str = self._fmt_date(fecha_inicio)
         fecha_fin_str = self._fmt_date(fecha_fin)
 
-        self.cur.execute(
+        rows = self._fetchall_cacheado(
             """SELECT t.* FROM Turno t
                JOIN Medico m ON t.nro_matricula_medico = m.nro_matricula
                WHERE m.id_especialidad=?
                  AND m.activo = 1
                  AND date(t.fecha_hora_inicio) BETWEEN ? AND ?
                ORDER BY datetime(t.fecha_hora_inicio) ASC""",
-            (id_especialidad, fecha_inicio_str, fecha_fin_str)
+            (id_especialidad, fecha_inicio_str, fecha_fin_str), tablas=("Turno", "Medico")
         )
-        rows = self.cur.fetchall()
         return [Turno(**row) for row in rows]
     
+    def iterar_turnos_por_medico_en_un_periodo(self, nro_matricula_medico, fecha_inicio, fecha_fin,
+                                               excluir_estados=(), tamanio_bloque=500):
+        """
+        Recorre los turnos de un médico en un período en bloques de `tamanio_bloque` objetos Turno,
+        sin cargar todo el resultado en memoria. Usa un rango sobre fecha_hora_inicio (sin funciones
+        sobre la columna) para aprovechar el índice idx_turno_medico_fecha, que además ya da el orden.
+        """
+        condiciones, params = self._rango_fechas("fecha_hora_inicio", fecha_inicio, fecha_fin)
+        query = "SELECT * FROM Turno WHERE nro_matricula_medico = ? AND " + " AND ".join(condiciones)
+        params = [nro_matricula_medico] + params
+        if excluir_estados:
+            query += f" AND estado NOT IN ({', '.join('?' for _ in excluir_estados)})"
+            params.extend(excluir_estados)
+        query += " ORDER BY fecha_hora_inicio ASC"
+
+        cur = self.conn.cursor()
+        cur.execute(query, tuple(params))
+        while True:
+            rows = cur.fetchmany(tamanio_bloque)
+            if not rows:
+                break
+            yield [Turno(**row) for row in rows]
+
+    def iterar_para_exportar(self, nro_matricula_medico=None, id_especialidad=None, estado=None,
+                             fecha_inicio=None, fecha_fin=None, tamanio_bloque=1000):
+        """
+        Turnos para exportación masiva, con los mismos filtros que las consultas por período
+        (médico, especialidad, estado, rango de fechas). Retorna (columnas, filas) con filas leídas en bloques.
+        """
+        query = """SELECT t.id_turno, t.fecha_hora_inicio, t.motivo, t.observaciones, t.estado,
+                          t.dni_paciente, t.nro_matricula_medico
+                   FROM Turno t"""
+        condiciones, params = self._rango_fechas("t.fecha_hora_inicio", fecha_inicio, fecha_fin)
+        if nro_matricula_medico is not None:
+            condiciones.append("t.nro_matricula_medico = ?")
+            params.append(nro_matricula_medico)
+        if estado is not None:
+            condiciones.append("t.estado = ?")
+            params.append(estado)
+        if id_especialidad is not None:
+            query += " JOIN Medico m ON t.nro_matricula_medico = m.nro_matricula"
+            condiciones.append("m.id_especialidad = ?")
+            params.append(id_especialidad)
+        if condiciones:
+            query += " WHERE " + " AND ".join(condiciones)
+        query += " ORDER BY t.id_turno"
+        return self._iterar_filas(query, params, tamanio_bloque)
+
+    def obtener_batch_por_periodo(self, fecha_inicio, fecha_fin, nro_matricula_medico=None, id_especialidad=None):
+        """
+        Lectura masiva de turnos en un período como TurnoBatch (arreglos paralelos, sin
+        un objeto Turno por fila). Filtra opcionalmente por médico o por especialidad.
+        La conversión de fecha a minutos y de estado a código se hace en SQL.
+        """
+        codigos = " ".join(f"WHEN '{e}' THEN {i}" for i, e in enumerate(TurnoBatch.ESTADOS))
+        query = f"""SELECT t.id_turno,
+                           CAST(strftime('%s', t.fecha_hora_inicio) AS INTEGER) / 60,
+                           CASE t.estado {codigos} END,
+                           t.dni_paciente,
+                           t.nro_matricula_medico
+                    FROM Turno t"""
+        condiciones = ["date(t.fecha_hora_inicio) BETWEEN ? AND ?"]
+        params = [self._fmt_date(fecha_inicio), self._fmt_date(fecha_fin)]
+        if nro_matricula_medico is not None:
+            condiciones.append("t.nro_matricula_medico = ?")
+            params.append(nro_matricula_medico)
+        if id_especialidad is not None:
+            query += " JOIN Medico m ON t.nro_matricula_medico = m.nro_matricula"
+            condiciones.extend(["m.id_especialidad = ?", "m.activo = 1"])
+            params.append(id_especialidad)
+        query += " WHERE " + " AND ".join(condiciones) + " ORDER BY t.fecha_hora_inicio ASC"
+
+        cur = self.conn.cursor()
+        cur.execute(query, tuple(params))
+        batch = TurnoBatch()
+        while True:
+            filas = cur.fetchmany(1000)
+            if not filas:
+                break
+            for fila in filas:
+                batch.agregar(*fila)
+        return batch
+
+    # Expresión SQL del inicio de cada intervalo (la semana empieza el lunes)
+    INTERVALOS = {
+        "dia": "date(t.fecha_hora_inicio)",
+        "semana": "date(t.fecha_hora_inicio, '-6 days', 'weekday 1')",
+        "mes": "strftime('%Y-%m-01', t.fecha_hora_inicio)",
+    }
+    # desglose -> columna de agrupación (el nombre es el de la columna en el resultado)
+    DESGLOSES = {
+        "medico": "t.nro_matricula_medico",
+        "especialidad": "m.id_especialidad",
+    }
+
+    def contar_asistencias_por_intervalo(self, fecha_inicio, fecha_fin, intervalo="dia", desglose=None,
+                                         nro_matricula_medico=None, id_especialidad=None, tamanio_bloque=1000):
+        """
+        Cantidad de turnos atendidos, ausentes, cancelados y programados por intervalo (dia, semana
+        o mes), opcionalmente desglosados por médico o especialidad. Se resuelve con un único
+        GROUP BY sobre el rango de fechas (índice idx_turno_fecha_estado), sin leer turnos sueltos.
+        Retorna (columnas, filas) con una fila por intervalo (y grupo), ordenadas.
+        """
+        periodo = self.INTERVALOS[intervalo]
+        columnas_sql = [f"{periodo} AS periodo"]
+        agrupar = ["periodo"]
+        if desglose is not None:
+            columna = self.DESGLOSES[desglose]
+            columnas_sql.append(columna)
+            agrupar.append(columna)
+        columnas_sql += [
+            "SUM(t.estado = 'atendido') AS atendidos",
+            "SUM(t.estado = 'ausente') AS ausentes",
+            "SUM(t.estado = 'cancelado') AS cancelados",
+            "SUM(t.estado = 'programado') AS programados",
+        ]
+        query = f"SELECT {', '.join(columnas_sql)} FROM Turno t"
+
+        condiciones, params = self._rango_fechas("t.fecha_hora_inicio", fecha_inicio, fecha_fin)
+        condiciones.append("t.estado IN ('atendido', 'ausente', 'cancelado', 'programado')")
+        if nro_matricula_medico is not None:
+            condiciones.append("t.nro_matricula_medico = ?")
+            params.append(nro_matricula_medico)
+        if desglose == "especialidad" or id_especialidad is not None:
+            query += " JOIN Medico m ON t.nro_matricula_medico = m.nro_matricula"
+        if id_especialidad is not None:
+            condiciones.append("m.id_especialidad = ?")
+            params.append(id_especialidad)
+        query += " WHERE " + " AND ".join(condiciones)
+        query += f" GROUP BY {', '.join(agrupar)} ORDER BY {', '.join(agrupar)}"
+        return self._iterar_filas(query, params, tamanio_bloque)
+
+    # Datos de un turno para armar sus mails (ver servicios/plantillas_mail.py): paciente, médico y especialidad
+    _CONSULTA_NOTIFICACION = """SELECT t.id_turno, t.fecha_hora_inicio, t.motivo, t.observaciones, t.estado,
+                      t.nro_matricula_medico,
+                      p.dni, p.nombre AS nombre_paciente, p.apellido AS apellido_paciente, p.email,
+                      m.nombre AS nombre_medico, m.apellido AS apellido_medico,
+                      e.nombre AS especialidad
+               FROM Turno t
+               JOIN Paciente p ON t.dni_paciente = p.dni
+               JOIN Medico m ON t.nro_matricula_medico = m.nro_matricula
+               LEFT JOIN Especialidad e ON m.id_especialidad = e.id_especialidad"""
+
+    def obtener_datos_notificacion(self, id_turno):
+        """
+        Datos del turno, su paciente, su médico y la especialidad en una sola consulta, para
+        armar la confirmación o la cancelación. Retorna un dict (mismas claves que
+        obtener_para_recordatorio) o None si el turno no existe o no tiene paciente.
+        """
+        self.cur.execute(self._CONSULTA_NOTIFICACION + " WHERE t.id_turno = ?", (id_turno,))
+        row = self.cur.fetchone()
+        return dict(row) if row else None
+
+    def obtener_para_recordatorio(self, desde, hasta):
+        """
+        Turnos 'programado' con inicio en [desde, hasta) cuyo paciente tiene email, con los datos
+        del paciente, del médico y de la especialidad para armar el recordatorio. Una sola consulta
+        con joins sobre el rango de fechas (índice idx_turno_fecha_estado).
+        Retorna una lista de dicts ordenada por fecha.
+        """
+        self.cur.execute(
+            self._CONSULTA_NOTIFICACION + """
+               WHERE t.fecha_hora_inicio >= ? AND t.fecha_hora_inicio < ? AND t.estado = 'programado'
+                 AND p.email IS NOT NULL AND p.email <> ''
+               ORDER BY t.fecha_hora_inicio, t.id_turno""",
+            (self._fmt_datetime(desde), self._fmt_datetime(hasta))
+        )
+        return [dict(row) for row in self.cur.fetchall()]
+
     def obtener_cantidad_turnos_por_estado_y_especialidad(self, id_especialidad):
         """
         Retorna un diccionario con la cantidad de turnos por estado para una especialidad médica específica.
@@ -1,5 +1,27 @@
 import sqlite3
 import os
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+@contextmanager
+def transaccion_lectura(conn):
+    """
+    Ejecuta un bloque de consultas dentro de una única transacción de lectura:
+    todas ven la misma foto de la base aunque otra conexión confirme cambios en el medio.
+    Si la conexión ya está dentro de una transacción, se reutiliza.
+    """
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.execute("COMMIT")
+
+class Conexion(sqlite3.Connection):
+    """Conexión sqlite3 que admite referencias débiles (CacheConsultas la sigue sin retenerla)."""
+
 
 class DBConnection:
     _instance = None
@@ -22,14 +44,43 @@ class DBConnection:
 
     def _initialize(self, db_path):
         os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
-        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.db_path = db_path
+        self._connection = sqlite3.connect(db_path, check_same_thread=False, factory=Conexion)
         self._connection.row_factory = sqlite3.Row
+        # WAL: los lectores (reportes) no bloquean a los escritores y viceversa
+        try:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.DatabaseError as e:
+            print(f"[WARN] No se pudo activar el modo WAL: {e}")
         self._create_schema()
+        self.fts_disponible = self._create_search_index()
 
     @property
     def conn(self):
         return self._connection
+
+    def conexion_lectura(self):
+        """
+        Abre una conexión nueva de solo lectura (URI mode=ro) sobre la misma base.
+        Pensada para reportes: no comparte transacción con las escrituras de la aplicación.
+        La conexión queda en modo autocommit; usar `transaccion_lectura` para obtener
+        una foto consistente de la base durante varias consultas.
+        """
+        uri = f"file:{pathname2url(self.db_path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None, factory=Conexion)
+        conn.row_factory = sqlite3.Row
+        return conn
     
+    def nueva_conexion(self):
+        """
+        Abre una conexión nueva de lectura/escritura sobre la misma base, para hilos en
+        segundo plano que escriben (por ej. los workers de mails) sin compartir la
+        transacción de la conexión principal. Espera hasta 10 s si la base está bloqueada.
+        """
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10, factory=Conexion)
+        conn.row_factory = sqlite3.Row
+        return conn
+
     def _create_schema(self):
         cur = self.conn.cursor()
 
@@ -132,6 +183,40 @@ class DBConnection:
         )
         ''')
 
+        # Cola de mails salientes: se escribe en la misma transacción que la operación que
+        # genera el mail (por ej. programar un turno) y la vacían los workers de mail_outbox.py
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS MailOutbox (
+            id_mail INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo TEXT NOT NULL,
+            destinatario TEXT NOT NULL,
+            asunto TEXT NOT NULL,
+            cuerpo TEXT NOT NULL,
+            id_turno INTEGER,
+            estado TEXT NOT NULL DEFAULT 'pendiente' CHECK(estado IN ('pendiente','enviando','enviado','muerto')),
+            intentos INTEGER NOT NULL DEFAULT 0,
+            proximo_intento DATETIME NOT NULL,
+            ultimo_error TEXT,
+            fecha_creacion DATETIME NOT NULL,
+            fecha_envio DATETIME,
+            clave_idempotencia TEXT,
+            cuerpo_html TEXT,
+            FOREIGN KEY(id_turno) REFERENCES Turno(id_turno)
+        )
+        ''')
+
+        # Columnas agregadas después de crear las tablas (bases ya existentes)
+        self._agregar_columna(cur, 'MailOutbox', 'clave_idempotencia', 'TEXT')
+        self._agregar_columna(cur, 'MailOutbox', 'cuerpo_html', 'TEXT')
+
+        # Índices
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_turno_medico_fecha ON Turno(nro_matricula_medico, fecha_hora_inicio)')
+        # Cubre los conteos por intervalo (rango de fechas + estado + médico) sin leer la tabla
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_turno_fecha_estado ON Turno(fecha_hora_inicio, estado, nro_matricula_medico)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_mailoutbox_pendientes ON MailOutbox(estado, proximo_intento)')
+        # Un mail con clave (por ej. 'recordatorio:<id_turno>:<fecha>') se encola una sola vez
+        cur.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_mailoutbox_clave ON MailOutbox(clave_idempotencia)')
+
         # Persistencia de datos iniciales, por ahora no hay datos iniciales.
 
         # Datos iniciales
@@ -144,3 +229,84 @@ class DBConnection:
             (3, 'Cardiología', 'Enfermedades del corazón')
         ])
         self.conn.commit()
+
+    def _agregar_columna(self, cur, tabla, columna, definicion):
+        """Agrega `columna` a `tabla` si todavía no existe (migración de bases creadas antes)."""
+        columnas = {row[1] for row in cur.execute(f"PRAGMA table_info({tabla})")}
+        if columna not in columnas:
+            cur.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
+
+    def _create_search_index(self):
+        """
+        Crea los índices FTS5 de búsqueda de texto:
+        - pacientes y médicos (tokenizador trigram, coincidencia parcial).
+        - diagnósticos/observaciones de consultas y medicamentos/detalle de recetas
+          (tokenizador unicode61 sin acentos, con índices de prefijo).
+        Los triggers los mantienen sincronizados con las tablas base.
+        Retorna False si la versión de SQLite no soporta FTS5/trigram.
+        """
+        cur = self.conn.cursor()
+        try:
+            self._create_fts_table(
+                cur, "PacienteFTS", "Paciente", "dni",
+                ["dni", "nombre", "apellido", "email"],
+                "tokenize='trigram'"
+            )
+            self._create_fts_table(
+                cur, "MedicoFTS", "Medico", "nro_matricula",
+                ["nro_matricula", "nombre", "apellido", "email"],
+                "tokenize='trigram'"
+            )
+            self._create_fts_table(
+                cur, "ConsultaFTS", "Consulta", "id_consulta",
+                ["diagnostico", "observaciones"],
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3'"
+            )
+            self._create_fts_table(
+                cur, "RecetaFTS", "Receta", "id_receta",
+                ["medicamentos", "detalle"],
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3'"
+            )
+            self.conn.commit()
+            return True
+        except sqlite3.OperationalError as e:
+            self.conn.rollback()
+            print(f"[WARN] Búsqueda FTS5 no disponible, se usará LIKE: {e}")
+            return False
+
+    def _create_fts_table(self, cur, fts, tabla, pk, columnas, opciones):
+        """
+        Crea una tabla FTS5 de contenido externo sobre `tabla` y sus triggers de sincronización.
+        Si la tabla FTS es nueva, se reconstruye a partir de los datos existentes.
+        """
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (fts,))
+        existia = cur.fetchone() is not None
+
+        cols = ", ".join(columnas)
+        new_cols = ", ".join(f"new.{c}" for c in columnas)
+        old_cols = ", ".join(f"old.{c}" for c in columnas)
+
+        cur.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {cols}, content='{tabla}', content_rowid='{pk}', {opciones}
+        )
+        ''')
+        cur.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {tabla}_fts_ai AFTER INSERT ON {tabla} BEGIN
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.{pk}, {new_cols});
+        END
+        ''')
+        cur.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {tabla}_fts_ad AFTER DELETE ON {tabla} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.{pk}, {old_cols});
+        END
+        ''')
+        cur.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {tabla}_fts_au AFTER UPDATE OF {cols} ON {tabla} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.{pk}, {old_cols});
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.{pk}, {new_cols});
+        END
+        ''')
+
+        if not existia:
+            cur.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
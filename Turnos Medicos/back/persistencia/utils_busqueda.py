@@ -0,0 +1,27 @@
+# persistencia/utils_busqueda.py
+
+def tokenizar_busqueda(texto):
+    """
+    Separa el texto ingresado por el usuario en términos de búsqueda.
+    Retorna lista vacía si el texto no es válido.
+    """
+    if not isinstance(texto, str):
+        return []
+    return [t for t in texto.strip().split() if t]
+
+def construir_consulta_fts(terminos, columnas=None, prefijo=False):
+    """
+    Arma la expresión MATCH de FTS5 a partir de una lista de términos.
+    Cada término se encierra entre comillas para que no se interprete como
+    sintaxis FTS (AND, OR, NEAR, *, :, etc.). Todos los términos deben coincidir.
+    - columnas: restringe la búsqueda a esas columnas de la tabla FTS.
+    - prefijo: agrega '*' para buscar por prefijo (tokenizador unicode61).
+    """
+    filtro = "{" + " ".join(columnas) + "} : " if columnas else ""
+    partes = []
+    for termino in terminos:
+        frase = '"' + termino.replace('"', '""') + '"'
+        if prefijo:
+            frase += "*"
+        partes.append(filtro + frase)
+    return " AND ".join(partes)
@@ -0,0 +1,130 @@
+# servicios/cache_reportes.py
+"""
+Cache en disco de gráficos (PNG) y reportes (PDF) direccionado por contenido.
+La clave es el hash SHA-256 del tipo de reporte más los datos de entrada, así que un
+pedido repetido con los mismos datos se resuelve sin matplotlib ni reportlab.
+Tamaño acotado: al superar `max_bytes` se borran los archivos usados hace más tiempo
+(se toma la fecha de modificación, que se actualiza en cada acierto).
+"""
+import os
+import json
+import hashlib
+import shutil
+import tempfile
+import threading
+
+# Cambiar si cambia el formato de los reportes, para no servir versiones viejas
+VERSION_FORMATO = 1
+MAX_MB_POR_DEFECTO = 200
+
+class CacheReportes:
+    def __init__(self, directorio, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = self._max_bytes_desde_entorno()
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        os.makedirs(self.directorio, exist_ok=True)
+
+    @staticmethod
+    def _max_bytes_desde_entorno():
+        valor = os.getenv("REPORTES_CACHE_MB")
+        try:
+            mb = float(valor) if valor else MAX_MB_POR_DEFECTO
+        except ValueError:
+            print(f"[WARN] REPORTES_CACHE_MB inválido ({valor}), se usan {MAX_MB_POR_DEFECTO} MB.")
+            mb = MAX_MB_POR_DEFECTO
+        return int(mb * 1024 * 1024)
+
+    @staticmethod
+    def clave(tipo, datos):
+        """Hash del tipo de contenido y de sus datos de entrada (fechas y objetos se serializan como texto)."""
+        contenido = json.dumps([VERSION_FORMATO, tipo, datos], sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+    def _ruta(self, clave, extension):
+        return os.path.join(self.directorio, f"{clave}{extension}")
+
+    def obtener(self, clave, extension):
+        """Contenido guardado para la clave, o None si no está en cache."""
+        ruta = self._ruta(clave, extension)
+        with self._lock:
+            try:
+                with open(ruta, "rb") as f:
+                    contenido = f.read()
+                os.utime(ruta)
+            except OSError:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+            return contenido
+
+    def copiar_a(self, clave, extension, destino):
+        """Copia el archivo cacheado a `destino`. Retorna False si no está en cache."""
+        ruta = self._ruta(clave, extension)
+        with self._lock:
+            try:
+                shutil.copyfile(ruta, destino)
+                os.utime(ruta)
+            except OSError:
+                self.fallos += 1
+                return False
+            self.aciertos += 1
+            return True
+
+    def guardar(self, clave, extension, contenido):
+        """Guarda bytes bajo la clave (escritura atómica) y aplica el límite de tamaño."""
+        with self._lock:
+            fd, temporal = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(contenido)
+                os.replace(temporal, self._ruta(clave, extension))
+            except OSError as e:
+                print(f"[WARN] No se pudo guardar en el cache de reportes: {e}")
+                if os.path.exists(temporal):
+                    os.remove(temporal)
+                return
+            self._desalojar()
+
+    def guardar_archivo(self, clave, extension, origen):
+        """Guarda una copia del archivo `origen` (por ejemplo, el PDF recién generado)."""
+        try:
+            with open(origen, "rb") as f:
+                contenido = f.read()
+        except OSError as e:
+            print(f"[WARN] No se pudo leer {origen} para el cache de reportes: {e}")
+            return
+        self.guardar(clave, extension, contenido)
+
+    def _desalojar(self):
+        archivos = []
+        total = 0
+        for entrada in os.scandir(self.directorio):
+            if entrada.is_file() and not entrada.name.endswith(".tmp"):
+                info = entrada.stat()
+                archivos.append((info.st_mtime, info.st_size, entrada.path))
+                total += info.st_size
+        archivos.sort()
+        for _, tamanio, ruta in archivos:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(ruta)
+                total -= tamanio
+            except OSError:
+                pass
+
+    def limpiar(self):
+        with self._lock:
+            for entrada in os.scandir(self.directorio):
+                if entrada.is_file():
+                    os.remove(entrada.path)
+
+    def estadisticas(self):
+        with self._lock:
+            archivos = [e.stat().st_size for e in os.scandir(self.directorio) if e.is_file()]
+            return {"aciertos": self.aciertos, "fallos": self.fallos, "archivos": len(archivos),
+                    "bytes": sum(archivos), "max_bytes": self.max_bytes}
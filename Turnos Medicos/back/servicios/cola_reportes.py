@@ -0,0 +1,133 @@
+# servicios/cola_reportes.py
+"""
+Cola de trabajos de reportes que se generan en hilos en segundo plano.
+La interfaz encola un trabajo, consulta su estado periódicamente (estado, progreso,
+mensaje, ruta del PDF) y no queda bloqueada mientras se arma el reporte.
+"""
+import os
+import queue
+import threading
+import itertools
+from datetime import datetime
+
+PENDIENTE = "pendiente"
+EN_PROCESO = "en_proceso"
+TERMINADO = "terminado"
+ERROR = "error"
+CANCELADO = "cancelado"
+
+
+class TrabajoReporte:
+    __slots__ = ("id", "tipo", "parametros", "estado", "progreso", "mensaje", "ruta", "error",
+                 "creado", "iniciado", "finalizado")
+
+    def __init__(self, id_trabajo, tipo, parametros):
+        self.id = id_trabajo
+        self.tipo = tipo
+        self.parametros = parametros
+        self.estado = PENDIENTE
+        self.progreso = 0.0
+        self.mensaje = "En cola"
+        self.ruta = None
+        self.error = None
+        self.creado = datetime.now()
+        self.iniciado = None
+        self.finalizado = None
+
+    def como_dict(self):
+        return {nombre: getattr(self, nombre) for nombre in self.__slots__}
+
+
+class ColaReportes:
+    # tipo de trabajo -> método de ReporteService
+    TIPOS = {
+        "turnos_por_medico": "listado_turnos_por_medico_en_un_periodo",
+        "cantidad_por_especialidad": "reporte_cantidad_turnos_por_especialidad",
+        "pacientes_atendidos": "reporte_pacientes_atendidos_en_un_periodo",
+        "asistencias": "asistencias_vs_inasistencias_de_pacientes",
+        "asistencias_por_intervalo": "reporte_asistencias_por_intervalo",
+    }
+
+    def __init__(self, reporte_service, workers=1):
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError("La cantidad de workers debe ser un entero mayor o igual a 1.")
+        self.reporte_service = reporte_service
+        self._cola = queue.Queue()
+        self._trabajos = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._hilos = []
+        for i in range(workers):
+            hilo = threading.Thread(target=self._procesar, name=f"cola-reportes-{i + 1}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def encolar(self, tipo, **parametros):
+        """Agrega un trabajo y retorna su id. `parametros` son los argumentos del método del reporte."""
+        if tipo not in self.TIPOS:
+            raise ValueError(f"Tipo de reporte inválido. Debe ser uno de: {', '.join(self.TIPOS)}.")
+        with self._lock:
+            trabajo = TrabajoReporte(next(self._ids), tipo, parametros)
+            self._trabajos[trabajo.id] = trabajo
+        self._cola.put(trabajo.id)
+        return trabajo.id
+
+    def estado(self, id_trabajo):
+        """Foto del estado de un trabajo (dict), o None si no existe."""
+        with self._lock:
+            trabajo = self._trabajos.get(id_trabajo)
+            return trabajo.como_dict() if trabajo else None
+
+    def trabajos(self):
+        """Estado de todos los trabajos, del más nuevo al más viejo."""
+        with self._lock:
+            return [t.como_dict() for t in sorted(self._trabajos.values(), key=lambda t: t.id, reverse=True)]
+
+    def cancelar(self, id_trabajo):
+        """Cancela un trabajo que todavía no empezó. Retorna True si se canceló."""
+        with self._lock:
+            trabajo = self._trabajos.get(id_trabajo)
+            if trabajo is None or trabajo.estado != PENDIENTE:
+                return False
+            trabajo.estado = CANCELADO
+            trabajo.mensaje = "Cancelado"
+            trabajo.finalizado = datetime.now()
+            return True
+
+    def detener(self):
+        """Termina los hilos cuando terminen el trabajo en curso."""
+        for _ in self._hilos:
+            self._cola.put(None)
+
+    def _actualizar(self, trabajo, **campos):
+        with self._lock:
+            for nombre, valor in campos.items():
+                setattr(trabajo, nombre, valor)
+
+    def _procesar(self):
+        while True:
+            id_trabajo = self._cola.get()
+            if id_trabajo is None:
+                break
+            trabajo = self._trabajos[id_trabajo]
+            with self._lock:
+                if trabajo.estado != PENDIENTE:
+                    continue
+                trabajo.estado = EN_PROCESO
+                trabajo.mensaje = "Iniciando"
+                trabajo.iniciado = datetime.now()
+
+            def progreso(fraccion, mensaje=None):
+                campos = {"progreso": max(0.0, min(1.0, fraccion))}
+                if mensaje:
+                    campos["mensaje"] = mensaje
+                self._actualizar(trabajo, **campos)
+
+            try:
+                metodo = getattr(self.reporte_service, self.TIPOS[trabajo.tipo])
+                ruta = metodo(progreso=progreso, **trabajo.parametros)
+                self._actualizar(trabajo, estado=TERMINADO, progreso=1.0, mensaje="Listo",
+                                 ruta=os.path.abspath(ruta), finalizado=datetime.now())
+            except Exception as e:
+                print(f"[ERROR] Fallo el trabajo de reporte {trabajo.id} ({trabajo.tipo}): {e}")
+                self._actualizar(trabajo, estado=ERROR, mensaje="Error", error=str(e), finalizado=datetime.now())
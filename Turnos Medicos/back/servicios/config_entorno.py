@@ -0,0 +1,17 @@
+# servicios/config_entorno.py
+"""
+Lectura de la configuración numérica desde variables de entorno, compartida por los servicios.
+"""
+import os
+
+
+def entero_desde_entorno(nombre, por_defecto):
+    """Valor entero de la variable `nombre`; `por_defecto` si no está definida o no es un entero."""
+    valor = os.getenv(nombre)
+    if not valor:
+        return por_defecto
+    try:
+        return int(valor)
+    except ValueError:
+        print(f"[WARN] {nombre} inválido ({valor}), se usa {por_defecto}.")
+        return por_defecto
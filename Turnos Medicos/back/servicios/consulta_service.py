@@ -80,6 +80,32 @@ class ConsultaService:
             print(f"[ERROR DB] Fallo al obtener consultas: {e}")
             raise RuntimeError("Ocurrió un error técnico al consultar las consultas.")
 
+    def buscar_consultas(self, texto, pagina=1, por_pagina=20, marcas=("<b>", "</b>")):
+        """
+        Busca consultas por diagnóstico u observaciones (texto libre, por prefijo de palabra).
+        Retorna un diccionario con la página pedida:
+            {"total", "pagina", "por_pagina", "resultados": [{"consulta", "fragmento"}]}
+        donde `fragmento` es el texto coincidente con los términos resaltados entre `marcas`.
+        """
+        if not isinstance(pagina, int) or pagina < 1:
+            raise ValueError("La página debe ser un entero mayor o igual a 1.")
+        if not isinstance(por_pagina, int) or not (1 <= por_pagina <= 200):
+            raise ValueError("La cantidad por página debe estar entre 1 y 200.")
+
+        resultado = {"total": 0, "pagina": pagina, "por_pagina": por_pagina, "resultados": []}
+        if not isinstance(texto, str) or not texto.strip():
+            return resultado
+
+        try:
+            resultado["total"] = self.consulta_dao.contar_busqueda(texto)
+            encontrados = self.consulta_dao.buscar(texto, por_pagina, (pagina - 1) * por_pagina, marcas)
+        except Exception as e:
+            print(f"[ERROR DB] Fallo al buscar consultas: {e}")
+            raise RuntimeError("Ocurrió un error técnico al buscar consultas.")
+
+        resultado["resultados"] = [{"consulta": c, "fragmento": f} for c, f in encontrados]
+        return resultado
+
     def obtener_consulta_por_id(self, id_consulta):
         try:
             consulta = self.consulta_dao.obtener_por_id(id_consulta)
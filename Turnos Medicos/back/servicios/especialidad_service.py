@@ -8,8 +8,8 @@ class EspecialidadService:
     Coordina acceso a DAO y aplica reglas.
     """
 
-    def __init__(self):
-        self.especialidad_dao = EspecialidadDAO()
+    def __init__(self, conn=None):
+        self.especialidad_dao = EspecialidadDAO(conn)
 
     def agregar_especialidad(self, nombre: str, descripcion: str = None):
         """
@@ -0,0 +1,177 @@
+import os
+import csv
+import gzip
+import json
+import time
+import sqlite3
+import tempfile
+from datetime import datetime
+
+from persistencia.db_connection import DBConnection, transaccion_lectura
+from persistencia.persistencia_errores import DatabaseError
+from persistencia.dao.turno_dao import TurnoDAO
+from persistencia.dao.consulta_dao import ConsultaDAO
+from persistencia.dao.receta_dao import RecetaDAO
+from persistencia.dao.paciente_dao import PacienteDAO
+from persistencia.dao.medico_dao import MedicoDAO
+from persistencia.dao.especialidad_dao import EspecialidadDAO
+from persistencia.dao.agenda_dao import AgendaDAO
+from persistencia.dao.historial_clinico_dao import HistorialClinicoDAO
+from modelos.turno_batch import TurnoBatch
+
+class ExportacionService:
+    """
+    Exportación masiva de datos a CSV o JSON Lines (opcionalmente comprimidos con gzip).
+    Las filas se leen de la base en bloques y se escriben a medida que llegan, así que la
+    memoria usada no depende de la cantidad de filas. Usa una conexión de solo lectura
+    y una única transacción de lectura por exportación (foto consistente de la base).
+    """
+    FORMATOS = ("csv", "jsonl")
+
+    def __init__(self, conn=None, directorio=None):
+        self._conn = conn or DBConnection().conexion_lectura()
+        self.turno_dao = TurnoDAO(self._conn)
+        self.consulta_dao = ConsultaDAO(self._conn)
+        self.receta_dao = RecetaDAO(self._conn)
+        self._daos_por_tabla = {
+            dao.TABLAS[0]: dao for dao in (
+                self.turno_dao, self.consulta_dao, self.receta_dao,
+                PacienteDAO(self._conn), MedicoDAO(self._conn), EspecialidadDAO(self._conn),
+                AgendaDAO(self._conn), HistorialClinicoDAO(self._conn),
+            )
+        }
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+        self._directorio = directorio or os.path.join(root, "salidas", "exportaciones")
+
+    def tablas_exportables(self):
+        return sorted(self._daos_por_tabla)
+
+    def exportar_turnos(self, formato="csv", comprimir=False, ruta=None, nro_matricula_medico=None,
+                        id_especialidad=None, estado=None, fecha_inicio=None, fecha_fin=None):
+        """Exporta turnos con los filtros opcionales de médico, especialidad, estado y rango de fechas."""
+        if estado is not None and estado not in TurnoBatch.ESTADOS:
+            raise ValueError(f"Estado inválido. Debe ser uno de: {', '.join(TurnoBatch.ESTADOS)}.")
+        return self._exportar(
+            "turnos", formato, comprimir, ruta,
+            lambda: self.turno_dao.iterar_para_exportar(
+                nro_matricula_medico=nro_matricula_medico, id_especialidad=id_especialidad, estado=estado,
+                fecha_inicio=fecha_inicio, fecha_fin=fecha_fin
+            )
+        )
+
+    def exportar_consultas(self, formato="csv", comprimir=False, ruta=None, dni_paciente=None,
+                           nro_matricula_medico=None, fecha_inicio=None, fecha_fin=None):
+        """Exporta consultas filtradas opcionalmente por paciente, médico y rango de fechas."""
+        return self._exportar(
+            "consultas", formato, comprimir, ruta,
+            lambda: self.consulta_dao.iterar_para_exportar(
+                dni_paciente=dni_paciente, nro_matricula_medico=nro_matricula_medico,
+                fecha_inicio=fecha_inicio, fecha_fin=fecha_fin
+            )
+        )
+
+    def exportar_recetas(self, formato="csv", comprimir=False, ruta=None, dni_paciente=None,
+                         nro_matricula_medico=None, fecha_inicio=None, fecha_fin=None):
+        """Exporta recetas filtradas opcionalmente por paciente, médico de la consulta y fecha de emisión."""
+        return self._exportar(
+            "recetas", formato, comprimir, ruta,
+            lambda: self.receta_dao.iterar_para_exportar(
+                dni_paciente=dni_paciente, nro_matricula_medico=nro_matricula_medico,
+                fecha_inicio=fecha_inicio, fecha_fin=fecha_fin
+            )
+        )
+
+    def exportar_asistencias_por_intervalo(self, fecha_inicio, fecha_fin, intervalo="dia", desglose=None,
+                                           formato="csv", comprimir=False, ruta=None,
+                                           nro_matricula_medico=None, id_especialidad=None):
+        """
+        Exporta los conteos de atendidos, ausentes, cancelados y programados por día, semana o mes
+        (una fila por intervalo y, con `desglose`, por médico o especialidad).
+        """
+        if intervalo not in TurnoDAO.INTERVALOS:
+            raise ValueError(f"Intervalo inválido. Debe ser uno de: {', '.join(TurnoDAO.INTERVALOS)}.")
+        if desglose is not None and desglose not in TurnoDAO.DESGLOSES:
+            raise ValueError(f"Desglose inválido. Debe ser uno de: {', '.join(TurnoDAO.DESGLOSES)}.")
+        if not (fecha_inicio and fecha_fin):
+            raise ValueError("Debe indicar fecha de inicio y fin para esta exportación.")
+        return self._exportar(
+            f"asistencias_por_{intervalo}", formato, comprimir, ruta,
+            lambda: self.turno_dao.contar_asistencias_por_intervalo(
+                fecha_inicio, fecha_fin, intervalo, desglose,
+                nro_matricula_medico=nro_matricula_medico, id_especialidad=id_especialidad
+            )
+        )
+
+    def exportar_tabla(self, tabla, formato="csv", comprimir=False, ruta=None):
+        """Exporta una tabla completa (ver tablas_exportables)."""
+        dao = self._daos_por_tabla.get(tabla)
+        if dao is None:
+            raise ValueError(f"Tabla inválida. Debe ser una de: {', '.join(self.tablas_exportables())}.")
+        return self._exportar(tabla.lower(), formato, comprimir, ruta, dao.iterar_tabla)
+
+    def _exportar(self, nombre, formato, comprimir, ruta, consultar):
+        """
+        Ejecuta `consultar()` -> (columnas, filas) y escribe el resultado en `ruta`
+        (por defecto en salidas/exportaciones). Retorna un resumen con ruta, filas y segundos.
+        """
+        if formato not in self.FORMATOS:
+            raise ValueError(f"Formato inválido. Debe ser uno de: {', '.join(self.FORMATOS)}.")
+
+        if ruta is None:
+            os.makedirs(self._directorio, exist_ok=True)
+            marca = datetime.now().strftime("%Y%m%d_%H%M%S")
+            ruta = os.path.join(self._directorio, f"{nombre}_{marca}.{formato}" + (".gz" if comprimir else ""))
+        directorio = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(directorio, exist_ok=True)
+
+        inicio = time.perf_counter()
+        # Se escribe en un temporal y se renombra al final: nunca queda un archivo a medias
+        fd, temporal = tempfile.mkstemp(dir=directorio, suffix=".tmp")
+        os.close(fd)
+        try:
+            with transaccion_lectura(self._conn):
+                columnas, filas = consultar()
+                with self._abrir(temporal, comprimir) as f:
+                    if formato == "csv":
+                        cantidad = self._escribir_csv(f, columnas, filas)
+                    else:
+                        cantidad = self._escribir_jsonl(f, columnas, filas)
+            os.replace(temporal, ruta)
+        except (DatabaseError, sqlite3.Error) as e:
+            print(f"[ERROR DB] Fallo al exportar {nombre}: {e}")
+            raise RuntimeError(f"Ocurrió un error técnico al exportar {nombre}.")
+        except OSError as e:
+            print(f"[ERROR] Fallo al escribir la exportación de {nombre}: {e}")
+            raise RuntimeError(f"No se pudo escribir el archivo de exportación de {nombre}.")
+        finally:
+            # Ante cualquier error (también uno inesperado o una interrupción) no queda el temporal;
+            # si todo salió bien ya se renombró
+            if os.path.exists(temporal):
+                os.remove(temporal)
+
+        segundos = time.perf_counter() - inicio
+        print(f"[OK] Exportación generada: {ruta} ({cantidad} filas en {segundos:.2f} s)")
+        return {"ruta": ruta, "filas": cantidad, "segundos": segundos}
+
+    def _abrir(self, ruta, comprimir):
+        if comprimir:
+            return gzip.open(ruta, "wt", encoding="utf-8", newline="", compresslevel=6)
+        return open(ruta, "w", encoding="utf-8", newline="")
+
+    def _escribir_csv(self, f, columnas, filas):
+        writer = csv.writer(f)
+        writer.writerow(columnas)
+        cantidad = 0
+        for fila in filas:
+            writer.writerow(fila)
+            cantidad += 1
+        return cantidad
+
+    def _escribir_jsonl(self, f, columnas, filas):
+        codificar = json.JSONEncoder(ensure_ascii=False, default=str).encode
+        cantidad = 0
+        for fila in filas:
+            f.write(codificar(dict(zip(columnas, fila))))
+            f.write("\n")
+            cantidad += 1
+        return cantidad
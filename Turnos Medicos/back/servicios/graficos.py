@@ -0,0 +1,84 @@
+# servicios/graficos.py
+"""
+Render de los gráficos de los reportes a PNG (bytes).
+Usa la API orientada a objetos de matplotlib (Figure + FigureCanvasAgg) en lugar del
+estado global de pyplot, por lo que puede llamarse desde hilos en segundo plano.
+matplotlib se importa recién al renderizar el primer gráfico.
+"""
+import threading
+from io import BytesIO
+
+_Figure = None
+_FigureCanvasAgg = None
+_lock_import = threading.Lock()
+
+def _cargar_matplotlib():
+    """Importa matplotlib una sola vez (backend Agg, sin interfaz gráfica)."""
+    global _Figure, _FigureCanvasAgg
+    if _Figure is None:
+        with _lock_import:
+            if _Figure is None:
+                from matplotlib.backends.backend_agg import FigureCanvasAgg
+                from matplotlib.figure import Figure
+                _FigureCanvasAgg = FigureCanvasAgg
+                _Figure = Figure
+    return _Figure, _FigureCanvasAgg
+
+def _nueva_figura(tamanio, dpi):
+    Figure, FigureCanvasAgg = _cargar_matplotlib()
+    fig = Figure(figsize=tamanio, dpi=dpi)
+    FigureCanvasAgg(fig)
+    return fig
+
+def _a_png(fig):
+    img_buffer = BytesIO()
+    fig.savefig(img_buffer, format='png')
+    return img_buffer.getvalue()
+
+def renderizar_torta(valores, etiquetas, titulo, tamanio=(8, 8), colores=None, angulo_inicio=140, dpi=100):
+    """Gráfico de torta con porcentajes; retorna la imagen PNG en bytes."""
+    fig = _nueva_figura(tamanio, dpi)
+    ax = fig.add_subplot()
+    ax.pie(valores, labels=etiquetas, autopct='%1.1f%%', colors=colores, startangle=angulo_inicio)
+    ax.set_title(titulo)
+    ax.axis('equal')  # Igualar aspecto para que sea un círculo
+    return _a_png(fig)
+
+def renderizar_lineas(etiquetas, series, titulo, tamanio=(10, 5), colores=None, etiqueta_y="Turnos", dpi=100):
+    """
+    Gráfico de líneas: `etiquetas` son los valores del eje X (por ejemplo, los períodos) y
+    `series` una lista de [nombre, valores] con un valor por etiqueta. Retorna la imagen PNG en bytes.
+    """
+    fig = _nueva_figura(tamanio, dpi)
+    ax = fig.add_subplot()
+    posiciones = range(len(etiquetas))
+    for i, (nombre, valores) in enumerate(series):
+        color = colores[i] if colores and i < len(colores) else None
+        ax.plot(posiciones, valores, marker='o', markersize=3, label=nombre, color=color)
+    # Con muchos períodos se muestra solo una parte de las etiquetas para que no se superpongan
+    paso = max(1, len(etiquetas) // 12)
+    ax.set_xticks(list(posiciones)[::paso])
+    ax.set_xticklabels(etiquetas[::paso], rotation=45, ha='right', fontsize=8)
+    ax.set_ylabel(etiqueta_y)
+    ax.set_title(titulo)
+    ax.grid(True, alpha=0.3)
+    if series:
+        ax.legend(fontsize=8)
+    fig.tight_layout()
+    return _a_png(fig)
+
+_RENDERS = {
+    "torta": renderizar_torta,
+    "lineas": renderizar_lineas,
+}
+
+def renderizar_grafico(spec):
+    """
+    Renderiza un gráfico descripto por un dict: 'tipo' (por defecto 'torta') y los
+    argumentos de la función de render. Es el punto de entrada del pool de procesos.
+    """
+    spec = dict(spec)
+    tipo = spec.pop("tipo", "torta")
+    if tipo not in _RENDERS:
+        raise ValueError(f"Tipo de gráfico desconocido: {tipo}")
+    return _RENDERS[tipo](**spec)
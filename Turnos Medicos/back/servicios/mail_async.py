@@ -0,0 +1,313 @@
+# servicios/mail_async.py
+"""
+Envío de mails con asyncio: muchos envíos HTTP (SendGrid) y SMTP en curso a la vez desde un
+solo hilo, en lugar de un hilo bloqueado por cada mail que espera la red.
+
+- EnviadorAsync.enviar hace lo mismo que MailService.enviar_mensaje_detallado (SendGrid, SMTP
+  de respaldo, circuit breakers y reintentos de mail_resiliencia.py, spool) y retorna el mismo
+  dict. Un semáforo limita los envíos en curso y cada proveedor tiene un límite de envíos por
+  segundo (LimiteTasa), así una tanda de miles de recordatorios no supera la cuota del proveedor.
+- SendGrid usa aiohttp si está instalado (AIOHTTP_AVAILABLE); si no, cada envío corre con
+  asyncio.to_thread sobre el transporte sincrónico de MailService (sesión HTTP compartida): se
+  mantienen la concurrencia y los límites, pero cada envío en curso ocupa un hilo. SMTP va
+  siempre por asyncio.to_thread sobre MailService._enviar_smtp, así usa el pool de conexiones
+  (smtp_pool.py) con su configuración y su modo TLS 'auto', igual que sin MAIL_ASYNC.
+- Fachada sincrónica: enviar(...) y enviar_varios(...) ejecutan en un bucle asyncio propio que
+  corre en un hilo aparte (compartido por todos los llamadores), con un tiempo máximo de espera:
+  lo que no terminó a tiempo se cancela y se informa como no enviado (un envío que ya estaba en
+  un hilo no se puede cortar y puede llegar igual; el outbox lo reintenta). MailService.enviar_mensaje_detallado
+  la usa cuando MAIL_ASYNC está activado, así enviar_turno / enviar_mensaje y sus llamadores no
+  cambian; los workers de mail_outbox.py mandan con enviar_varios todo lo que reclaman.
+
+Configuración (variables de entorno; MAIL_ASYNC también en mail_config):
+    MAIL_ASYNC                 1 / true para enviar por este módulo (desactivado)
+    MAIL_ASYNC_CONCURRENCIA    envíos en curso como máximo (100)
+    MAIL_LIMITE_SENDGRID       envíos por segundo a SendGrid, 0 = sin límite (100)
+    MAIL_LIMITE_SMTP           envíos por segundo al servidor SMTP, 0 = sin límite (10)
+    MAIL_ASYNC_TIMEOUT         segundos que la fachada espera cada llamada (300)
+"""
+import time
+import atexit
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TimeoutFuturo
+
+try:
+    import aiohttp
+
+    AIOHTTP_AVAILABLE = True
+except Exception:
+    AIOHTTP_AVAILABLE = False
+
+import mail_service
+from config_entorno import entero_desde_entorno
+from mail_resiliencia import enviar_con_respaldo_async
+
+TIMEOUT_POR_DEFECTO_SEGUNDOS = 300
+# Margen de la fachada sobre el tiempo máximo de enviar_varios, que corta y responde por su cuenta
+MARGEN_TIMEOUT_SEGUNDOS = 5
+
+
+def activado(mail_config=None):
+    """True si MAIL_ASYNC está activado (en mail_config o en el entorno)."""
+    valor = mail_service.MailService._valor_config(mail_config, 'MAIL_ASYNC')
+    return str(valor or '').lower() in ('1', 'true', 'yes')
+
+
+class LimiteTasa:
+    """Balde de fichas: como mucho `por_segundo` envíos por segundo, con ráfagas de hasta `rafaga`."""
+
+    def __init__(self, por_segundo, rafaga=None):
+        self.por_segundo = por_segundo
+        self.rafaga = rafaga or max(1, por_segundo)
+        self._fichas = float(self.rafaga)
+        self._ultimo = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.esperas = 0
+
+    async def adquirir(self):
+        if not self.por_segundo:
+            return
+        async with self._lock:
+            while True:
+                ahora = time.monotonic()
+                self._fichas = min(self.rafaga, self._fichas + (ahora - self._ultimo) * self.por_segundo)
+                self._ultimo = ahora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                self.esperas += 1
+                await asyncio.sleep((1 - self._fichas) / self.por_segundo)
+
+
+class EnviadorAsync:
+    def __init__(self, concurrencia=None, limites=None):
+        self.concurrencia = concurrencia or entero_desde_entorno("MAIL_ASYNC_CONCURRENCIA", 100)
+        if self.concurrencia < 1:
+            raise ValueError("La concurrencia de envío debe ser mayor o igual a 1.")
+        limites = limites or {"sendgrid": entero_desde_entorno("MAIL_LIMITE_SENDGRID", 100),
+                              "smtp": entero_desde_entorno("MAIL_LIMITE_SMTP", 10)}
+        self.limites = {nombre: LimiteTasa(por_segundo) for nombre, por_segundo in limites.items()}
+        self._semaforo = asyncio.Semaphore(self.concurrencia)
+        self._sesiones = {}
+        self.en_curso = 0
+        self.max_en_curso = 0
+
+    async def enviar(self, to_email, subject, cuerpo, mail_config=None, prefijo_archivo='mail', referencia='',
+                     cuerpo_html=None, persistir_diferido=True):
+        """Como MailService.enviar_mensaje_detallado (mismos transportes, respaldos y resultado)."""
+        MailService = mail_service.MailService
+        if not to_email:
+            return {"enviado": False, "transporte": None, "error": "Dirección de mail destino vacía.",
+                    "diferido": False, "reintentar_en": None}
+
+        transportes = []
+        if MailService._valor_config(mail_config, 'SENDGRID_API_KEY'):
+            transportes.append(('sendgrid', lambda: self._enviar_sendgrid(to_email, subject, cuerpo, mail_config,
+                                                                          cuerpo_html)))
+        smtp = MailService._config_smtp(mail_config)
+        if smtp:
+            transportes.append(('smtp', lambda: self._enviar_smtp(to_email, subject, cuerpo, *smtp, cuerpo_html)))
+        if not transportes:
+            return MailService._simular(to_email, subject, cuerpo, prefijo_archivo, referencia, cuerpo_html)
+
+        async with self._semaforo:
+            self.en_curso += 1
+            self.max_en_curso = max(self.max_en_curso, self.en_curso)
+            try:
+                resultado = await enviar_con_respaldo_async(transportes)
+            finally:
+                self.en_curso -= 1
+        if not resultado["enviado"]:
+            MailService._diferir(to_email, subject, cuerpo, prefijo_archivo, referencia, cuerpo_html, resultado["error"],
+                                 persistir_diferido)
+        return resultado
+
+    async def enviar_varios(self, mensajes, mail_config=None, timeout=None):
+        """
+        Envía a la vez los `mensajes` (dicts con los argumentos de enviar: to_email, subject,
+        cuerpo y, opcionales, prefijo_archivo, referencia, cuerpo_html, persistir_diferido).
+        Los que no terminan en `timeout` segundos (sin límite si es None) se cancelan y se
+        informan como no enviados. Retorna un resultado por mensaje, en el mismo orden.
+        """
+        tareas = [asyncio.ensure_future(self.enviar(mail_config=mail_config, **m)) for m in mensajes]
+        if not tareas:
+            return []
+        _, pendientes = await asyncio.wait(tareas, timeout=timeout)
+        for tarea in pendientes:
+            tarea.cancel()
+        await asyncio.gather(*pendientes, return_exceptions=True)
+
+        resultados = []
+        for mensaje, tarea in zip(mensajes, tareas):
+            if tarea.cancelled():
+                resultados.append(_resultado_vencido(mensaje, mail_config, timeout))
+            elif tarea.exception() is not None:
+                resultados.append(_resultado_error(str(tarea.exception())))
+            else:
+                resultados.append(tarea.result())
+        return resultados
+
+    async def _enviar_sendgrid(self, to_email, subject, cuerpo, mail_config, cuerpo_html):
+        MailService = mail_service.MailService
+        await self.limites["sendgrid"].adquirir()
+        if not AIOHTTP_AVAILABLE:
+            return await asyncio.to_thread(MailService._enviar_sendgrid, to_email, subject, cuerpo, mail_config,
+                                           cuerpo_html)
+
+        cliente, payload, allow_unsuppress = MailService._preparar_sendgrid(to_email, subject, cuerpo, mail_config,
+                                                                            cuerpo_html)
+        # Con la lista de supresiones en memoria no se bloquea el bucle; si hay que consultar la API, en un hilo
+        suprimida = cliente.supresiones.tipos_en_memoria(to_email)
+        if suprimida is None or (suprimida and allow_unsuppress):
+            await asyncio.to_thread(MailService._comprobar_supresion, cliente, to_email, allow_unsuppress)
+        else:
+            MailService._comprobar_supresion(cliente, to_email, allow_unsuppress, suprimida)
+
+        try:
+            async with self._sesion_http(cliente).post(f"{cliente.api_url}/v3/mail/send", json=payload) as resp:
+                texto = await resp.text()
+                estado, encabezados = resp.status, resp.headers
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise MailService._error_red_sendgrid(e)
+        return MailService._resultado_sendgrid(to_email, estado, texto, encabezados)
+
+    def _sesion_http(self, cliente):
+        """Sesión aiohttp (keep-alive) por cliente de SendGrid; se crea dentro del bucle."""
+        clave = (cliente.api_url, cliente.sesion.headers.get("Authorization"))
+        sesion = self._sesiones.get(clave)
+        if sesion is None or sesion.closed:
+            sesion = aiohttp.ClientSession(
+                headers={"Authorization": clave[1], "Content-Type": "application/json"},
+                timeout=aiohttp.ClientTimeout(total=cliente.timeout),
+                connector=aiohttp.TCPConnector(limit=self.concurrencia))
+            self._sesiones[clave] = sesion
+        return sesion
+
+    async def _enviar_smtp(self, to_email, subject, cuerpo, smtp_host, smtp_port, smtp_user, smtp_pass, from_email,
+                           smtp_tls, cuerpo_html):
+        # En un hilo sobre el transporte sincrónico: comparte el pool SMTP (y su modo TLS) con MailService
+        MailService = mail_service.MailService
+        await self.limites["smtp"].adquirir()
+        return await asyncio.to_thread(MailService._enviar_smtp, to_email, subject, cuerpo, smtp_host, smtp_port,
+                                       smtp_user, smtp_pass, from_email, smtp_tls, cuerpo_html)
+
+    async def cerrar(self):
+        for sesion in self._sesiones.values():
+            await sesion.close()
+        self._sesiones.clear()
+
+    def estadisticas(self):
+        return {"aiohttp": AIOHTTP_AVAILABLE,
+                "concurrencia": self.concurrencia, "en_curso": self.en_curso, "max_en_curso": self.max_en_curso,
+                "esperas_por_limite": {nombre: limite.esperas for nombre, limite in self.limites.items()}}
+
+
+def _resultado_error(error):
+    return {"enviado": False, "transporte": None, "error": error, "diferido": False, "reintentar_en": None}
+
+
+def _resultado_vencido(mensaje, mail_config, timeout):
+    """Resultado de un envío cancelado por tiempo; se registra como cualquier mail no enviado."""
+    error = f"El envío no terminó en {timeout} s y se canceló."
+    mail_service.MailService._diferir(mensaje["to_email"], mensaje["subject"], mensaje["cuerpo"],
+                                      mensaje.get("prefijo_archivo", "mail"), mensaje.get("referencia", ""),
+                                      mensaje.get("cuerpo_html"), error, mensaje.get("persistir_diferido", True))
+    return _resultado_error(error)
+
+
+def _timeout(timeout):
+    return timeout if timeout is not None else entero_desde_entorno("MAIL_ASYNC_TIMEOUT", TIMEOUT_POR_DEFECTO_SEGUNDOS)
+
+
+# Fachada sincrónica: un bucle asyncio en un hilo propio, compartido por todos los envíos
+_lock = threading.Lock()
+_bucle = None
+_hilo = None
+_enviador = None
+
+
+def _iniciar():
+    global _bucle, _hilo, _enviador
+    with _lock:
+        if _bucle is None:
+            enviador = EnviadorAsync()
+            bucle = asyncio.new_event_loop()
+            # Hilos para los transportes sincrónicos (SMTP, SendGrid sin aiohttp) y las consultas de supresión
+            bucle.set_default_executor(ThreadPoolExecutor(max_workers=enviador.concurrencia,
+                                                          thread_name_prefix="mail-async"))
+            hilo = threading.Thread(target=bucle.run_forever, name="mail-async", daemon=True)
+            hilo.start()
+            _bucle, _hilo, _enviador = bucle, hilo, enviador
+        return _bucle, _enviador
+
+
+def _ejecutar(crear_corutina, timeout):
+    """
+    Corre la corutina en el bucle compartido y espera su resultado hasta `timeout` segundos;
+    si vence, la cancela y lanza TimeoutError.
+    """
+    bucle, enviador = _iniciar()
+    if threading.current_thread() is _hilo:
+        raise RuntimeError("La fachada sincrónica de mail_async no se puede usar desde su propio bucle.")
+    futuro = asyncio.run_coroutine_threadsafe(crear_corutina(enviador), bucle)
+    try:
+        return futuro.result(timeout)
+    except TimeoutFuturo:
+        futuro.cancel()
+        raise TimeoutError(f"El envío no terminó en {timeout} s y se canceló.")
+
+
+def enviar(to_email, subject, cuerpo, mail_config=None, prefijo_archivo='mail', referencia='', cuerpo_html=None,
+           persistir_diferido=True, timeout=None):
+    """
+    EnviadorAsync.enviar desde código sincrónico: bloquea hasta que termina ese envío o hasta
+    `timeout` segundos (MAIL_ASYNC_TIMEOUT); vencido, el envío se cancela y se informa como no enviado.
+    """
+    mensaje = {"to_email": to_email, "subject": subject, "cuerpo": cuerpo, "prefijo_archivo": prefijo_archivo,
+               "referencia": referencia, "cuerpo_html": cuerpo_html, "persistir_diferido": persistir_diferido}
+    timeout = _timeout(timeout)
+    try:
+        return _ejecutar(lambda enviador: enviador.enviar(mail_config=mail_config, **mensaje), timeout)
+    except TimeoutError:
+        return _resultado_vencido(mensaje, mail_config, timeout)
+
+
+def enviar_varios(mensajes, mail_config=None, timeout=None):
+    """
+    EnviadorAsync.enviar_varios desde código sincrónico: todos los mensajes a la vez, con
+    `timeout` segundos (MAIL_ASYNC_TIMEOUT) como máximo para la tanda.
+    """
+    timeout = _timeout(timeout)
+    try:
+        return _ejecutar(lambda enviador: enviador.enviar_varios(mensajes, mail_config, timeout),
+                         timeout + MARGEN_TIMEOUT_SEGUNDOS)
+    except TimeoutError:
+        # El bucle no respondió ni siquiera para cortar la tanda: nada se da por enviado
+        return [_resultado_vencido(mensaje, mail_config, timeout) for mensaje in mensajes]
+
+
+def estadisticas():
+    with _lock:
+        enviador = _enviador
+    return enviador.estadisticas() if enviador else {"aiohttp": AIOHTTP_AVAILABLE}
+
+
+def cerrar():
+    """Cierra las sesiones HTTP y detiene el bucle (se vuelve a crear si se envía de nuevo)."""
+    global _bucle, _hilo, _enviador
+    with _lock:
+        bucle, hilo, enviador = _bucle, _hilo, _enviador
+        _bucle = _hilo = _enviador = None
+    if bucle is None:
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(enviador.cerrar(), bucle).result(5)
+    except Exception as e:
+        print(f"[MailService WARN] No se pudieron cerrar las sesiones de envío: {e}")
+    bucle.call_soon_threadsafe(bucle.stop)
+    hilo.join(5)
+    bucle.close()
+
+
+atexit.register(cerrar)
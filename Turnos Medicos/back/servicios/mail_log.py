@@ -0,0 +1,177 @@
+# servicios/mail_log.py
+"""
+Registro de los envíos de mail y spool de los mails simulados.
+
+- registrar_exito / registrar_error escriben en salidas/emails/mail_success.log y
+  mail_errors.log (mismo formato que antes: "[fecha] mensaje"). El que envía solo pone el
+  registro en una cola (logging.handlers.QueueHandler); un único hilo (QueueListener) lo
+  escribe en archivos que quedan abiertos y rotan por tamaño (RotatingFileHandler), en lugar
+  de crear la carpeta y abrir/cerrar el archivo en cada mail.
+- SpoolSimulacion reemplaza el archivo .txt por mail simulado: cada mail es una línea JSON
+  agregada a salidas/emails/simulados.jsonl (también rota por tamaño). También quedan ahí,
+  como 'diferido', los mails que ningún proveedor pudo enviar (ver mail_resiliencia.py).
+
+Configuración (variables de entorno):
+    MAIL_LOG_MAX_BYTES   tamaño a partir del cual se rota cada archivo (5 MB)
+    MAIL_LOG_BACKUPS     cantidad de archivos rotados que se conservan (5)
+"""
+import os
+import json
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from datetime import datetime
+
+from config_entorno import entero_desde_entorno
+
+DIRECTORIO_EMAILS = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'salidas', 'emails'))
+
+
+class _SoloHasta(logging.Filter):
+    """Deja pasar los registros de nivel menor a `nivel` (los éxitos no van al log de errores)."""
+
+    def __init__(self, nivel):
+        super().__init__()
+        self.nivel = nivel
+
+    def filter(self, registro):
+        return registro.levelno < self.nivel
+
+
+_logger = logging.getLogger("turnos.mail")
+_logger.propagate = False
+_lock = threading.Lock()
+_listener = None
+
+
+def iniciar_log(directorio=None):
+    """Configura los archivos de log y arranca el hilo que los escribe (se llama solo al primer uso)."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        directorio = directorio or DIRECTORIO_EMAILS
+        os.makedirs(directorio, exist_ok=True)
+        max_bytes = entero_desde_entorno("MAIL_LOG_MAX_BYTES", 5 * 1024 * 1024)
+        backups = entero_desde_entorno("MAIL_LOG_BACKUPS", 5)
+        formato = logging.Formatter("[%(asctime)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+
+        exitos = logging.handlers.RotatingFileHandler(os.path.join(directorio, "mail_success.log"),
+                                                      maxBytes=max_bytes, backupCount=backups,
+                                                      encoding="utf-8", delay=True)
+        exitos.addFilter(_SoloHasta(logging.WARNING))
+        errores = logging.handlers.RotatingFileHandler(os.path.join(directorio, "mail_errors.log"),
+                                                       maxBytes=max_bytes, backupCount=backups,
+                                                       encoding="utf-8", delay=True)
+        errores.setLevel(logging.WARNING)
+        for handler in (exitos, errores):
+            handler.setFormatter(formato)
+
+        cola = queue.SimpleQueue()
+        _logger.handlers = [logging.handlers.QueueHandler(cola)]
+        _logger.setLevel(logging.INFO)
+        _listener = logging.handlers.QueueListener(cola, exitos, errores, respect_handler_level=True)
+        _listener.start()
+
+
+def detener_log():
+    """Escribe lo que quedó en la cola y cierra los archivos."""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _logger.handlers = []
+        _listener = None
+
+
+atexit.register(detener_log)
+
+
+def registrar_exito(mensaje):
+    if _listener is None:
+        iniciar_log()
+    _logger.info(mensaje)
+
+
+def registrar_error(mensaje):
+    if _listener is None:
+        iniciar_log()
+    _logger.error(mensaje)
+
+
+class SpoolSimulacion:
+    """
+    Archivo JSON Lines, solo de agregado, con los mails simulados (sin proveedor configurado).
+    El archivo queda abierto entre escrituras; al superar `max_bytes` se rota como los logs
+    (simulados.jsonl.1, .2, ...). A diferencia del log, la escritura es sincrónica: si falla,
+    el envío simulado se informa como fallido.
+    """
+
+    def __init__(self, ruta=None, max_bytes=None, backups=None):
+        self.ruta = ruta or os.path.join(DIRECTORIO_EMAILS, "simulados.jsonl")
+        self.max_bytes = max_bytes if max_bytes is not None else entero_desde_entorno("MAIL_LOG_MAX_BYTES", 5 * 1024 * 1024)
+        self.backups = backups if backups is not None else entero_desde_entorno("MAIL_LOG_BACKUPS", 5)
+        self._archivo = None
+        self._lock = threading.Lock()
+
+    def escribir(self, to_email, subject, cuerpo, tipo="mail", referencia="", estado="simulado", cuerpo_html=None):
+        """`estado`: 'simulado' (no hay proveedor configurado) o 'diferido' (ningún proveedor lo aceptó)."""
+        registro = {"fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "tipo": tipo, "estado": estado,
+                    "referencia": referencia, "to": to_email, "subject": subject, "cuerpo": cuerpo}
+        if cuerpo_html:
+            registro["cuerpo_html"] = cuerpo_html
+        linea = json.dumps(registro, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._archivo is None:
+                os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+                self._archivo = open(self.ruta, "a", encoding="utf-8")
+            self._archivo.write(linea)
+            self._archivo.flush()
+            if self.max_bytes and self._archivo.tell() >= self.max_bytes:
+                self._rotar()
+
+    def leer(self):
+        """Registros del archivo actual (para pruebas y revisión)."""
+        with self._lock:
+            if self._archivo is not None:
+                self._archivo.flush()
+        if not os.path.exists(self.ruta):
+            return []
+        with open(self.ruta, encoding="utf-8") as f:
+            return [json.loads(linea) for linea in f if linea.strip()]
+
+    def _rotar(self):
+        self._archivo.close()
+        self._archivo = None
+        if self.backups <= 0:
+            os.remove(self.ruta)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            origen = f"{self.ruta}.{i}"
+            if os.path.exists(origen):
+                os.replace(origen, f"{self.ruta}.{i + 1}")
+        os.replace(self.ruta, f"{self.ruta}.1")
+
+    def cerrar(self):
+        with self._lock:
+            if self._archivo is not None:
+                self._archivo.close()
+                self._archivo = None
+
+
+_spool = None
+
+
+def obtener_spool():
+    """Spool compartido por todos los envíos simulados."""
+    global _spool
+    with _lock:
+        if _spool is None:
+            _spool = SpoolSimulacion()
+            atexit.register(_spool.cerrar)
+        return _spool
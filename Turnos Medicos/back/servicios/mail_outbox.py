@@ -0,0 +1,276 @@
+# servicios/mail_outbox.py
+"""
+Envío de mails en segundo plano a partir de la tabla MailOutbox.
+Las operaciones que generan un mail (por ej. programar un turno) solo lo encolan, en la
+misma transacción que la operación, y la respuesta al usuario no depende del proveedor de
+mail. Los workers de DespachadorMails reclaman los pendientes, los envían con MailService
+y registran el resultado: 'enviado', o un reintento con espera exponencial, o 'muerto'
+(dead letter) cuando se agotan los intentos. Un mail reclamado cuyo resultado no se llega a
+registrar (el worker se colgó, o falló la base al marcarlo) se vuelve a reclamar cuando vence
+el plazo del reclamo (MailOutboxDAO.PLAZO_ENVIO).
+
+Para avisos masivos (por ej. recordatorios) `enviar_en_lote` reclama muchos mails de un tipo
+y los manda con MailService.enviar_lote, que agrupa hasta 1000 destinatarios por pedido.
+
+Con MAIL_ASYNC activado, cada worker manda a la vez todos los mails que reclama, con
+mail_async.enviar_varios (concurrencia y límites por proveedor de mail_async.py).
+"""
+import threading
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+
+from persistencia.db_connection import DBConnection
+from persistencia.dao.mail_outbox_dao import MailOutboxDAO
+from persistencia.persistencia_errores import DatabaseError
+import mail_async
+from config_entorno import entero_desde_entorno
+from mail_service import MailService
+from mail_resiliencia import estadisticas as estadisticas_transportes
+
+MAX_INTENTOS_POR_DEFECTO = 5
+ESPERA_BASE_SEGUNDOS = 30
+ESPERA_MAXIMA_SEGUNDOS = 3600
+# Espera mínima de un mail diferido por circuitos abiertos (las fechas se guardan con precisión
+# de segundos: una espera menor haría que la misma pasada lo vuelva a reclamar)
+ESPERA_MINIMA_DIFERIDO_SEGUNDOS = 5
+
+# Se activa al encolar un mail para que los workers no esperen al próximo sondeo
+_hay_mails = threading.Event()
+
+
+def avisar_nuevo_mail():
+    """Despierta a los workers (llamar después de confirmar la transacción que encoló el mail)."""
+    _hay_mails.set()
+
+
+class DespachadorMails:
+    """
+    Hilos que vacían MailOutbox. Cada worker usa su propia conexión a la base, abierta mientras
+    el worker corre.
+    `enviar(mensaje) -> bool` permite reemplazar el transporte (por defecto MailService, que
+    devuelve el resultado detallado de enviar_mensaje_detallado), y
+    `enviar_lote(mensajes) -> {id_mail: (error, definitivo)}` el de los envíos en lote (solo
+    se devuelven los que fallaron; `definitivo` indica que no tiene sentido reintentar).
+    """
+
+    def __init__(self, workers=None, max_intentos=None, intervalo=2.0, lote=10, enviar=None, mail_config=None,
+                 enviar_lote=None):
+        self.workers = workers if workers is not None else entero_desde_entorno("MAIL_WORKERS", 2)
+        self.max_intentos = max_intentos if max_intentos is not None else \
+            entero_desde_entorno("MAIL_MAX_INTENTOS", MAX_INTENTOS_POR_DEFECTO)
+        if self.workers < 1 or self.max_intentos < 1:
+            raise ValueError("La cantidad de workers y de intentos debe ser mayor o igual a 1.")
+        self.intervalo = intervalo
+        self.lote = lote
+        self._enviar = enviar or self._enviar_con_mail_service
+        self._enviar_lote = enviar_lote or self._enviar_lote_con_mail_service
+        self._mail_config = mail_config
+        self._detener = threading.Event()
+        self._hilos = []
+        self._lock = threading.Lock()
+        self._contadores = {"enviados": 0, "reintentos": 0, "muertos": 0, "diferidos": 0}
+
+    def iniciar(self):
+        """Libera los mails que quedaron a medio enviar (con el reclamo vencido) y arranca los workers."""
+        if self._hilos:
+            return
+        try:
+            with closing(DBConnection().nueva_conexion()) as conn:
+                liberados = MailOutboxDAO(conn).liberar_en_envio()
+            if liberados:
+                print(f"[WARN] {liberados} mails quedaron en envío con el reclamo vencido; se reintentan.")
+        except DatabaseError as e:
+            print(f"[ERROR DB] No se pudieron liberar los mails en envío: {e}")
+        self._detener.clear()
+        for i in range(self.workers):
+            hilo = threading.Thread(target=self._trabajar, name=f"mail-outbox-{i + 1}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def detener(self, timeout=5.0):
+        """Pide a los workers que terminen (después del mail en curso) y los espera."""
+        self._detener.set()
+        _hay_mails.set()
+        for hilo in self._hilos:
+            hilo.join(timeout)
+        self._hilos = []
+
+    def estadisticas(self):
+        """Contadores del despachador y, en "transportes", los de mail_resiliencia (circuitos)."""
+        with self._lock:
+            contadores = dict(self._contadores)
+        contadores["transportes"] = estadisticas_transportes()
+        return contadores
+
+    def procesar_pendientes(self, dao=None):
+        """
+        Envía los mails pendientes vencidos hasta vaciar la cola (una pasada, sin hilos).
+        Sin `dao` se usa una conexión propia que se cierra al terminar.
+        Retorna la cantidad de mails procesados.
+        """
+        procesados = 0
+        with self._dao_o_propio(dao) as dao:
+            while not self._detener.is_set():
+                mensajes = dao.reclamar_pendientes(self.lote)
+                if not mensajes:
+                    break
+                resultados = self._enviar_varios(mensajes) or [None] * len(mensajes)
+                for mensaje, resultado in zip(mensajes, resultados):
+                    self._procesar(dao, mensaje, resultado)
+                    procesados += 1
+        return procesados
+
+    @contextmanager
+    def _dao_o_propio(self, dao):
+        """`dao` si viene; si no, un MailOutboxDAO sobre una conexión nueva que se cierra al salir."""
+        if dao is not None:
+            yield dao
+            return
+        with closing(DBConnection().nueva_conexion()) as conn:
+            yield MailOutboxDAO(conn)
+
+    def _trabajar(self):
+        conn = DBConnection().nueva_conexion()
+        dao = MailOutboxDAO(conn)
+        try:
+            while not self._detener.is_set():
+                try:
+                    self.procesar_pendientes(dao)
+                except DatabaseError as e:
+                    print(f"[ERROR DB] Fallo el worker de mails: {e}")
+                _hay_mails.wait(self.intervalo)
+                _hay_mails.clear()
+        finally:
+            conn.close()
+
+    def enviar_en_lote(self, tipo=None, tamanio=None, dao=None):
+        """
+        Envía en lotes los mails pendientes vencidos (de `tipo`, si se indica) hasta vaciar la
+        cola, de a `tamanio` por vez (por defecto el máximo de destinatarios por pedido).
+        Sin `dao` se usa una conexión propia que se cierra al terminar.
+        Retorna {"procesados", "enviados", "fallidos"}.
+        """
+        tamanio = min(tamanio or MailService.MAX_DESTINATARIOS_POR_PEDIDO, MailService.MAX_DESTINATARIOS_POR_PEDIDO)
+        resumen = {"procesados": 0, "enviados": 0, "fallidos": 0}
+        with self._dao_o_propio(dao) as dao:
+            while not self._detener.is_set():
+                mensajes = dao.reclamar_pendientes(tamanio, tipo=tipo)
+                if not mensajes:
+                    break
+                try:
+                    fallidos = self._enviar_lote(mensajes)
+                except Exception as e:
+                    fallidos = {mensaje.id_mail: (str(e), False) for mensaje in mensajes}
+                for mensaje in mensajes:
+                    error, definitivo = fallidos.get(mensaje.id_mail, (None, False))
+                    self._registrar(dao, mensaje, error is None, error, definitivo)
+                    resumen["procesados"] += 1
+                    resumen["enviados" if error is None else "fallidos"] += 1
+        return resumen
+
+    def _procesar(self, dao, mensaje, resultado=None):
+        """Registra el envío de `mensaje`; si no viene su `resultado` (ya enviado), lo envía."""
+        reintentar_en = None
+        try:
+            if resultado is None:
+                resultado = self._enviar(mensaje)
+            if isinstance(resultado, dict):
+                # Resultado detallado de MailService: puede venir diferido por los circuitos abiertos
+                enviado, error = resultado["enviado"], resultado.get("error")
+                if resultado.get("diferido"):
+                    reintentar_en = max(resultado.get("reintentar_en") or 0, ESPERA_MINIMA_DIFERIDO_SEGUNDOS)
+            else:
+                enviado, error = bool(resultado), None
+            if not enviado and not error:
+                error = "El proveedor de mail no aceptó el envío."
+        except Exception as e:
+            enviado, error = False, str(e)
+        self._registrar(dao, mensaje, enviado, error, reintentar_en=reintentar_en)
+
+    def _registrar(self, dao, mensaje, enviado, error, definitivo=False, reintentar_en=None):
+        if enviado:
+            dao.marcar_enviado(mensaje.id_mail)
+            self._contar("enviados")
+        elif reintentar_en is not None:
+            # Los proveedores tienen el circuito abierto: se espera a que se cierre sin gastar un intento
+            dao.reprogramar(mensaje.id_mail, datetime.now() + timedelta(seconds=reintentar_en), error,
+                            devolver_intento=True)
+            self._contar("diferidos")
+        elif definitivo or mensaje.intentos >= self.max_intentos:
+            print(f"[ERROR Mail] Mail {mensaje.id_mail} a {mensaje.destinatario} descartado tras "
+                  f"{mensaje.intentos} intentos: {error}")
+            dao.marcar_muerto(mensaje.id_mail, error)
+            self._contar("muertos")
+        else:
+            espera = min(ESPERA_BASE_SEGUNDOS * 2 ** (mensaje.intentos - 1), ESPERA_MAXIMA_SEGUNDOS)
+            dao.reprogramar(mensaje.id_mail, datetime.now() + timedelta(seconds=espera), error)
+            self._contar("reintentos")
+
+    def _contar(self, nombre):
+        with self._lock:
+            self._contadores[nombre] += 1
+
+    def _enviar_con_mail_service(self, mensaje):
+        config = self._mail_config or MailService.configuracion_desde_entorno()
+        return MailService.enviar_mensaje_detallado(mensaje.destinatario, mensaje.asunto, mensaje.cuerpo, config,
+                                          prefijo_archivo=f"mail_{mensaje.tipo}", referencia=mensaje.id_turno or mensaje.id_mail,
+                                          cuerpo_html=mensaje.cuerpo_html, persistir_diferido=False)
+
+    def _enviar_varios(self, mensajes):
+        """
+        Con MAIL_ASYNC y el envío por defecto, manda todos los `mensajes` a la vez por
+        mail_async y retorna sus resultados (en el mismo orden). Si no, retorna None y cada
+        mensaje se envía con self._enviar.
+        """
+        config = self._mail_config or MailService.configuracion_desde_entorno()
+        if self._enviar != self._enviar_con_mail_service or not mail_async.activado(config):
+            return None
+        return mail_async.enviar_varios([
+            {"to_email": m.destinatario, "subject": m.asunto, "cuerpo": m.cuerpo, "prefijo_archivo": f"mail_{m.tipo}",
+             "referencia": m.id_turno or m.id_mail, "cuerpo_html": m.cuerpo_html, "persistir_diferido": False}
+            for m in mensajes], config)
+
+    def _enviar_lote_con_mail_service(self, mensajes):
+        """
+        Cada mail ya tiene su asunto y cuerpo armados: se pasan como sustituciones de un
+        contenido '%asunto%' / '%cuerpo%', así entran todos en un mismo pedido a SendGrid
+        (enviar_en_lote reclama como mucho MAX_DESTINATARIOS_POR_PEDIDO, y un pedido se acepta
+        o se rechaza entero). El HTML va como '%cuerpo_html%' si todos los mails del lote lo
+        tienen; si no, el lote sale solo en texto. Sin SendGrid se envían uno por uno (o todos a
+        la vez con MAIL_ASYNC).
+        """
+        config = self._mail_config or MailService.configuracion_desde_entorno()
+        if not MailService._valor_config(config, 'SENDGRID_API_KEY'):
+            fallidos = {}
+            resultados = self._enviar_varios(mensajes) or [None] * len(mensajes)
+            for mensaje, resultado in zip(mensajes, resultados):
+                try:
+                    if resultado is None:
+                        resultado = self._enviar(mensaje)
+                    enviado = resultado["enviado"] if isinstance(resultado, dict) else resultado
+                    if not enviado:
+                        error = resultado.get("error") if isinstance(resultado, dict) else None
+                        fallidos[mensaje.id_mail] = (error or "El proveedor de mail no aceptó el envío.", False)
+                except Exception as e:
+                    fallidos[mensaje.id_mail] = (str(e), False)
+            return fallidos
+
+        con_html = all(m.cuerpo_html for m in mensajes)
+        destinatarios = []
+        for m in mensajes:
+            sustituciones = {"asunto": m.asunto, "cuerpo": m.cuerpo}
+            if con_html:
+                sustituciones["cuerpo_html"] = m.cuerpo_html
+            destinatarios.append((m.destinatario, sustituciones))
+        resultado = MailService.enviar_lote(destinatarios, "%asunto%", "%cuerpo%", config,
+                                            cuerpo_html="%cuerpo_html%" if con_html else None)
+        errores = {email.lower(): error for email, error in resultado["fallidos"]}
+        suprimidos = {email.lower() for email in resultado["suprimidos"]}
+        fallidos = {}
+        for mensaje in mensajes:
+            clave = mensaje.destinatario.lower()
+            if clave in suprimidos:
+                fallidos[mensaje.id_mail] = ("Dirección suprimida en SendGrid.", True)
+            elif clave in errores:
+                fallidos[mensaje.id_mail] = (errores[clave], False)
+        return fallidos
@@ -0,0 +1,309 @@
+# servicios/mail_resiliencia.py
+"""
+Reintentos y circuit breakers para los transportes de mail (SendGrid, SMTP).
+
+- Cada intento fallido por un error transitorio (red, timeout, 429, 5xx) se reintenta con
+  espera exponencial con jitter: un valor al azar entre 0 y base·2^intento (con tope), así
+  varios workers no reintentan todos al mismo tiempo.
+- Cada transporte tiene un CircuitBreaker: después de `umbral` fallos seguidos se abre y, durante
+  `segundos_abierto`, los envíos por ese transporte fallan al instante en lugar de esperar el
+  timeout. Pasado ese tiempo queda semiabierto: se deja pasar un envío de prueba y, según el
+  resultado, se cierra o se vuelve a abrir. Si la prueba termina sin resultado (se canceló, o
+  falló por un error inesperado que no dice nada del proveedor) se libera para el próximo envío.
+- Un error inesperado de un transporte (un bug, un mensaje que no se pudo armar) no se reintenta:
+  se informa como ErrorPermanente, así el envío sigue por el próximo transporte.
+- enviar_con_respaldo prueba los transportes en orden (SendGrid -> SMTP) y pasa al siguiente
+  cuando uno falla o tiene el circuito abierto. MailService guarda en el spool los que no
+  pudo enviar ningún transporte.
+
+Las transiciones de los circuitos (aperturas, cierres) se cuentan y se pueden consultar con
+estadisticas(). Configuración (variables de entorno):
+    MAIL_REINTENTOS          reintentos por transporte para errores transitorios (2)
+    MAIL_CIRCUITO_UMBRAL     fallos seguidos que abren el circuito (5)
+    MAIL_CIRCUITO_SEGUNDOS   segundos que el circuito queda abierto (60)
+"""
+import time
+import random
+import asyncio
+import threading
+
+from config_entorno import entero_desde_entorno
+from mail_log import registrar_error
+
+CERRADO = "cerrado"
+ABIERTO = "abierto"
+SEMIABIERTO = "semiabierto"
+
+ESPERA_BASE_SEGUNDOS = 0.5
+ESPERA_MAXIMA_SEGUNDOS = 8.0
+
+
+class ErrorTransitorio(Exception):
+    """El proveedor no respondió o está degradado: tiene sentido reintentar y cuenta para el circuito."""
+
+
+class ErrorPermanente(Exception):
+    """El proveedor rechazó este mensaje (dirección, contenido): no se reintenta por el mismo transporte."""
+
+
+class CircuitoAbierto(Exception):
+    def __init__(self, circuito):
+        super().__init__(f"Circuito '{circuito.nombre}' abierto")
+        self.circuito = circuito
+
+
+class CircuitBreaker:
+    def __init__(self, nombre, umbral=None, segundos_abierto=None):
+        self.nombre = nombre
+        self.umbral = umbral if umbral is not None else entero_desde_entorno("MAIL_CIRCUITO_UMBRAL", 5)
+        self.segundos_abierto = segundos_abierto if segundos_abierto is not None else \
+            entero_desde_entorno("MAIL_CIRCUITO_SEGUNDOS", 60)
+        self._estado = CERRADO
+        self._fallos_seguidos = 0
+        self._abierto_desde = 0.0
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+        self.contadores = {"exitos": 0, "fallos": 0, "rechazos_rapidos": 0,
+                           "aperturas": 0, "semiaperturas": 0, "cierres": 0}
+
+    @property
+    def estado(self):
+        with self._lock:
+            self._actualizar()
+            return self._estado
+
+    def _actualizar(self):
+        if self._estado == ABIERTO and time.monotonic() - self._abierto_desde >= self.segundos_abierto:
+            self._cambiar(SEMIABIERTO)
+
+    def _cambiar(self, estado):
+        self._estado = estado
+        self.contadores[{ABIERTO: "aperturas", SEMIABIERTO: "semiaperturas", CERRADO: "cierres"}[estado]] += 1
+        if estado == ABIERTO:
+            self._abierto_desde = time.monotonic()
+            self._prueba_en_curso = False
+            mensaje = (f"Circuito de {self.nombre} abierto tras {self._fallos_seguidos} fallos seguidos; "
+                       f"se vuelve a probar en {self.segundos_abierto} s")
+            print(f"[MailService WARN] {mensaje}")
+            registrar_error(mensaje)
+        elif estado == CERRADO:
+            self._prueba_en_curso = False
+            print(f"[MailService] Circuito de {self.nombre} cerrado: el proveedor volvió a responder")
+
+    def permitir(self):
+        """True si se puede intentar un envío (en semiabierto, solo uno de prueba a la vez)."""
+        with self._lock:
+            self._actualizar()
+            if self._estado == CERRADO:
+                return True
+            if self._estado == SEMIABIERTO and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return True
+            self.contadores["rechazos_rapidos"] += 1
+            return False
+
+    def registrar_exito(self):
+        with self._lock:
+            self.contadores["exitos"] += 1
+            self._fallos_seguidos = 0
+            if self._estado != CERRADO:
+                self._cambiar(CERRADO)
+
+    def registrar_fallo(self):
+        with self._lock:
+            self.contadores["fallos"] += 1
+            self._fallos_seguidos += 1
+            if self._estado == SEMIABIERTO or (self._estado == CERRADO and self._fallos_seguidos >= self.umbral):
+                self._cambiar(ABIERTO)
+
+    def liberar_prueba(self):
+        """El envío de prueba terminó sin resultado: el próximo envío puede volver a probar."""
+        with self._lock:
+            self._prueba_en_curso = False
+
+    def segundos_para_reintentar(self):
+        """Segundos hasta que el circuito deje pasar un envío de prueba (0 si ya lo deja)."""
+        with self._lock:
+            self._actualizar()
+            if self._estado != ABIERTO:
+                return 0.0
+            return max(0.0, self.segundos_abierto - (time.monotonic() - self._abierto_desde))
+
+    def estadisticas(self):
+        with self._lock:
+            self._actualizar()
+            return {"estado": self._estado, "fallos_seguidos": self._fallos_seguidos, **self.contadores}
+
+
+_circuitos = {}
+_lock_circuitos = threading.Lock()
+_contadores = {"envios": 0, "respaldos": 0, "sin_enviar": 0}
+
+
+def obtener_circuito(nombre):
+    """Circuito compartido del transporte `nombre` (por ej. 'sendgrid', 'smtp')."""
+    with _lock_circuitos:
+        circuito = _circuitos.get(nombre)
+        if circuito is None:
+            circuito = CircuitBreaker(nombre)
+            _circuitos[nombre] = circuito
+        return circuito
+
+
+def reiniciar_circuitos():
+    """Descarta los circuitos y contadores (por ej. al cambiar de configuración o en pruebas)."""
+    with _lock_circuitos:
+        _circuitos.clear()
+        for clave in _contadores:
+            _contadores[clave] = 0
+
+
+def estadisticas():
+    """Contadores de envíos y el estado y las transiciones de cada circuito."""
+    with _lock_circuitos:
+        circuitos = dict(_circuitos)
+        generales = dict(_contadores)
+    generales["circuitos"] = {nombre: c.estadisticas() for nombre, c in circuitos.items()}
+    return generales
+
+
+def _contar(nombre):
+    with _lock_circuitos:
+        _contadores[nombre] += 1
+
+
+def espera_con_jitter(intento, base=ESPERA_BASE_SEGUNDOS, maxima=ESPERA_MAXIMA_SEGUNDOS):
+    """Espera antes del reintento número `intento` (0, 1, ...): al azar entre 0 y base·2^intento."""
+    return random.uniform(0, min(maxima, base * 2 ** intento))
+
+
+def ejecutar_con_reintentos(funcion, circuito, reintentos=None, espera_base=ESPERA_BASE_SEGUNDOS):
+    """
+    Ejecuta `funcion()` reintentando los ErrorTransitorio con espera exponencial con jitter y
+    registrando cada resultado en `circuito`. Lanza CircuitoAbierto si el circuito no deja pasar
+    el envío, o el último error si se agotan los reintentos.
+    """
+    reintentos = reintentos if reintentos is not None else entero_desde_entorno("MAIL_REINTENTOS", 2)
+    for intento in range(reintentos + 1):
+        if not circuito.permitir():
+            raise CircuitoAbierto(circuito)
+        try:
+            resultado = funcion()
+        except ErrorPermanente:
+            # El proveedor respondió: está disponible aunque rechace este mensaje
+            circuito.registrar_exito()
+            raise
+        except ErrorTransitorio as e:
+            circuito.registrar_fallo()
+            if intento == reintentos:
+                raise
+            espera = espera_con_jitter(intento, espera_base)
+            print(f"[MailService WARN] {circuito.nombre}: {e}; reintento {intento + 1} de {reintentos} en {espera:.2f} s")
+            time.sleep(espera)
+        except Exception as e:
+            circuito.liberar_prueba()
+            raise _error_inesperado(circuito, e) from e
+        except BaseException:
+            circuito.liberar_prueba()
+            raise
+        else:
+            circuito.registrar_exito()
+            return resultado
+
+
+def _error_inesperado(circuito, e):
+    mensaje = f"Error inesperado en {circuito.nombre}: {type(e).__name__}: {e}"
+    print(f"[MailService ERROR] {mensaje}")
+    registrar_error(mensaje)
+    return ErrorPermanente(mensaje)
+
+
+def enviar_con_respaldo(transportes, reintentos=None):
+    """
+    Prueba los transportes [(nombre, funcion)] en orden hasta que uno envíe el mail.
+    Retorna {"enviado", "transporte", "error", "diferido", "reintentar_en"}: `diferido` es True
+    si no se intentó ningún transporte porque todos tenían el circuito abierto, y
+    `reintentar_en` los segundos hasta que alguno vuelva a dejar pasar envíos.
+    """
+    _contar("envios")
+    errores, esperas, intentado = [], [], False
+    for posicion, (nombre, funcion) in enumerate(transportes):
+        circuito = obtener_circuito(nombre)
+        try:
+            ejecutar_con_reintentos(funcion, circuito, reintentos)
+        except CircuitoAbierto:
+            errores.append(f"{nombre}: circuito abierto")
+            esperas.append(circuito.segundos_para_reintentar())
+            continue
+        except (ErrorTransitorio, ErrorPermanente) as e:
+            intentado = True
+            errores.append(f"{nombre}: {e}")
+            continue
+        return _enviado(nombre, posicion, errores)
+    return _no_enviado(transportes, errores, esperas, intentado)
+
+
+def _enviado(nombre, posicion, errores):
+    if posicion > 0:
+        _contar("respaldos")
+        print(f"[MailService] Enviado por {nombre} como respaldo ({'; '.join(errores)})")
+    return {"enviado": True, "transporte": nombre, "error": None, "diferido": False, "reintentar_en": None}
+
+
+def _no_enviado(transportes, errores, esperas, intentado):
+    _contar("sin_enviar")
+    return {"enviado": False, "transporte": None, "error": "; ".join(errores) or "Sin transportes configurados.",
+            "diferido": bool(transportes) and not intentado,
+            "reintentar_en": min(esperas) if esperas and not intentado else None}
+
+
+# Versiones asyncio (mail_async.py): mismos circuitos y contadores, las esperas no bloquean el bucle
+
+async def ejecutar_con_reintentos_async(funcion, circuito, reintentos=None, espera_base=ESPERA_BASE_SEGUNDOS):
+    """Como ejecutar_con_reintentos, pero `funcion()` retorna una corrutina."""
+    reintentos = reintentos if reintentos is not None else entero_desde_entorno("MAIL_REINTENTOS", 2)
+    for intento in range(reintentos + 1):
+        if not circuito.permitir():
+            raise CircuitoAbierto(circuito)
+        try:
+            resultado = await funcion()
+        except ErrorPermanente:
+            circuito.registrar_exito()
+            raise
+        except ErrorTransitorio as e:
+            circuito.registrar_fallo()
+            if intento == reintentos:
+                raise
+            espera = espera_con_jitter(intento, espera_base)
+            print(f"[MailService WARN] {circuito.nombre}: {e}; reintento {intento + 1} de {reintentos} en {espera:.2f} s")
+            await asyncio.sleep(espera)
+        except Exception as e:
+            circuito.liberar_prueba()
+            raise _error_inesperado(circuito, e) from e
+        except BaseException:
+            # Por ejemplo asyncio.CancelledError, cuando mail_async corta una tanda por tiempo
+            circuito.liberar_prueba()
+            raise
+        else:
+            circuito.registrar_exito()
+            return resultado
+
+
+async def enviar_con_respaldo_async(transportes, reintentos=None):
+    """Como enviar_con_respaldo, con transportes [(nombre, funcion que retorna una corrutina)]."""
+    _contar("envios")
+    errores, esperas, intentado = [], [], False
+    for posicion, (nombre, funcion) in enumerate(transportes):
+        circuito = obtener_circuito(nombre)
+        try:
+            await ejecutar_con_reintentos_async(funcion, circuito, reintentos)
+        except CircuitoAbierto:
+            errores.append(f"{nombre}: circuito abierto")
+            esperas.append(circuito.segundos_para_reintentar())
+            continue
+        except (ErrorTransitorio, ErrorPermanente) as e:
+            intentado = True
+            errores.append(f"{nombre}: {e}")
+            continue
+        return _enviado(nombre, posicion, errores)
+    return _no_enviado(transportes, errores, esperas, intentado)
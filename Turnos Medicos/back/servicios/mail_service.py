@@ -1,9 +1,16 @@
 import os
+import time
 import smtplib
 from email.message import EmailMessage
-from datetime import datetime
 import json
-import requests
+
+from smtp_pool import obtener_pool
+from sendgrid_cliente import obtener_cliente
+from mail_log import registrar_error, registrar_exito, obtener_spool
+from mail_resiliencia import (ErrorTransitorio, ErrorPermanente, enviar_con_respaldo, obtener_circuito,
+                              espera_con_jitter)
+from plantillas_mail import CONFIRMACION, renderizar, datos_de_turno
+import mail_async
 
 
 class MailService:
@@ -11,208 +18,457 @@ class MailService:
 
     Comportamiento:
     - Si las variables de entorno SMTP_* están definidas (HOST, PORT, USER, PASS, FROM)
-      intentará enviar el correo vía SMTP/TLS.
-    - Si no hay configuración SMTP, guardará un archivo simulando el envío en
-      `front/salidas/emails/` con nombre timestamp para facilitar pruebas locales.
+      intentará enviar el correo vía SMTP/TLS (SMTP_TLS elige el modo), reutilizando
+      las sesiones autenticadas del pool de smtp_pool.py.
+    - Si SENDGRID_API_KEY está definida se prioriza SendGrid, con un cliente HTTP
+      compartido y caché de supresiones (sendgrid_cliente.py).
+    - Si SendGrid falla pasa a SMTP, con reintentos y un circuit breaker por proveedor
+      (mail_resiliencia.py); lo que no se pudo enviar queda en el spool como 'diferido'.
+    - Si no hay configuración SMTP, simulará el envío agregando el mail como una
+      línea JSON a `back/salidas/emails/simulados.jsonl` para facilitar pruebas locales.
+    - Los envíos y errores se registran en mail_success.log / mail_errors.log
+      (con rotación por tamaño, ver mail_log.py).
+    - Con MAIL_ASYNC=1 los envíos pasan por un bucle asyncio compartido que manda
+      muchos a la vez, con límite de concurrencia y de envíos por segundo por
+      proveedor (mail_async.py). Los métodos públicos no cambian.
 
-    Método público:
+    Métodos públicos:
+    - enviar_mensaje(to_email, subject, cuerpo, mail_config=None, cuerpo_html=None) -> bool
+      Envía un mail ya armado (con una versión HTML opcional). Devuelve True si el
+      envío (o simulación) fue exitoso, False en caso contrario. Lo usan los workers
+      de mail_outbox.py.
     - enviar_turno(to_email: str, turno) -> bool
-      Intenta enviar un email con la información del turno. Devuelve True si
-      el envío (o simulación) fue exitoso, False en caso contrario.
+      Arma la confirmación del turno con su plantilla (plantillas_mail.py) y la envía
+      con enviar_mensaje.
+    - enviar_lote(destinatarios, subject, cuerpo, mail_config=None) -> dict
+      Envía el mismo mail a muchos destinatarios con valores propios para cada uno
+      (avisos masivos). Con SendGrid agrupa hasta 1000 destinatarios por pedido.
     """
     
 
+    CLAVES_CONFIG = ('SMTP_HOST', 'SMTP_PORT', 'SMTP_USER', 'SMTP_PASS', 'SMTP_TLS', 'FROM_EMAIL',
+                     'SENDGRID_API_KEY', 'SENDGRID_API_URL', 'ALLOW_SENDGRID_UNSUPPRESS', 'MAIL_ASYNC')
+
+    # Límite de personalizations (destinatarios) por pedido a /v3/mail/send
+    MAX_DESTINATARIOS_POR_PEDIDO = 1000
+    REINTENTOS_LOTE = 3
+    ESPERA_BASE_LOTE = 2.0
+    ESPERA_MAXIMA_LOTE = 60.0
+
+    @staticmethod
+    def configuracion_desde_entorno() -> dict:
+        """mail_config armado con las variables de entorno (SMTP_*, FROM_EMAIL, SENDGRID_*)."""
+        return {clave: os.environ.get(clave) for clave in MailService.CLAVES_CONFIG}
+
+    @staticmethod
+    def _valor_config(mail_config, key, default=None):
+        # Soporte de configuración dinámica: prioridad = mail_config > variables de entorno
+        if mail_config:
+            # aceptar claves en mayúsculas o minúsculas
+            if key in mail_config:
+                return mail_config.get(key)
+            if key.lower() in mail_config:
+                return mail_config.get(key.lower())
+        return os.environ.get(key, default)
+
     @staticmethod
     def enviar_turno(to_email: str, turno, mail_config: dict = None) -> bool:
+        """
+        Envía la confirmación del turno (texto y HTML). `turno` es un Turno (paciente, médico y
+        especialidad se leen con TurnoDAO.obtener_datos_notificacion) o esa fila ya leída.
+        """
+        try:
+            subject, cuerpo, cuerpo_html = renderizar(CONFIRMACION, datos_de_turno(turno))
+        except Exception as e:
+            print(f"[MailService ERROR] No se pudo armar la confirmación del turno: {e}")
+            registrar_error(f"No se pudo armar la confirmación del turno para {to_email}: {e}")
+            return False
+        referencia = turno.get('id_turno', '') if isinstance(turno, dict) else getattr(turno, 'id_turno', '')
+        return MailService.enviar_mensaje(to_email, subject, cuerpo, mail_config,
+                                          prefijo_archivo='mail_turno', referencia=referencia, cuerpo_html=cuerpo_html)
+
+    @staticmethod
+    def enviar_mensaje(to_email: str, subject: str, cuerpo: str, mail_config: dict = None,
+                       prefijo_archivo: str = 'mail', referencia='', cuerpo_html: str = None) -> bool:
+        """
+        Envía un mail ya armado (SendGrid, SMTP o simulación en archivo, en ese orden).
+        Devuelve True si el envío (o simulación) fue exitoso, False en caso contrario.
+        """
+        return MailService.enviar_mensaje_detallado(to_email, subject, cuerpo, mail_config,
+                                                    prefijo_archivo, referencia, cuerpo_html)["enviado"]
+
+    @staticmethod
+    def enviar_mensaje_detallado(to_email: str, subject: str, cuerpo: str, mail_config: dict = None,
+                                 prefijo_archivo: str = 'mail', referencia='', cuerpo_html: str = None,
+                                 persistir_diferido: bool = True) -> dict:
+        """
+        Igual que enviar_mensaje, pero informa cómo terminó el envío.
+        Prueba SendGrid y SMTP (los que estén configurados), cada uno con reintentos y su
+        circuit breaker (ver mail_resiliencia.py). Si no hay ninguno configurado el envío se
+        simula en el spool. Si hay proveedores pero ninguno pudo enviar, el mail queda en el
+        spool como 'diferido' y se informa como no enviado; con `persistir_diferido=False` no se
+        escribe en el spool (el outbox ya tiene el mail guardado y lo reintenta él).
+        Retorna {"enviado", "transporte", "error", "diferido", "reintentar_en"}: `diferido` indica
+        que no se intentó porque los circuitos estaban abiertos y `reintentar_en` cuántos segundos
+        falta para que vuelvan a dejar pasar envíos (el outbox reprograma el mail para ese momento).
+        """
         if not to_email:
             print("[MailService] Dirección de mail destino vacía. No se enviará el correo.")
-            return False
+            return {"enviado": False, "transporte": None, "error": "Dirección de mail destino vacía.",
+                    "diferido": False, "reintentar_en": None}
+        if mail_async.activado(mail_config):
+            # MAIL_ASYNC: el envío lo hace el bucle asyncio compartido (ver mail_async.py), mismo resultado
+            return mail_async.enviar(to_email, subject, cuerpo, mail_config, prefijo_archivo, referencia, cuerpo_html,
+                                     persistir_diferido)
 
-        subject = f"Confirmación de turno #{getattr(turno, 'id_turno', '')}"
-        fecha = getattr(turno, 'fecha_hora_inicio', '')
-        cuerpo = (
-            f"ME IMAGINO LO SORPRENDIDO QUE DEBE ESTAR.... nosotros tambien.\n"
-            f"Detalle del turno:\n\n"
-            f"ID: {getattr(turno, 'id_turno', '')}\n"
-            f"Fecha/Hora: {fecha}\n"
-            f"Médico (matrícula): {getattr(turno, 'nro_matricula_medico', '')}\n"
-            f"Motivo: {getattr(turno, 'motivo', '')}\n"
-            f"Observaciones: {getattr(turno, 'observaciones', '')}\n"
-            f"Atentamente grupo 67"
-            
-        )
+        # Priorizar SendGrid si está configurado; SMTP como respaldo
+        transportes = []
+        if MailService._valor_config(mail_config, 'SENDGRID_API_KEY'):
+            transportes.append(('sendgrid', lambda: MailService._enviar_sendgrid(to_email, subject, cuerpo, mail_config,
+                                                                                 cuerpo_html)))
+        smtp = MailService._config_smtp(mail_config)
+        if smtp:
+            transportes.append(('smtp', lambda: MailService._enviar_smtp(to_email, subject, cuerpo, *smtp, cuerpo_html)))
 
-        # Soporte de configuración dinámica: prioridad = mail_config > variables de entorno
+        if not transportes:
+            return MailService._simular(to_email, subject, cuerpo, prefijo_archivo, referencia, cuerpo_html)
+        resultado = enviar_con_respaldo(transportes)
+        if not resultado["enviado"]:
+            MailService._diferir(to_email, subject, cuerpo, prefijo_archivo, referencia, cuerpo_html, resultado["error"],
+                                 persistir_diferido)
+        return resultado
+
+    @staticmethod
+    def _config_smtp(mail_config):
+        """(host, port, user, pass, from_email, tls) si SMTP está configurado, o None."""
         def _cfg(key, default=None):
-            if mail_config:
-                # aceptar claves en mayúsculas o minúsculas
-                if key in mail_config:
-                    return mail_config.get(key)
-                if key.lower() in mail_config:
-                    return mail_config.get(key.lower())
-            return os.environ.get(key, default)
+            return MailService._valor_config(mail_config, key, default)
 
         smtp_host = _cfg('SMTP_HOST')
         smtp_port = _cfg('SMTP_PORT')
         smtp_user = _cfg('SMTP_USER')
         smtp_pass = _cfg('SMTP_PASS')
+        if not (smtp_host and smtp_port and smtp_user and smtp_pass):
+            return None
+        return (smtp_host, smtp_port, smtp_user, smtp_pass, _cfg('FROM_EMAIL', smtp_user),
+                str(_cfg('SMTP_TLS') or 'auto').lower())
+
+    @staticmethod
+    def _simular(to_email, subject, cuerpo, prefijo_archivo, referencia, cuerpo_html=None):
+        """Sin proveedores configurados: una línea JSON por mail en salidas/emails/simulados.jsonl."""
+        try:
+            spool = obtener_spool()
+            spool.escribir(to_email, subject, cuerpo, tipo=prefijo_archivo, referencia=referencia,
+                           cuerpo_html=cuerpo_html)
+            print(f"[MailService] Simulated email to {to_email} appended to: {spool.ruta}")
+            return {"enviado": True, "transporte": "spool", "error": None, "diferido": False, "reintentar_en": None}
+        except Exception as e:
+            print(f"[MailService ERROR] No se pudo escribir el archivo de simulación: {e}")
+            return {"enviado": False, "transporte": None, "error": str(e), "diferido": False, "reintentar_en": None}
+
+    @staticmethod
+    def _diferir(to_email, subject, cuerpo, prefijo_archivo, referencia, cuerpo_html, error, persistir=True):
+        """
+        Ningún proveedor aceptó el mail: se registra el error y, si `persistir`, el mail queda en
+        el spool como 'diferido'.
+        """
+        err = f"No se pudo enviar el mail a {to_email}: {error}"
+        print(f"[MailService ERROR] {err}")
+        registrar_error(err)
+        if not persistir:
+            return
+        # Último respaldo: que el mail quede registrado aunque ningún proveedor lo haya aceptado
+        try:
+            obtener_spool().escribir(to_email, subject, cuerpo, tipo=prefijo_archivo, referencia=referencia,
+                                     estado='diferido', cuerpo_html=cuerpo_html)
+        except Exception as e:
+            print(f"[MailService ERROR] No se pudo escribir el archivo de simulación: {e}")
+
+    @staticmethod
+    def _enviar_sendgrid(to_email, subject, cuerpo, mail_config, cuerpo_html=None):
+        """Envía por SendGrid. Lanza ErrorTransitorio (red, 429, 5xx) o ErrorPermanente (4xx, credenciales)."""
+        cliente, payload, allow_unsuppress = MailService._preparar_sendgrid(to_email, subject, cuerpo, mail_config,
+                                                                            cuerpo_html)
+        MailService._comprobar_supresion(cliente, to_email, allow_unsuppress)
+        try:
+            resp = cliente.enviar(payload)
+        except Exception as e:
+            raise MailService._error_red_sendgrid(e)
+        return MailService._resultado_sendgrid(to_email, resp.status_code, resp.text, resp.headers)
+
+    @staticmethod
+    def _preparar_sendgrid(to_email, subject, cuerpo, mail_config, cuerpo_html=None):
+        """(cliente compartido, payload, allow_unsuppress) de un envío por SendGrid."""
+        def _cfg(key, default=None):
+            return MailService._valor_config(mail_config, key, default)
+
+        smtp_user = _cfg('SMTP_USER')
         from_email = _cfg('FROM_EMAIL', smtp_user)
-        sendgrid_key = _cfg('SENDGRID_API_KEY')
         # Opt-in to allow the service to remove sendgrid suppressions automatically (use with caution)
         allow_unsuppress = str(_cfg('ALLOW_SENDGRID_UNSUPPRESS', 'false')).lower() in ('1', 'true', 'yes')
 
-        base_salidas = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'salidas'))
-        emails_dir = os.path.join(base_salidas, 'emails')
+        # Construir payload SendGrid
+        payload = {
+            "personalizations": [{
+                "to": [{"email": to_email}],
+                "subject": subject
+            }],
+            "from": {"email": from_email or smtp_user or "no-reply@example.com"},
+            "content": [{"type": "text/plain", "value": cuerpo}]
+        }
+        if cuerpo_html:
+            payload["content"].append({"type": "text/html", "value": cuerpo_html})
+        # Cliente compartido: una sola sesión HTTP (keep-alive) para todos los envíos
+        cliente = obtener_cliente(_cfg('SENDGRID_API_KEY'), _cfg('SENDGRID_API_URL'))
+        return cliente, payload, allow_unsuppress
 
-        def _log_error(msg: str):
-            try:
-                os.makedirs(emails_dir, exist_ok=True)
-                log_path = os.path.join(emails_dir, 'mail_errors.log')
-                ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                with open(log_path, 'a', encoding='utf-8') as lf:
-                    lf.write(f"[{ts}] {msg}\n")
-            except Exception:
-                # no podemos hacer mucho si el log falla
-                pass
-
-        def _log_success(msg: str):
-            try:
-                os.makedirs(emails_dir, exist_ok=True)
-                success_path = os.path.join(emails_dir, 'mail_success.log')
-                ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                with open(success_path, 'a', encoding='utf-8') as lf:
-                    lf.write(f"[{ts}] {msg}\n")
-            except Exception:
-                pass
-
-        # Si falta configuración SMTP, caeremos a modo 'simulado' escribiendo un archivo
-        # Priorizar SendGrid si está configurado
-        if sendgrid_key:
-            try:
-                os.makedirs(emails_dir, exist_ok=True)
-                # Construir payload SendGrid
-                payload = {
-                    "personalizations": [{
-                        "to": [{"email": to_email}],
-                        "subject": subject
-                    }],
-                    "from": {"email": from_email or smtp_user or "no-reply@example.com"},
-                    "content": [{"type": "text/plain", "value": cuerpo}]
-                }
-                headers = {
-                    "Authorization": f"Bearer {sendgrid_key}",
-                    "Content-Type": "application/json"
-                }
-                # Antes de enviar: comprobar si el destinatario está en listas de supresión
-                try:
-                    suppressed = []
-                    # bounces
-                    r_b = requests.get(f'https://api.sendgrid.com/v3/suppression/bounces?email={to_email}', headers=headers, timeout=8)
-                    if r_b.status_code == 200 and r_b.text and r_b.text != '[]':
-                        suppressed.append(('bounces', r_b.text))
-                    # blocks
-                    r_blk = requests.get(f'https://api.sendgrid.com/v3/suppression/blocks?email={to_email}', headers=headers, timeout=8)
-                    if r_blk.status_code == 200 and r_blk.text and r_blk.text != '[]':
-                        suppressed.append(('blocks', r_blk.text))
-                    # global suppressions
-                    r_glob = requests.get(f'https://api.sendgrid.com/v3/asm/suppressions/global?email={to_email}', headers=headers, timeout=8)
-                    if r_glob.status_code == 200 and r_glob.text and r_glob.text != '[]':
-                        suppressed.append(('global', r_glob.text))
-
-                    if suppressed:
-                        detail = '; '.join([f"{k}:{v}" for k, v in suppressed])
-                        msg = f"SendGrid suppression detected for {to_email}: {detail}"
-                        print(f"[MailService WARN] {msg}")
-                        _log_error(msg)
-                        # Intentar eliminar la supresión solo si el admin explicitamente lo permite
-                        if allow_unsuppress:
-                            try:
-                                for kind, _ in suppressed:
-                                    if kind == 'bounces':
-                                        requests.delete(f'https://api.sendgrid.com/v3/suppression/bounces/{to_email}', headers=headers, timeout=8)
-                                    elif kind == 'blocks':
-                                        requests.delete(f'https://api.sendgrid.com/v3/suppression/blocks/{to_email}', headers=headers, timeout=8)
-                                    elif kind == 'global':
-                                        requests.delete(f'https://api.sendgrid.com/v3/asm/suppressions/global/{to_email}', headers=headers, timeout=8)
-                                # reintentar envío tras eliminar supresiones
-                            except Exception as e_uns:
-                                _log_error(f"Failed to remove suppression for {to_email}: {e_uns}")
-                                # No abortamos; intentaremos enviar de todos modos
-
-                except Exception as e_check:
-                    # Si falla la comprobación de supresiones, lo registramos pero intentamos enviar
-                    _log_error(f"Error checking SendGrid suppressions for {to_email}: {e_check}")
-
-                resp = requests.post('https://api.sendgrid.com/v3/mail/send', headers=headers, data=json.dumps(payload), timeout=10)
-                if resp.status_code == 202:
-                    # Extraer X-Message-Id y loguear cabeceras para trazabilidad en SendGrid Activity
-                    msg_id = resp.headers.get('X-Message-Id') or resp.headers.get('X-Message-Id'.lower())
-                    try:
-                        hdrs = dict(resp.headers)
-                    except Exception:
-                        hdrs = {k: v for k, v in resp.headers.items()}
-                    hdrs_str = json.dumps(hdrs, ensure_ascii=False)
-                    succ_msg = f"Email enviado a {to_email} via SendGrid | message_id={msg_id} | headers={hdrs_str}"
-                    print(f"[MailService] {succ_msg}")
-                    _log_success(succ_msg)
-                    return True
-                else:
+    @staticmethod
+    def _comprobar_supresion(cliente, to_email, allow_unsuppress, suppressed=None):
+        """
+        Antes de enviar: comprobar si el destinatario está en listas de supresión. La caché
+        descarga las listas completas periódicamente (ver sendgrid_cliente.py). `suppressed`
+        permite pasar los tipos ya consultados.
+        """
+        try:
+            if suppressed is None:
+                suppressed = cliente.supresiones.tipos(to_email)
+            if suppressed:
+                msg = f"SendGrid suppression detected for {to_email}: {', '.join(suppressed)}"
+                print(f"[MailService WARN] {msg}")
+                registrar_error(msg)
+                # Intentar eliminar la supresión solo si el admin explicitamente lo permite
+                if allow_unsuppress:
                     try:
-                        hdrs = dict(resp.headers)
-                    except Exception:
-                        hdrs = {k: v for k, v in resp.headers.items()}
-                    hdrs_str = json.dumps(hdrs, ensure_ascii=False)
-                    err = f"SendGrid returned {resp.status_code}: {resp.text} | headers={hdrs_str}"
-                    print(f"[MailService ERROR] {err}")
-                    _log_error(err)
-                    # continuar y probar fallback SMTP/file
-            except Exception as e:
-                err = f"SendGrid exception: {e}"
-                print(f"[MailService ERROR] {err}")
-                _log_error(err)
+                        for kind in suppressed:
+                            cliente.eliminar_supresion(kind, to_email)
+                        # reintentar envío tras eliminar supresiones
+                    except Exception as e_uns:
+                        registrar_error(f"Failed to remove suppression for {to_email}: {e_uns}")
+                        # No abortamos; intentaremos enviar de todos modos
 
-        if not smtp_host or not smtp_port or not smtp_user or not smtp_pass:
-            try:
-                os.makedirs(emails_dir, exist_ok=True)
-                ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-                filename = f"mail_turno_{ts}_{getattr(turno, 'id_turno', '')}.txt"
-                path = os.path.join(emails_dir, filename)
-                with open(path, 'w', encoding='utf-8') as f:
-                    f.write(f"To: {to_email}\n")
-                    f.write(f"Subject: {subject}\n\n")
-                    f.write(cuerpo)
-                print(f"[MailService] Simulated email written to: {path}")
-                return True
-            except Exception as e:
-                print(f"[MailService ERROR] No se pudo escribir el archivo de simulación: {e}")
-                return False
+        except Exception as e_check:
+            # Si falla la comprobación de supresiones, lo registramos pero intentamos enviar
+            registrar_error(f"Error checking SendGrid suppressions for {to_email}: {e_check}")
+
+    @staticmethod
+    def _error_red_sendgrid(e):
+        err = f"SendGrid exception: {e}"
+        print(f"[MailService ERROR] {err}")
+        registrar_error(err)
+        return ErrorTransitorio(err)
+
+    @staticmethod
+    def _resultado_sendgrid(to_email, status_code, texto, headers):
+        """Registra la respuesta de /v3/mail/send. Retorna True si se aceptó; si no, lanza el error clasificado."""
+        try:
+            hdrs = dict(headers)
+        except Exception:
+            hdrs = {k: v for k, v in headers.items()}
+        hdrs_str = json.dumps(hdrs, ensure_ascii=False)
+        if status_code == 202:
+            # Extraer X-Message-Id y loguear cabeceras para trazabilidad en SendGrid Activity
+            msg_id = headers.get('X-Message-Id') or headers.get('X-Message-Id'.lower())
+            succ_msg = f"Email enviado a {to_email} via SendGrid | message_id={msg_id} | headers={hdrs_str}"
+            print(f"[MailService] {succ_msg}")
+            registrar_exito(succ_msg)
+            return True
+        err = f"SendGrid returned {status_code}: {texto} | headers={hdrs_str}"
+        print(f"[MailService ERROR] {err}")
+        registrar_error(err)
+        # 429 / 5xx: proveedor degradado. 401 / 403 (credenciales) y el resto de 4xx no se
+        # arreglan reintentando: errores permanentes, que tampoco abren el circuito
+        if status_code == 429 or status_code >= 500:
+            raise ErrorTransitorio(f"SendGrid returned {status_code}")
+        raise ErrorPermanente(f"SendGrid returned {status_code}: {texto}")
 
-        # Intentar envío SMTP real (primero STARTTLS, si falla, intentar SMTP_SSL)
+    @staticmethod
+    def _enviar_smtp(to_email, subject, cuerpo, smtp_host, smtp_port, smtp_user, smtp_pass, from_email, smtp_tls,
+                     cuerpo_html=None):
+        """Envía por SMTP. Lanza ErrorTransitorio (conexión, 4xx) o ErrorPermanente (rechazo 5xx)."""
+        # Envío SMTP real por una sesión del pool (se reutiliza entre mensajes; ver smtp_pool.py).
+        # SMTP_TLS: 'auto' (STARTTLS y si falla SMTP_SSL), 'starttls', 'ssl' o 'none'.
+        msg = MailService._armar_email(to_email, subject, cuerpo, from_email, cuerpo_html)
+        try:
+            pool = obtener_pool(smtp_host, smtp_port, smtp_user, smtp_pass, tls=smtp_tls)
+            pool.enviar(msg)
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e_smtp:
+            codigo = getattr(e_smtp, 'smtp_code', None)
+            if codigo is None and isinstance(e_smtp, smtplib.SMTPRecipientsRefused):
+                codigo = min(c for c, _ in e_smtp.recipients.values())
+            raise MailService._error_smtp(to_email, e_smtp, codigo)
+        except Exception as e_smtp:
+            raise MailService._error_smtp(to_email, e_smtp)
+        print(f"[MailService] Email enviado a {to_email} por SMTP ({pool.tls})")
+        registrar_exito(f"Email enviado a {to_email} via SMTP")
+        return True
+
+    @staticmethod
+    def _armar_email(to_email, subject, cuerpo, from_email, cuerpo_html=None):
         msg = EmailMessage()
         msg['Subject'] = subject
         msg['From'] = from_email
         msg['To'] = to_email
         msg.set_content(cuerpo)
+        if cuerpo_html:
+            msg.add_alternative(cuerpo_html, subtype='html')
+        return msg
 
-        port = int(smtp_port)
-        # Intento #1: SMTP con STARTTLS (puerto típico 587)
-        try:
-            with smtplib.SMTP(smtp_host, port, timeout=15) as server:
-                server.starttls()
-                server.login(smtp_user, smtp_pass)
-                server.send_message(msg)
-            print(f"[MailService] Email enviado a {to_email} usando STARTTLS")
-            return True
-        except Exception as e_starttls:
-            print(f"[MailService WARN] STARTTLS falló: {e_starttls}. Intentando SMTP_SSL...")
+    @staticmethod
+    def _error_smtp(to_email, e_smtp, codigo=None):
+        """
+        Registra un fallo SMTP y lo clasifica: un rechazo con código 5xx es ErrorPermanente; un
+        rechazo 4xx, un error de conexión o un timeout (sin código) son ErrorTransitorio.
+        """
+        print(f"[MailService ERROR] Falló el envío SMTP: {e_smtp}")
+        registrar_error(f"SMTP exception for {to_email}: {e_smtp}")
+        if codigo is None:
+            return ErrorTransitorio(f"SMTP: {e_smtp}")
+        if 400 <= codigo < 500:
+            return ErrorTransitorio(f"SMTP {codigo}: {e_smtp}")
+        return ErrorPermanente(f"SMTP rechazó el mail: {e_smtp}")
 
-        # Intento #2: SMTP_SSL (puerto típico 465)
-        try:
-            with smtplib.SMTP_SSL(smtp_host, port, timeout=15) as server_ssl:
-                server_ssl.login(smtp_user, smtp_pass)
-                server_ssl.send_message(msg)
-            print(f"[MailService] Email enviado a {to_email} usando SMTP_SSL")
-            return True
-        except Exception as e_ssl:
-            print(f"[MailService ERROR] Falló el envío SMTP_SSL: {e_ssl}")
-            return False
+    @staticmethod
+    def aplicar_sustituciones(texto: str, sustituciones: dict) -> str:
+        """Reemplaza cada %clave% de `texto` por su valor (lo mismo que hace SendGrid con substitutions)."""
+        for clave, valor in sustituciones.items():
+            texto = texto.replace(f"%{clave}%", valor)
+        return texto
+
+    @staticmethod
+    def enviar_lote(destinatarios, subject: str, cuerpo: str, mail_config: dict = None,
+                    tamanio_lote: int = None, reintentos: int = None, espera_base: float = None,
+                    cuerpo_html: str = None) -> dict:
+        """
+        Envía el mismo mail a muchos destinatarios (recordatorios, reprogramaciones, cierres).
+        `destinatarios` es una lista de (email, sustituciones); en `subject` y `cuerpo` cada clave
+        de las sustituciones se escribe como %clave% (ej. "Hola %nombre%, su turno es el %fecha%").
+        `cuerpo_html` (opcional) admite las mismas sustituciones; los valores se insertan tal cual,
+        así que deben venir ya escapados si se usan en el HTML.
+
+        Con SendGrid se agrupan hasta MAX_DESTINATARIOS_POR_PEDIDO destinatarios por pedido (una
+        personalization por destinatario, con sus substitutions). Un grupo que falla por un error
+        transitorio (429, 5xx o de red) se reintenta con espera exponencial con jitter, sin reenviar
+        los grupos que ya se aceptaron; si sigue fallando (o el circuito de SendGrid está abierto) y
+        hay SMTP configurado, ese grupo se envía por SMTP. Las direcciones suprimidas no se envían.
+        Sin SendGrid se envía uno por uno con enviar_mensaje (SMTP o simulación).
+
+        Retorna {"enviados": [emails], "fallidos": [(email, error)], "suprimidos": [emails], "pedidos": n}.
+        """
+        tamanio_lote = min(tamanio_lote or MailService.MAX_DESTINATARIOS_POR_PEDIDO, MailService.MAX_DESTINATARIOS_POR_PEDIDO)
+        reintentos = MailService.REINTENTOS_LOTE if reintentos is None else reintentos
+        espera_base = MailService.ESPERA_BASE_LOTE if espera_base is None else espera_base
+        resultado = {"enviados": [], "fallidos": [], "suprimidos": [], "pedidos": 0}
+
+        validos = []
+        for email, sustituciones in destinatarios:
+            if not email:
+                resultado["fallidos"].append((email, "Dirección de mail destino vacía."))
+                continue
+            # SendGrid solo acepta valores de texto en substitutions
+            validos.append((email, {clave: "" if valor is None else str(valor)
+                                    for clave, valor in (sustituciones or {}).items()}))
+
+        sendgrid_key = MailService._valor_config(mail_config, 'SENDGRID_API_KEY')
+        if not sendgrid_key:
+            for email, sustituciones in validos:
+                html = MailService.aplicar_sustituciones(cuerpo_html, sustituciones) if cuerpo_html else None
+                if MailService.enviar_mensaje(email, MailService.aplicar_sustituciones(subject, sustituciones),
+                                              MailService.aplicar_sustituciones(cuerpo, sustituciones),
+                                              mail_config, prefijo_archivo='mail_lote', cuerpo_html=html):
+                    resultado["enviados"].append(email)
+                else:
+                    resultado["fallidos"].append((email, "No se pudo enviar el mail."))
+            return resultado
+
+        cliente = obtener_cliente(sendgrid_key, MailService._valor_config(mail_config, 'SENDGRID_API_URL'))
+        por_enviar = []
+        for email, sustituciones in validos:
+            try:
+                suprimida = bool(cliente.supresiones.tipos(email))
+            except Exception as e:
+                print(f"[MailService WARN] No se pudo comprobar la supresión de {email}: {e}")
+                suprimida = False
+            if suprimida:
+                resultado["suprimidos"].append(email)
+            else:
+                por_enviar.append((email, sustituciones))
+
+        smtp_host = MailService._valor_config(mail_config, 'SMTP_HOST')
+        smtp_port = MailService._valor_config(mail_config, 'SMTP_PORT')
+        smtp_user = MailService._valor_config(mail_config, 'SMTP_USER')
+        smtp_pass = MailService._valor_config(mail_config, 'SMTP_PASS')
+        smtp_tls = str(MailService._valor_config(mail_config, 'SMTP_TLS') or 'auto').lower()
+        smtp_configurado = bool(smtp_host and smtp_port and smtp_user and smtp_pass)
+        remitente = MailService._valor_config(mail_config, 'FROM_EMAIL', smtp_user) or smtp_user or "no-reply@example.com"
+        for inicio in range(0, len(por_enviar), tamanio_lote):
+            grupo = por_enviar[inicio:inicio + tamanio_lote]
+            payload = {
+                "personalizations": [{
+                    "to": [{"email": email}],
+                    "subject": subject,
+                    "substitutions": {f"%{clave}%": valor for clave, valor in sustituciones.items()},
+                } for email, sustituciones in grupo],
+                "from": {"email": remitente},
+                "content": [{"type": "text/plain", "value": cuerpo}],
+            }
+            if cuerpo_html:
+                payload["content"].append({"type": "text/html", "value": cuerpo_html})
+            error, transitorio = MailService._enviar_grupo_sendgrid(cliente, payload, reintentos, espera_base, resultado)
+            if error is None:
+                resultado["enviados"].extend(email for email, _ in grupo)
+                print(f"[MailService] Lote de {len(grupo)} mails aceptado por SendGrid")
+            elif transitorio and smtp_configurado:
+                # SendGrid caído o con el circuito abierto: respaldo por SMTP, uno por uno
+                print(f"[MailService WARN] Lote de {len(grupo)} mails no enviado por SendGrid ({error}); se envía por SMTP")
+                for email, sustituciones in grupo:
+                    envio = enviar_con_respaldo([('smtp', lambda: MailService._enviar_smtp(
+                        email, MailService.aplicar_sustituciones(subject, sustituciones),
+                        MailService.aplicar_sustituciones(cuerpo, sustituciones),
+                        smtp_host, smtp_port, smtp_user, smtp_pass, remitente, smtp_tls,
+                        MailService.aplicar_sustituciones(cuerpo_html, sustituciones) if cuerpo_html else None))])
+                    if envio["enviado"]:
+                        resultado["enviados"].append(email)
+                    else:
+                        resultado["fallidos"].append((email, f"{error}; {envio['error']}"))
+            else:
+                resultado["fallidos"].extend((email, error) for email, _ in grupo)
+                print(f"[MailService ERROR] Lote de {len(grupo)} mails rechazado: {error}")
+        return resultado
+
+    @staticmethod
+    def _enviar_grupo_sendgrid(cliente, payload, reintentos, espera_base, resultado):
+        """
+        POST de un grupo con reintentos para errores transitorios, respetando el circuit breaker
+        de SendGrid. Retorna (None, False) si se aceptó, o (último error, es_transitorio).
+        """
+        circuito = obtener_circuito('sendgrid')
+        for intento in range(reintentos + 1):
+            if not circuito.permitir():
+                return f"Circuito '{circuito.nombre}' abierto", True
+            resultado["pedidos"] += 1
+            espera = None
+            try:
+                resp = cliente.enviar(payload)
+            except Exception as e:
+                error, transitorio = f"SendGrid exception: {e}", True
+            else:
+                if resp.status_code == 202:
+                    circuito.registrar_exito()
+                    return None, False
+                error = f"SendGrid returned {resp.status_code}: {resp.text}"
+                transitorio = resp.status_code == 429 or resp.status_code >= 500
+                try:
+                    espera = float(resp.headers.get('Retry-After'))
+                except (TypeError, ValueError):
+                    espera = None
+            if not transitorio:
+                circuito.registrar_exito()
+                return error, False
+            circuito.registrar_fallo()
+            if intento == reintentos:
+                return error, True
+            if espera is None:
+                espera = espera_con_jitter(intento, espera_base, MailService.ESPERA_MAXIMA_LOTE)
+            espera = min(espera, MailService.ESPERA_MAXIMA_LOTE)
+            print(f"[MailService WARN] {error}; reintento {intento + 1} de {reintentos} en {espera:.1f} s")
+            time.sleep(espera)
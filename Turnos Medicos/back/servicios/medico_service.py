@@ -15,11 +15,12 @@ class MedicoService:
     Coordina acceso a DAO y aplica reglas (baja cohesión, bajo acoplamiento).
     """
 
-    def __init__(self):
-        self.agenda_dao = AgendaDAO()
-        self.turno_dao = TurnoDAO()
-        self.medico_dao = MedicoDAO()
-        self.especialidad_dao = EspecialidadDAO()
+    def __init__(self, conn=None):
+        # conn: conexión opcional para los DAOs (ej: conexión de solo lectura de reportes)
+        self.agenda_dao = AgendaDAO(conn)
+        self.turno_dao = TurnoDAO(conn)
+        self.medico_dao = MedicoDAO(conn)
+        self.especialidad_dao = EspecialidadDAO(conn)
 
     def agregar_medico(self, nro_matricula, nombre, apellido, email, id_especialidad):
         try:
@@ -132,6 +133,20 @@ class MedicoService:
         except Exception as e:
             print(f"[ERROR DB] Fallo general de base de datos al obtener médicos por apellido: {e}")
             raise RuntimeError("Ocurrió un error técnico al consultar médicos por apellido.")
+
+    def buscar_medicos(self, texto: str, limit: int = 20):
+        """
+        Búsqueda rápida (type-ahead) de médicos activos por nombre, apellido, matrícula o email.
+        Retorna:
+            lista de Medico ordenada por relevancia (hasta `limit`)
+        """
+        if not isinstance(texto, str) or not texto.strip():
+            return []
+        try:
+            return self.medico_dao.buscar(texto, limit)
+        except Exception as e:
+            print(f"[ERROR DB] Fallo general de base de datos al buscar médicos: {e}")
+            raise RuntimeError("Ocurrió un error técnico al buscar médicos.")
     
     def actualizar_medico(self, nro_matricula:int, nombre:str =None, apellido:str =None, email:str =None, id_especialidad:int =None):
 
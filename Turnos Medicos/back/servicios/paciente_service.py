@@ -71,20 +71,27 @@ class PacienteService:
 
     def obtener_pacientes_por_apellido(self, apellido: str):
         """
-        Obtiene pacientes cuyo apellido coincida parcialmente.
-        Si el DAO no ofrece un método específico, realiza el filtrado en memoria.
+        Obtiene pacientes activos cuyo apellido coincida parcialmente (índice FTS del DAO).
         """
         try:
-            # Intentar llamar al DAO si implementa método específico
-            if hasattr(self.paciente_dao, 'obtener_por_apellido'):
-                return self.paciente_dao.obtener_por_apellido(apellido)
-            # Sino, filtrar localmente
-            todos = self.paciente_dao.obtener_todos()
-            return [p for p in todos if apellido.lower() in p.apellido.lower()]
+            return self.paciente_dao.obtener_por_apellido(apellido)
         except Exception as e:
             print(f"[ERROR DB] Fallo al obtener pacientes por apellido: {e}")
             raise RuntimeError("Ocurrió un error técnico al consultar pacientes por apellido.")
 
+    def buscar_pacientes(self, texto: str, limit: int = 20):
+        """
+        Búsqueda rápida (type-ahead) de pacientes activos por nombre, apellido, DNI o email.
+        Retorna hasta `limit` pacientes ordenados por relevancia.
+        """
+        if not isinstance(texto, str) or not texto.strip():
+            return []
+        try:
+            return self.paciente_dao.buscar(texto, limit)
+        except Exception as e:
+            print(f"[ERROR DB] Fallo al buscar pacientes: {e}")
+            raise RuntimeError("Ocurrió un error técnico al buscar pacientes.")
+
     def actualizar_paciente(self, dni, nombre=None, apellido=None, fecha_nacimiento=None, email=None, direccion=None):
         """
         Actualiza los datos de un paciente existente.
@@ -0,0 +1,192 @@
+# servicios/plantillas_mail.py
+"""
+Plantillas de los mails de turnos: confirmación, cancelación y recordatorio, cada una con
+asunto, cuerpo en texto y cuerpo en HTML.
+
+Las plantillas se escriben con la sintaxis de string.Template ($paciente, ${fecha}) y se
+compilan una sola vez, al importar el módulo, a cadenas de str.format_map: renderizar un mail
+es un format_map por parte, sin volver a analizar la plantilla (unos pocos microsegundos por
+mail, aun armando miles de recordatorios). Un campo que falta o está mal escrito se detecta al
+importar el módulo, no al enviar: los campos de cada plantilla se comparan con los que arma
+valores_turno.
+
+Los valores salen de una fila de TurnoDAO.obtener_datos_notificacion / obtener_para_recordatorio
+(turno, paciente, médico y especialidad en una sola consulta). En el HTML los valores se escapan.
+
+Uso:
+    asunto, texto, html = renderizar(CONFIRMACION, datos)
+    mensaje = armar_mail(RECORDATORIO, datos, clave_idempotencia="recordatorio:...")
+"""
+from html import escape
+from string import Template
+from datetime import datetime
+
+from modelos.mensaje_mail import MensajeMail
+from persistencia.dao.turno_dao import TurnoDAO
+
+CONFIRMACION = "confirmacion_turno"
+CANCELACION = "cancelacion_turno"
+RECORDATORIO = "recordatorio_turno"
+
+FIRMA = "Atentamente grupo 67"
+
+
+def _compilar(texto):
+    """Convierte una plantilla de string.Template en una cadena para str.format_map. Retorna (cadena, campos)."""
+    partes, campos, desde = [], set(), 0
+    for m in Template.pattern.finditer(texto):
+        partes.append(texto[desde:m.start()].replace("{", "{{").replace("}", "}}"))
+        desde = m.end()
+        if m.group("escaped") is not None:
+            partes.append("$")
+            continue
+        campo = m.group("named") or m.group("braced")
+        if campo is None:
+            raise ValueError(f"Marcador inválido en la plantilla, posición {m.start()}: {texto[m.start():m.start() + 20]!r}")
+        campos.add(campo)
+        partes.append("{" + campo + "}")
+    partes.append(texto[desde:].replace("{", "{{").replace("}", "}}"))
+    return "".join(partes), campos
+
+
+class PlantillaMail:
+    """Asunto, texto y HTML de un tipo de mail, ya compilados."""
+    __slots__ = ("tipo", "_asunto", "_texto", "_html", "campos")
+
+    def __init__(self, tipo, asunto, texto, html):
+        self.tipo = tipo
+        self._asunto, campos_asunto = _compilar(asunto)
+        self._texto, campos_texto = _compilar(texto)
+        self._html, campos_html = _compilar(html)
+        self.campos = frozenset(campos_asunto | campos_texto | campos_html)
+
+    def renderizar(self, valores):
+        """(asunto, texto, html) con `valores` (dict de str). Lanza ValueError si falta un campo."""
+        try:
+            html = self._html.format_map({clave: escape(valor) for clave, valor in valores.items()})
+            return self._asunto.format_map(valores), self._texto.format_map(valores), html
+        except KeyError as e:
+            raise ValueError(f"Falta el campo {e} para la plantilla '{self.tipo}'.")
+
+
+def _html(titulo, introduccion, filas, cierre):
+    """Fuente HTML (plantilla) de un mail con el detalle del turno en una tabla."""
+    detalle = "".join(
+        f'<tr><th style="text-align:left;padding:4px 12px 4px 0;color:#555">{etiqueta}</th>'
+        f'<td style="padding:4px 0">{valor}</td></tr>'
+        for etiqueta, valor in filas)
+    return (
+        '<!DOCTYPE html><html lang="es"><head><meta charset="utf-8"></head>'
+        '<body style="font-family:Arial,Helvetica,sans-serif;color:#222;font-size:14px">'
+        f'<h2 style="color:#1f5f8b;margin-bottom:8px">{titulo}</h2>'
+        f'<p>Hola $paciente,</p><p>{introduccion}</p>'
+        f'<table style="border-collapse:collapse;margin:8px 0 16px">{detalle}</table>'
+        f'<p>{cierre}</p><p style="color:#555">{FIRMA}</p>'
+        '</body></html>'
+    )
+
+
+def _texto(introduccion, filas, cierre):
+    detalle = "".join(f"{etiqueta}: {valor}\n" for etiqueta, valor in filas)
+    return f"Hola $paciente,\n\n{introduccion}\n\n{detalle}\n{cierre}\n{FIRMA}"
+
+
+_FILAS_TURNO = [("Fecha", "$fecha"), ("Hora", "$hora"), ("Médico", "$medico"), ("Especialidad", "$especialidad")]
+
+
+def _plantilla(tipo, asunto, titulo, introduccion, filas, cierre):
+    return PlantillaMail(tipo, asunto, _texto(introduccion, filas, cierre), _html(titulo, introduccion, filas, cierre))
+
+
+# Compiladas una sola vez, al importar el módulo
+PLANTILLAS = {
+    CONFIRMACION: _plantilla(
+        CONFIRMACION, "Confirmación de turno #$id_turno - $fecha $hora", "Turno confirmado",
+        "Su turno quedó confirmado:", _FILAS_TURNO + [("Motivo", "$motivo"), ("Observaciones", "$observaciones")],
+        "Si no puede asistir, por favor cancele el turno con anticipación."),
+    CANCELACION: _plantilla(
+        CANCELACION, "Turno cancelado - $fecha $hora", "Turno cancelado",
+        "Su turno fue cancelado:", _FILAS_TURNO,
+        "Si necesita un nuevo turno, por favor comuníquese con la clínica."),
+    RECORDATORIO: _plantilla(
+        RECORDATORIO, "Recordatorio de turno - $fecha", "Recordatorio de turno",
+        "Le recordamos su turno:", _FILAS_TURNO + [("Motivo", "$motivo")],
+        "Si no puede asistir, por favor avise a la clínica para liberar el turno."),
+}
+
+
+def obtener_plantilla(tipo):
+    try:
+        return PLANTILLAS[tipo]
+    except KeyError:
+        raise ValueError(f"No existe una plantilla de mail '{tipo}'. Opciones: {', '.join(PLANTILLAS)}.")
+
+
+def _fecha_y_hora(inicio):
+    """('dd/mm/aaaa', 'hh:mm'). Las fechas de la base ('aaaa-mm-dd hh:mm:ss') se cortan sin strptime."""
+    if isinstance(inicio, str):
+        if len(inicio) < 16 or inicio[4] != "-" or inicio[10] != " ":
+            inicio = datetime.strptime(inicio, "%Y-%m-%d %H:%M:%S")
+        else:
+            return f"{inicio[8:10]}/{inicio[5:7]}/{inicio[0:4]}", inicio[11:16]
+    if not isinstance(inicio, datetime):
+        raise ValueError("El turno no tiene fecha y hora de inicio.")
+    return inicio.strftime("%d/%m/%Y"), inicio.strftime("%H:%M")
+
+
+def valores_turno(datos):
+    """Valores de las plantillas a partir de una fila de TurnoDAO.obtener_datos_notificacion."""
+    fecha, hora = _fecha_y_hora(datos.get("fecha_hora_inicio"))
+    return {
+        "id_turno": str(datos.get("id_turno") or ""),
+        "paciente": f"{datos.get('nombre_paciente') or ''} {datos.get('apellido_paciente') or ''}".strip(),
+        "fecha": fecha,
+        "hora": hora,
+        "medico": f"{datos.get('nombre_medico') or ''} {datos.get('apellido_medico') or ''}".strip()
+                  or f"matrícula {datos.get('nro_matricula_medico')}",
+        "especialidad": datos.get("especialidad") or "-",
+        "motivo": datos.get("motivo") or "-",
+        "observaciones": datos.get("observaciones") or "-",
+    }
+
+
+def datos_de_turno(turno, dao=None):
+    """
+    Fila de obtener_datos_notificacion para `turno` (un Turno o su id). Si ya es un dict, se
+    devuelve tal cual. Lanza ValueError si el turno no existe o no tiene paciente.
+    """
+    if isinstance(turno, dict):
+        return turno
+    id_turno = getattr(turno, "id_turno", turno)
+    datos = (dao or TurnoDAO()).obtener_datos_notificacion(id_turno)
+    if not datos:
+        raise ValueError(f"El turno {id_turno} no existe o no tiene un paciente asignado.")
+    return datos
+
+
+# Campos que arma valores_turno (y que pueden usar las plantillas)
+CAMPOS_TURNO = frozenset(valores_turno({"fecha_hora_inicio": "2000-01-01 00:00:00"}))
+
+
+def verificar_campos(plantillas, campos):
+    """Lanza ValueError si alguna plantilla usa un campo que no está en `campos`."""
+    for plantilla in plantillas.values():
+        desconocidos = plantilla.campos - campos
+        if desconocidos:
+            raise ValueError(f"La plantilla '{plantilla.tipo}' usa campos que no existen: "
+                             f"{', '.join(sorted(desconocidos))}.")
+
+
+verificar_campos(PLANTILLAS, CAMPOS_TURNO)
+
+
+def renderizar(tipo, datos):
+    """(asunto, texto, html) del mail `tipo` para una fila de obtener_datos_notificacion."""
+    return obtener_plantilla(tipo).renderizar(valores_turno(datos))
+
+
+def armar_mail(tipo, datos, clave_idempotencia=None):
+    """MensajeMail `tipo` para el paciente del turno (lanza ValueError si no tiene email)."""
+    asunto, texto, html = renderizar(tipo, datos)
+    return MensajeMail(tipo=tipo, destinatario=datos.get("email"), asunto=asunto, cuerpo=texto,
+                       cuerpo_html=html, id_turno=datos.get("id_turno"), clave_idempotencia=clave_idempotencia)
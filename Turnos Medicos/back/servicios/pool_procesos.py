@@ -0,0 +1,33 @@
+# servicios/pool_procesos.py
+"""
+Pools de procesos de los servicios que dibujan en paralelo (gráficos de reportes, PDFs de recetas).
+
+Los procesos se crean con "spawn" y no con fork: la aplicación tiene otros hilos (cola de
+reportes, workers de mails, log) y un proceso hecho con fork podría heredar uno de sus locks
+tomado y quedar bloqueado. Por eso lo que se ejecuta en el pool tiene que ser una función de
+módulo, que el proceso nuevo importa.
+"""
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def resolver_workers(workers, variable):
+    """Cantidad de procesos del pool: parámetro, variable de entorno `variable` o núcleos disponibles."""
+    if workers is None:
+        valor = os.getenv(variable)
+        if valor:
+            try:
+                workers = int(valor)
+            except ValueError:
+                print(f"[WARN] {variable} inválido ({valor}), se usa la cantidad de núcleos.")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if not isinstance(workers, int) or workers < 1:
+        raise ValueError("La cantidad de workers debe ser un entero mayor o igual a 1.")
+    return workers
+
+
+def crear_pool(workers):
+    """ProcessPoolExecutor de `workers` procesos creados con "spawn"."""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
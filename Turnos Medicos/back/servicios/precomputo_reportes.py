@@ -0,0 +1,125 @@
+# servicios/precomputo_reportes.py
+"""
+Precómputo nocturno de los reportes estándar del mes anterior: listado de turnos de cada
+médico activo, pacientes atendidos y asistencias vs inasistencias. Los PDFs se guardan en
+salidas/reportes/precomputados/<AAAA-MM>/ y se registran en el índice indice.json de esa
+carpeta; durante el día ReporteService devuelve directamente el PDF precomputado cuando
+se pide el mismo reporte para ese período.
+
+El reporte de cantidad de turnos por especialidad es histórico (no depende del período),
+así que no se indexa: se genera igual para dejar cargado el cache de reportes y el primer
+pedido del día se resuelve sin volver a dibujar los gráficos.
+
+Ejecución (desde la raíz del repo), por ejemplo con cron a las 2 AM del día 1:
+    python "./Turnos Medicos/back/servicios/precomputo_reportes.py"
+    python "./Turnos Medicos/back/servicios/precomputo_reportes.py" --mes 2025-11
+"""
+import os
+import sys
+import shutil
+import argparse
+from datetime import date, datetime, timedelta
+
+if __name__ == "__main__":
+    _servicios = os.path.dirname(os.path.abspath(__file__))
+    for _ruta in (os.path.dirname(_servicios), _servicios):
+        if _ruta not in sys.path:
+            sys.path.insert(0, _ruta)
+
+from reporte_service import ReporteService
+
+
+def periodo_mes_anterior(hoy=None):
+    """Primer y último día del mes anterior a `hoy` (por defecto, la fecha actual)."""
+    hoy = hoy or date.today()
+    fin = hoy.replace(day=1) - timedelta(days=1)
+    return fin.replace(day=1), fin
+
+
+def periodo_de_mes(mes):
+    """Primer y último día del mes indicado como 'AAAA-MM'."""
+    try:
+        inicio = datetime.strptime(mes, "%Y-%m").date()
+    except ValueError:
+        raise ValueError("El mes debe tener el formato AAAA-MM.")
+    siguiente = (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return inicio, siguiente - timedelta(days=1)
+
+
+def precomputar_reportes(fecha_inicio, fecha_fin, reporte_service=None):
+    """
+    Genera los reportes estándar del período y los registra en el índice de precomputados.
+    Un reporte que falla no corta el proceso (se informa y se sigue con el resto).
+    Retorna (cantidad de reportes generados, cantidad de errores).
+    """
+    servicio = reporte_service or ReporteService()
+    destino = os.path.join(servicio.dir_precomputados, fecha_inicio.strftime("%Y-%m"))
+    os.makedirs(destino, exist_ok=True)
+
+    trabajos = [
+        (("pacientes_atendidos",),
+         lambda: servicio.reporte_pacientes_atendidos_en_un_periodo(fecha_inicio, fecha_fin)),
+        (("asistencias",),
+         lambda: servicio.asistencias_vs_inasistencias_de_pacientes(fecha_inicio, fecha_fin)),
+    ]
+    try:
+        medicos = servicio.medico_service.obtener_medicos()
+    except RuntimeError as e:
+        print(f"[ERROR] No se pudieron obtener los médicos para precomputar los listados: {e}")
+        medicos = []
+    for medico in medicos:
+        trabajos.append((
+            ("turnos_por_medico", medico.nro_matricula),
+            lambda nro=medico.nro_matricula: servicio.listado_turnos_por_medico_en_un_periodo(nro, fecha_inicio, fecha_fin),
+        ))
+
+    entradas = {}
+    errores = 0
+    for (tipo, *parametros), generar in trabajos:
+        try:
+            # La huella se toma antes de generar: si los datos cambian en el medio, no coincide
+            # con la que se lee al pedir el reporte y se regenera en vez de servir el PDF viejo
+            huella = servicio.huella_precomputado(tipo, fecha_inicio, fecha_fin, *parametros)
+            ruta = generar()
+            ruta_final = os.path.join(destino, os.path.basename(ruta))
+            if os.path.abspath(ruta) != os.path.abspath(ruta_final):  # ya era el precomputado vigente
+                shutil.copyfile(ruta, ruta_final)
+        except (ValueError, RuntimeError, OSError) as e:
+            # ValueError: sin datos en el período (por ejemplo, asistencias sin turnos)
+            print(f"[WARN] No se precomputó {tipo} {parametros}: {e}")
+            errores += 1
+            continue
+        clave = servicio.clave_precomputado(tipo, fecha_inicio, fecha_fin, *parametros)
+        entradas[clave] = {"ruta": ruta_final, "huella": huella,
+                           "generado": datetime.now().isoformat(timespec="seconds")}
+
+    if entradas:
+        servicio.registrar_precomputados(entradas)
+
+    try:
+        servicio.reporte_cantidad_turnos_por_especialidad()
+    except RuntimeError as e:
+        print(f"[WARN] No se precomputó cantidad_por_especialidad: {e}")
+        errores += 1
+
+    return len(entradas), errores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mes", help="mes a precomputar (AAAA-MM); por defecto, el mes anterior")
+    parser.add_argument("--workers", type=int, default=None, help="procesos para renderizar gráficos")
+    args = parser.parse_args(argv)
+
+    fecha_inicio, fecha_fin = periodo_de_mes(args.mes) if args.mes else periodo_mes_anterior()
+    servicio = ReporteService(workers=args.workers)
+    try:
+        generados, errores = precomputar_reportes(fecha_inicio, fecha_fin, servicio)
+    finally:
+        servicio.cerrar()
+    print(f"[OK] Reportes precomputados de {fecha_inicio} a {fecha_fin}: {generados} generados, {errores} con error.")
+    return 1 if errores and not generados else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
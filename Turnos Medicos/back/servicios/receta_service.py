@@ -11,10 +11,12 @@ from persistencia.dao.historial_clinico_dao import HistorialClinicoDAO
 from persistencia.persistencia_errores import IntegridadError, DatabaseError
 from modelos.receta import Receta
 from modelos.historial_clinico import HistorialClinico
+from pool_procesos import resolver_workers, crear_pool
 
 try:
     from reportlab.lib.pagesizes import A4
     from reportlab.pdfgen import canvas
+    from reportlab.lib.utils import ImageReader
 
     REPORTLAB_AVAILABLE = True
 except Exception:
@@ -88,6 +90,31 @@ class RecetaService:
 
         return receta, destino
 
+    def buscar_recetas(self, texto, pagina=1, por_pagina=20, marcas=("<b>", "</b>")):
+        """
+        Busca recetas por medicamento o detalle (texto libre, por prefijo de palabra).
+        Retorna un diccionario con la página pedida:
+            {"total", "pagina", "por_pagina", "resultados": [{"receta", "fragmento"}]}
+        donde `fragmento` es el texto coincidente con los términos resaltados entre `marcas`.
+        """
+        if not isinstance(pagina, int) or pagina < 1:
+            raise ValueError("La página debe ser un entero mayor o igual a 1.")
+        if not isinstance(por_pagina, int) or not (1 <= por_pagina <= 200):
+            raise ValueError("La cantidad por página debe estar entre 1 y 200.")
+
+        resultado = {"total": 0, "pagina": pagina, "por_pagina": por_pagina, "resultados": []}
+        if not isinstance(texto, str) or not texto.strip():
+            return resultado
+
+        try:
+            resultado["total"] = self.receta_dao.contar_busqueda(texto)
+            encontradas = self.receta_dao.buscar(texto, por_pagina, (pagina - 1) * por_pagina, marcas)
+        except Exception as e:
+            raise RuntimeError(f"Fallo técnico al buscar recetas: {e}")
+
+        resultado["resultados"] = [{"receta": r, "fragmento": f} for r, f in encontradas]
+        return resultado
+
     def _ensure_historial(self, dni):
         try:
             if not self.historial_dao.obtener_por_id(dni):
@@ -99,28 +126,44 @@ class RecetaService:
         paciente = self._obtener_paciente(consulta.dni_paciente)
         medico, especialidad = self._obtener_medico_y_especialidad(consulta.nro_matricula_medico)
 
-        medicamentos_list = self._parse_medicamentos(receta.medicamentos)
-
+        return self._payload_desde_datos({
+            "fecha_emision": receta.fecha_emision,
+            "medicamentos": receta.medicamentos,
+            "detalle": receta.detalle,
+            "id_consulta": consulta.id_consulta,
+            "diagnostico": consulta.diagnostico,
+            "dni": paciente.dni,
+            "nombre_paciente": paciente.nombre,
+            "apellido_paciente": paciente.apellido,
+            "nro_matricula": medico.nro_matricula,
+            "nombre_medico": medico.nombre,
+            "apellido_medico": medico.apellido,
+            "especialidad": especialidad,
+        })
+
+    def _payload_desde_datos(self, datos):
+        """Arma el contenido del PDF a partir de los datos planos de la receta (ver RecetaDAO.obtener_datos_emision)."""
+        fecha_emision = datos["fecha_emision"]
         return {
             "info_clinica": self.INFO_CLINICA,
             "info_medico": {
-                "nombre_completo": f"{medico.nombre} {medico.apellido}",
-                "nro_matricula": medico.nro_matricula,
-                "especialidad": especialidad or "No registrada",
+                "nombre_completo": f"{datos['nombre_medico']} {datos['apellido_medico']}",
+                "nro_matricula": datos["nro_matricula"],
+                "especialidad": datos["especialidad"] or "No registrada",
             },
             "info_paciente": {
-                "nombre_completo": f"{paciente.nombre} {paciente.apellido}",
-                "dni": paciente.dni,
+                "nombre_completo": f"{datos['nombre_paciente']} {datos['apellido_paciente']}",
+                "dni": datos["dni"],
             },
             "receta": {
-                "id_consulta": consulta.id_consulta,
-                "fecha_emision": receta.fecha_emision.strftime("%Y-%m-%d")
-                if isinstance(receta.fecha_emision, (datetime, date))
-                else str(receta.fecha_emision),
-                "diagnostico_principal": consulta.diagnostico,
-                "medicamentos": medicamentos_list,
+                "id_consulta": datos["id_consulta"],
+                "fecha_emision": fecha_emision.strftime("%Y-%m-%d")
+                if isinstance(fecha_emision, (datetime, date))
+                else str(fecha_emision),
+                "diagnostico_principal": datos["diagnostico"],
+                "medicamentos": self._parse_medicamentos(datos["medicamentos"]),
                 "validez_dias": 30,
-                "observaciones_adicionales": receta.detalle or "Sin observaciones adicionales.",
+                "observaciones_adicionales": datos["detalle"] or "Sin observaciones adicionales.",
             },
         }
 
@@ -172,107 +215,194 @@ class RecetaService:
         return meds
 
     def _emit_pdf(self, payload, destino):
-        if not REPORTLAB_AVAILABLE:
-            raise RuntimeError(
-                "No se pudo generar el PDF porque la librería 'reportlab' no está instalada."
-            )
+        _dibujar_receta(payload, destino, self.logo_path)
+
+    def emitir_lote(self, ids_recetas, output_dir=None, workers=None):
+        """
+        Emite (o reimprime) el PDF de varias recetas. Los datos de todas se leen con una
+        consulta con joins por bloque de ids y los PDFs se dibujan en un pool de `workers`
+        procesos (parámetro, variable RECETAS_WORKERS o núcleos disponibles; 1 = en serie).
+        Cada proceso decodifica el logo una sola vez para todo el lote (ver pool_procesos.py).
+        Retorna {"rutas": {id_receta: ruta}, "errores": {id_receta: mensaje}}.
+        """
+        ids = list(dict.fromkeys(ids_recetas))
+        try:
+            datos = self.receta_dao.obtener_datos_emision(ids)
+        except Exception as e:
+            raise RuntimeError(f"Fallo técnico al obtener los datos de las recetas: {e}")
 
-        receta = payload["receta"]
-        clinica = payload["info_clinica"]
-        medico = payload["info_medico"]
-        paciente = payload["info_paciente"]
-
-        c = canvas.Canvas(destino, pagesize=A4)
-        width, height = A4
-        y = height - 40
-
-        if os.path.exists(self.logo_path):
-            try:
-                c.drawImage(
-                    self.logo_path,
-                    width - 150,
-                    height - 130,
-                    width=110,
-                    preserveAspectRatio=True,
-                    mask='auto'
-                )
-            except Exception:
-                pass
-
-        c.setFont("Helvetica-Bold", 15)
-        c.drawString(40, y, clinica["nombre"])
-        c.setFont("Helvetica", 10)
-        y -= 15
-        c.drawString(40, y, clinica["direccion"])
-        y -= 12
-        c.drawString(40, y, f"Tel: {clinica['telefono']} - {clinica['sitio_web']}")
-
-        y -= 30
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(40, y, "Datos del Paciente")
-        c.setFont("Helvetica", 10)
-        y -= 15
-        c.drawString(40, y, f"Nombre: {paciente['nombre_completo']}")
-        y -= 12
-        c.drawString(40, y, f"DNI: {paciente['dni']}")
-
-        y -= 25
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(40, y, "Profesional")
-        c.setFont("Helvetica", 10)
-        y -= 15
-        c.drawString(40, y, f"{medico['nombre_completo']} - Matrícula {medico['nro_matricula']}")
-        y -= 12
-        c.drawString(40, y, f"Especialidad: {medico['especialidad']}")
-
-        y -= 25
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(40, y, "Diagnóstico principal")
-        c.setFont("Helvetica", 10)
-        y -= 15
-        y = self._draw_wrapped_text(c, receta["diagnostico_principal"], y, width)
-
-        y -= 10
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(40, y, "Medicamentos")
-        y -= 15
-
-        c.setFont("Helvetica", 10)
-        for idx, med in enumerate(receta["medicamentos"], start=1):
-            if y < 100:
-                c.showPage()
-                y = height - 40
-                c.setFont("Helvetica", 10)
-            c.drawString(40, y, f"{idx}. {med['nombre_generico']}")
-            y -= 12
-            for label, value in [
-                ("Nombre comercial", med.get("nombre_comercial") or "-"),
-                ("Presentación", med.get("presentacion") or "-"),
-                ("Cantidad", med.get("cantidad") or "-"),
-                ("Posología", med.get("posologia") or "-"),
-            ]:
-                y = self._draw_wrapped_text(c, f"{label}: {value}", y, width, indent=15)
-            y -= 5
-
-        y -= 10
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(40, y, "Observaciones")
-        c.setFont("Helvetica", 10)
-        y -= 15
-        y = self._draw_wrapped_text(c, receta["observaciones_adicionales"], y, width)
-
-        y -= 25
-        c.drawString(
-            40, y, f"Validez: {receta['validez_dias']} días - Emitida el {receta['fecha_emision']}"
+        output_dir = output_dir or self._default_output
+        os.makedirs(output_dir, exist_ok=True)
+
+        errores = {id_receta: f"No existe la receta #{id_receta}." for id_receta in ids if id_receta not in datos}
+        trabajos = []
+        for id_receta in ids:
+            if id_receta in datos:
+                fila = datos[id_receta]
+                filename = f"receta_consulta_{fila['id_consulta']}_receta_{id_receta}.pdf"
+                trabajos.append((id_receta, self._payload_desde_datos(fila), os.path.join(output_dir, filename)))
+
+        workers = resolver_workers(workers, "RECETAS_WORKERS")
+        argumentos = [(payload, destino, self.logo_path) for _, payload, destino in trabajos]
+        if workers > 1 and len(trabajos) > 1:
+            with crear_pool(workers) as pool:
+                resultados = list(pool.map(_dibujar_receta_seguro, argumentos,
+                                           chunksize=max(1, len(argumentos) // (workers * 4))))
+        else:
+            resultados = [_dibujar_receta_seguro(args) for args in argumentos]
+
+        rutas = {}
+        for (id_receta, _, destino), error in zip(trabajos, resultados):
+            if error:
+                print(f"[ERROR PDF] No se pudo emitir la receta #{id_receta}: {error}")
+                errores[id_receta] = error
+            else:
+                rutas[id_receta] = destino
+        return {"rutas": rutas, "errores": errores}
+
+    def emitir_lote_por_fecha(self, fecha_inicio, fecha_fin=None, output_dir=None, workers=None):
+        """Reimprime todas las recetas emitidas en un día (o en un rango de fechas). Ver emitir_lote."""
+        try:
+            ids = self.receta_dao.obtener_ids_por_fecha_emision(fecha_inicio, fecha_fin or fecha_inicio)
+        except Exception as e:
+            raise RuntimeError(f"Fallo técnico al obtener las recetas del período: {e}")
+        return self.emitir_lote(ids, output_dir=output_dir, workers=workers)
+
+
+# Logos ya decodificados en este proceso: {ruta: ImageReader}
+_logos = {}
+
+
+def _cargar_logo(logo_path):
+    """
+    Logo decodificado una única vez por proceso (None si no existe o no se puede leer).
+    Solo se guarda si se pudo leer: si el archivo aparece después, se usa en la próxima receta.
+    """
+    logo = _logos.get(logo_path)
+    if logo is not None or not os.path.exists(logo_path):
+        return logo
+    try:
+        logo = ImageReader(logo_path)
+    except Exception:
+        return None
+    _logos[logo_path] = logo
+    return logo
+
+
+def _dibujar_receta_seguro(argumentos):
+    """Versión para el pool de procesos: retorna None si salió bien o el mensaje de error."""
+    try:
+        _dibujar_receta(*argumentos)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def _dibujar_receta(payload, destino, logo_path):
+    """Dibuja el PDF de una receta. Es función de módulo para poder ejecutarse en el pool de procesos."""
+    if not REPORTLAB_AVAILABLE:
+        raise RuntimeError(
+            "No se pudo generar el PDF porque la librería 'reportlab' no está instalada."
         )
 
-        c.setFont("Helvetica", 9)
-        c.drawRightString(width - 40, 30, "Documento generado automáticamente por Clínica UTN")
-        c.save()
+    receta = payload["receta"]
+    clinica = payload["info_clinica"]
+    medico = payload["info_medico"]
+    paciente = payload["info_paciente"]
+
+    c = canvas.Canvas(destino, pagesize=A4)
+    width, height = A4
+    y = height - 40
+
+    logo = _cargar_logo(logo_path)
+    if logo is not None:
+        try:
+            c.drawImage(
+                logo,
+                width - 150,
+                height - 130,
+                width=110,
+                preserveAspectRatio=True,
+                mask='auto'
+            )
+        except Exception:
+            pass
 
-    def _draw_wrapped_text(self, canvas_obj, text, y, width, indent=0):
-        max_chars = 95
-        for line in wrap(text or "", width=max_chars):
-            canvas_obj.drawString(40 + indent, y, line)
-            y -= 12
-        return y
+    c.setFont("Helvetica-Bold", 15)
+    c.drawString(40, y, clinica["nombre"])
+    c.setFont("Helvetica", 10)
+    y -= 15
+    c.drawString(40, y, clinica["direccion"])
+    y -= 12
+    c.drawString(40, y, f"Tel: {clinica['telefono']} - {clinica['sitio_web']}")
+
+    y -= 30
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(40, y, "Datos del Paciente")
+    c.setFont("Helvetica", 10)
+    y -= 15
+    c.drawString(40, y, f"Nombre: {paciente['nombre_completo']}")
+    y -= 12
+    c.drawString(40, y, f"DNI: {paciente['dni']}")
+
+    y -= 25
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(40, y, "Profesional")
+    c.setFont("Helvetica", 10)
+    y -= 15
+    c.drawString(40, y, f"{medico['nombre_completo']} - Matrícula {medico['nro_matricula']}")
+    y -= 12
+    c.drawString(40, y, f"Especialidad: {medico['especialidad']}")
+
+    y -= 25
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(40, y, "Diagnóstico principal")
+    c.setFont("Helvetica", 10)
+    y -= 15
+    y = _draw_wrapped_text(c, receta["diagnostico_principal"], y, width)
+
+    y -= 10
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(40, y, "Medicamentos")
+    y -= 15
+
+    c.setFont("Helvetica", 10)
+    for idx, med in enumerate(receta["medicamentos"], start=1):
+        if y < 100:
+            c.showPage()
+            y = height - 40
+            c.setFont("Helvetica", 10)
+        c.drawString(40, y, f"{idx}. {med['nombre_generico']}")
+        y -= 12
+        for label, value in [
+            ("Nombre comercial", med.get("nombre_comercial") or "-"),
+            ("Presentación", med.get("presentacion") or "-"),
+            ("Cantidad", med.get("cantidad") or "-"),
+            ("Posología", med.get("posologia") or "-"),
+        ]:
+            y = _draw_wrapped_text(c, f"{label}: {value}", y, width, indent=15)
+        y -= 5
+
+    y -= 10
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(40, y, "Observaciones")
+    c.setFont("Helvetica", 10)
+    y -= 15
+    y = _draw_wrapped_text(c, receta["observaciones_adicionales"], y, width)
+
+    y -= 25
+    c.drawString(
+        40, y, f"Validez: {receta['validez_dias']} días - Emitida el {receta['fecha_emision']}"
+    )
+
+    c.setFont("Helvetica", 9)
+    c.drawRightString(width - 40, 30, "Documento generado automáticamente por Clínica UTN")
+    c.save()
+
+
+def _draw_wrapped_text(canvas_obj, text, y, width, indent=0):
+    max_chars = 95
+    for line in wrap(text or "", width=max_chars):
+        canvas_obj.drawString(40 + indent, y, line)
+        y -= 12
+    return y
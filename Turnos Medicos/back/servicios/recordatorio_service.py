@@ -0,0 +1,137 @@
+# servicios/recordatorio_service.py
+"""
+Recordatorios de turnos por mail. Busca, con una sola consulta, los turnos programados del
+día siguiente (o de las próximas N horas) con el email del paciente y el nombre del médico,
+arma un mensaje por turno (texto y HTML, con la plantilla de plantillas_mail.py) y los encola
+en MailOutbox con una clave de idempotencia ('recordatorio:<id_turno>:<fecha y hora>:<dni>'):
+correr el job dos veces no encola ni envía dos veces el mismo recordatorio, y si el turno se
+cancela y se vuelve a dar a otro paciente, el nuevo paciente recibe el suyo (al cancelar,
+TurnoService descarta el recordatorio pendiente). Después los envía en lotes
+(DespachadorMails.enviar_en_lote).
+
+Ejecución (desde la raíz del repo), por ejemplo con cron todos los días a las 18:
+    python "./Turnos Medicos/back/servicios/recordatorio_service.py"
+    python "./Turnos Medicos/back/servicios/recordatorio_service.py" --horas 3
+    python "./Turnos Medicos/back/servicios/recordatorio_service.py" --solo-encolar
+"""
+import os
+import sys
+import argparse
+from datetime import datetime, timedelta
+
+if __name__ == "__main__":
+    _servicios = os.path.dirname(os.path.abspath(__file__))
+    for _ruta in (os.path.dirname(_servicios), _servicios):
+        if _ruta not in sys.path:
+            sys.path.insert(0, _ruta)
+
+from persistencia.db_connection import DBConnection
+from persistencia.dao.turno_dao import TurnoDAO
+from persistencia.dao.mail_outbox_dao import MailOutboxDAO
+from persistencia.persistencia_errores import DatabaseError
+from mail_outbox import DespachadorMails
+from plantillas_mail import RECORDATORIO, armar_mail
+
+TIPO_RECORDATORIO = RECORDATORIO
+
+
+def periodo_recordatorio(horas=None, ahora=None):
+    """
+    Rango [desde, hasta) de los turnos a recordar: el día siguiente completo o, si se
+    indica `horas`, las próximas `horas` horas a partir de `ahora`.
+    """
+    ahora = ahora or datetime.now()
+    if horas is not None:
+        if horas <= 0:
+            raise ValueError("La cantidad de horas debe ser mayor a 0.")
+        return ahora, ahora + timedelta(hours=horas)
+    manana = datetime.combine(ahora.date() + timedelta(days=1), datetime.min.time())
+    return manana, manana + timedelta(days=1)
+
+
+def clave_recordatorio(datos):
+    return f"recordatorio:{datos['id_turno']}:{datos['fecha_hora_inicio']}:{datos['dni']}"
+
+
+def armar_recordatorio(datos):
+    """MensajeMail de recordatorio a partir de una fila de TurnoDAO.obtener_para_recordatorio."""
+    return armar_mail(RECORDATORIO, datos, clave_idempotencia=clave_recordatorio(datos))
+
+
+class RecordatorioService:
+    def __init__(self, conn=None, despachador=None):
+        # Conexión propia: el job puede correr en un hilo aparte de la interfaz (se cierra con cerrar())
+        self._conn_propia = None if conn else DBConnection().nueva_conexion()
+        conn = conn or self._conn_propia
+        self.turno_dao = TurnoDAO(conn)
+        self.mail_outbox_dao = MailOutboxDAO(conn)
+        self.despachador = despachador or DespachadorMails(workers=1)
+
+    def cerrar(self):
+        """Cierra la conexión propia, si se abrió una (con `conn` la cierra quien la pasó)."""
+        if self._conn_propia is not None:
+            self._conn_propia.close()
+            self._conn_propia = None
+
+    def encolar_recordatorios(self, horas=None, ahora=None):
+        """
+        Encola un recordatorio por cada turno programado del período (ver periodo_recordatorio).
+        Retorna {"turnos", "encolados", "ya_encolados", "invalidos"}.
+        """
+        desde, hasta = periodo_recordatorio(horas, ahora)
+        try:
+            turnos = self.turno_dao.obtener_para_recordatorio(desde, hasta)
+        except Exception as e:
+            print(f"[ERROR DB] No se pudieron obtener los turnos a recordar: {e}")
+            raise RuntimeError("No se pudieron obtener los turnos a recordar.")
+
+        mensajes, invalidos = [], 0
+        for datos in turnos:
+            try:
+                mensajes.append(armar_recordatorio(datos))
+            except ValueError as e:
+                invalidos += 1
+                print(f"[WARN] No se encoló el recordatorio del turno {datos['id_turno']}: {e}")
+        try:
+            encolados = self.mail_outbox_dao.encolar_sin_repetir(mensajes) if mensajes else 0
+        except DatabaseError as e:
+            print(f"[ERROR DB] No se pudieron encolar los recordatorios: {e}")
+            raise RuntimeError("No se pudieron encolar los recordatorios.")
+        return {"turnos": len(turnos), "encolados": encolados,
+                "ya_encolados": len(mensajes) - encolados, "invalidos": invalidos}
+
+    def enviar_recordatorios(self, horas=None, ahora=None, enviar=True):
+        """
+        Encola los recordatorios del período y, si `enviar`, envía en lotes todos los
+        recordatorios pendientes. Retorna el resumen de encolar_recordatorios más
+        "enviados" y "fallidos".
+        """
+        resumen = self.encolar_recordatorios(horas, ahora)
+        resumen.update({"enviados": 0, "fallidos": 0})
+        if enviar:
+            envio = self.despachador.enviar_en_lote(tipo=TIPO_RECORDATORIO, dao=self.mail_outbox_dao)
+            resumen["enviados"], resumen["fallidos"] = envio["enviados"], envio["fallidos"]
+        return resumen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--horas", type=int, default=None,
+                        help="recordar los turnos de las próximas N horas; por defecto, los de mañana")
+    parser.add_argument("--solo-encolar", action="store_true",
+                        help="solo encolar (los envían los workers de la aplicación)")
+    args = parser.parse_args(argv)
+
+    servicio = RecordatorioService()
+    try:
+        resumen = servicio.enviar_recordatorios(args.horas, enviar=not args.solo_encolar)
+    finally:
+        servicio.cerrar()
+    print(f"[OK] Recordatorios: {resumen['turnos']} turnos, {resumen['encolados']} encolados "
+          f"({resumen['ya_encolados']} ya estaban encolados), {resumen['enviados']} enviados, "
+          f"{resumen['fallidos']} con error.")
+    return 1 if resumen["fallidos"] and not resumen["enviados"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
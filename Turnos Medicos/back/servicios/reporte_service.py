@@ -1,32 +1,266 @@
 import os
+import json
+import hashlib
+import tempfile
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Flowable
 from reportlab.platypus.tables import Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 
-import matplotlib.pyplot as plt
 from io import BytesIO
 
-from persistencia.dao.turno_dao import TurnoDAO
-from persistencia.dao.medico_dao import MedicoDAO
+import threading
+from contextlib import contextmanager
+
+from persistencia.db_connection import DBConnection, transaccion_lectura
+from persistencia.cache_consultas import CacheConsultas
 from turno_service import TurnoService
 from medico_service import MedicoService
+from graficos import renderizar_grafico
+from cache_reportes import CacheReportes
+from pool_procesos import resolver_workers, crear_pool
 
 from datetime import datetime, date
 
+class _TurnosEnBloques(Flowable):
+    """
+    Flowable con los turnos del listado que arma la tabla de cada bloque recién cuando reportlab
+    la ubica en la página (split). Los bloques se van leyendo del iterador de la base, así en
+    memoria hay un solo bloque y una sola tabla por vez, y no el documento ni los turnos enteros.
+    Usa solo el protocolo de los Flowable (wrap / split / draw).
+    """
+
+    def __init__(self, bloque, bloques, armar_tabla, al_armar=None, procesados=0):
+        super().__init__()
+        self._bloque = bloque
+        self._bloques = bloques
+        self._armar_tabla = armar_tabla
+        self._al_armar = al_armar
+        self._procesados = procesados
+
+    def wrap(self, ancho, alto):
+        # Pide más lugar del que hay, para que reportlab lo parta (split) y arme la tabla
+        return ancho, alto + 1
+
+    def split(self, ancho, alto):
+        tabla = self._armar_tabla(self._bloque)
+        if tabla.wrap(ancho, alto)[1] <= alto:
+            partes = [tabla]
+        else:
+            # Lo que entre en esta página; el resto de la tabla (con el encabezado) va después.
+            # Si no entra nada, el bloque queda en este Flowable y se prueba en la página siguiente
+            partes = tabla.split(ancho, alto)
+            if not partes:
+                return []
+        procesados = self._procesados + len(self._bloque)
+        if self._al_armar is not None:
+            self._al_armar(procesados)
+        siguiente = next(self._bloques, None)
+        if siguiente:
+            partes.append(_TurnosEnBloques(siguiente, self._bloques, self._armar_tabla, self._al_armar, procesados))
+        return partes
+
+    def draw(self):
+        pass
+
 class ReporteService:
-    def __init__(self):
-        self.turno_service = TurnoService()
-        self.medico_service = MedicoService()
+    # Filas por tabla en los listados: cada bloque de turnos leído de la base es una tabla propia
+    FILAS_POR_TABLA = 40
+    # Reportes que se precomputan: tipo del cache de reportes y tablas de las que salen sus datos
+    PRECOMPUTABLES = {
+        "turnos_por_medico": ("listado_turnos_por_medico", ("Turno", "Medico")),
+        "pacientes_atendidos": ("pacientes_atendidos", ("Turno", "Paciente")),
+        "asistencias": ("asistencias_vs_inasistencias", ("Turno",)),
+    }
+
+    def __init__(self, workers=None, directorio=None):
+        # Conexión de solo lectura propia: los reportes no comparten transacción con las
+        # escrituras del front y cada reporte lee una foto consistente de la base.
+        self._conn_lectura = DBConnection().conexion_lectura()
+        self._lock_lectura = threading.RLock()
+        self.turno_service = TurnoService(self._conn_lectura)
+        self.medico_service = MedicoService(self._conn_lectura)
+        # directorio: carpeta de salida (por defecto back/salidas), con reportes/ y cache/ adentro
         self._root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-        self._report_dir = os.path.join(self._root, "salidas", "reportes")
+        salidas = directorio or os.path.join(self._root, "salidas")
+        self._report_dir = os.path.join(salidas, "reportes")
         os.makedirs(self._report_dir, exist_ok=True)
+        # Reportes de meses cerrados generados de noche (ver precomputo_reportes.py)
+        self.dir_precomputados = os.path.join(self._report_dir, "precomputados")
+        self._indice_precomputados = (None, {})
+        # {clave del índice: (huella, versión de las tablas)} de los precomputados ya comparados
+        self._precomputados_validados = {}
+        # Gráficos y PDFs ya generados, indexados por hash de los datos de entrada
+        self._cache = CacheReportes(os.path.join(salidas, "cache"))
+        # Procesos para renderizar gráficos en paralelo (1 = sin pool, todo en este proceso)
+        self.workers = resolver_workers(workers, "REPORTES_WORKERS")
+        self._pool = None
+        self._lock_pool = threading.Lock()
+
+    def _renderizar_graficos(self, specs):
+        """
+        Retorna los gráficos de `specs` como PNG (bytes), en el mismo orden.
+        Los que ya están en el cache no se vuelven a renderizar.
+        """
+        claves = [self._cache.clave("grafico", spec) for spec in specs]
+        imagenes = [self._cache.obtener(clave, ".png") for clave in claves]
+        faltantes = [i for i, img in enumerate(imagenes) if img is None]
+        if faltantes:
+            renderizadas = self._renderizar_en_pool([specs[i] for i in faltantes])
+            for i, png in zip(faltantes, renderizadas):
+                imagenes[i] = png
+                self._cache.guardar(claves[i], ".png", png)
+        return imagenes
+
+    def _renderizar_en_pool(self, specs):
+        """
+        Renderiza varios gráficos a PNG (bytes), en el mismo orden que `specs`.
+        Con más de un gráfico y más de un worker usa el pool de procesos; si el pool
+        no está disponible o falla, se renderiza en serie en este proceso. El pool (ver
+        pool_procesos.py) se crea la primera vez y se reutiliza hasta cerrar().
+        """
+        if self.workers > 1 and len(specs) > 1:
+            try:
+                with self._lock_pool:
+                    if self._pool is None:
+                        self._pool = crear_pool(self.workers)
+                    pool = self._pool
+                return list(pool.map(renderizar_grafico, specs))
+            except Exception as e:
+                print(f"[WARN] Falló el render en paralelo, se continúa en serie: {e}")
+                self.cerrar()
+                self.workers = 1
+        return [renderizar_grafico(spec) for spec in specs]
+
+    def cerrar(self):
+        """Libera el pool de procesos de render (si se creó). Llamar al cerrar la aplicación."""
+        with self._lock_pool:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    @contextmanager
+    def _lectura_consistente(self):
+        """Agrupa las consultas de un reporte en una única transacción de lectura."""
+        with self._lock_lectura:
+            with transaccion_lectura(self._conn_lectura):
+                yield
+
+    def _avisar(self, progreso, fraccion, mensaje):
+        """Informa el avance del reporte (0 a 1) si se pasó un callback `progreso(fraccion, mensaje)`."""
+        if progreso is not None:
+            progreso(fraccion, mensaje)
 
     def _output_path(self, nombre_archivo):
         return os.path.join(self._report_dir, nombre_archivo)
 
+    def _pdf_desde_cache(self, tipo, datos, ruta_salida):
+        """
+        Si el reporte `tipo` ya se generó con los mismos datos, copia el PDF cacheado a
+        `ruta_salida`. Retorna (clave, encontrado); la clave sirve para guardar el PDF nuevo.
+        """
+        clave = self._cache.clave(tipo, datos)
+        return clave, self._cache.copiar_a(clave, ".pdf", ruta_salida)
+
+    def _ruta_indice_precomputados(self):
+        return os.path.join(self.dir_precomputados, "indice.json")
+
+    def _leer_indice_precomputados(self):
+        """Índice {clave: datos del reporte precomputado}. Solo se relee del disco si el archivo cambió."""
+        ruta = self._ruta_indice_precomputados()
+        try:
+            modificado = os.path.getmtime(ruta)
+        except OSError:
+            return {}
+        if self._indice_precomputados[0] != modificado:
+            try:
+                with open(ruta, "r", encoding="utf-8") as f:
+                    indice = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[WARN] No se pudo leer el índice de reportes precomputados: {e}")
+                return {}
+            self._indice_precomputados = (modificado, indice)
+        return self._indice_precomputados[1]
+
+    def clave_precomputado(self, tipo, fecha_inicio, fecha_fin, *parametros):
+        """Clave del índice: tipo de reporte (ver ColaReportes.TIPOS), parámetros extra y período."""
+        partes = [tipo] + [str(p) for p in parametros]
+        partes += [self._format_date_for_filename(fecha_inicio), self._format_date_for_filename(fecha_fin)]
+        return "|".join(partes)
+
+    def _buscar_precomputado(self, tipo, fecha_inicio, fecha_fin, *parametros):
+        """
+        Entrada del índice con el PDF precomputado para el reporte pedido, o None. Solo se usan
+        para períodos ya cerrados (que terminan antes de hoy) y entradas con la huella de sus
+        datos. Incluye la versión actual de las tablas del reporte (CacheConsultas), tomada
+        antes de leer los datos; ver _servir_precomputado.
+        """
+        if self._format_date_for_filename(fecha_fin) >= date.today().strftime("%Y-%m-%d"):
+            return None
+        clave = self.clave_precomputado(tipo, fecha_inicio, fecha_fin, *parametros)
+        entrada = self._leer_indice_precomputados().get(clave)
+        if not entrada or not entrada.get("huella") or not os.path.exists(entrada["ruta"]):
+            return None
+        version = CacheConsultas().version(self._conn_lectura, *self.PRECOMPUTABLES[tipo][1])
+        return dict(entrada, clave=clave, version=version)
+
+    def _servir_precomputado(self, precomputado, huella=None):
+        """
+        Ruta del PDF precomputado si sus datos no cambiaron desde que se generó, o None (hay que
+        regenerarlo). Con `huella` (la de los datos recién leídos) se compara con la del índice;
+        sin ella, solo se sirve si ya se comparó en este proceso y desde entonces no hubo
+        escrituras sobre las tablas del reporte, así el pedido repetido no vuelve a leer los datos.
+        """
+        if precomputado is None:
+            return None
+        clave = precomputado["clave"]
+        if huella is None:
+            if self._precomputados_validados.get(clave) != (precomputado["huella"], precomputado["version"]):
+                return None
+        elif huella != precomputado["huella"]:
+            print(f"[WARN] Reporte precomputado desactualizado (cambiaron sus datos), se regenera: {precomputado['ruta']}")
+            self._precomputados_validados.pop(clave, None)
+            return None
+        else:
+            self._precomputados_validados[clave] = (huella, precomputado["version"])
+        print(f"[OK] Reporte precomputado: {precomputado['ruta']}")
+        return precomputado["ruta"]
+
+    def huella_precomputado(self, tipo, fecha_inicio, fecha_fin, *parametros):
+        """
+        Huella (hash) de los datos de origen del reporte `tipo` del período. precomputo_reportes.py
+        la guarda en el índice junto al PDF, y se compara antes de servirlo.
+        """
+        tipo_cache = self.PRECOMPUTABLES[tipo][0]
+        with self._lectura_consistente():
+            if tipo == "turnos_por_medico":
+                datos = self._datos_listado_turnos(parametros[0], fecha_inicio, fecha_fin)[1]
+            elif tipo == "pacientes_atendidos":
+                datos = self._datos_pacientes_atendidos(fecha_inicio, fecha_fin)[1]
+            else:
+                datos = self._datos_asistencias(fecha_inicio, fecha_fin)[1]
+        return self._cache.clave(tipo_cache, datos)
+
+    def registrar_precomputados(self, entradas):
+        """
+        Agrega al índice los reportes precomputados ({clave: datos}, con "ruta" y "huella").
+        El índice se reescribe completo en un temporal y se reemplaza de forma atómica.
+        """
+        os.makedirs(self.dir_precomputados, exist_ok=True)
+        indice = dict(self._leer_indice_precomputados())
+        indice.update(entradas)
+        fd, temporal = tempfile.mkstemp(dir=self.dir_precomputados, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(indice, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(temporal, self._ruta_indice_precomputados())
+        except OSError:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+
     def _format_date_for_filename(self, date_obj):
         """Helper para formatear la fecha a string para el nombre del archivo (solo YYYY-MM-DD)."""
         if isinstance(date_obj, (datetime, date)):
@@ -35,67 +269,137 @@ class ReporteService:
              return date_obj[:10] # Asumiendo formato YYYY-MM-DD
         return "fecha_invalida"
 
-    def listado_turnos_por_medico_en_un_periodo(self, nro_matricula_medico, fecha_inicio, fecha_fin):
-        """Genera un listado pdf de turnos para un médico específico dentro de un período determinado."""
+    def listado_turnos_por_medico_en_un_periodo(self, nro_matricula_medico, fecha_inicio, fecha_fin, progreso=None):
+        """
+        Genera un listado pdf de turnos para un médico específico dentro de un período determinado
+        (de hasta un año). Todo pasa en una sola transacción de lectura, con dos recorridas de los
+        turnos: la primera calcula su huella (para el cache y los precomputados) y la segunda arma
+        el PDF. Cada bloque de turnos es una tabla con el encabezado repetido que se lee y se arma
+        recién al ubicarla en la página, así la memoria no depende de la cantidad de turnos y el
+        tiempo de armado crece en forma lineal.
+        Retorna la ruta del PDF generado.
+        """
+        precomputado = self._buscar_precomputado("turnos_por_medico", fecha_inicio, fecha_fin, nro_matricula_medico)
+        ruta_precomputada = self._servir_precomputado(precomputado)
+        if ruta_precomputada:
+            self._avisar(progreso, 1.0, "Listo")
+            return ruta_precomputada
+
+        self._avisar(progreso, 0.0, "Leyendo turnos")
+        # Las dos recorridas ven la misma foto de la base
+        with self._lectura_consistente():
+            medico, datos, cantidad = self._datos_listado_turnos(nro_matricula_medico, fecha_inicio, fecha_fin)
+            clave = self._cache.clave("listado_turnos_por_medico", datos)
+            ruta_precomputada = self._servir_precomputado(precomputado, clave)
+            if ruta_precomputada:
+                self._avisar(progreso, 1.0, "Listo")
+                return ruta_precomputada
+
+            fecha_inicio_str, fecha_fin_str = datos["periodo"]
+
+            # Nombre del archivo
+            nombre_archivo = f"turnos_{nro_matricula_medico}_{fecha_inicio_str}_al_{fecha_fin_str}.pdf"
+            ruta_salida = self._output_path(nombre_archivo)
+
+            clave, en_cache = self._pdf_desde_cache("listado_turnos_por_medico", datos, ruta_salida)
+            if en_cache:
+                print(f"[OK] Reporte PDF obtenido del cache: {nombre_archivo}")
+                self._avisar(progreso, 1.0, "Listo")
+                return ruta_salida
+
+            doc = SimpleDocTemplate(ruta_salida, pagesize=A4)
+
+            # Crear estilos
+            styles = getSampleStyleSheet()
+            table_text_style = ParagraphStyle(
+                name="TablaTurnos",
+                parent=styles['BodyText'],
+                fontSize=9,
+                leading=11,
+                spaceAfter=0,
+                spaceBefore=0
+            )
+
+            # Encabezado
+            title = "Listado de Turnos por Médico en un Período"
+            text = (f"Turnos del Dr/a. {medico.apellido}, Matrícula: {medico.nro_matricula}, "
+                    f"desde: {fecha_inicio_str} hasta: {fecha_fin_str}.")
+            elements = [Paragraph(title, styles['Title']), Paragraph(text, styles['Normal']), Spacer(1, 12)]
+
+            # Una tabla por bloque de turnos, leído y armado a medida que se ubica en las páginas
+            bloques = self._bloques_listado_turnos(nro_matricula_medico, fecha_inicio, fecha_fin)
+            primero = next(bloques, None)
+            if primero:
+                elements.append(_TurnosEnBloques(
+                    primero, bloques, lambda bloque: self._tabla_turnos(bloque, table_text_style),
+                    al_armar=lambda procesados: self._avisar(progreso, 0.2 + 0.75 * procesados / cantidad,
+                                                            f"Armando PDF ({procesados} de {cantidad} turnos)")))
+            else:
+                elements.append(self._tabla_turnos([], table_text_style))
+
+            # 4. Construir el informe
+            try:
+                self._avisar(progreso, 0.2, "Armando PDF")
+                doc.build(elements)
+                self._cache.guardar_archivo(clave, ".pdf", ruta_salida)
+                print(f"[OK] Reporte PDF generado exitosamente: {nombre_archivo}")
+                self._avisar(progreso, 1.0, "Listo")
+                return ruta_salida
+            except Exception as e:
+                print(f"[ERROR PDF] Fallo al construir el documento PDF: {e}")
+                raise RuntimeError("Fallo interno al generar el archivo PDF.")
+            finally:
+                bloques.close()
+
+    def _datos_listado_turnos(self, nro_matricula_medico, fecha_inicio, fecha_fin):
+        """
+        (médico, datos para la clave del cache, cantidad de turnos) del listado de turnos por
+        médico. En vez de los turnos, los datos llevan su huella, calculada recorriéndolos en
+        bloques sin guardarlos. Llamar dentro de _lectura_consistente.
+        """
         try:
             medico = self.medico_service.obtener_medico_por_matricula(nro_matricula_medico)
         except Exception as e:
             print(f"[ERROR] Fallo al obtener medico por matricula: {e}")
             raise RuntimeError("Ocurrió un error técnico al obtener los datos del médico.")
-        
+        huella, cantidad = hashlib.sha256(), 0
+        for bloque in self._bloques_listado_turnos(nro_matricula_medico, fecha_inicio, fecha_fin):
+            for t in bloque:
+                huella.update(repr((t.id_turno, t.fecha_hora_inicio, t.motivo, t.observaciones,
+                                    t.estado, t.dni_paciente)).encode("utf-8"))
+            cantidad += len(bloque)
+        datos = {
+            "medico": [medico.nro_matricula, medico.apellido],
+            "periodo": [self._format_date_for_filename(fecha_inicio), self._format_date_for_filename(fecha_fin)],
+            "turnos": huella.hexdigest(),
+        }
+        return medico, datos, cantidad
+
+    def _bloques_listado_turnos(self, nro_matricula_medico, fecha_inicio, fecha_fin):
+        """Bloques de FILAS_POR_TABLA turnos del listado, leídos de a poco de la base."""
         try:
-            turnos = self.turno_service.obtener_turnos_por_medico_en_un_periodo(nro_matricula_medico, fecha_inicio, fecha_fin)
+            bloques = self.turno_service.iterar_turnos_por_medico_en_un_periodo(
+                nro_matricula_medico, fecha_inicio, fecha_fin, tamanio_bloque=self.FILAS_POR_TABLA)
+            yield from bloques
         except Exception as e:
             print(f"[ERROR] Fallo al generar el listado de turnos por medico en un periodo: {e}")
             raise RuntimeError("Ocurrió un error técnico al generar el listado de turnos por médico en un período.")
 
-        fecha_inicio_str = self._format_date_for_filename(fecha_inicio)
-        fecha_fin_str = self._format_date_for_filename(fecha_fin)
-        
-        # Nombre del archivo
-        nombre_archivo = f"turnos_{nro_matricula_medico}_{fecha_inicio_str}_al_{fecha_fin_str}.pdf"
-        ruta_salida = self._output_path(nombre_archivo)
-        doc = SimpleDocTemplate(ruta_salida, pagesize=A4)
-        
-        # Crear estilos y elementos
-        styles = getSampleStyleSheet()
-        elements = []
-
-        # Encabezado
-        title = "Listado de Turnos por Médico en un Período"
-        elements.append(Paragraph(title, styles['Title']))
-        
-        text = (f"Turnos del Dr/a. {medico.apellido}, Matrícula: {medico.nro_matricula}, "
-                f"desde: {fecha_inicio_str} hasta: {fecha_fin_str}.")
-        elements.append(Paragraph(text, styles['Normal']))
-        elements.append(Spacer(1, 12))
-        
-        # Datos de la tabla
-        table_text_style = ParagraphStyle(
-            name="TablaTurnos",
-            parent=styles['BodyText'],
-            fontSize=9,
-            leading=11,
-            spaceAfter=0,
-            spaceBefore=0
-        )
-
+    def _tabla_turnos(self, turnos, table_text_style):
+        """Tabla de un bloque de turnos, con el encabezado repetido si se parte entre páginas."""
         def _p(text):
             text = text or ""
             return Paragraph(text.replace('\n', '<br/>'), table_text_style)
 
         data = [['ID', 'Fecha y Hora Inicio','Motivo', 'Observaciones', 'Estado', 'DNI Paciente']]
 
-        turnos_filtrados = [t for t in turnos if getattr(t, 'estado', '').lower() != 'disponible']
-
-        for turno in turnos_filtrados:
-            # Asumo que fecha_hora_inicio es un objeto datetime o se puede convertir.
+        for turno in turnos:
             fecha_hora_str = ""
             if isinstance(turno.fecha_hora_inicio, (datetime, date)):
                 fecha_hora_str = turno.fecha_hora_inicio.strftime("%Y-%m-%d %H:%M")
             elif isinstance(turno.fecha_hora_inicio, str):
                 fecha_hora_str = turno.fecha_hora_inicio # Si ya viene como string
-                
+
             data.append([
                 turno.id_turno,
                 fecha_hora_str,
@@ -104,10 +408,10 @@ class ReporteService:
                 _p(turno.estado),
                 _p(str(turno.dni_paciente) if turno.dni_paciente else "N/A")
             ])
-            
+
         # Tabla y Estilo
         col_widths = [0.5 * inch, 1.3 * inch, 2.0 * inch, 2.0 * inch, 0.8 * inch, 0.8 * inch]
-        table = Table(data, colWidths=col_widths)
+        table = Table(data, colWidths=col_widths, repeatRows=1)
 
         table.setStyle(TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.darkgrey),
@@ -123,33 +427,31 @@ class ReporteService:
             ('BACKGROUND', (0, 1), (-1, -1), colors.white),
             ('GRID', (0, 0), (-1, -1), 1, colors.black)
         ]))
-        
-        elements.append(table)
-        
-        # 4. Construir el informe
-        try:
-            doc.build(elements)
-            print(f"[OK] Reporte PDF generado exitosamente: {nombre_archivo}")
-            return nombre_archivo
-        except Exception as e:
-            print(f"[ERROR PDF] Fallo al construir el documento PDF: {e}")
-            raise RuntimeError("Fallo interno al generar el archivo PDF.")
-    
-    def reporte_cantidad_turnos_por_especialidad(self):
+        return table
+
+    def reporte_cantidad_turnos_por_especialidad(self, progreso=None):
         """
         Genera un reporte PDF histórico con gráficos de torta
         mostrando la cantidad de turnos atendidos por especialidad médica
         y la distribución de estados de turnos para cada especialidad.
         """
         #Creo que en graficos falta agregar 
+        self._avisar(progreso, 0.0, "Leyendo datos")
         try:
-            dic_data = self.turno_service.obtener_cantidad_turnos_por_especialidades_y_estado()
+            with self._lectura_consistente():
+                dic_data = self.turno_service.obtener_cantidad_turnos_por_especialidades_y_estado()
         except Exception as e:
             print(f"[ERROR] Fallo al obtener datos para el reporte de turnos por especialidad: {e}")
             raise RuntimeError("Ocurrió un error técnico al obtener los datos para el reporte.")
         
         nombre_archivo = "reporte_cantidad_turnos_por_especialidad.pdf"
         ruta_salida = self._output_path(nombre_archivo)
+        clave, en_cache = self._pdf_desde_cache("cantidad_turnos_por_especialidad", dic_data, ruta_salida)
+        if en_cache:
+            print(f"[OK] Reporte PDF obtenido del cache: {ruta_salida}")
+            self._avisar(progreso, 1.0, "Listo")
+            return ruta_salida
+
         doc = SimpleDocTemplate(ruta_salida, pagesize=A4)
         styles = getSampleStyleSheet()
         elements = []
@@ -167,55 +469,49 @@ class ReporteService:
         
         # 1. Preparación de datos para el Gráfico General (solo 'atendido')
         total_atendidos = sum(estados.get("atendido", 0) for estados in dic_data.values())
-
         if total_atendidos > 0:
             for especialidad, estados in dic_data.items():
                 cantidad_atendida = estados.get("atendido", 0)
                 if cantidad_atendida > 0:
                     data_1.append(cantidad_atendida)
                     labels_1.append(f"{especialidad} ({cantidad_atendida})")
-            
-            # Gráfico general de distribución de Turnos ATENDIDOS
-            plt.figure(figsize=(8, 8))
-            plt.pie(data_1, labels=labels_1, autopct='%1.1f%%', startangle=140)
-            plt.title("Distribución de Turnos Atendidos por Especialidad Médica")
-            plt.axis('equal')  # Igualar aspecto para que sea un círculo
-
-            img_buffer = BytesIO()
-            plt.savefig(img_buffer, format='png')
-            img_buffer.seek(0)
-            img = Image(img_buffer, 6*inch, 6*inch)
-            elements.append(img)
+
+        # 2. Preparación de datos de los gráficos por especialidad (Distribución de ESTADOS)
+        specs = []
+        if total_atendidos > 0:
+            specs.append({"valores": data_1, "etiquetas": labels_1,
+                          "titulo": "Distribución de Turnos Atendidos por Especialidad Médica"})
+        for especialidad, estados in dic_data.items():
+            # Solo graficar si hay datos
+            if any(cantidad > 0 for cantidad in estados.values()):
+                specs.append({
+                    "valores": [value for value in estados.values() if value > 0],
+                    "etiquetas": [f"{label} ({value})" for label, value in estados.items() if value > 0],
+                    "titulo": f"Distribución de Estados de Turnos para {especialidad}",
+                })
+
+        # Los gráficos se renderizan todos juntos (en paralelo si hay workers) y se arma el PDF acá
+        try:
+            self._avisar(progreso, 0.2, f"Generando {len(specs)} gráficos")
+            imagenes = iter(self._renderizar_graficos(specs))
+        except Exception as e:
+            print(f"[ERROR] Fallo al renderizar los gráficos del reporte: {e}")
+            raise RuntimeError("Fallo interno al generar los gráficos del reporte.")
+        self._avisar(progreso, 0.8, "Armando PDF")
+
+        # Gráfico general de distribución de Turnos ATENDIDOS
+        if total_atendidos > 0:
+            elements.append(Image(BytesIO(next(imagenes)), 6*inch, 6*inch))
             elements.append(Spacer(1, 24))
-            plt.clf()  # Limpiar la figura para el siguiente gráfico
         else:
              elements.append(Paragraph("<b>No hay turnos con estado 'atendido' para generar el gráfico general.</b>", styles['Normal']))
              elements.append(Spacer(1, 24))
 
-
-        # 2. Gráficos por especialidad (Distribución de ESTADOS)
+        # Gráficos por especialidad
         for especialidad, estados in dic_data.items():
-            
-            # Solo graficar si hay datos
             if any(cantidad > 0 for cantidad in estados.values()):
-                labels = [
-                    f"{label} ({value})" 
-                    for label, value in estados.items() if value > 0
-                ]
-                data = [value for value in estados.values() if value > 0]
-
-                plt.figure(figsize=(8, 8))
-                plt.pie(data, labels=labels, autopct='%1.1f%%', startangle=140)
-                plt.title(f"Distribución de Estados de Turnos para {especialidad}")
-                plt.axis('equal')
-
-                img_buffer = BytesIO()
-                plt.savefig(img_buffer, format='png')
-                img_buffer.seek(0)
-                img = Image(img_buffer, 6*inch, 6*inch)
-                elements.append(img)
+                elements.append(Image(BytesIO(next(imagenes)), 6*inch, 6*inch))
                 elements.append(Spacer(1, 24))
-                plt.clf()  # Limpiar la figura para el siguiente gráfico
             else:
                 elements.append(Paragraph(f"<b>No hay datos de turnos para la especialidad: {especialidad}</b>", styles['Normal']))
                 elements.append(Spacer(1, 12))
@@ -224,32 +520,46 @@ class ReporteService:
         # 3. Construir el informe
         try:
             doc.build(elements)
+            self._cache.guardar_archivo(clave, ".pdf", ruta_salida)
             print(f"[OK] Reporte PDF generado exitosamente: {ruta_salida}")
+            self._avisar(progreso, 1.0, "Listo")
             return ruta_salida
         except Exception as e:
             print(f"[ERROR PDF] Fallo al construir el documento PDF: {e}")
             raise RuntimeError("Fallo interno al generar el archivo PDF.")
         
 
-    def reporte_pacientes_atendidos_en_un_periodo(self, fecha_inicio, fecha_fin):
+    def reporte_pacientes_atendidos_en_un_periodo(self, fecha_inicio, fecha_fin, progreso=None):
         """
         Genera un reporte PDF con la lista de pacientes atendidos en un período determinado,
         no incluye detalles del médico y del turno, ya que puede haber varios turnos por paciente
         y aquí solo se detalla un única vez.
         """
-
-        try:
-            pacientes = self.turno_service.obtener_pacientes_atendidos_por_periodo(fecha_inicio, fecha_fin)
-        except Exception as e:
-            print(f"[ERROR] Fallo al generar el listado de pacientes en un periodo: {e}")
-            raise RuntimeError("Ocurrió un error técnico al generar el listado de pacientes en un período.")
-
-        fecha_inicio_str = self._format_date_for_filename(fecha_inicio)
-        fecha_fin_str = self._format_date_for_filename(fecha_fin)
+        precomputado = self._buscar_precomputado("pacientes_atendidos", fecha_inicio, fecha_fin)
+        ruta_precomputada = self._servir_precomputado(precomputado)
+        if ruta_precomputada:
+            self._avisar(progreso, 1.0, "Listo")
+            return ruta_precomputada
+
+        self._avisar(progreso, 0.0, "Leyendo pacientes")
+        with self._lectura_consistente():
+            pacientes, datos = self._datos_pacientes_atendidos(fecha_inicio, fecha_fin)
+        ruta_precomputada = self._servir_precomputado(precomputado, self._cache.clave("pacientes_atendidos", datos))
+        if ruta_precomputada:
+            self._avisar(progreso, 1.0, "Listo")
+            return ruta_precomputada
+
+        fecha_inicio_str, fecha_fin_str = datos["periodo"]
         
         # Nombre del archivo
         nombre_archivo = f"pacientes_atendidos_{fecha_inicio_str}_al_{fecha_fin_str}.pdf"
         ruta_salida = self._output_path(nombre_archivo)
+
+        clave, en_cache = self._pdf_desde_cache("pacientes_atendidos", datos, ruta_salida)
+        if en_cache:
+            print(f"[OK] Reporte PDF obtenido del cache: {ruta_salida}")
+            self._avisar(progreso, 1.0, "Listo")
+            return ruta_salida
         doc = SimpleDocTemplate(ruta_salida, pagesize=A4)
         
         # Crear estilos y elementos
@@ -299,15 +609,31 @@ class ReporteService:
         elements.append(table)
         
         # 4. Construir el informe
+        self._avisar(progreso, 0.7, "Armando PDF")
         try:
             doc.build(elements)
+            self._cache.guardar_archivo(clave, ".pdf", ruta_salida)
             print(f"[OK] Reporte PDF generado exitosamente: {ruta_salida}")
+            self._avisar(progreso, 1.0, "Listo")
             return ruta_salida
         except Exception as e:
             print(f"[ERROR PDF] Fallo al construir el documento PDF: {e}")
             raise RuntimeError("Fallo interno al generar el archivo PDF.")
         
-    def asistencias_vs_inasistencias_de_pacientes(self, fecha_inicio, fecha_fin):
+    def _datos_pacientes_atendidos(self, fecha_inicio, fecha_fin):
+        """(pacientes, datos para la clave del cache) del listado de pacientes atendidos."""
+        try:
+            pacientes = self.turno_service.obtener_pacientes_atendidos_por_periodo(fecha_inicio, fecha_fin)
+        except Exception as e:
+            print(f"[ERROR] Fallo al generar el listado de pacientes en un periodo: {e}")
+            raise RuntimeError("Ocurrió un error técnico al generar el listado de pacientes en un período.")
+        datos = {
+            "periodo": [self._format_date_for_filename(fecha_inicio), self._format_date_for_filename(fecha_fin)],
+            "pacientes": [[p.dni, p.nombre, p.apellido, p.fecha_nacimiento, p.email, p.direccion] for p in pacientes],
+        }
+        return pacientes, datos
+
+    def asistencias_vs_inasistencias_de_pacientes(self, fecha_inicio, fecha_fin, progreso=None):
         """
         Genera un gráfico comparando asistencias (turnos atendidos) versus
         inasistencias (ausentes + cancelados) en el período indicado.
@@ -315,22 +641,33 @@ class ReporteService:
         if not (fecha_inicio and fecha_fin):
             raise ValueError("Debe indicar fecha de inicio y fin para este reporte.")
 
-        try:
-            resumen = self.turno_service.obtener_resumen_asistencias(fecha_inicio, fecha_fin)
-        except Exception as e:
-            print(f"[ERROR] Fallo al obtener el resumen de asistencias: {e}")
-            raise RuntimeError("Ocurrió un error técnico al obtener los datos del reporte.")
+        precomputado = self._buscar_precomputado("asistencias", fecha_inicio, fecha_fin)
+        ruta_precomputada = self._servir_precomputado(precomputado)
+        if ruta_precomputada:
+            self._avisar(progreso, 1.0, "Listo")
+            return ruta_precomputada
 
-        asistencias = resumen.get('atendido', 0)
-        inasistencias = resumen.get('ausente', 0) + resumen.get('cancelado', 0)
+        self._avisar(progreso, 0.0, "Leyendo datos")
+        with self._lectura_consistente():
+            _, datos = self._datos_asistencias(fecha_inicio, fecha_fin)
+        asistencias, inasistencias = datos["asistencias"], datos["inasistencias"]
 
         if asistencias == 0 and inasistencias == 0:
             raise ValueError("No hay turnos registrados en el periodo seleccionado.")
+        ruta_precomputada = self._servir_precomputado(precomputado, self._cache.clave("asistencias_vs_inasistencias", datos))
+        if ruta_precomputada:
+            self._avisar(progreso, 1.0, "Listo")
+            return ruta_precomputada
 
-        fecha_inicio_str = self._format_date_for_filename(fecha_inicio)
-        fecha_fin_str = self._format_date_for_filename(fecha_fin)
+        fecha_inicio_str, fecha_fin_str = datos["periodo"]
         nombre_archivo = f"asistencias_vs_inasistencias_{fecha_inicio_str}_al_{fecha_fin_str}.pdf"
         ruta_salida = self._output_path(nombre_archivo)
+        clave, en_cache = self._pdf_desde_cache("asistencias_vs_inasistencias", datos, ruta_salida)
+        if en_cache:
+            print(f"[OK] Reporte PDF obtenido del cache: {ruta_salida}")
+            self._avisar(progreso, 1.0, "Listo")
+            return ruta_salida
+
         doc = SimpleDocTemplate(ruta_salida, pagesize=A4)
         styles = getSampleStyleSheet()
         elements = []
@@ -364,25 +701,157 @@ class ReporteService:
         elements.append(Spacer(1, 24))
 
         # Gráfico
+        self._avisar(progreso, 0.3, "Generando gráfico")
         labels = ['Asistencias', 'Inasistencias']
         valores = [asistencias, inasistencias]
         colores = ['#4CAF50', '#F44336']
 
-        plt.figure(figsize=(5, 5))
-        plt.pie(valores, labels=labels, autopct='%1.1f%%', colors=colores, startangle=90)
-        plt.title('Distribución de asistencias e inasistencias')
-        plt.axis('equal')
-        img_buffer = BytesIO()
-        plt.savefig(img_buffer, format='png')
-        img_buffer.seek(0)
-        elements.append(Image(img_buffer, 4.5 * inch, 4.5 * inch))
-        plt.clf()
+        png = self._renderizar_graficos([{
+            "valores": valores, "etiquetas": labels, "titulo": 'Distribución de asistencias e inasistencias',
+            "tamanio": (5, 5), "colores": colores, "angulo_inicio": 90,
+        }])[0]
+        elements.append(Image(BytesIO(png), 4.5 * inch, 4.5 * inch))
+
+        self._avisar(progreso, 0.7, "Armando PDF")
+        try:
+            doc.build(elements)
+            self._cache.guardar_archivo(clave, ".pdf", ruta_salida)
+            print(f"[OK] Reporte PDF generado exitosamente: {ruta_salida}")
+            self._avisar(progreso, 1.0, "Listo")
+            return ruta_salida
+        except Exception as e:
+            print(f"[ERROR PDF] Fallo al construir el documento PDF: {e}")
+            raise RuntimeError("Fallo interno al generar el archivo PDF.")
+
+    def _datos_asistencias(self, fecha_inicio, fecha_fin):
+        """(resumen por estado, datos para la clave del cache) del reporte de asistencias."""
+        try:
+            resumen = self.turno_service.obtener_resumen_asistencias(fecha_inicio, fecha_fin)
+        except Exception as e:
+            print(f"[ERROR] Fallo al obtener el resumen de asistencias: {e}")
+            raise RuntimeError("Ocurrió un error técnico al obtener los datos del reporte.")
+        datos = {
+            "periodo": [self._format_date_for_filename(fecha_inicio), self._format_date_for_filename(fecha_fin)],
+            "asistencias": resumen.get('atendido', 0),
+            "inasistencias": resumen.get('ausente', 0) + resumen.get('cancelado', 0),
+        }
+        return resumen, datos
+
+    def reporte_asistencias_por_intervalo(self, fecha_inicio, fecha_fin, intervalo="semana", desglose=None, progreso=None):
+        """
+        Genera un reporte PDF con la evolución de turnos atendidos, ausentes, cancelados y
+        programados por día, semana o mes (gráfico de líneas y tabla). Con `desglose`
+        ('medico' o 'especialidad') agrega un gráfico de atendidos por grupo.
+        Los conteos se calculan en la base, así que admite rangos de cualquier longitud.
+        """
+        self._avisar(progreso, 0.0, "Leyendo datos")
+        try:
+            with self._lectura_consistente():
+                filas = self.turno_service.obtener_asistencias_por_intervalo(
+                    fecha_inicio, fecha_fin, intervalo, desglose
+                )
+                nombres = self._nombres_de_grupos(desglose)
+        except ValueError:
+            raise
+        except Exception as e:
+            print(f"[ERROR] Fallo al obtener las asistencias por intervalo: {e}")
+            raise RuntimeError("Ocurrió un error técnico al obtener los datos del reporte.")
+
+        if not filas:
+            raise ValueError("No hay turnos registrados en el periodo seleccionado.")
+
+        categorias = ["atendidos", "ausentes", "cancelados", "programados"]
+        totales = {}
+        por_grupo = {}
+        columna_grupo = "nro_matricula_medico" if desglose == "medico" else "id_especialidad"
+        for fila in filas:
+            total = totales.setdefault(fila["periodo"], dict.fromkeys(categorias, 0))
+            for categoria in categorias:
+                total[categoria] += fila[categoria]
+            if desglose is not None:
+                por_grupo.setdefault(fila[columna_grupo], {})[fila["periodo"]] = fila["atendidos"]
+        periodos = sorted(totales)
+
+        fecha_inicio_str = self._format_date_for_filename(fecha_inicio)
+        fecha_fin_str = self._format_date_for_filename(fecha_fin)
+        sufijo = f"_por_{desglose}" if desglose else ""
+        nombre_archivo = f"asistencias_por_{intervalo}{sufijo}_{fecha_inicio_str}_al_{fecha_fin_str}.pdf"
+        ruta_salida = self._output_path(nombre_archivo)
+        datos = {"periodo": [fecha_inicio_str, fecha_fin_str], "intervalo": intervalo,
+                 "desglose": desglose, "filas": filas, "nombres": nombres}
+        clave, en_cache = self._pdf_desde_cache("asistencias_por_intervalo", datos, ruta_salida)
+        if en_cache:
+            print(f"[OK] Reporte PDF obtenido del cache: {ruta_salida}")
+            self._avisar(progreso, 1.0, "Listo")
+            return ruta_salida
+
+        specs = [{
+            "tipo": "lineas",
+            "etiquetas": periodos,
+            "series": [[categoria.capitalize(), [totales[p][categoria] for p in periodos]] for categoria in categorias],
+            "titulo": f"Turnos por {intervalo}",
+            "colores": ['#4CAF50', '#F44336', '#FF9800', '#2196F3'],
+        }]
+        if desglose is not None:
+            specs.append({
+                "tipo": "lineas",
+                "etiquetas": periodos,
+                "series": [[nombres.get(grupo, str(grupo)), [valores.get(p, 0) for p in periodos]]
+                           for grupo, valores in sorted(por_grupo.items())],
+                "titulo": f"Turnos atendidos por {intervalo} y {desglose}",
+            })
+
+        try:
+            self._avisar(progreso, 0.2, f"Generando {len(specs)} gráficos")
+            imagenes = self._renderizar_graficos(specs)
+        except Exception as e:
+            print(f"[ERROR] Fallo al renderizar los gráficos del reporte: {e}")
+            raise RuntimeError("Fallo interno al generar los gráficos del reporte.")
+        self._avisar(progreso, 0.7, "Armando PDF")
+
+        doc = SimpleDocTemplate(ruta_salida, pagesize=A4)
+        styles = getSampleStyleSheet()
+        elements = []
+        elements.append(Paragraph("Evolución de Asistencias e Inasistencias", styles['Title']))
+        elements.append(Spacer(1, 12))
+        elements.append(Paragraph(
+            f"Período analizado: {fecha_inicio_str} a {fecha_fin_str}, agrupado por {intervalo}. "
+            "Se cuentan los turnos en estado 'atendido', 'ausente', 'cancelado' y 'programado'.",
+            styles['Normal']
+        ))
+        elements.append(Spacer(1, 12))
+        for png in imagenes:
+            elements.append(Image(BytesIO(png), 7 * inch, 3.5 * inch))
+            elements.append(Spacer(1, 12))
+
+        data = [['Período', 'Atendidos', 'Ausentes', 'Cancelados', 'Programados']]
+        for p in periodos:
+            data.append([p] + [totales[p][categoria] for categoria in categorias])
+        table = Table(data, colWidths=[1.5 * inch] + [1.2 * inch] * 4, repeatRows=1)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.darkgrey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+        elements.append(table)
 
         try:
             doc.build(elements)
+            self._cache.guardar_archivo(clave, ".pdf", ruta_salida)
             print(f"[OK] Reporte PDF generado exitosamente: {ruta_salida}")
+            self._avisar(progreso, 1.0, "Listo")
             return ruta_salida
         except Exception as e:
             print(f"[ERROR PDF] Fallo al construir el documento PDF: {e}")
             raise RuntimeError("Fallo interno al generar el archivo PDF.")
 
+    def _nombres_de_grupos(self, desglose):
+        """Nombre para mostrar de cada grupo del desglose: {matrícula: apellido} o {id: especialidad}."""
+        if desglose == "medico":
+            return {m.nro_matricula: f"{m.apellido}, {m.nombre}" for m in self.medico_service.obtener_medicos()}
+        if desglose == "especialidad":
+            return {e.id_especialidad: e.nombre for e in self.turno_service.especialidad_service.obtener_especialidades()}
+        return {}
@@ -0,0 +1,213 @@
+# servicios/sendgrid_cliente.py
+"""
+Cliente HTTP de SendGrid compartido entre envíos, con caché de supresiones.
+
+- ClienteSendGrid usa una única requests.Session (keep-alive y pool de conexiones), así
+  los envíos y consultas seguidos no abren una conexión TLS nueva cada vez.
+- CacheSupresiones guarda, por dirección, en qué listas de supresión está (bounces, blocks,
+  global). Cada `intervalo_refresco` segundos descarga las listas completas de una vez; mientras
+  esa descarga está vigente, consultar una dirección es una búsqueda en un diccionario. Si la
+  descarga falla (por ej. la API key no tiene permiso para listar), consulta la dirección
+  puntual y guarda el resultado con TTL, también el negativo ("no está suprimida").
+  La descarga la hace un solo envío por vez: mientras tanto los demás siguen usando las listas
+  anteriores (o, si todavía no hay ninguna, esperan a la primera).
+
+Configuración (variables de entorno o mail_config):
+    SENDGRID_API_URL                   URL base de la API (por defecto https://api.sendgrid.com)
+    SENDGRID_SUPRESIONES_TTL           segundos entre descargas completas y TTL de las positivas (900)
+    SENDGRID_SUPRESIONES_TTL_NEGATIVO  TTL de "no suprimida" en consultas puntuales (300)
+"""
+import time
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config_entorno import entero_desde_entorno
+
+API_URL_POR_DEFECTO = "https://api.sendgrid.com"
+
+# tipo -> (endpoint de la lista completa, endpoint de consulta/borrado por dirección)
+LISTAS_SUPRESION = {
+    "bounces": ("/v3/suppression/bounces", "/v3/suppression/bounces/{email}"),
+    "blocks": ("/v3/suppression/blocks", "/v3/suppression/blocks/{email}"),
+    "global": ("/v3/suppression/unsubscribes", "/v3/asm/suppressions/global/{email}"),
+}
+TAMANIO_PAGINA = 500
+
+
+class ClienteSendGrid:
+    def __init__(self, api_key, api_url=None, timeout=10, conexiones=10):
+        self.api_url = (api_url or API_URL_POR_DEFECTO).rstrip("/")
+        self.timeout = timeout
+        self.sesion = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=conexiones)
+        self.sesion.mount("http://", adaptador)
+        self.sesion.mount("https://", adaptador)
+        self.sesion.headers.update({"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"})
+        self.supresiones = CacheSupresiones(self)
+
+    def enviar(self, payload):
+        """POST a /v3/mail/send. Retorna la respuesta (202 = aceptado)."""
+        return self.sesion.post(f"{self.api_url}/v3/mail/send", json=payload, timeout=self.timeout)
+
+    def listar_supresiones(self, tipo):
+        """Direcciones (en minúsculas) de la lista de supresión `tipo`, recorriendo todas las páginas."""
+        endpoint = LISTAS_SUPRESION[tipo][0]
+        direcciones, offset = set(), 0
+        while True:
+            resp = self.sesion.get(f"{self.api_url}{endpoint}",
+                                   params={"limit": TAMANIO_PAGINA, "offset": offset}, timeout=self.timeout)
+            resp.raise_for_status()
+            pagina = resp.json()
+            direcciones.update(str(item.get("email", "")).lower() for item in pagina if item.get("email"))
+            if len(pagina) < TAMANIO_PAGINA:
+                return direcciones
+            offset += TAMANIO_PAGINA
+
+    def consultar_supresiones(self, email):
+        """Consulta puntual: tupla con los tipos de supresión en los que figura `email`."""
+        tipos = []
+        for tipo, (_, endpoint) in LISTAS_SUPRESION.items():
+            resp = self.sesion.get(f"{self.api_url}{endpoint.format(email=email)}", timeout=self.timeout)
+            if resp.status_code == 404:
+                continue
+            resp.raise_for_status()
+            if resp.text and resp.json():
+                tipos.append(tipo)
+        return tuple(tipos)
+
+    def eliminar_supresion(self, tipo, email):
+        resp = self.sesion.delete(f"{self.api_url}{LISTAS_SUPRESION[tipo][1].format(email=email)}",
+                                  timeout=self.timeout)
+        if resp.status_code not in (200, 204, 404):
+            resp.raise_for_status()
+        self.supresiones.invalidar(email)
+
+    def cerrar(self):
+        self.sesion.close()
+
+
+class CacheSupresiones:
+    def __init__(self, cliente, intervalo_refresco=None, ttl_negativo=None):
+        self.cliente = cliente
+        self.intervalo_refresco = intervalo_refresco if intervalo_refresco is not None else \
+            entero_desde_entorno("SENDGRID_SUPRESIONES_TTL", 900)
+        self.ttl_negativo = ttl_negativo if ttl_negativo is not None else \
+            entero_desde_entorno("SENDGRID_SUPRESIONES_TTL_NEGATIVO", 300)
+        self._lock = threading.Lock()
+        self._lock_refresco = threading.Lock()  # lo tiene quien está descargando las listas
+        self._listas = None             # email -> tupla de tipos (última descarga completa)
+        self._listas_vencen = 0.0
+        self._proximo_refresco = 0.0    # no reintentar la descarga completa antes de esto
+        self._puntuales = {}            # email -> (tupla de tipos, vence)
+        self.aciertos = 0
+        self.consultas_api = 0
+        self.refrescos = 0
+
+    def refrescar(self):
+        """Descarga las listas completas. Retorna True si se pudo."""
+        listas = {}
+        try:
+            for tipo in LISTAS_SUPRESION:
+                for email in self.cliente.listar_supresiones(tipo):
+                    listas[email] = listas.get(email, ()) + (tipo,)
+        except (requests.RequestException, ValueError) as e:
+            print(f"[MailService WARN] No se pudieron descargar las listas de supresión de SendGrid: {e}")
+            with self._lock:
+                self._proximo_refresco = time.monotonic() + self.intervalo_refresco
+            return False
+        with self._lock:
+            ahora = time.monotonic()
+            self._listas = listas
+            self._listas_vencen = ahora + self.intervalo_refresco
+            self._proximo_refresco = self._listas_vencen
+            self._puntuales.clear()
+            self.refrescos += 1
+        return True
+
+    def tipos(self, email):
+        """Tupla con las listas de supresión en las que está `email` (vacía si no está suprimida)."""
+        clave = email.strip().lower()
+        self._refrescar_si_vencio()
+        tipos = self.tipos_en_memoria(email)
+        if tipos is not None:
+            return tipos
+
+        tipos = self.cliente.consultar_supresiones(email)
+        ttl = self.intervalo_refresco if tipos else self.ttl_negativo
+        with self._lock:
+            self.consultas_api += 1
+            self._puntuales[clave] = (tipos, time.monotonic() + ttl)
+        return tipos
+
+    def _vencio(self):
+        ahora = time.monotonic()
+        with self._lock:
+            return ahora >= self._listas_vencen and ahora >= self._proximo_refresco
+
+    def _refrescar_si_vencio(self):
+        """Descarga las listas si vencieron y nadie más las está descargando."""
+        if not self._vencio():
+            return
+        with self._lock:
+            hay_listas = self._listas is not None
+        # Con listas anteriores no se espera: se siguen usando hasta que termine la descarga
+        if not self._lock_refresco.acquire(blocking=not hay_listas):
+            return
+        try:
+            # Quien esperaba la primera descarga la encuentra hecha (o fallida) y no la repite
+            if self._vencio():
+                self.refrescar()
+        finally:
+            self._lock_refresco.release()
+
+    def tipos_en_memoria(self, email):
+        """Como tipos(), pero sin llamar a la API: None si para saberlo habría que consultarla."""
+        clave = email.strip().lower()
+        ahora = time.monotonic()
+        with self._lock:
+            vigentes = ahora < self._listas_vencen or self._lock_refresco.locked()
+            if self._listas is not None and vigentes:
+                self.aciertos += 1
+                return self._listas.get(clave, ())
+            entrada = self._puntuales.get(clave)
+            if entrada and ahora < entrada[1]:
+                self.aciertos += 1
+                return entrada[0]
+        return None
+
+    def invalidar(self, email):
+        """Olvida lo que se sabe de `email` (por ej. después de quitarlo de una lista)."""
+        clave = email.strip().lower()
+        with self._lock:
+            self._puntuales.pop(clave, None)
+            if self._listas is not None:
+                self._listas.pop(clave, None)
+
+    def estadisticas(self):
+        with self._lock:
+            return {"aciertos": self.aciertos, "consultas_api": self.consultas_api, "refrescos": self.refrescos,
+                    "suprimidas": len(self._listas) if self._listas is not None else None}
+
+
+# Un cliente (y su caché) por API key y URL, compartido por todos los envíos
+_clientes = {}
+_lock_clientes = threading.Lock()
+
+
+def obtener_cliente(api_key, api_url=None):
+    clave = (api_key, (api_url or API_URL_POR_DEFECTO).rstrip("/"))
+    with _lock_clientes:
+        cliente = _clientes.get(clave)
+        if cliente is None:
+            cliente = ClienteSendGrid(api_key, api_url)
+            _clientes[clave] = cliente
+        return cliente
+
+
+def cerrar_clientes():
+    with _lock_clientes:
+        for cliente in _clientes.values():
+            cliente.cerrar()
+        _clientes.clear()
@@ -0,0 +1,229 @@
+# servicios/smtp_pool.py
+"""
+Pool de sesiones SMTP autenticadas que se reutilizan entre mensajes.
+En lugar de conectar, negociar TLS y hacer login por cada mail, cada conexión del pool
+envía muchos mensajes seguidos. Una conexión que se cae (o que el servidor cerró por
+inactividad) se reabre y el mensaje se reintenta una vez. Se lleva la cuenta de mensajes,
+bytes y tiempo de envío por conexión para medir el throughput.
+
+Modo de TLS (parámetro `tls` o variable SMTP_TLS):
+    'starttls' -> SMTP + STARTTLS (puerto típico 587)
+    'ssl'      -> SMTP_SSL (puerto típico 465)
+    'none'     -> sin cifrado (solo servidores locales / de prueba)
+    'auto'     -> STARTTLS y, si falla, SMTP_SSL (comportamiento original de MailService)
+"""
+import time
+import queue
+import smtplib
+import threading
+import itertools
+
+MODOS_TLS = ("auto", "starttls", "ssl", "none")
+
+# Errores que indican que la sesión ya no sirve (hay que reconectar), a diferencia de
+# un rechazo del destinatario o del contenido, que no se arregla reconectando.
+_ERRORES_CONEXION = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError,
+                     smtplib.SMTPHeloError, ConnectionError, TimeoutError, OSError)
+
+
+class ConexionSMTP:
+    """Sesión SMTP autenticada con sus contadores de uso."""
+
+    def __init__(self, id_conexion, sesion, modo_tls):
+        self.id = id_conexion
+        self.sesion = sesion
+        self.modo_tls = modo_tls
+        self.creada = time.monotonic()
+        self.ultimo_uso = self.creada
+        self.mensajes = 0
+        self.bytes = 0
+        self.segundos_envio = 0.0
+
+    def estadisticas(self):
+        return {
+            "id": self.id,
+            "tls": self.modo_tls,
+            "mensajes": self.mensajes,
+            "bytes": self.bytes,
+            "segundos_envio": round(self.segundos_envio, 4),
+            "mensajes_por_segundo": round(self.mensajes / self.segundos_envio, 1) if self.segundos_envio else 0.0,
+            "edad_segundos": round(time.monotonic() - self.creada, 1),
+        }
+
+    def cerrar(self):
+        try:
+            self.sesion.quit()
+        except Exception:
+            try:
+                self.sesion.close()
+            except Exception:
+                pass
+
+
+class PoolSMTP:
+    def __init__(self, host, port, usuario=None, clave=None, tls="auto", tamanio=2, timeout=15,
+                 max_mensajes_por_conexion=500, max_inactividad=60):
+        if tls not in MODOS_TLS:
+            raise ValueError(f"Modo TLS inválido. Debe ser uno de: {', '.join(MODOS_TLS)}.")
+        if not isinstance(tamanio, int) or tamanio < 1:
+            raise ValueError("El tamaño del pool debe ser un entero mayor o igual a 1.")
+        self.host = host
+        self.port = int(port)
+        self.usuario = usuario
+        self.clave = clave
+        self.tls = tls
+        self.tamanio = tamanio
+        self.timeout = timeout
+        self.max_mensajes_por_conexion = max_mensajes_por_conexion
+        self.max_inactividad = max_inactividad
+        self._libres = queue.LifoQueue()
+        self._cupos = threading.BoundedSemaphore(tamanio)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._conexiones = {}          # id -> ConexionSMTP (abiertas)
+        self._historial = []           # estadísticas de las conexiones ya cerradas
+        self.reconexiones = 0
+
+    # --- conexiones -------------------------------------------------------------------
+
+    def _abrir(self):
+        """Abre y autentica una sesión según el modo TLS. En modo 'auto' recuerda el que funcionó."""
+        modos = ("starttls", "ssl") if self.tls == "auto" else (self.tls,)
+        ultimo_error = None
+        for modo in modos:
+            sesion = None
+            try:
+                if modo == "ssl":
+                    sesion = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+                else:
+                    sesion = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+                    if modo == "starttls":
+                        sesion.starttls()
+                if self.usuario and self.clave:
+                    sesion.login(self.usuario, self.clave)
+            except (smtplib.SMTPException, OSError) as e:
+                print(f"[MailService WARN] No se pudo abrir la sesión SMTP ({modo}): {e}")
+                if sesion is not None:
+                    # Conectada pero falló STARTTLS o el login: se cierra el socket antes de seguir
+                    sesion.close()
+                ultimo_error = e
+                continue
+            if self.tls == "auto":
+                self.tls = modo
+            conexion = ConexionSMTP(next(self._ids), sesion, modo)
+            with self._lock:
+                self._conexiones[conexion.id] = conexion
+            return conexion
+        raise ultimo_error
+
+    def _descartar(self, conexion):
+        conexion.cerrar()
+        with self._lock:
+            if self._conexiones.pop(conexion.id, None) is not None:
+                self._historial.append(conexion.estadisticas())
+
+    def _tomar(self):
+        """Conexión libre (la usada más recientemente) o una nueva si no hay."""
+        self._cupos.acquire()
+        try:
+            while True:
+                try:
+                    conexion = self._libres.get_nowait()
+                except queue.Empty:
+                    return self._abrir()
+                # Una sesión inactiva hace rato puede haber sido cerrada por el servidor
+                if time.monotonic() - conexion.ultimo_uso > self.max_inactividad and not self._viva(conexion):
+                    self._descartar(conexion)
+                    continue
+                return conexion
+        except BaseException:
+            self._cupos.release()
+            raise
+
+    def _devolver(self, conexion):
+        if conexion.mensajes >= self.max_mensajes_por_conexion:
+            self._descartar(conexion)
+        else:
+            self._libres.put(conexion)
+        self._cupos.release()
+
+    def _viva(self, conexion):
+        try:
+            return conexion.sesion.noop()[0] == 250
+        except _ERRORES_CONEXION + (smtplib.SMTPException,):
+            return False
+
+    # --- envío ------------------------------------------------------------------------
+
+    def enviar(self, mensaje):
+        """
+        Envía un email.message.EmailMessage por una sesión del pool. Si la sesión se cayó,
+        reconecta y reintenta una vez. Los rechazos del servidor (destinatario, contenido)
+        se propagan como smtplib.SMTPException sin reintentar.
+        """
+        conexion = self._tomar()
+        try:
+            for intento in range(2):
+                try:
+                    inicio = time.perf_counter()
+                    conexion.sesion.send_message(mensaje)
+                    conexion.segundos_envio += time.perf_counter() - inicio
+                    conexion.mensajes += 1
+                    conexion.bytes += len(mensaje.as_bytes())
+                    conexion.ultimo_uso = time.monotonic()
+                    return True
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+                    raise
+                except _ERRORES_CONEXION as e:
+                    self._descartar(conexion)
+                    conexion = None
+                    if intento == 1:
+                        raise
+                    print(f"[MailService WARN] Se perdió la sesión SMTP ({e}); reconectando.")
+                    with self._lock:
+                        self.reconexiones += 1
+                    conexion = self._abrir()
+        finally:
+            if conexion is not None:
+                self._devolver(conexion)
+            else:
+                self._cupos.release()
+
+    def estadisticas(self):
+        """Uso por conexión (abiertas y cerradas) y cantidad de reconexiones."""
+        with self._lock:
+            abiertas = [c.estadisticas() for c in self._conexiones.values()]
+            return {"conexiones": sorted(self._historial + abiertas, key=lambda c: c["id"]),
+                    "abiertas": len(abiertas), "reconexiones": self.reconexiones}
+
+    def cerrar(self):
+        """Cierra todas las sesiones libres (las que están en uso se cierran al devolverse)."""
+        while True:
+            try:
+                conexion = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            self._descartar(conexion)
+
+
+# Pools compartidos por configuración, para que las sesiones sobrevivan entre envíos
+_pools = {}
+_lock_pools = threading.Lock()
+
+
+def obtener_pool(host, port, usuario=None, clave=None, tls="auto", tamanio=None):
+    """Pool compartido para esa configuración (se crea la primera vez)."""
+    clave_pool = (host, int(port), usuario, clave, tls)
+    with _lock_pools:
+        pool = _pools.get(clave_pool)
+        if pool is None:
+            pool = PoolSMTP(host, port, usuario, clave, tls=tls, tamanio=tamanio or 2)
+            _pools[clave_pool] = pool
+        return pool
+
+
+def cerrar_pools():
+    with _lock_pools:
+        for pool in _pools.values():
+            pool.cerrar()
+        _pools.clear()
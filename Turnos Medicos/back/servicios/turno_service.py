@@ -2,10 +2,12 @@ from persistencia.dao.turno_dao import TurnoDAO
 from persistencia.dao.paciente_dao import PacienteDAO
 from persistencia.dao.medico_dao import MedicoDAO
 from persistencia.dao.especialidad_dao import EspecialidadDAO
+from persistencia.dao.mail_outbox_dao import MailOutboxDAO
 from persistencia.persistencia_errores import IntegridadError, DatabaseError, NotFoundError
 from modelos.turno import Turno
 from especialidad_service import EspecialidadService
-from mail_service import MailService
+from mail_outbox import avisar_nuevo_mail
+from plantillas_mail import CONFIRMACION, CANCELACION, RECORDATORIO, armar_mail
 import os
 from datetime import datetime, date, timedelta
 class TurnoService:
@@ -14,12 +16,18 @@ class TurnoService:
     Coordina acceso a DAO y aplica reglas (baja cohesión, bajo acoplamiento).
     """
 
-    def __init__(self):
-        self.turno_dao = TurnoDAO()
-        self.paciente_dao = PacienteDAO()
-        self.medico_dao = MedicoDAO()
-        self.especialidad_dao = EspecialidadDAO()
-        self.especialidad_service = EspecialidadService()
+    # Máxima cantidad de días de un período consultado (los listados PDF se leen en bloques y admiten un año)
+    MAX_DIAS_PERIODO = 30
+    MAX_DIAS_LISTADO = 366
+
+    def __init__(self, conn=None):
+        # conn: conexión opcional para los DAOs (ej: conexión de solo lectura de reportes)
+        self.turno_dao = TurnoDAO(conn)
+        self.paciente_dao = PacienteDAO(conn)
+        self.medico_dao = MedicoDAO(conn)
+        self.especialidad_dao = EspecialidadDAO(conn)
+        self.mail_outbox_dao = MailOutboxDAO(conn)
+        self.especialidad_service = EspecialidadService(conn)
 
     
     def programar_turno(self, id_turno, dni_paciente, motivo, observaciones=None):
@@ -55,39 +63,23 @@ class TurnoService:
         if observaciones:
             turno.observaciones = observaciones
 
-        # Validar y persistir cambios
+        # Validar y persistir cambios. La confirmación por mail se encola en la misma transacción
+        # que la asignación del turno y la envían los workers de mail_outbox.py.
         try:
             turno._validar()
-            actualizado = self.turno_dao.actualizar(turno)
+            mensaje = None
+            with self.turno_dao.transaccion():
+                actualizado = self.turno_dao.actualizar(turno)
+                if actualizado:
+                    # Los datos del mail (paciente, médico, especialidad) se leen ya con el turno asignado
+                    mensaje = self._mail_turno(CONFIRMACION, id_turno)
+                    if mensaje:
+                        self.mail_outbox_dao.crear(mensaje)
             if actualizado:
                 print(f"[OK] Turno {id_turno} asignado correctamente.")
-
-                # Intentar enviar notificación por mail al paciente. No revertimos la operación
-                # si el envío falla: solo registramos el resultado en consola.
-                try:
-                    email = getattr(paciente, 'email', None)
-                    if email:
-                        # Construir mail_config aquí si tu servicio/DB lo provee.
-                        # Actualmente usamos variables de entorno como ejemplo,
-                        # pero puedes reemplazar esto por campos del médico/clinica.
-                        mail_config = {
-                            'SMTP_HOST': os.environ.get('SMTP_HOST'),
-                            'SMTP_PORT': os.environ.get('SMTP_PORT'),
-                            'SMTP_USER': os.environ.get('SMTP_USER'),
-                            'SMTP_PASS': os.environ.get('SMTP_PASS'),
-                            'FROM_EMAIL': os.environ.get('FROM_EMAIL'),
-                            'SENDGRID_API_KEY': os.environ.get('SENDGRID_API_KEY'),
-                            'ALLOW_SENDGRID_UNSUPPRESS': os.environ.get('ALLOW_SENDGRID_UNSUPPRESS'),
-                        }
-                        enviado = MailService.enviar_turno(email, turno, mail_config)
-                        if enviado:
-                            print(f"[OK] Notificación por mail enviada a {email} para turno {id_turno}.")
-                        else:
-                            print(f"[WARN] No se pudo enviar la notificación por mail a {email}.")
-                    else:
-                        print(f"[WARN] El paciente {dni_paciente} no tiene email registrado; no se envió notificación.")
-                except Exception as e:
-                    print(f"[ERROR Mail] Ocurrió un error al intentar enviar el mail: {e}")
+                if mensaje:
+                    avisar_nuevo_mail()
+                    print(f"[OK] Notificación por mail a {mensaje.destinatario} encolada para turno {id_turno}.")
 
             return actualizado
         
@@ -104,10 +96,33 @@ class TurnoService:
             # Captura errores de obtención/chequeo de existencia
             raise
 
+    def _mail_turno(self, tipo, id_turno):
+        """
+        MensajeMail `tipo` (ver plantillas_mail.py) para el paciente del turno, o None si no se
+        puede enviar. Paciente, médico y especialidad salen de una sola consulta.
+        """
+        try:
+            datos = self.turno_dao.obtener_datos_notificacion(id_turno)
+        except Exception as e:
+            print(f"[WARN] No se pudieron leer los datos del mail del turno {id_turno}: {e}")
+            return None
+        if not datos:
+            return None
+        if not datos.get('email'):
+            print(f"[WARN] El paciente {datos['dni']} no tiene email registrado; no se envió notificación.")
+            return None
+        try:
+            return armar_mail(tipo, datos)
+        except ValueError as e:
+            print(f"[WARN] No se encoló la notificación del turno {id_turno}: {e}")
+            return None
+
     def cancelar_turno(self, id_turno, observaciones=None):
         """
         Cancela un turno programado y lo devuelve a estado 'disponible' para
-        que vuelva a ofrecerse en la agenda.
+        que vuelva a ofrecerse en la agenda. Si el paciente tiene email se le
+        encola el aviso de cancelación en la misma transacción, y se descarta su
+        recordatorio si todavía no se envió.
         """
         # Obtener y validar turno
         try:
@@ -124,6 +139,9 @@ class TurnoService:
         if turno.estado not in ['programado']:
             raise ValueError(f"El turno {id_turno} no puede ser cancelado. Estado actual: {turno.estado}.")
 
+        # El aviso de cancelación se arma antes de desasignar al paciente
+        mensaje = self._mail_turno(CANCELACION, id_turno)
+
         # Reestablecer el turno como disponible para que pueda reasignarse
         turno.estado = 'disponible'
         turno.dni_paciente = None
@@ -132,8 +150,16 @@ class TurnoService:
 
         try:
             turno._validar()
-            actualizado = self.turno_dao.actualizar(turno)
+            with self.turno_dao.transaccion():
+                actualizado = self.turno_dao.actualizar(turno)
+                if actualizado:
+                    self.mail_outbox_dao.descartar_pendientes(id_turno, RECORDATORIO)
+                if actualizado and mensaje:
+                    self.mail_outbox_dao.crear(mensaje)
             print(f"[OK] Turno {id_turno} marcado nuevamente como 'disponible'.")
+            if actualizado and mensaje:
+                avisar_nuevo_mail()
+                print(f"[OK] Aviso de cancelación a {mensaje.destinatario} encolado para turno {id_turno}.")
             return actualizado
 
         except IntegridadError as e:
@@ -354,8 +380,38 @@ class TurnoService:
             print(f"[ERROR DB] Fallo al obtener turnos por especialidad/mes: {e}")
             raise RuntimeError("Ocurrió un error técnico al consultar los turnos por especialidad.")
 
-    def obtener_turnos_por_medico_en_un_periodo(self, nro_matricula_medico, fecha_inicio, fecha_fin):
-        """Obtiene listado de turnos para un médico específico dentro de un período determinado."""
+    def _validar_periodo(self, fecha_inicio, fecha_fin, max_dias=MAX_DIAS_PERIODO):
+        """
+        Valida un rango de fechas (string 'YYYY-MM-DD' o date/datetime) de como mucho `max_dias` días
+        (None = sin límite).
+        Retorna (fecha_inicio, fecha_fin) como objetos date.
+        """
+        fechas = []
+        for fecha in (fecha_inicio, fecha_fin):
+            if isinstance(fecha, str):
+                try:
+                    fecha = datetime.strptime(fecha, "%Y-%m-%d").date()
+                except ValueError:
+                    raise ValueError("La fecha tiene un formato inválido (usar YYYY-MM-DD)")
+            if isinstance(fecha, (datetime, date)):
+                fecha = fecha.date() if isinstance(fecha, datetime) else fecha
+            else:
+                raise ValueError("La fecha debe ser un string 'YYYY-MM-DD' o un objeto date/datetime.")
+            fechas.append(fecha)
+        fecha_inicio, fecha_fin = fechas
+
+        if fecha_inicio > fecha_fin:
+            raise ValueError("La fecha de inicio no puede ser posterior a la fecha de fin.")
+
+        if max_dias is not None and (fecha_fin - fecha_inicio).days > max_dias:
+            raise ValueError(f"El período entre las fechas no puede ser mayor a {max_dias} días.")
+        return fecha_inicio, fecha_fin
+
+    def obtener_turnos_por_medico_en_un_periodo(self, nro_matricula_medico, fecha_inicio, fecha_fin, como_batch=False):
+        """
+        Obtiene listado de turnos para un médico específico dentro de un período determinado.
+        Con como_batch=True retorna un TurnoBatch (columnar, sin motivo/observaciones).
+        """
 
         # Verificar que el médico existe y está activo
         try:
@@ -366,43 +422,41 @@ class TurnoService:
         if not medico or medico.activo == 0:
             raise ValueError(f"No existe un médico activo con matrícula {nro_matricula_medico}.")        
         
-        # Validar el rango de fechas
-        if isinstance(fecha_inicio, str):
-            try:
-                fecha_inicio = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
-            except ValueError:
-                raise ValueError("La fecha tiene un formato inválido (usar YYYY-MM-DD)")
-        if isinstance(fecha_inicio, (datetime, date)):
-            fecha_inicio = fecha_inicio.date() if isinstance(fecha_inicio, datetime) else fecha_inicio
-        else:
-            raise ValueError("La fecha debe ser un string 'YYYY-MM-DD' o un objeto date/datetime.")    
-        
-
-        if isinstance(fecha_fin, str):
-            try:
-                fecha_fin = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
-            except ValueError:
-                raise ValueError("La fecha tiene un formato inválido (usar YYYY-MM-DD)")
-        if isinstance(fecha_fin, (datetime, date)):
-            fecha_fin = fecha_fin.date() if isinstance(fecha_fin, datetime) else fecha_fin
-        else:
-            raise ValueError("La fecha debe ser un string 'YYYY-MM-DD' o un objeto date/datetime.")
-
-        if fecha_inicio > fecha_fin:
-            raise ValueError("La fecha de inicio no puede ser posterior a la fecha de fin.")
-        
-        if (fecha_fin - fecha_inicio).days > 30:
-            raise ValueError("El período entre las fechas no puede ser mayor a 30 días.")
+        fecha_inicio, fecha_fin = self._validar_periodo(fecha_inicio, fecha_fin)
         
         # Obtener los turnos del médico en el período especificado
         try:
+            if como_batch:
+                return self.turno_dao.obtener_batch_por_periodo(fecha_inicio, fecha_fin, nro_matricula_medico=nro_matricula_medico)
             return self.turno_dao.obtener_turnos_por_medico_en_un_periodo(nro_matricula_medico, fecha_inicio, fecha_fin)
         except Exception as e:
             print(f"[ERROR DB] Fallo al obtener turnos por medico y periodo: {e}")
             raise RuntimeError("Ocurrió un error técnico al consultar los turnos medico y periodo.")
 
-    def obtener_turnos_por_especialidad_en_un_periodo(self, id_especialidad, fecha_inicio, fecha_fin):
-        """Obtiene turnos de todos los médicos de una especialidad en un rango de fechas."""
+    def iterar_turnos_por_medico_en_un_periodo(self, nro_matricula_medico, fecha_inicio, fecha_fin, tamanio_bloque=500):
+        """
+        Igual que obtener_turnos_por_medico_en_un_periodo pero para listados grandes: admite
+        períodos de hasta MAX_DIAS_LISTADO días, excluye los turnos disponibles y retorna
+        un iterador de bloques (listas de Turno) leídos de a poco de la base.
+        """
+        try:
+            medico = self.medico_dao.obtener_por_id(nro_matricula_medico)
+        except Exception as e:
+            raise RuntimeError(f"Fallo técnico al verificar el médico {nro_matricula_medico}: {e}")
+
+        if not medico or medico.activo == 0:
+            raise ValueError(f"No existe un médico activo con matrícula {nro_matricula_medico}.")
+
+        fecha_inicio, fecha_fin = self._validar_periodo(fecha_inicio, fecha_fin, self.MAX_DIAS_LISTADO)
+        return self.turno_dao.iterar_turnos_por_medico_en_un_periodo(
+            nro_matricula_medico, fecha_inicio, fecha_fin, excluir_estados=("disponible",), tamanio_bloque=tamanio_bloque
+        )
+
+    def obtener_turnos_por_especialidad_en_un_periodo(self, id_especialidad, fecha_inicio, fecha_fin, como_batch=False):
+        """
+        Obtiene turnos de todos los médicos de una especialidad en un rango de fechas.
+        Con como_batch=True retorna un TurnoBatch (columnar, sin motivo/observaciones).
+        """
         try:
             id_especialidad = int(id_especialidad)
         except Exception:
@@ -416,33 +470,11 @@ class TurnoService:
         if not especialidad or getattr(especialidad, "activo", 0) == 0:
             raise ValueError(f"No existe una especialidad activa con ID {id_especialidad}.")
 
-        if isinstance(fecha_inicio, str):
-            try:
-                fecha_inicio = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
-            except ValueError:
-                raise ValueError("La fecha tiene un formato inválido (usar YYYY-MM-DD)")
-        if isinstance(fecha_inicio, datetime):
-            fecha_inicio = fecha_inicio.date()
-        if not isinstance(fecha_inicio, date):
-            raise ValueError("La fecha debe ser un string 'YYYY-MM-DD' o un objeto date/datetime.")
-
-        if isinstance(fecha_fin, str):
-            try:
-                fecha_fin = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
-            except ValueError:
-                raise ValueError("La fecha tiene un formato inválido (usar YYYY-MM-DD)")
-        if isinstance(fecha_fin, datetime):
-            fecha_fin = fecha_fin.date()
-        if not isinstance(fecha_fin, date):
-            raise ValueError("La fecha debe ser un string 'YYYY-MM-DD' o un objeto date/datetime.")
-
-        if fecha_inicio > fecha_fin:
-            raise ValueError("La fecha de inicio no puede ser posterior a la fecha de fin.")
-
-        if (fecha_fin - fecha_inicio).days > 30:
-            raise ValueError("El período entre las fechas no puede ser mayor a 30 días.")
+        fecha_inicio, fecha_fin = self._validar_periodo(fecha_inicio, fecha_fin)
 
         try:
+            if como_batch:
+                return self.turno_dao.obtener_batch_por_periodo(fecha_inicio, fecha_fin, id_especialidad=id_especialidad)
             return self.turno_dao.obtener_turnos_por_especialidad_en_un_periodo(
                 id_especialidad, fecha_inicio, fecha_fin
             )
@@ -460,6 +492,30 @@ class TurnoService:
             print(f"[ERROR DB] Fallo al obtener resumen de asistencias: {e}")
             raise RuntimeError("Ocurrió un error técnico al consultar el resumen de asistencias.")
 
+    def obtener_asistencias_por_intervalo(self, fecha_inicio, fecha_fin, intervalo="dia", desglose=None,
+                                          nro_matricula_medico=None, id_especialidad=None):
+        """
+        Turnos atendidos, ausentes, cancelados y programados por día, semana o mes en un rango
+        de fechas de cualquier longitud. `desglose` ('medico' o 'especialidad') agrega una fila
+        por grupo en cada intervalo. Los conteos se hacen en la base (no se leen los turnos).
+        Retorna una lista de diccionarios, uno por intervalo (y grupo), ordenados por fecha.
+        """
+        if intervalo not in TurnoDAO.INTERVALOS:
+            raise ValueError(f"Intervalo inválido. Debe ser uno de: {', '.join(TurnoDAO.INTERVALOS)}.")
+        if desglose is not None and desglose not in TurnoDAO.DESGLOSES:
+            raise ValueError(f"Desglose inválido. Debe ser uno de: {', '.join(TurnoDAO.DESGLOSES)}.")
+        fecha_inicio, fecha_fin = self._validar_periodo(fecha_inicio, fecha_fin, max_dias=None)
+
+        try:
+            columnas, filas = self.turno_dao.contar_asistencias_por_intervalo(
+                fecha_inicio, fecha_fin, intervalo, desglose,
+                nro_matricula_medico=nro_matricula_medico, id_especialidad=id_especialidad
+            )
+            return [dict(zip(columnas, fila)) for fila in filas]
+        except Exception as e:
+            print(f"[ERROR DB] Fallo al obtener asistencias por intervalo: {e}")
+            raise RuntimeError("Ocurrió un error técnico al consultar las asistencias por intervalo.")
+
     def obtener_cantidad_turnos_por_estado_y_especialidad(self, id_especialidad):
         """
         Obtiene la cantidad de turnos por estado para una especialidad médica específica.
@@ -508,35 +564,7 @@ class TurnoService:
         """
         # 1. Validación de fechas (formato y lógica)
         try:
-            # Validar el rango de fechas
-            if isinstance(fecha_inicio, str):
-                try:
-                    fecha_inicio = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
-                except ValueError:
-                    raise ValueError("La fecha tiene un formato inválido (usar YYYY-MM-DD)")
-            if isinstance(fecha_inicio, (datetime, date)):
-                fecha_inicio = fecha_inicio.date() if isinstance(fecha_inicio, datetime) else fecha_inicio
-            else:
-                raise ValueError("La fecha debe ser un string 'YYYY-MM-DD' o un objeto date/datetime.")    
-            
-
-            if isinstance(fecha_fin, str):
-                try:
-                    fecha_fin = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
-                except ValueError:
-                    raise ValueError("La fecha tiene un formato inválido (usar YYYY-MM-DD)")
-            if isinstance(fecha_fin, (datetime, date)):
-                fecha_fin = fecha_fin.date() if isinstance(fecha_fin, datetime) else fecha_fin
-            else:
-                raise ValueError("La fecha debe ser un string 'YYYY-MM-DD' o un objeto date/datetime.")
-
-            if fecha_inicio > fecha_fin:
-                raise ValueError("La fecha de inicio no puede ser posterior a la fecha de fin.")
-            
-            if (fecha_fin - fecha_inicio).days > 30:
-                raise ValueError("El período entre las fechas no puede ser mayor a 30 días.")
-            
-            
+            fecha_inicio, fecha_fin = self._validar_periodo(fecha_inicio, fecha_fin)
         except ValueError as e:
             # Captura errores de formato o lógica de fechas
             print(f"[ERROR VALIDACIÓN] Error en el formato o lógica de fechas: {e}")
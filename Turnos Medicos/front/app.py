@@ -2,6 +2,8 @@ import os
 import sys
 import re
 import calendar
+import subprocess
+import threading
 import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
@@ -21,6 +23,9 @@ try:
     from medico_service import MedicoService
     from turno_service import TurnoService
     from reporte_service import ReporteService
+    from cola_reportes import ColaReportes, TERMINADO, ERROR, CANCELADO
+    from mail_outbox import DespachadorMails
+    from recordatorio_service import RecordatorioService
     from consulta_service import ConsultaService
     from receta_service import RecetaService
     from persistencia.dao.paciente_dao import PacienteDAO
@@ -62,6 +67,7 @@ class App(tk.Tk):
             self.medico_service = MedicoService()
             self.turno_service = TurnoService()
             self.reporte_service = ReporteService()
+            self.cola_reportes = ColaReportes(self.reporte_service)
             self.consulta_service = ConsultaService()
             self.receta_service = RecetaService()
             self.paciente_dao = PacienteDAO()
@@ -69,11 +75,15 @@ class App(tk.Tk):
             self.especialidad_dao = EspecialidadDAO()
             self.receta_dao = RecetaDAO()
             self.historial_dao = HistorialClinicoDAO()
+            # Workers que envían en segundo plano los mails encolados (confirmaciones de turnos)
+            self.despachador_mails = DespachadorMails()
+            self.despachador_mails.iniciar()
         except Exception:
             # tolerar inicialización fallida; manejaremos con mensajes en botones
             self.medico_service = None
             self.turno_service = None
             self.reporte_service = None
+            self.cola_reportes = None
             self.consulta_service = None
             self.receta_service = None
             self.paciente_dao = None
@@ -81,8 +91,20 @@ class App(tk.Tk):
             self.especialidad_dao = None
             self.receta_dao = None
             self.historial_dao = None
+            self.despachador_mails = None
 
         self._create_widgets()
+        self.protocol('WM_DELETE_WINDOW', self._al_cerrar)
+
+    def _al_cerrar(self):
+        if self.despachador_mails is not None:
+            self.despachador_mails.detener(timeout=2.0)
+        if self.cola_reportes is not None:
+            self.cola_reportes.detener()
+        if self.reporte_service is not None:
+            # Termina los procesos del pool de gráficos
+            self.reporte_service.cerrar()
+        self.destroy()
 
     def _create_widgets(self):
         # Cabecera
@@ -1172,6 +1194,13 @@ class App(tk.Tk):
         self.combo_entidad.current(0)
         self.combo_entidad.bind('<<ComboboxSelected>>', lambda e: self._refresh_abc())
 
+        # Búsqueda type-ahead (pacientes y médicos)
+        ttk.Label(left, text='Buscar (nombre, apellido, DNI/matrícula o email):').pack(anchor='w', padx=8, pady=(8,0))
+        self.entry_buscar_abc = ttk.Entry(left)
+        self.entry_buscar_abc.pack(fill='x', padx=8)
+        self._buscar_abc_job = None
+        self.entry_buscar_abc.bind('<KeyRelease>', self._on_buscar_abc)
+
         # Treeview (definimos hasta 6 columnas; cada entidad usará las que necesite)
         cols = ('pk', 'col1', 'col2', 'col3', 'col4', 'col5')
         self.tree_abc = ttk.Treeview(left, columns=cols, show='headings')
@@ -1197,8 +1226,16 @@ class App(tk.Tk):
 
         self._refresh_abc()
 
+    def _on_buscar_abc(self, _event=None):
+        # Esperar a que el usuario deje de tipear antes de consultar
+        if self._buscar_abc_job is not None:
+            self.after_cancel(self._buscar_abc_job)
+        self._buscar_abc_job = self.after(250, self._refresh_abc)
+
     def _refresh_abc(self):
+        self._buscar_abc_job = None
         entidad = self.combo_entidad.get()
+        texto_busqueda = (self.entry_buscar_abc.get() or '').strip()
 
         # Actualizar encabezados según la entidad seleccionada.
         # Pacientes: agregar "Fecha de nacimiento" y "Dirección" (total 6 columnas).
@@ -1230,7 +1267,10 @@ class App(tk.Tk):
             if entidad == 'Pacientes':
                 if self.paciente_dao is None:
                     raise RuntimeError('DAO Paciente no disponible')
-                items = self.paciente_dao.obtener_todos()
+                if texto_busqueda:
+                    items = self.paciente_dao.buscar(texto_busqueda, 50)
+                else:
+                    items = self.paciente_dao.obtener_todos()
                 for p in items:
                     fecha = getattr(p, 'fecha_nacimiento', '')
                     direccion = getattr(p, 'direccion', '')
@@ -1239,7 +1279,10 @@ class App(tk.Tk):
             elif entidad == 'Médicos':
                 if self.medico_dao is None:
                     raise RuntimeError('DAO Medico no disponible')
-                items = self.medico_dao.obtener_todos()
+                if texto_busqueda:
+                    items = self.medico_dao.buscar(texto_busqueda, 50)
+                else:
+                    items = self.medico_dao.obtener_todos()
                 for m in items:
                     esp = ''
                     try:
@@ -1557,16 +1600,65 @@ class App(tk.Tk):
         right = ttk.LabelFrame(container, text='Generación de emails')
         right.pack(side='left', fill='both', expand=True)
         ttk.Label(right, text='Enviar mail recordatorio turnos mañana').pack(anchor='w', padx=8, pady=(8, 4))
-        ttk.Button(right, text='Enviar', state='disabled').pack(anchor='w', padx=8, pady=4)
+        self.btn_recordatorios = ttk.Button(right, text='Enviar', command=self._enviar_recordatorios)
+        self.btn_recordatorios.pack(anchor='w', padx=8, pady=4)
+
+        # Estado de los reportes que se generan en segundo plano
+        frm_progreso = ttk.Frame(parent)
+        frm_progreso.pack(fill='x', padx=8, pady=(0, 4))
+        self.lbl_reportes_estado = ttk.Label(frm_progreso, text='Sin reportes en curso')
+        self.lbl_reportes_estado.pack(side='left')
+        self.pb_reportes = ttk.Progressbar(frm_progreso, mode='determinate', maximum=100, length=220)
+        self.pb_reportes.pack(side='right')
+        self._reportes_en_curso = {}
 
         self.reportes_log = tk.Text(parent, height=12)
         self.reportes_log.pack(fill='both', expand=True, padx=8, pady=(0, 8))
 
+    def _enviar_recordatorios(self):
+        """Encola y envía en segundo plano los recordatorios de los turnos de mañana."""
+        if self.turno_service is None:
+            messagebox.showerror('Error', 'Servicio de turnos no disponible')
+            return
+        self.btn_recordatorios.config(state='disabled')
+        self.reportes_log.insert(tk.END, 'Enviando recordatorios de los turnos de mañana...\n')
+        resultado = {}
+
+        def trabajar():
+            servicio = None
+            try:
+                servicio = RecordatorioService(despachador=self.despachador_mails)
+                resultado['resumen'] = servicio.enviar_recordatorios()
+            except Exception as e:
+                resultado['error'] = e
+            finally:
+                if servicio is not None:
+                    servicio.cerrar()
+
+        hilo = threading.Thread(target=trabajar, daemon=True)
+        hilo.start()
+        self.after(300, self._poll_recordatorios, hilo, resultado)
+
+    def _poll_recordatorios(self, hilo, resultado):
+        if hilo.is_alive():
+            self.after(300, self._poll_recordatorios, hilo, resultado)
+            return
+        self.btn_recordatorios.config(state='normal')
+        if 'error' in resultado:
+            self.reportes_log.insert(tk.END, f"Error al enviar recordatorios: {resultado['error']}\n")
+            messagebox.showerror('Error al enviar recordatorios', str(resultado['error']))
+            return
+        r = resultado['resumen']
+        texto = (f"Recordatorios: {r['turnos']} turnos mañana, {r['encolados']} nuevos "
+                 f"({r['ya_encolados']} ya encolados antes), {r['enviados']} enviados, {r['fallidos']} con error.")
+        self.reportes_log.insert(tk.END, texto + '\n')
+        messagebox.showinfo('Recordatorios', texto)
+
     def _on_generar_reportes(self):
         self._open_report_dialog()
 
     def _open_report_dialog(self, default_type=None):
-        if self.reporte_service is None:
+        if self.reporte_service is None or self.cola_reportes is None:
             messagebox.showerror('Error', 'Servicio de reportes no disponible')
             return
 
@@ -1630,25 +1722,28 @@ class App(tk.Tk):
                     fi = ent_fi.get().strip(); ff = ent_ff.get().strip()
                     if not self._is_valid_date(fi) or not self._is_valid_date(ff):
                         raise ValueError('Fechas inválidas. Formato YYYY-MM-DD')
-                    archivo = self.reporte_service.listado_turnos_por_medico_en_un_periodo(nro, fi, ff)
+                    id_trabajo = self.cola_reportes.encolar('turnos_por_medico', nro_matricula_medico=nro,
+                                                            fecha_inicio=fi, fecha_fin=ff)
                 elif tipo == 'Cantidad por especialidad':
-                    archivo = self.reporte_service.reporte_cantidad_turnos_por_especialidad()
+                    id_trabajo = self.cola_reportes.encolar('cantidad_por_especialidad')
                 elif tipo == 'Pacientes atendidos en período':
                     fi = ent_fi.get().strip(); ff = ent_ff.get().strip()
                     if not self._is_valid_date(fi) or not self._is_valid_date(ff):
                         raise ValueError('Fechas inválidas. Formato YYYY-MM-DD')
-                    archivo = self.reporte_service.reporte_pacientes_atendidos_en_un_periodo(fi, ff)
+                    id_trabajo = self.cola_reportes.encolar('pacientes_atendidos', fecha_inicio=fi, fecha_fin=ff)
                 elif tipo == 'Asistencias vs inasistencias':
                     fi = ent_fi.get().strip(); ff = ent_ff.get().strip()
                     if not self._is_valid_date(fi) or not self._is_valid_date(ff):
                         raise ValueError('Fechas inválidas. Formato YYYY-MM-DD')
-                    archivo = self.reporte_service.asistencias_vs_inasistencias_de_pacientes(fi, ff)
+                    id_trabajo = self.cola_reportes.encolar('asistencias', fecha_inicio=fi, fecha_fin=ff)
                 else:
                     raise ValueError('Tipo de reporte no soportado')
 
-                msg = f'Reporte generado: {archivo}\n'
-                self.reportes_log.insert(tk.END, msg)
-                messagebox.showinfo('OK', msg)
+                # El reporte se genera en segundo plano; la ventana sigue respondiendo
+                self.reportes_log.insert(tk.END, f'Reporte #{id_trabajo} en cola: {tipo}\n')
+                self._reportes_en_curso[id_trabajo] = tipo
+                if len(self._reportes_en_curso) == 1:
+                    self.after(300, self._poll_reportes)
                 dlg.destroy()
             except Exception as e:
                 messagebox.showerror('Error al generar reporte', str(e))
@@ -1658,6 +1753,46 @@ class App(tk.Tk):
         btn_close = ttk.Button(dlg, text='Cancelar', command=dlg.destroy)
         btn_close.pack(side='right', padx=6, pady=12)
 
+    def _poll_reportes(self):
+        """Consulta el estado de los reportes encolados y actualiza la pestaña de reportes."""
+        for id_trabajo, tipo in list(self._reportes_en_curso.items()):
+            estado = self.cola_reportes.estado(id_trabajo)
+            if estado is None:
+                del self._reportes_en_curso[id_trabajo]
+                continue
+            if estado['estado'] == TERMINADO:
+                del self._reportes_en_curso[id_trabajo]
+                self.reportes_log.insert(tk.END, f"Reporte #{id_trabajo} generado: {estado['ruta']}\n")
+                self._abrir_archivo(estado['ruta'])
+            elif estado['estado'] == ERROR:
+                del self._reportes_en_curso[id_trabajo]
+                self.reportes_log.insert(tk.END, f"Reporte #{id_trabajo} con error: {estado['error']}\n")
+                messagebox.showerror('Error al generar reporte', f"{tipo}: {estado['error']}")
+            elif estado['estado'] == CANCELADO:
+                del self._reportes_en_curso[id_trabajo]
+            else:
+                self.lbl_reportes_estado.config(
+                    text=f"Reporte #{id_trabajo} ({tipo}): {estado['mensaje']} - {estado['progreso']:.0%}")
+                self.pb_reportes['value'] = estado['progreso'] * 100
+
+        if self._reportes_en_curso:
+            self.after(300, self._poll_reportes)
+        else:
+            self.lbl_reportes_estado.config(text='Sin reportes en curso')
+            self.pb_reportes['value'] = 0
+
+    def _abrir_archivo(self, ruta):
+        """Abre un archivo (PDF) con la aplicación predeterminada del sistema."""
+        try:
+            if sys.platform.startswith('win'):
+                os.startfile(ruta)
+            elif sys.platform == 'darwin':
+                subprocess.Popen(['open', ruta])
+            else:
+                subprocess.Popen(['xdg-open', ruta])
+        except Exception as e:
+            self.reportes_log.insert(tk.END, f'No se pudo abrir {ruta}: {e}\n')
+
     def _open_report_turnos_medico(self):
         self._open_report_dialog('Turnos por médico en período')
 
@@ -0,0 +1,58 @@
+"""
+Benchmark de throughput de ExportacionService (CSV / JSON Lines, con y sin gzip).
+
+Ejecución (desde la raíz del repo):
+    python ./tests/benchmark_exportacion.py --turnos 1000000
+
+Crea una base sintética temporal (ver datos_sinteticos.py), exporta todos los turnos en
+cada formato y muestra filas/segundo, tamaño del archivo y pico de memoria (tracemalloc),
+que debe mantenerse constante aunque crezca la cantidad de filas.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datos_sinteticos import preparar_rutas, crear_base
+
+preparar_rutas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turnos', type=int, default=1000000, help='cantidad de turnos sintéticos')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'benchmark_exportacion.db'))
+    parser.add_argument('--salida', default=os.path.join(tempfile.gettempdir(), 'benchmark_exportacion'))
+    args = parser.parse_args()
+
+    print(f"Generando {args.turnos} turnos en {args.db} ...")
+    inicio = time.perf_counter()
+    crear_base(args.db, args.turnos)
+    print(f"Datos generados en {time.perf_counter() - inicio:.1f} s")
+
+    from exportacion_service import ExportacionService
+    servicio = ExportacionService(directorio=args.salida)
+
+    for formato in ExportacionService.FORMATOS:
+        for comprimir in (False, True):
+            ruta = os.path.join(args.salida, f"turnos.{formato}" + (".gz" if comprimir else ""))
+            tracemalloc.start()
+            resultado = servicio.exportar_turnos(formato=formato, comprimir=comprimir, ruta=ruta)
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            tamanio = os.path.getsize(ruta)
+            print(f"{formato:<5} gzip={str(comprimir):<5} filas={resultado['filas']:>9}  "
+                  f"{resultado['filas'] / resultado['segundos']:>10.0f} filas/s  "
+                  f"archivo={tamanio / 1024 / 1024:8.1f} MiB  pico={pico / 1024 / 1024:6.2f} MiB")
+            os.remove(ruta)
+
+    for sufijo in ('', '-wal', '-shm'):
+        if os.path.exists(args.db + sufijo):
+            os.remove(args.db + sufijo)
+
+
+if __name__ == '__main__':
+    main()
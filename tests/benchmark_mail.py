@@ -0,0 +1,161 @@
+"""
+Benchmark de envío de mails con MailService, sin red: cuántos mensajes por segundo salen por
+cada transporte (SendGrid, SMTP y el spool de simulación) y la latencia de cada envío
+(p50 / p95 / p99), con distintas cantidades de hilos enviando a la vez.
+
+Ejecución (desde la raíz del repo):
+    python ./tests/benchmark_mail.py
+    python ./tests/benchmark_mail.py --mensajes 5000 --concurrencia 1 8 32 --transportes sendgrid smtp
+    python ./tests/benchmark_mail.py --pool-smtp 8 --json benchmark_mail.json
+
+SendGrid y SMTP se miden contra los servidores de servidores_locales.py (API HTTP falsa de
+SendGrid y un SMTP que guarda los mensajes en memoria); el spool escribe en una carpeta
+temporal. Cada envío pasa por MailService.enviar_mensaje_detallado completo (caché de
+supresiones, circuit breaker, pool SMTP, logs), así que se mide el costo del servicio y no
+solo el del transporte. Los servidores locales corren en el mismo proceso, por lo que los
+números sirven para comparar cambios entre sí, no como capacidad real contra el proveedor.
+La salida por consola de MailService se descarta durante las mediciones.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import contextlib
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datos_sinteticos import preparar_rutas
+from servidores_locales import ServidorSMTPLocal, ServidorSendGridLocal
+
+preparar_rutas()
+
+import mail_log
+import mail_resiliencia
+from mail_log import SpoolSimulacion
+from mail_service import MailService
+from smtp_pool import obtener_pool, cerrar_pools
+from sendgrid_cliente import cerrar_clientes
+
+TRANSPORTES = ("sendgrid", "smtp", "spool")
+
+
+def configuracion(transporte, sendgrid, smtp):
+    """mail_config que hace que MailService use solo `transporte`."""
+    config = {clave: None for clave in MailService.CLAVES_CONFIG}
+    config['FROM_EMAIL'] = 'clinica@example.com'
+    if transporte == "sendgrid":
+        config.update({'SENDGRID_API_KEY': 'clave-local', 'SENDGRID_API_URL': sendgrid.url})
+    elif transporte == "smtp":
+        config.update({'SMTP_HOST': smtp.host, 'SMTP_PORT': str(smtp.puerto), 'SMTP_USER': 'usuario',
+                       'SMTP_PASS': 'clave', 'SMTP_TLS': 'none'})
+    return config
+
+
+def percentil(valores_ordenados, p):
+    """Percentil `p` (0-100) por el método del rango más cercano."""
+    if not valores_ordenados:
+        return None
+    indice = max(0, min(len(valores_ordenados) - 1, int(round(p / 100 * len(valores_ordenados))) - 1))
+    return valores_ordenados[indice]
+
+
+def medir(transporte, config, cantidad, hilos):
+    """Envía `cantidad` mails con `hilos` hilos a la vez. Retorna el resumen de la corrida."""
+    def enviar(i):
+        inicio = time.perf_counter()
+        resultado = MailService.enviar_mensaje_detallado(
+            f"paciente{i}@example.com", f"Confirmación de turno #{i}",
+            f"Hola paciente {i},\nSu turno quedó confirmado.\nAtentamente grupo 67", config,
+            prefijo_archivo='benchmark', referencia=i)
+        return time.perf_counter() - inicio, resultado
+
+    mail_resiliencia.reiniciar_circuitos()
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        # Un envío previo para abrir conexiones y cargar la caché de supresiones
+        enviar(-1)
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+            resultados = list(ejecutor.map(enviar, range(cantidad)))
+        segundos = time.perf_counter() - inicio
+
+    latencias = sorted(duracion for duracion, _ in resultados)
+    enviados = sum(1 for _, r in resultados if r["enviado"])
+    otros = {r["transporte"] for _, r in resultados if r["enviado"] and r["transporte"] != transporte}
+    resumen = {
+        "transporte": transporte,
+        "hilos": hilos,
+        "mensajes": cantidad,
+        "enviados": enviados,
+        "segundos": round(segundos, 4),
+        "mensajes_por_segundo": round(enviados / segundos, 1) if segundos else None,
+        "latencia_ms": {nombre: round(percentil(latencias, p) * 1000, 3)
+                        for nombre, p in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "latencia_max_ms": round(latencias[-1] * 1000, 3),
+    }
+    print(f"  {transporte:<9} hilos={hilos:>3}  {enviados:>6}/{cantidad:<6} "
+          f"{resumen['mensajes_por_segundo']:>9.1f} msg/s  {resumen['mensajes_por_segundo'] * 60:>10.0f} msg/min  "
+          + "  ".join(f"{nombre}={valor:8.2f} ms" for nombre, valor in resumen["latencia_ms"].items())
+          + (f"  [WARN] {cantidad - enviados} sin enviar" if enviados < cantidad else "")
+          + (f"  [WARN] también por {', '.join(sorted(otros))}" if otros else ""))
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mensajes', type=int, default=2000, help='mails por transporte y concurrencia')
+    parser.add_argument('--concurrencia', type=int, nargs='+', default=[1, 4, 16],
+                        help='cantidades de hilos enviando a la vez')
+    parser.add_argument('--transportes', nargs='+', choices=TRANSPORTES, default=list(TRANSPORTES))
+    parser.add_argument('--pool-smtp', type=int, default=None,
+                        help='conexiones del pool SMTP (por defecto, las de MailService)')
+    parser.add_argument('--json', default=None, help='archivo donde guardar los resultados')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="benchmark_mail_")
+    mail_log._spool = SpoolSimulacion(os.path.join(directorio, "simulados.jsonl"))
+    mail_log.iniciar_log(directorio)
+    resultados = []
+    try:
+        with ServidorSendGridLocal() as sendgrid, ServidorSMTPLocal() as smtp:
+            if args.pool_smtp:
+                # Mismos parámetros que usa MailService, así toma este pool ya creado
+                obtener_pool(smtp.host, smtp.puerto, 'usuario', 'clave', tls='none', tamanio=args.pool_smtp)
+            print(f"Enviando {args.mensajes} mails por transporte con {args.concurrencia} hilos ...")
+            for transporte in args.transportes:
+                config = configuracion(transporte, sendgrid, smtp)
+                for hilos in args.concurrencia:
+                    resultados.append(medir(transporte, config, args.mensajes, hilos))
+            recibidos = {"sendgrid": len(sendgrid.envios), "smtp": len(smtp.mensajes),
+                         "smtp_sesiones": smtp.sesiones, "sendgrid_conexiones": sendgrid.contadores["conexiones"]}
+            print(f"Recibidos por los servidores locales: {recibidos}")
+    finally:
+        cerrar_pools()
+        cerrar_clientes()
+        mail_log.detener_log()
+        mail_log._spool.cerrar()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    if args.json:
+        salida = {
+            "fecha": datetime.now().isoformat(timespec='seconds'),
+            "entorno": {
+                "python": platform.python_version(),
+                "plataforma": platform.platform(),
+                "nucleos": os.cpu_count(),
+                "pool_smtp": args.pool_smtp,
+            },
+            "recibidos": recibidos,
+            "resultados": resultados,
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(salida, f, ensure_ascii=False, indent=2)
+        print(f"Resultados guardados en {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Benchmark de ReporteService: tiempo de cada reporte de punta a punta, separado en las fases
+de consulta, gráficos y armado del PDF, y pico de memoria (tracemalloc).
+
+Ejecución (desde la raíz del repo):
+    python ./tests/benchmark_reportes.py
+    python ./tests/benchmark_reportes.py --tamanios 1000 100000 --json resultados.json
+
+Para cada tamaño se crea una base sintética temporal (ver datos_sinteticos.py) y se corre
+en un proceso propio (DBConnection es un singleton). Los reportes se generan en una carpeta
+temporal con el cache vacío, así que se mide siempre la primera generación.
+
+Las fases se toman de los avisos de progreso del reporte: desde "Leyendo..." hasta el
+siguiente aviso es consulta, "Generando..." es gráficos y "Armando..." es PDF. Los tiempos
+incluyen el costo de tracemalloc.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import platform
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datos_sinteticos import preparar_rutas, crear_base, rango_turnos
+
+preparar_rutas()
+
+FASES = (("Leyendo", "consulta"), ("Generando", "graficos"), ("Armando", "pdf"))
+
+
+class Cronometro:
+    """Callback de progreso que acumula el tiempo transcurrido en cada fase."""
+
+    def __init__(self):
+        self.fases = {nombre: 0.0 for _, nombre in FASES}
+        self._fase = None
+        self._desde = None
+
+    def __call__(self, fraccion, mensaje=None):
+        ahora = time.perf_counter()
+        if self._fase is not None:
+            self.fases[self._fase] += ahora - self._desde
+        self._fase = next((nombre for prefijo, nombre in FASES if (mensaje or "").startswith(prefijo)), None)
+        self._desde = ahora
+
+
+def medir_reporte(nombre, generar):
+    cronometro = Cronometro()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    error = None
+    try:
+        generar(cronometro)
+    except (ValueError, RuntimeError) as e:
+        error = str(e)
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    resultado = {
+        "reporte": nombre,
+        "segundos": round(segundos, 4),
+        "fases": {fase: round(valor, 4) for fase, valor in cronometro.fases.items()},
+        "pico_mib": round(pico / 1024 / 1024, 2),
+        "error": error,
+    }
+    fases = "  ".join(f"{fase}={valor:7.3f}s" for fase, valor in resultado["fases"].items())
+    print(f"  {nombre:<28} total={segundos:8.3f}s  {fases}  pico={resultado['pico_mib']:8.2f} MiB"
+          + (f"  [ERROR] {error}" if error else ""))
+    return resultado
+
+
+def correr_tamanio(cantidad_turnos, ruta_db, workers):
+    """Crea la base de `cantidad_turnos` y mide todos los reportes. Corre en un proceso propio."""
+    print(f"Generando {cantidad_turnos} turnos en {ruta_db} ...")
+    inicio = time.perf_counter()
+    conn = crear_base(ruta_db, cantidad_turnos)
+    segundos_carga = time.perf_counter() - inicio
+    print(f"Datos generados en {segundos_carga:.1f} s")
+
+    primer_dia, ultimo_dia = rango_turnos(conn)
+    fin_mes = min(primer_dia + timedelta(days=29), ultimo_dia)
+    fin_anio = min(primer_dia + timedelta(days=365), ultimo_dia)
+    matricula = conn.execute("SELECT MIN(nro_matricula) FROM Medico").fetchone()[0]
+
+    from reporte_service import ReporteService
+    salidas = tempfile.mkdtemp(prefix="benchmark_reportes_")
+    servicio = ReporteService(workers=workers, directorio=salidas)
+    reportes = [
+        ("turnos_por_medico", lambda p: servicio.listado_turnos_por_medico_en_un_periodo(
+            matricula, primer_dia, fin_anio, progreso=p)),
+        ("cantidad_por_especialidad", lambda p: servicio.reporte_cantidad_turnos_por_especialidad(progreso=p)),
+        ("pacientes_atendidos", lambda p: servicio.reporte_pacientes_atendidos_en_un_periodo(
+            primer_dia, fin_mes, progreso=p)),
+        ("asistencias", lambda p: servicio.asistencias_vs_inasistencias_de_pacientes(
+            primer_dia, fin_mes, progreso=p)),
+        ("asistencias_por_semana", lambda p: servicio.reporte_asistencias_por_intervalo(
+            primer_dia, ultimo_dia, "semana", progreso=p)),
+    ]
+    try:
+        resultados = [medir_reporte(nombre, generar) for nombre, generar in reportes]
+    finally:
+        servicio.cerrar()
+        shutil.rmtree(salidas, ignore_errors=True)
+        conn.close()
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(ruta_db + sufijo):
+                os.remove(ruta_db + sufijo)
+
+    return {"turnos": cantidad_turnos, "segundos_carga": round(segundos_carga, 2),
+            "periodo": [str(primer_dia), str(ultimo_dia)], "reportes": resultados}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanios', type=int, nargs='+', default=[1000, 100000, 1000000],
+                        help='cantidades de turnos sintéticos a medir')
+    parser.add_argument('--workers', type=int, default=1, help='procesos para renderizar gráficos')
+    parser.add_argument('--json', default='benchmark_reportes.json', help='archivo de resultados')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'benchmark_reportes.db'))
+    # Uso interno: medir un único tamaño y escribir el resultado parcial
+    parser.add_argument('--solo', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.solo is not None:
+        resultado = correr_tamanio(args.solo, args.db, args.workers)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f)
+        return
+
+    resultados = []
+    for cantidad in args.tamanios:
+        fd, parcial = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            proceso = subprocess.run([sys.executable, os.path.abspath(__file__), '--solo', str(cantidad),
+                                      '--workers', str(args.workers), '--db', args.db, '--json', parcial])
+            if proceso.returncode != 0:
+                print(f"[ERROR] Falló el benchmark con {cantidad} turnos (código {proceso.returncode})")
+                resultados.append({"turnos": cantidad, "error": f"código de salida {proceso.returncode}"})
+                continue
+            with open(parcial, encoding='utf-8') as f:
+                resultados.append(json.load(f))
+        finally:
+            os.remove(parcial)
+
+    salida = {
+        "fecha": datetime.now().isoformat(timespec='seconds'),
+        "entorno": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+            "nucleos": os.cpu_count(),
+            "workers": args.workers,
+        },
+        "resultados": resultados,
+    }
+    with open(args.json, 'w', encoding='utf-8') as f:
+        json.dump(salida, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark de memoria y tiempo de carga: lista de objetos Turno vs TurnoBatch.
+
+Ejecución (desde la raíz del repo):
+    python ./tests/benchmark_turno_batch.py --turnos 100000
+
+Crea una base sintética temporal (ver datos_sinteticos.py), carga todos los turnos
+del período de las dos formas y muestra tiempo de carga, memoria retenida
+(tracemalloc) y bytes por turno.
+"""
+import os
+import sys
+import gc
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datos_sinteticos import preparar_rutas, crear_base, rango_turnos
+
+preparar_rutas()
+
+
+def medir(nombre, cargar, cantidad_esperada):
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = cargar()
+    segundos = time.perf_counter() - inicio
+    actual, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    cantidad = len(resultado)
+    if cantidad != cantidad_esperada:
+        print(f"[WARN] {nombre}: se esperaban {cantidad_esperada} turnos y se cargaron {cantidad}")
+    print(f"{nombre:<16} turnos={cantidad:>9}  carga={segundos:8.3f} s  "
+          f"memoria={actual / 1024 / 1024:8.2f} MiB  pico={pico / 1024 / 1024:8.2f} MiB  "
+          f"bytes/turno={actual / max(cantidad, 1):8.1f}")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turnos', type=int, default=100000, help='cantidad de turnos sintéticos')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'benchmark_turno_batch.db'))
+    args = parser.parse_args()
+
+    print(f"Generando {args.turnos} turnos en {args.db} ...")
+    inicio = time.perf_counter()
+    conn = crear_base(args.db, args.turnos)
+    print(f"Datos generados en {time.perf_counter() - inicio:.1f} s")
+
+    from modelos.turno import Turno
+    from persistencia.dao.turno_dao import TurnoDAO
+
+    dao = TurnoDAO()
+    desde, hasta = rango_turnos(conn)
+
+    def cargar_objetos():
+        cur = conn.cursor()
+        cur.execute("""SELECT * FROM Turno WHERE date(fecha_hora_inicio) BETWEEN ? AND ?
+                       ORDER BY fecha_hora_inicio ASC""", (desde.isoformat(), hasta.isoformat()))
+        return [Turno(**row) for row in cur.fetchall()]
+
+    objetos = medir("lista de Turno", cargar_objetos, args.turnos)
+    del objetos
+    batch = medir("TurnoBatch", lambda: dao.obtener_batch_por_periodo(desde, hasta), args.turnos)
+    print(f"TurnoBatch: {batch.tamanio_bytes() / len(batch):.1f} bytes/turno en los arreglos")
+    print(f"Conteo por estado: {batch.contar_por_estado()}")
+
+    conn.close()
+    for sufijo in ('', '-wal', '-shm'):
+        if os.path.exists(args.db + sufijo):
+            os.remove(args.db + sufijo)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Prueba del cache de consultas (persistencia/cache_consultas.py) con dos conexiones a una base
+temporal: una escritura propia invalida la tabla, una escritura de otra conexión vacía el cache
+y una consulta que empezó antes de ese vaciado no guarda su resultado viejo. Además, el cache
+no retiene las conexiones cerradas y una conexión que no puede seguir no usa el cache.
+
+Ejecución (desde la raíz del repo):
+    python ./tests/cache_consultas_local.py
+"""
+import os
+import sys
+import gc
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datos_sinteticos import preparar_rutas
+
+preparar_rutas()
+
+from persistencia.cache_consultas import CacheConsultas
+from persistencia.db_connection import Conexion
+
+SQL = "SELECT valor FROM Prueba"
+
+
+def verificar(condicion, mensaje):
+    print(("[OK] " if condicion else "[FALLO] ") + mensaje)
+    if not condicion:
+        sys.exit(1)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "cache.db")
+        conn = sqlite3.connect(ruta, factory=Conexion)
+        otra = sqlite3.connect(ruta, factory=Conexion)
+        conn.execute("CREATE TABLE Prueba (valor INTEGER)")
+        conn.execute("INSERT INTO Prueba VALUES (1)")
+        conn.commit()
+
+        cache = CacheConsultas()
+        cache.limpiar()
+        lecturas = []
+
+        def cargar():
+            lecturas.append(1)
+            return conn.execute(SQL).fetchall()
+
+        cache.obtener(conn, SQL, (), ("Prueba",), cargar)
+        verificar(cache.obtener(conn, SQL, (), ("Prueba",), cargar) == [(1,)] and len(lecturas) == 1,
+                  "la segunda consulta sale del cache")
+
+        conn.execute("UPDATE Prueba SET valor = 2")
+        conn.commit()
+        cache.invalidar("Prueba")
+        verificar(cache.obtener(conn, SQL, (), ("Prueba",), cargar) == [(2,)], "una escritura propia invalida la tabla")
+
+        otra.execute("UPDATE Prueba SET valor = 3")
+        otra.commit()
+        verificar(cache.obtener(conn, SQL, (), ("Prueba",), cargar) == [(3,)],
+                  "una escritura de otra conexión vacía el cache (PRAGMA data_version)")
+
+        def cargar_y_cambiar():
+            # Lee el valor viejo; mientras tanto otra conexión escribe y otro hilo vacía el cache
+            filas = conn.execute(SQL).fetchall()
+            otra.execute("UPDATE Prueba SET valor = 4")
+            otra.commit()
+            cache.obtener(conn, "SELECT 1", (), (), lambda: [(1,)])
+            return filas
+
+        cache.limpiar()
+        verificar(cache.obtener(conn, SQL, (), ("Prueba",), cargar_y_cambiar) == [(3,)],
+                  "la consulta en curso devuelve lo que leyó")
+        verificar(cache.obtener(conn, SQL, (), ("Prueba",), cargar) == [(4,)],
+                  "pero no lo guarda si el cache se vació mientras tanto")
+
+        # Conexiones que se abren y se cierran (por ej. una por worker): no quedan en el cache
+        seguidas = len(cache._data_version)
+        for _ in range(50):
+            temporal = sqlite3.connect(ruta, factory=Conexion)
+            cache.obtener(temporal, SQL, (), ("Prueba",), lambda: temporal.execute(SQL).fetchall())
+            temporal.close()
+        del temporal
+        gc.collect()
+        verificar(len(cache._data_version) == seguidas, "el cache no retiene las conexiones cerradas")
+
+        comun = sqlite3.connect(ruta)
+        lecturas.clear()
+        for _ in range(2):
+            cache.obtener(comun, "SELECT valor + 0 FROM Prueba", (), ("Prueba",), cargar)
+        verificar(len(lecturas) == 2 and cache.version(comun, "Prueba") != cache.version(comun, "Prueba"),
+                  "una conexión sqlite3 común no usa el cache ni repite versión")
+        comun.close()
+        print(f"Estadísticas: {cache.estadisticas()}")
+        conn.close()
+        otra.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Generación de datos sintéticos para benchmarks.
+Crea (o completa) una base SQLite con el esquema de la aplicación y carga
+médicos, pacientes y turnos con inserciones masivas, sin pasar por los services.
+
+Uso desde otro script de tests:
+    from datos_sinteticos import preparar_rutas, crear_base
+    preparar_rutas()
+    crear_base('/tmp/bench.db', cantidad_turnos=100000)
+
+Nota: DBConnection es un singleton, así que cada benchmark debe correr en su
+propio proceso para usar una base distinta.
+"""
+import os
+import sys
+import random
+from datetime import datetime, timedelta
+
+BASE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Turnos Medicos', 'back'))
+SERVICES_PATH = os.path.join(BASE, 'servicios')
+
+ESTADOS_PASADOS = ['atendido'] * 6 + ['ausente', 'cancelado', 'programado']
+MOTIVOS = ['Control', 'Consulta de rutina', 'Dolor de cabeza', 'Chequeo anual', 'Seguimiento']
+
+
+def preparar_rutas():
+    for p in (SERVICES_PATH, BASE):
+        if p not in sys.path:
+            sys.path.insert(0, p)
+
+
+def crear_base(ruta_db, cantidad_turnos, cantidad_medicos=50, cantidad_pacientes=2000,
+               desde=datetime(2025, 1, 6, 8, 0), duracion_minutos=30, semilla=42):
+    """
+    Crea la base en `ruta_db` (se borra si existía) y la carga con datos sintéticos.
+    Cada médico atiende de 8 a 16 hs en turnos de `duracion_minutos`, de lunes a viernes.
+    Retorna la conexión de DBConnection.
+    """
+    preparar_rutas()
+    from persistencia.db_connection import DBConnection
+
+    for sufijo in ('', '-wal', '-shm'):
+        if os.path.exists(ruta_db + sufijo):
+            os.remove(ruta_db + sufijo)
+
+    conn = DBConnection(ruta_db).conn
+    rnd = random.Random(semilla)
+
+    matriculas = [100000 + i for i in range(cantidad_medicos)]
+    conn.executemany(
+        "INSERT INTO Medico (nro_matricula, nombre, apellido, email, id_especialidad) VALUES (?, ?, ?, ?, ?)",
+        [(m, f"Medico{i}", f"Apellido{i}", f"medico{i}@clinica.com", i % 3 + 1) for i, m in enumerate(matriculas)]
+    )
+    dnis = [30000000 + i for i in range(cantidad_pacientes)]
+    conn.executemany(
+        "INSERT INTO Paciente (dni, nombre, apellido, fecha_nacimiento, email, direccion) VALUES (?, ?, ?, ?, ?, ?)",
+        [(d, f"Paciente{i}", f"Apellido{i}", "1980-01-01", f"paciente{i}@mail.com", "Calle 123") for i, d in enumerate(dnis)]
+    )
+    conn.executemany("INSERT INTO HistorialClinico (dni_paciente) VALUES (?)", [(d,) for d in dnis])
+
+    turnos_por_dia = (8 * 60) // duracion_minutos
+    ahora = datetime.now()
+
+    def _turnos():
+        dia = desde
+        generados = 0
+        while generados < cantidad_turnos:
+            if dia.weekday() < 5:
+                for slot in range(turnos_por_dia):
+                    inicio = dia + timedelta(minutes=slot * duracion_minutos)
+                    for matricula in matriculas:
+                        if generados >= cantidad_turnos:
+                            return
+                        if inicio < ahora or rnd.random() < 0.3:
+                            estado = rnd.choice(ESTADOS_PASADOS) if inicio < ahora else 'programado'
+                            yield (inicio.strftime("%Y-%m-%d %H:%M"), rnd.choice(MOTIVOS), None,
+                                   estado, rnd.choice(dnis), matricula)
+                        else:
+                            yield (inicio.strftime("%Y-%m-%d %H:%M"), None, None, 'disponible', None, matricula)
+                        generados += 1
+            dia += timedelta(days=1)
+
+    conn.executemany(
+        """INSERT INTO Turno (fecha_hora_inicio, motivo, observaciones, estado, dni_paciente, nro_matricula_medico)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        _turnos()
+    )
+    conn.commit()
+    return conn
+
+
+def rango_turnos(conn):
+    """Primera y última fecha (date) con turnos cargados."""
+    fila = conn.execute("SELECT MIN(date(fecha_hora_inicio)), MAX(date(fecha_hora_inicio)) FROM Turno").fetchone()
+    return (datetime.strptime(fila[0], "%Y-%m-%d").date(), datetime.strptime(fila[1], "%Y-%m-%d").date())
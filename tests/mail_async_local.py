@@ -0,0 +1,155 @@
+"""
+Prueba del envío de mails con asyncio (servicios/mail_async.py) contra servidores locales con
+latencia simulada: mails enviados uno por uno con MailService frente a todos a la vez con
+mail_async, el límite de envíos por segundo por proveedor, enviar_turno sin cambios con
+MAIL_ASYNC=1, el SMTP por el pool de conexiones (mismo modo TLS que sin MAIL_ASYNC), el tiempo
+máximo de la fachada sincrónica y el despachador del outbox mandando cada tanda reclamada a la vez.
+
+Ejecución (desde la raíz del repo):
+    python ./tests/mail_async_local.py --mensajes 200 --demora 0.02
+
+Sin aiohttp instalado SendGrid se prueba en el modo con asyncio.to_thread sobre el transporte
+sincrónico (se informa al principio); SMTP va siempre por ese modo, sobre el pool SMTP.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+
+# Sin límites por proveedor para medir la concurrencia; el límite se prueba aparte
+os.environ["MAIL_ASYNC_CONCURRENCIA"] = "50"
+os.environ["MAIL_LIMITE_SENDGRID"] = "0"
+os.environ["MAIL_LIMITE_SMTP"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datos_sinteticos import preparar_rutas, crear_base
+from servidores_locales import ServidorSMTPLocal, ServidorSendGridLocal
+
+preparar_rutas()
+
+import mail_log
+import mail_async
+from mail_log import SpoolSimulacion
+from mail_service import MailService
+from mail_outbox import DespachadorMails
+from modelos.mensaje_mail import MensajeMail
+from persistencia.dao.mail_outbox_dao import MailOutboxDAO
+
+
+def verificar(condicion, mensaje):
+    print(("[OK] " if condicion else "[FALLO] ") + mensaje)
+    if not condicion:
+        sys.exit(1)
+
+
+def mensajes_de_prueba(cantidad, prefijo):
+    return [{"to_email": f"{prefijo}{i}@example.com", "subject": f"Recordatorio #{i}", "cuerpo": "Hola",
+             "referencia": i} for i in range(cantidad)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mensajes', type=int, default=200, help='mails por medición')
+    parser.add_argument('--demora', type=float, default=0.02, help='segundos que tarda el proveedor por envío')
+    args = parser.parse_args()
+    print(f"aiohttp: {mail_async.AIOHTTP_AVAILABLE}")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        mail_log._spool = SpoolSimulacion(os.path.join(directorio, "simulados.jsonl"))
+        mail_log.iniciar_log(directorio)
+
+        with ServidorSendGridLocal(demora=args.demora) as sendgrid, ServidorSMTPLocal(demora=args.demora) as smtp:
+            config = {'SENDGRID_API_KEY': 'clave-local', 'SENDGRID_API_URL': sendgrid.url,
+                      'FROM_EMAIL': 'clinica@example.com'}
+            mensajes = mensajes_de_prueba(args.mensajes, "sincronico")
+            with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+                inicio = time.perf_counter()
+                sincronicos = [MailService.enviar_mensaje_detallado(mail_config=config, **m) for m in mensajes]
+                segundos_sync = time.perf_counter() - inicio
+                inicio = time.perf_counter()
+                asincronicos = mail_async.enviar_varios(mensajes_de_prueba(args.mensajes, "async"), config)
+                segundos_async = time.perf_counter() - inicio
+            print(f"    uno por uno: {segundos_sync:.2f} s ({args.mensajes / segundos_sync:.0f} msg/s), "
+                  f"con mail_async: {segundos_async:.2f} s ({args.mensajes / segundos_async:.0f} msg/s)")
+            print(f"    {mail_async.estadisticas()}")
+            verificar(all(r["enviado"] and r["transporte"] == "sendgrid" for r in sincronicos + asincronicos)
+                      and len(sendgrid.envios) == 2 * args.mensajes, "todos los mails llegan a SendGrid")
+            verificar(segundos_async * 3 < segundos_sync, "con mail_async los envíos se solapan (al menos 3 veces más rápido)")
+            verificar(mail_async.estadisticas()["max_en_curso"] <= 50, "no hay más envíos en curso que la concurrencia")
+
+            # 20 por segundo con ráfaga de 20: 60 mails tardan al menos 2 segundos
+            enviador = mail_async.EnviadorAsync(concurrencia=50, limites={"sendgrid": 20, "smtp": 0})
+            with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+                inicio = time.perf_counter()
+                limitados = asyncio.run(enviador.enviar_varios(mensajes_de_prueba(60, "limite"), config))
+                segundos = time.perf_counter() - inicio
+            esperas = enviador.estadisticas()['esperas_por_limite']
+            print(f"    60 mails con límite de 20/s: {segundos:.2f} s, esperas: {esperas}")
+            verificar(all(r["enviado"] for r in limitados) and segundos >= 1.9 and esperas["sendgrid"] > 0,
+                      "el límite por proveedor frena los envíos a SendGrid")
+
+            config_smtp = {'SMTP_HOST': smtp.host, 'SMTP_PORT': str(smtp.puerto), 'SMTP_USER': 'usuario',
+                           'SMTP_PASS': 'clave', 'SMTP_TLS': 'none', 'FROM_EMAIL': 'clinica@example.com',
+                           'MAIL_ASYNC': '1'}
+            turno = {"id_turno": 7, "fecha_hora_inicio": "2030-05-02 10:30:00", "nombre_paciente": "Ana",
+                     "apellido_paciente": "Pérez", "nombre_medico": "Juan", "apellido_medico": "Gómez",
+                     "especialidad": "Clínica", "motivo": "Control"}
+            verificar(MailService.enviar_turno("ana@example.com", turno, config_smtp) is True
+                      and len(smtp.mensajes) == 1, "enviar_turno funciona igual con MAIL_ASYNC=1 (por SMTP)")
+
+            # SMTP por el pool: pocas conexiones para muchos mails, y el mismo modo TLS que sin MAIL_ASYNC
+            sesiones = smtp.sesiones
+            with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+                por_smtp = mail_async.enviar_varios(mensajes_de_prueba(30, "smtp"), config_smtp)
+            print(f"    30 mails por SMTP con mail_async: {smtp.sesiones - sesiones} conexiones nuevas")
+            verificar(all(r["enviado"] and r["transporte"] == "smtp" for r in por_smtp)
+                      and smtp.sesiones - sesiones <= 2, "los envíos SMTP reusan las conexiones del pool")
+            config_auto = dict(config_smtp, SMTP_TLS='auto')
+            # (el servidor local informa en stderr las conexiones cortadas al probar STARTTLS y SSL)
+            with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo), contextlib.redirect_stderr(nulo):
+                sincronico = MailService.enviar_mensaje_detallado("auto@example.com", "TLS", "Hola",
+                                                                  dict(config_auto, MAIL_ASYNC='0'))
+                asincronico = mail_async.enviar("auto@example.com", "TLS", "Hola", config_auto)
+            verificar(sincronico["enviado"] == asincronico["enviado"] and not asincronico["enviado"],
+                      "con SMTP_TLS='auto' y un servidor sin TLS el resultado es el mismo que sin MAIL_ASYNC")
+
+            # Tiempo máximo de la fachada: lo que no termina se cancela y se informa como no enviado
+            with ServidorSendGridLocal(demora=1.0) as lento:
+                config_lento = dict(config, SENDGRID_API_URL=lento.url)
+                with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+                    inicio = time.perf_counter()
+                    uno = mail_async.enviar("lento@example.com", "Lento", "Hola", config_lento, timeout=0.3)
+                    varios = mail_async.enviar_varios(mensajes_de_prueba(3, "lento"), config_lento, timeout=0.3)
+                    segundos = time.perf_counter() - inicio
+                print(f"    envío y tanda con timeout de 0.3 s contra un proveedor de 1 s: {segundos:.2f} s")
+                verificar(segundos < 1.5 and not uno["enviado"] and "no terminó" in uno["error"]
+                          and all(not r["enviado"] and "no terminó" in r["error"] for r in varios),
+                          "lo que no termina a tiempo se cancela y se informa como no enviado")
+            verificar(mail_async.enviar("despues@example.com", "Prueba", "Hola", config)["enviado"],
+                      "después de un timeout el bucle sigue enviando")
+
+            conn = crear_base(os.path.join(directorio, "async.db"), 10, cantidad_medicos=1, cantidad_pacientes=5)
+            dao = MailOutboxDAO(conn)
+            for i in range(40):
+                dao.crear(MensajeMail(tipo="prueba", destinatario=f"outbox{i}@example.com", asunto="Prueba", cuerpo="Hola"))
+            config_outbox = dict(config, MAIL_ASYNC='1')
+            despachador = DespachadorMails(workers=1, lote=20, mail_config=config_outbox)
+            with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+                inicio = time.perf_counter()
+                despachador.procesar_pendientes(dao)
+                segundos = time.perf_counter() - inicio
+            print(f"    outbox: 40 mails en {segundos:.2f} s, {despachador.estadisticas()['enviados']} enviados")
+            verificar(len(dao.obtener_por_estado("enviado")) == 40 and segundos < 40 * args.demora,
+                      "el outbox envía a la vez los mails que reclama")
+            conn.close()
+
+        mail_async.cerrar()
+        mail_log.detener_log()
+        mail_log._spool.cerrar()
+
+
+if __name__ == '__main__':
+    main()
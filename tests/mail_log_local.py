@@ -0,0 +1,79 @@
+"""
+Prueba del log de mails y del spool de simulación (servicios/mail_log.py).
+
+Ejecución (desde la raíz del repo):
+    python ./tests/mail_log_local.py --mensajes 2000
+
+Envía mensajes simulados (sin SendGrid ni SMTP) con MailService en un directorio temporal y
+verifica que quedan como líneas de un único archivo JSON Lines, que los logs se escriben desde
+el hilo del QueueListener y que el spool y los logs rotan por tamaño.
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datos_sinteticos import preparar_rutas
+
+preparar_rutas()
+
+import mail_log
+from mail_log import SpoolSimulacion, iniciar_log, detener_log, registrar_exito, registrar_error
+from mail_service import MailService
+
+CONFIG_SIMULADA = {'SENDGRID_API_KEY': None, 'SMTP_HOST': None}
+
+
+def verificar(condicion, mensaje):
+    print(("[OK] " if condicion else "[FALLO] ") + mensaje)
+    if not condicion:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mensajes', type=int, default=2000)
+    args = parser.parse_args()
+    n = args.mensajes
+
+    with tempfile.TemporaryDirectory() as directorio:
+        mail_log._spool = SpoolSimulacion(os.path.join(directorio, "simulados.jsonl"))
+        iniciar_log(directorio)
+
+        inicio = time.perf_counter()
+        enviados = sum(MailService.enviar_mensaje(f"paciente{i}@example.com", f"Asunto {i}", f"Cuerpo {i}",
+                                                  CONFIG_SIMULADA, prefijo_archivo="mail_prueba", referencia=i)
+                       for i in range(n))
+        segundos = time.perf_counter() - inicio
+        print(f"{enviados} mails simulados en {segundos:.3f} s ({n / segundos:.0f} msg/s)")
+        registros = mail_log._spool.leer()
+        verificar(len(registros) == n and registros[-1]["to"] == f"paciente{n - 1}@example.com",
+                  "un registro JSON por mail en un único archivo")
+        verificar(sorted(os.listdir(directorio)) == ["simulados.jsonl"], "no quedan archivos sueltos por mail")
+
+        inicio = time.perf_counter()
+        for i in range(n):
+            registrar_exito(f"Email enviado a paciente{i}@example.com via prueba")
+        registrar_error("Error de prueba")
+        print(f"{n + 1} registros de log encolados en {time.perf_counter() - inicio:.3f} s")
+        detener_log()
+        with open(os.path.join(directorio, "mail_success.log"), encoding="utf-8") as f:
+            exitos = f.readlines()
+        with open(os.path.join(directorio, "mail_errors.log"), encoding="utf-8") as f:
+            errores = f.readlines()
+        verificar(len(exitos) == n and errores[0].rstrip().endswith("] Error de prueba"),
+                  "éxitos y errores en su archivo, con el formato '[fecha] mensaje'")
+
+        spool = SpoolSimulacion(os.path.join(directorio, "rotado.jsonl"), max_bytes=4096, backups=2)
+        for i in range(200):
+            spool.escribir(f"paciente{i}@example.com", "Asunto", "x" * 100)
+        spool.cerrar()
+        rotados = sorted(f for f in os.listdir(directorio) if f.startswith("rotado"))
+        verificar(rotados == ["rotado.jsonl", "rotado.jsonl.1", "rotado.jsonl.2"], "el spool rota por tamaño")
+        mail_log._spool.cerrar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Prueba de los estados de MailOutbox (servicios/mail_outbox.py) con una base temporal y un
+transporte simulado: dos conexiones no reclaman el mismo mail, un envío fallido se reintenta con
+espera exponencial y queda 'muerto' al agotar los intentos, y un mail reclamado cuyo resultado
+no se registró (worker colgado o falla de la base al marcarlo enviado) se vuelve a reclamar
+cuando vence el plazo del reclamo (al arrancar solo se liberan los reclamos vencidos).
+
+Ejecución (desde la raíz del repo):
+    python ./tests/mail_outbox_local.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datos_sinteticos import preparar_rutas, crear_base
+
+preparar_rutas()
+
+from persistencia.db_connection import DBConnection
+from persistencia.dao.mail_outbox_dao import MailOutboxDAO
+from persistencia.persistencia_errores import DatabaseError
+from modelos.mensaje_mail import MensajeMail
+from mail_outbox import DespachadorMails, ESPERA_BASE_SEGUNDOS
+
+
+def verificar(condicion, mensaje):
+    print(("[OK] " if condicion else "[FALLO] ") + mensaje)
+    if not condicion:
+        sys.exit(1)
+
+
+def encolar(dao, cantidad, prefijo):
+    mensajes = [MensajeMail(tipo="prueba", destinatario=f"{prefijo}{i}@example.com", asunto="Prueba", cuerpo="Hola")
+                for i in range(cantidad)]
+    for mensaje in mensajes:
+        dao.crear(mensaje)
+    return [m.id_mail for m in mensajes]
+
+
+def vencer(conn, id_mail):
+    """Simula que pasó la espera del reintento."""
+    conn.execute("UPDATE MailOutbox SET proximo_intento = '2000-01-01 00:00:00' WHERE id_mail = ?", (id_mail,))
+    conn.commit()
+
+
+class DAOSinMarcarEnviado(MailOutboxDAO):
+    """Falla la base justo después de un envío exitoso."""
+
+    def marcar_enviado(self, id_mail):
+        raise DatabaseError("database is locked")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directorio:
+        conn = crear_base(os.path.join(directorio, "outbox.db"), 10, cantidad_medicos=1, cantidad_pacientes=5)
+        otra = DBConnection().nueva_conexion()
+        dao, dao_otra = MailOutboxDAO(conn), MailOutboxDAO(otra)
+
+        # Reclamo: cada mail lo toma una sola conexión
+        ids = encolar(dao, 8, "reclamo")
+        primeros, segundos = dao.reclamar_pendientes(5), dao_otra.reclamar_pendientes(5)
+        reclamados = [m.id_mail for m in primeros + segundos]
+        verificar(sorted(reclamados) == ids and len(primeros) == 5 and len(segundos) == 3,
+                  "dos conexiones reclaman mails distintos")
+        verificar(all(dao.obtener_por_id(i).estado == "enviando" and dao.obtener_por_id(i).intentos == 1 for i in ids)
+                  and not dao.reclamar_pendientes(10), "los reclamados quedan 'enviando' con un intento")
+        verificar(dao.liberar_en_envio() == 0, "al arrancar no se liberan reclamos vigentes (pueden ser de otra instancia)")
+        vencido = datetime.now() + MailOutboxDAO.PLAZO_ENVIO + timedelta(seconds=1)
+        verificar(dao.liberar_en_envio(ahora=vencido) == 8, "los que tienen el reclamo vencido sí se liberan")
+        liberados = dao.reclamar_pendientes(10, ahora=vencido)
+        verificar(len(liberados) == 8 and all(m.intentos == 2 for m in liberados), "y se vuelven a reclamar")
+        for mensaje in liberados:
+            dao.marcar_enviado(mensaje.id_mail)
+
+        # Reintentos con espera exponencial y dead letter
+        envios = []
+
+        def fallar(mensaje):
+            envios.append(mensaje.id_mail)
+            return {"enviado": False, "error": "550 buzón inexistente"}
+
+        despachador = DespachadorMails(workers=1, max_intentos=3, enviar=fallar)
+        [id_mail] = encolar(dao, 1, "reintento")
+        esperas = []
+        for intento in range(1, 4):
+            antes = datetime.now()
+            verificar(despachador.procesar_pendientes(dao) == 1, f"intento {intento}: se reclama y se envía")
+            mensaje = dao.obtener_por_id(id_mail)
+            if mensaje.estado == "pendiente":
+                esperas.append((mensaje.proximo_intento - antes).total_seconds())
+                vencer(conn, id_mail)
+        print(f"    esperas entre intentos: {esperas}")
+        verificar([round(e / ESPERA_BASE_SEGUNDOS) for e in esperas] == [1, 2],
+                  "la espera entre reintentos se duplica")
+        verificar(mensaje.estado == "muerto" and mensaje.intentos == 3 and mensaje.ultimo_error == "550 buzón inexistente",
+                  "al tercer intento fallido el mail queda 'muerto' con el último error")
+        verificar(despachador.procesar_pendientes(dao) == 0 and len(envios) == 3, "un mail muerto no se vuelve a enviar")
+        verificar(despachador.estadisticas()["reintentos"] == 2 and despachador.estadisticas()["muertos"] == 1,
+                  "los contadores registran los reintentos y el descarte")
+
+        # Plazo del reclamo: el resultado no se pudo registrar después de enviar
+        enviados = []
+
+        def enviar(mensaje):
+            enviados.append(mensaje.id_mail)
+            return True
+
+        despachador = DespachadorMails(workers=1, enviar=enviar)
+        [id_mail] = encolar(dao, 1, "plazo")
+        try:
+            despachador.procesar_pendientes(DAOSinMarcarEnviado(otra))
+            propagado = False
+        except DatabaseError:
+            propagado = True
+        verificar(propagado and enviados == [id_mail], "la falla de la base al marcarlo enviado llega al worker")
+        verificar(dao.obtener_por_id(id_mail).estado == "enviando" and despachador.procesar_pendientes(dao) == 0,
+                  "el mail queda 'enviando' y no se reclama antes de que venza el plazo")
+        vencido = datetime.now() + MailOutboxDAO.PLAZO_ENVIO + timedelta(seconds=1)
+        [mensaje] = dao.reclamar_pendientes(10, ahora=vencido)
+        verificar(mensaje.id_mail == id_mail and mensaje.intentos == 2,
+                  "vencido el plazo, se vuelve a reclamar y cuenta otro intento")
+        despachador._procesar(dao, mensaje)
+        verificar(dao.obtener_por_id(id_mail).estado == "enviado" and enviados == [id_mail, id_mail],
+                  "y se registra como enviado (el proveedor lo recibió dos veces)")
+
+        # Un worker colgado: su reclamo vence igual
+        [id_mail] = encolar(dao, 1, "colgado")
+        verificar([m.id_mail for m in dao_otra.reclamar_pendientes(10)] == [id_mail], "un worker reclama el mail")
+        verificar(not dao.reclamar_pendientes(10, ahora=datetime.now() + timedelta(minutes=1))
+                  and [m.id_mail for m in dao.reclamar_pendientes(10, ahora=vencido)] == [id_mail],
+                  "otro lo toma solo cuando vence el plazo del reclamo")
+        otra.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Prueba de los reintentos, circuit breakers y respaldos de mail (servicios/mail_resiliencia.py)
+con servidores locales: SendGrid caído con SMTP de respaldo, recuperación del circuito y los
+dos proveedores caídos (el mail queda en el spool y el outbox lo reprograma sin gastar intentos),
+y que un envío de prueba cancelado o con un error inesperado no deja el circuito trabado.
+
+Ejecución (desde la raíz del repo):
+    python ./tests/mail_resiliencia_local.py
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import tempfile
+from datetime import datetime
+
+# Circuitos cortos para que la prueba no tarde
+os.environ["MAIL_CIRCUITO_UMBRAL"] = "3"
+os.environ["MAIL_CIRCUITO_SEGUNDOS"] = "1"
+os.environ["MAIL_REINTENTOS"] = "1"
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datos_sinteticos import preparar_rutas, crear_base
+from servidores_locales import ServidorSMTPLocal, ServidorSendGridLocal
+
+preparar_rutas()
+
+import mail_log
+import mail_resiliencia
+from mail_log import SpoolSimulacion
+from mail_service import MailService
+from mail_outbox import DespachadorMails
+from modelos.mensaje_mail import MensajeMail
+from persistencia.dao.mail_outbox_dao import MailOutboxDAO
+
+
+def puerto_cerrado():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def configuracion(sendgrid_url, smtp_puerto):
+    return {'SENDGRID_API_KEY': 'clave-local', 'SENDGRID_API_URL': sendgrid_url, 'FROM_EMAIL': 'clinica@example.com',
+            'SMTP_HOST': '127.0.0.1', 'SMTP_PORT': str(smtp_puerto), 'SMTP_USER': 'usuario', 'SMTP_PASS': 'clave',
+            'SMTP_TLS': 'none'}
+
+
+def verificar(condicion, mensaje):
+    print(("[OK] " if condicion else "[FALLO] ") + mensaje)
+    if not condicion:
+        sys.exit(1)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directorio:
+        mail_log._spool = SpoolSimulacion(os.path.join(directorio, "simulados.jsonl"))
+        mail_log.iniciar_log(directorio)
+
+        with ServidorSendGridLocal() as sendgrid, ServidorSMTPLocal() as smtp:
+            config = configuracion(sendgrid.url, smtp.puerto)
+            sendgrid.respuestas_envio = [503] * 100
+            duraciones = []
+            for i in range(6):
+                inicio = time.perf_counter()
+                resultado = MailService.enviar_mensaje_detallado(f"paciente{i}@example.com", "Prueba", "Hola", config)
+                duraciones.append(time.perf_counter() - inicio)
+                verificar(resultado["enviado"] and resultado["transporte"] == "smtp",
+                          f"mail {i}: SendGrid devuelve 503 y se envía por SMTP")
+            circuito = mail_resiliencia.estadisticas()["circuitos"]["sendgrid"]
+            print(f"    pedidos a SendGrid: {sendgrid.contadores['pedidos']}, circuito: {circuito}")
+            print(f"    duración por mail: {', '.join(f'{d * 1000:.0f} ms' for d in duraciones)}")
+            verificar(circuito["estado"] == "abierto" and circuito["aperturas"] == 1,
+                      "el circuito de SendGrid se abre tras los fallos seguidos")
+            pedidos = sendgrid.contadores['pedidos']
+            MailService.enviar_mensaje("otro@example.com", "Prueba", "Hola", config)
+            verificar(sendgrid.contadores['pedidos'] == pedidos, "con el circuito abierto no se llama a SendGrid")
+
+            time.sleep(1.1)
+            sendgrid.respuestas_envio = []
+            resultado = MailService.enviar_mensaje_detallado("recuperado@example.com", "Prueba", "Hola", config)
+            circuito = mail_resiliencia.estadisticas()["circuitos"]["sendgrid"]
+            verificar(resultado["transporte"] == "sendgrid" and circuito["estado"] == "cerrado" and circuito["cierres"] == 1,
+                      "pasado el tiempo, el envío de prueba cierra el circuito")
+
+            # Credenciales inválidas: error permanente, sin reintentos ni fallos en el circuito
+            solo_sendgrid = {'SENDGRID_API_KEY': 'clave-local', 'SENDGRID_API_URL': sendgrid.url,
+                             'FROM_EMAIL': 'clinica@example.com'}
+            for estado in (401, 403):
+                sendgrid.respuestas_envio = [estado, estado, estado]
+                pedidos = sendgrid.contadores['pedidos']
+                resultado = MailService.enviar_mensaje_detallado("credenciales@example.com", "Prueba", "Hola", solo_sendgrid)
+                circuito = mail_resiliencia.estadisticas()["circuitos"]["sendgrid"]
+                verificar(not resultado["enviado"] and sendgrid.contadores['pedidos'] == pedidos + 1
+                          and circuito["fallos_seguidos"] == 0,
+                          f"un {estado} de SendGrid no se reintenta ni cuenta como fallo del circuito")
+            sendgrid.respuestas_envio = []
+
+        mail_resiliencia.reiniciar_circuitos()
+        previos = sum(1 for r in mail_log._spool.leer() if r["estado"] == "diferido")
+        config = configuracion(f"http://127.0.0.1:{puerto_cerrado()}", puerto_cerrado())
+        resultados = [MailService.enviar_mensaje_detallado(f"caido{i}@example.com", "Prueba", "Hola", config)
+                      for i in range(4)]
+        verificar(not any(r["enviado"] for r in resultados), "sin proveedores disponibles no se informa como enviado")
+        verificar(resultados[-1]["diferido"] and resultados[-1]["reintentar_en"] is not None,
+                  "con los dos circuitos abiertos el envío falla al instante y se difiere")
+        diferidos = [r for r in mail_log._spool.leer() if r["estado"] == "diferido"]
+        verificar(len(diferidos) == previos + 4, "los mails no enviados quedan en el spool como 'diferido'")
+
+        conn = crear_base(os.path.join(directorio, "resiliencia.db"), 10, cantidad_medicos=1, cantidad_pacientes=5)
+        dao = MailOutboxDAO(conn)
+        dao.crear(MensajeMail(tipo="prueba", destinatario="outbox@example.com", asunto="Prueba", cuerpo="Hola"))
+        despachador = DespachadorMails(workers=1, mail_config=config)
+        for _ in range(3):
+            # Cada pasada vuelve a diferir el mail (los circuitos siguen abiertos)
+            conn.execute("UPDATE MailOutbox SET proximo_intento = '2000-01-01 00:00:00' WHERE estado = 'pendiente'")
+            conn.commit()
+            despachador.procesar_pendientes(dao)
+        diferidos = [r for r in mail_log._spool.leer() if r["estado"] == "diferido"]
+        verificar(len(diferidos) == previos + 4, "los reintentos del outbox no agregan líneas 'diferido' al spool")
+        mensaje = dao.obtener_por_estado("pendiente")[0]
+        print(f"    outbox: intentos={mensaje.intentos}, próximo intento en "
+              f"{(mensaje.proximo_intento - datetime.now()).total_seconds():.0f} s, {despachador.estadisticas()['diferidos']} diferidos")
+        verificar(mensaje.intentos == 0, "el outbox reprograma el mail diferido sin gastar un intento")
+
+        # El envío de prueba del circuito semiabierto termina sin resultado
+        circuito = mail_resiliencia.CircuitBreaker("prueba", umbral=1, segundos_abierto=0)
+
+        async def colgado():
+            await asyncio.sleep(10)
+
+        async def cancelar_prueba():
+            tarea = asyncio.ensure_future(mail_resiliencia.ejecutar_con_reintentos_async(colgado, circuito, 0))
+            await asyncio.sleep(0.05)
+            tarea.cancel()
+            await asyncio.gather(tarea, return_exceptions=True)
+
+        circuito.registrar_fallo()
+        asyncio.run(cancelar_prueba())
+        verificar(circuito.estado == "semiabierto" and circuito.permitir(),
+                  "una prueba cancelada (timeout de mail_async) libera el circuito para la próxima")
+        circuito.liberar_prueba()
+
+        def con_bug():
+            raise KeyError("from_email")
+
+        try:
+            mail_resiliencia.ejecutar_con_reintentos(con_bug, circuito, 0)
+            informado = False
+        except mail_resiliencia.ErrorPermanente:
+            informado = True
+        verificar(informado and circuito.permitir(),
+                  "un error inesperado se informa como ErrorPermanente y también libera la prueba")
+
+        llamados = []
+
+        def smtp_ok():
+            llamados.append(1)
+            return True
+
+        mail_resiliencia.reiniciar_circuitos()
+        resultado = mail_resiliencia.enviar_con_respaldo([("sendgrid", con_bug), ("smtp", smtp_ok)], reintentos=0)
+        verificar(resultado["enviado"] and resultado["transporte"] == "smtp" and llamados == [1],
+                  "con un error inesperado en un transporte el envío sigue por el respaldo")
+
+        print(f"Contadores: {mail_resiliencia.estadisticas()}")
+        mail_log.detener_log()
+        mail_log._spool.cerrar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Prueba de las plantillas de mail (servicios/plantillas_mail.py) con una base sintética y un
+SMTP local: costo de renderizar cada plantilla, confirmación y cancelación encoladas por
+TurnoService con los nombres del médico y la especialidad (una sola consulta) y envío en
+texto + HTML.
+
+Ejecución (desde la raíz del repo):
+    python ./tests/plantillas_mail_local.py --turnos 20000
+"""
+import os
+import sys
+import time
+import email
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datos_sinteticos import preparar_rutas, crear_base
+from servidores_locales import ServidorSMTPLocal
+
+preparar_rutas()
+
+import mail_log
+from mail_log import SpoolSimulacion
+
+
+def verificar(condicion, mensaje):
+    print(("[OK] " if condicion else "[FALLO] ") + mensaje)
+    if not condicion:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turnos', type=int, default=20000, help='turnos sintéticos (se renderiza uno por turno programado)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        mail_log._spool = SpoolSimulacion(os.path.join(directorio, "simulados.jsonl"))
+        mail_log.iniciar_log(directorio)
+        conn = crear_base(os.path.join(directorio, "plantillas.db"), args.turnos)
+
+        import plantillas_mail
+        from turno_service import TurnoService
+        from mail_outbox import DespachadorMails
+        from persistencia.dao.turno_dao import TurnoDAO
+        from persistencia.dao.mail_outbox_dao import MailOutboxDAO
+
+        dao = TurnoDAO(conn)
+        filas = dao.obtener_para_recordatorio(datetime(2000, 1, 1), datetime(2100, 1, 1))
+        print(f"{len(filas)} turnos programados con email")
+        for tipo in plantillas_mail.PLANTILLAS:
+            inicio = time.perf_counter()
+            renderizados = [plantillas_mail.renderizar(tipo, fila) for fila in filas]
+            segundos = time.perf_counter() - inicio
+            print(f"    {tipo:<20} {segundos / len(filas) * 1e6:6.2f} µs por mail ({segundos * 1000:.1f} ms en total)")
+            verificar(not any("$" in parte for r in renderizados for parte in r),
+                      f"{tipo}: no quedan marcadores sin reemplazar")
+
+        mal_escrita = plantillas_mail.PlantillaMail("prueba", "Turno $fecha", "Hola $pacinete", "<p>$hora</p>")
+        try:
+            plantillas_mail.verificar_campos({"prueba": mal_escrita}, plantillas_mail.CAMPOS_TURNO)
+            detectado = False
+        except ValueError as e:
+            detectado = "pacinete" in str(e)
+        verificar(detectado, "un campo mal escrito en una plantilla se detecta sin renderizarla")
+
+        fila = dict(filas[0], nombre_paciente="Ana <b>", apellido_paciente="Pérez & Cía")
+        _, texto, html = plantillas_mail.renderizar(plantillas_mail.CONFIRMACION, fila)
+        verificar("Ana <b> Pérez & Cía" in texto and "Ana &lt;b&gt; Pérez &amp; Cía" in html,
+                  "los valores se escapan en el HTML y no en el texto")
+
+        # Turno futuro disponible para programarlo y cancelarlo
+        medico = conn.execute("SELECT m.nro_matricula, m.nombre, m.apellido, e.nombre FROM Medico m "
+                              "JOIN Especialidad e ON e.id_especialidad = m.id_especialidad LIMIT 1").fetchone()
+        dni = conn.execute("SELECT MIN(dni) FROM Paciente").fetchone()[0]
+        manana = (datetime.now() + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+        cur = conn.execute("INSERT INTO Turno (fecha_hora_inicio, estado, nro_matricula_medico) VALUES (?, 'disponible', ?)",
+                           (manana.strftime("%Y-%m-%d %H:%M:%S"), medico[0]))
+        id_turno = cur.lastrowid
+        conn.commit()
+
+        servicio = TurnoService()
+        servicio.programar_turno(id_turno, dni, "Control")
+        servicio.cancelar_turno(id_turno)
+        mails = {m.tipo: m for m in MailOutboxDAO(conn).obtener_por_estado("pendiente")}
+        confirmacion, cancelacion = mails.get(plantillas_mail.CONFIRMACION), mails.get(plantillas_mail.CANCELACION)
+        verificar(confirmacion is not None and cancelacion is not None, "se encolan la confirmación y la cancelación")
+        print("    " + confirmacion.cuerpo.replace("\n", "\n    "))
+        nombre_medico = f"{medico[1]} {medico[2]}"
+        verificar(all(nombre_medico in m.cuerpo and medico[3] in m.cuerpo and nombre_medico in m.cuerpo_html
+                      for m in (confirmacion, cancelacion)),
+                  "el mail muestra el nombre del médico y la especialidad, no la matrícula")
+
+        with ServidorSMTPLocal() as smtp:
+            config = {'SMTP_HOST': '127.0.0.1', 'SMTP_PORT': str(smtp.puerto), 'SMTP_USER': 'usuario',
+                      'SMTP_PASS': 'clave', 'SMTP_TLS': 'none', 'FROM_EMAIL': 'clinica@example.com'}
+            DespachadorMails(workers=1, mail_config=config).procesar_pendientes(MailOutboxDAO(conn))
+            recibidos = [email.message_from_bytes(m["datos"]) for m in smtp.mensajes]
+        verificar(len(recibidos) == 2 and all(r.get_content_type() == "multipart/alternative" for r in recibidos),
+                  "se envían por SMTP como multipart/alternative (texto + HTML)")
+        mail_log.detener_log()
+        mail_log._spool.cerrar()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
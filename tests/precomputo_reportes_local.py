@@ -0,0 +1,92 @@
+"""
+Prueba de los reportes precomputados (servicios/precomputo_reportes.py) con una base sintética:
+se precomputa un mes cerrado, los pedidos de ese mes salen del PDF precomputado y, si después
+cambia un turno del período, el reporte se regenera en vez de servir el PDF viejo.
+
+Ejecución (desde la raíz del repo):
+    python ./tests/precomputo_reportes_local.py
+"""
+import os
+import sys
+import sqlite3
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datos_sinteticos import preparar_rutas, crear_base
+
+preparar_rutas()
+
+# Enero de 2025: los turnos sintéticos empiezan el 6 y el mes ya está cerrado
+INICIO, FIN = date(2025, 1, 1), date(2025, 1, 31)
+
+
+def verificar(condicion, mensaje):
+    print(("[OK] " if condicion else "[FALLO] ") + mensaje)
+    if not condicion:
+        sys.exit(1)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_db = os.path.join(directorio, "precomputo.db")
+        conn = crear_base(ruta_db, 300, cantidad_medicos=2, cantidad_pacientes=20)
+
+        from reporte_service import ReporteService
+        from precomputo_reportes import precomputar_reportes
+
+        servicio = ReporteService(workers=1, directorio=os.path.join(directorio, "salidas"))
+        generados, errores = precomputar_reportes(INICIO, FIN, servicio)
+        verificar(generados == 4 and errores == 0, f"se precomputan los reportes del mes ({generados} generados)")
+
+        def precomputado(ruta):
+            return os.path.abspath(ruta).startswith(os.path.abspath(servicio.dir_precomputados))
+
+        matricula, otra_matricula = [fila[0] for fila in conn.execute("SELECT nro_matricula FROM Medico ORDER BY 1")]
+        verificar(precomputado(servicio.asistencias_vs_inasistencias_de_pacientes(INICIO, FIN))
+                  and precomputado(servicio.reporte_pacientes_atendidos_en_un_periodo(INICIO, FIN))
+                  and precomputado(servicio.listado_turnos_por_medico_en_un_periodo(matricula, INICIO, FIN)),
+                  "los pedidos del mes cerrado salen del PDF precomputado")
+        verificar(precomputado(servicio.asistencias_vs_inasistencias_de_pacientes(INICIO, FIN)),
+                  "el pedido repetido también")
+
+        # Un turno del período cambia desde otra conexión (otro proceso, una corrección a mano)
+        otra = sqlite3.connect(ruta_db)
+        otra.execute("UPDATE Turno SET estado = CASE estado WHEN 'atendido' THEN 'ausente' ELSE 'atendido' END "
+                     "WHERE id_turno = (SELECT MIN(id_turno) FROM Turno WHERE nro_matricula_medico = ? "
+                     "AND dni_paciente IS NOT NULL AND fecha_hora_inicio < '2025-02-01')", (matricula,))
+        otra.commit()
+        otra.close()
+        verificar(not precomputado(servicio.asistencias_vs_inasistencias_de_pacientes(INICIO, FIN)),
+                  "con un turno cambiado, las asistencias se regeneran")
+        verificar(not precomputado(servicio.listado_turnos_por_medico_en_un_periodo(matricula, INICIO, FIN)),
+                  "y el listado del médico del turno también")
+        verificar(precomputado(servicio.listado_turnos_por_medico_en_un_periodo(otra_matricula, INICIO, FIN)),
+                  "el listado de otro médico sigue saliendo del precomputado")
+
+        # Un cambio hecho por un DAO de este proceso invalida igual
+        from persistencia.dao.paciente_dao import PacienteDAO
+        dni = conn.execute("SELECT dni_paciente FROM Turno WHERE estado = 'atendido' "
+                           "AND fecha_hora_inicio < '2025-02-01' LIMIT 1").fetchone()[0]
+        precomputar_reportes(INICIO, FIN, servicio)
+        verificar(precomputado(servicio.reporte_pacientes_atendidos_en_un_periodo(INICIO, FIN)),
+                  "al volver a precomputar, el reporte vuelve a salir del precomputado")
+        dao = PacienteDAO(conn)
+        paciente = dao.obtener_por_id(dni)
+        paciente.apellido = "Corregido"
+        dao.actualizar(paciente)
+        verificar(not precomputado(servicio.reporte_pacientes_atendidos_en_un_periodo(INICIO, FIN)),
+                  "con un paciente corregido, el listado de pacientes atendidos se regenera")
+
+        # Un índice viejo, sin huella, no se usa
+        indice = servicio._leer_indice_precomputados()
+        servicio.registrar_precomputados({clave: {k: v for k, v in entrada.items() if k != "huella"}
+                                          for clave, entrada in indice.items()})
+        verificar(not precomputado(servicio.listado_turnos_por_medico_en_un_periodo(otra_matricula, INICIO, FIN)),
+                  "una entrada del índice sin huella no se sirve")
+        servicio.cerrar()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -11,7 +11,8 @@ El script:
 - crea (si falta) una Especialidad 'PruebaMail'
 - crea (si falta) un Médico con matrícula 900010
 - crea (si falta) el Paciente con DNI 77777777 y email `maurisalum@gmail.com`
-- crea un turno disponible 24h en el futuro y lo programa -> debe disparar MailService
+- crea un turno disponible 24h en el futuro y lo programa -> encola el mail en MailOutbox
+- procesa la cola de mails una vez (como los workers de la app) -> debe disparar MailService
 """
 
 import os
@@ -28,6 +29,8 @@ for p in (SERVICES_PATH, PERSISTENCE_PATH, MODELS_PATH, BASE):
 
 try:
     from servicios.turno_service import TurnoService
+    from mail_outbox import DespachadorMails
+    from persistencia.dao.mail_outbox_dao import MailOutboxDAO
     from persistencia.dao.especialidad_dao import EspecialidadDAO
     from persistencia.dao.medico_dao import MedicoDAO
     from persistencia.dao.paciente_dao import PacienteDAO
@@ -103,7 +106,7 @@ def main():
     turno = create_turno_disponible(nro_matricula_medico=med.nro_matricula, minutes_from_now=60*24)
 
     ts = TurnoService()
-    print('\nProgramando el turno (esto debería disparar MailService)...')
+    print('\nProgramando el turno (esto debería encolar el mail de confirmación)...')
     try:
         resultado = ts.programar_turno(turno.id_turno, pac.dni, motivo='Prueba automatizada', observaciones='Generado por script')
         print('\nResultado de programar_turno:', bool(resultado))
@@ -112,9 +115,14 @@ def main():
         print(e)
         sys.exit(1)
 
+    print('\nProcesando la cola de mails (esto debería disparar MailService)...')
+    procesados = DespachadorMails(workers=1).procesar_pendientes()
+    print('Mails procesados:', procesados)
+    print('Estado de la cola:', MailOutboxDAO().contar_por_estado())
+
     print('\nRevisá las salidas:')
     print('- Consola (mensajes de MailService)')
-    print("- Archivo: Turnos Medicos/front/salidas/emails/mail_success.log o mail_errors.log")
+    print("- Archivos: Turnos Medicos/back/salidas/emails/mail_success.log, mail_errors.log y simulados.jsonl")
     print('- Bandeja de ingreso del destinatario (maurisalum@gmail.com)')
 
 
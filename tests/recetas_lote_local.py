@@ -0,0 +1,88 @@
+"""
+Prueba de la emisión de recetas en lote (RecetaService.emitir_lote) con una base sintética:
+emite unas pocas recetas con el pool de procesos y en serie, revisa los PDFs generados y que
+el logo se lea cuando aparece aunque antes no existiera.
+
+Ejecución (desde la raíz del repo):
+    python ./tests/recetas_lote_local.py --recetas 12 --workers 2
+"""
+import os
+import sys
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datos_sinteticos import preparar_rutas, crear_base
+
+preparar_rutas()
+
+
+def verificar(condicion, mensaje):
+    print(("[OK] " if condicion else "[FALLO] ") + mensaje)
+    if not condicion:
+        sys.exit(1)
+
+
+def crear_recetas(conn, cantidad):
+    """Una consulta con su receta por cada una de las `cantidad` recetas. Retorna los ids."""
+    matricula = conn.execute("SELECT nro_matricula FROM Medico LIMIT 1").fetchone()[0]
+    dnis = [fila[0] for fila in conn.execute("SELECT dni FROM Paciente ORDER BY dni")]
+    ids = []
+    for i in range(cantidad):
+        dni = dnis[i % len(dnis)]
+        conn.execute("INSERT OR IGNORE INTO HistorialClinico (dni_paciente) VALUES (?)", (dni,))
+        id_consulta = conn.execute(
+            "INSERT INTO Consulta (fecha_hora, diagnostico, dni_paciente, nro_matricula_medico) VALUES (?, ?, ?, ?)",
+            (f"2025-03-{i % 28 + 1:02d} 10:00:00", f"Diagnóstico {i}", dni, matricula)).lastrowid
+        ids.append(conn.execute(
+            "INSERT INTO Receta (fecha_emision, medicamentos, detalle, id_consulta) VALUES (?, ?, ?, ?)",
+            (f"2025-03-{i % 28 + 1:02d}", f"Ibuprofeno 400 mg - 1 cada 8 h\nAmoxicilina {i}", "Tomar con comida",
+             id_consulta)).lastrowid)
+    conn.commit()
+    return ids
+
+
+def revisar_pdfs(rutas, ids):
+    return (set(rutas) == set(ids)
+            and all(os.path.getsize(ruta) > 0 and open(ruta, "rb").read(5) == b"%PDF-" for ruta in rutas.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recetas', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        conn = crear_base(os.path.join(directorio, "recetas.db"), 10, cantidad_medicos=2, cantidad_pacientes=5)
+        ids = crear_recetas(conn, args.recetas)
+
+        import receta_service
+        from receta_service import RecetaService
+
+        servicio = RecetaService()
+        en_pool = os.path.join(directorio, "pool")
+        resultado = servicio.emitir_lote(ids + [999999], output_dir=en_pool, workers=args.workers)
+        verificar(revisar_pdfs(resultado["rutas"], ids) and len(os.listdir(en_pool)) == len(ids),
+                  f"el pool de {args.workers} procesos emite un PDF por receta")
+        verificar(list(resultado["errores"]) == [999999], "la receta inexistente se informa como error")
+
+        en_serie = os.path.join(directorio, "serie")
+        resultado = servicio.emitir_lote(ids[:3], output_dir=en_serie, workers=1)
+        verificar(revisar_pdfs(resultado["rutas"], ids[:3]) and not resultado["errores"],
+                  "en serie se emiten los mismos PDFs")
+        verificar(all(os.path.basename(ruta).startswith("receta_consulta_") and ruta.endswith(f"_receta_{id_receta}.pdf")
+                      for id_receta, ruta in resultado["rutas"].items()), "los archivos se nombran por consulta y receta")
+
+        # El logo que falta no queda recordado como ausente
+        logo = os.path.join(directorio, "logo.png")
+        verificar(receta_service._cargar_logo(logo) is None, "sin logo no se dibuja")
+        from graficos import renderizar_grafico
+        with open(logo, "wb") as f:
+            f.write(renderizar_grafico({"valores": [1], "etiquetas": ["logo"], "titulo": "logo"}))
+        verificar(receta_service._cargar_logo(logo) is not None, "el logo se lee cuando aparece el archivo")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Prueba de la idempotencia de los recordatorios (servicios/recordatorio_service.py) con una base
+sintética y un SMTP local: correr el job dos veces no envía dos veces, un turno cancelado y dado
+a otro paciente le llega al paciente nuevo, y cancelar descarta el recordatorio pendiente.
+
+Ejecución (desde la raíz del repo):
+    python ./tests/recordatorios_local.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datos_sinteticos import preparar_rutas, crear_base
+from servidores_locales import ServidorSMTPLocal
+
+preparar_rutas()
+
+import mail_log
+from mail_log import SpoolSimulacion
+
+# Turnos lejos de los sintéticos: el job corre "el día anterior"
+AHORA = datetime(2099, 1, 1, 18, 0)
+INICIOS = ("2099-01-02 10:00:00", "2099-01-02 11:00:00")
+
+
+def verificar(condicion, mensaje):
+    print(("[OK] " if condicion else "[FALLO] ") + mensaje)
+    if not condicion:
+        sys.exit(1)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directorio:
+        mail_log._spool = SpoolSimulacion(os.path.join(directorio, "simulados.jsonl"))
+        mail_log.iniciar_log(directorio)
+        conn = crear_base(os.path.join(directorio, "recordatorios.db"), 10, cantidad_medicos=1, cantidad_pacientes=5)
+
+        from turno_service import TurnoService
+        from mail_outbox import DespachadorMails
+        from recordatorio_service import RecordatorioService, TIPO_RECORDATORIO
+        from persistencia.dao.mail_outbox_dao import MailOutboxDAO
+
+        matricula = conn.execute("SELECT nro_matricula FROM Medico LIMIT 1").fetchone()[0]
+        pacientes = conn.execute("SELECT dni, email FROM Paciente ORDER BY dni LIMIT 3").fetchall()
+        (dni_a, email_a), (dni_b, email_b), (dni_c, email_c) = [tuple(p) for p in pacientes]
+        turnos = [conn.execute("INSERT INTO Turno (fecha_hora_inicio, estado, nro_matricula_medico) "
+                               "VALUES (?, 'disponible', ?)", (inicio, matricula)).lastrowid for inicio in INICIOS]
+        conn.commit()
+
+        servicio = TurnoService()
+        with ServidorSMTPLocal() as smtp:
+            config = {'SMTP_HOST': smtp.host, 'SMTP_PORT': str(smtp.puerto), 'SMTP_USER': 'usuario',
+                      'SMTP_PASS': 'clave', 'SMTP_TLS': 'none', 'FROM_EMAIL': 'clinica@example.com'}
+            recordatorios = RecordatorioService(conn, DespachadorMails(workers=1, mail_config=config))
+
+            def recibidos(email):
+                return sum(1 for m in smtp.mensajes if any(email in d for d in m["para"]))
+
+            servicio.programar_turno(turnos[0], dni_a, "Control")
+            primero = recordatorios.enviar_recordatorios(ahora=AHORA)
+            segundo = recordatorios.enviar_recordatorios(ahora=AHORA)
+            print(f"    primera corrida: {primero}")
+            print(f"    segunda corrida: {segundo}")
+            verificar(primero["encolados"] == 1 and primero["enviados"] == 1 and recibidos(email_a) == 1,
+                      "la primera corrida envía el recordatorio")
+            verificar(segundo["encolados"] == 0 and segundo["ya_encolados"] == 1 and recibidos(email_a) == 1,
+                      "correr el job de nuevo no envía dos veces")
+
+            servicio.cancelar_turno(turnos[0])
+            servicio.programar_turno(turnos[0], dni_b, "Control")
+            tercero = recordatorios.enviar_recordatorios(ahora=AHORA)
+            verificar(tercero["encolados"] == 1 and recibidos(email_b) == 1 and recibidos(email_a) == 1,
+                      "el turno cancelado y dado a otro paciente le llega al paciente nuevo")
+
+            servicio.programar_turno(turnos[1], dni_c, "Control")
+            recordatorios.encolar_recordatorios(ahora=AHORA)
+            dao = MailOutboxDAO(conn)
+            pendientes = [m for m in dao.obtener_por_estado("pendiente") if m.tipo == TIPO_RECORDATORIO]
+            verificar(len(pendientes) == 1 and pendientes[0].destinatario == email_c, "se encola el recordatorio del turno")
+            servicio.cancelar_turno(turnos[1])
+            pendientes = [m for m in dao.obtener_por_estado("pendiente") if m.tipo == TIPO_RECORDATORIO]
+            cuarto = recordatorios.enviar_recordatorios(ahora=AHORA)
+            verificar(not pendientes and cuarto["turnos"] == 1 and recibidos(email_c) == 0,
+                      "cancelar el turno descarta el recordatorio pendiente")
+
+            servicio.programar_turno(turnos[1], dni_c, "Control")
+            quinto = recordatorios.enviar_recordatorios(ahora=AHORA)
+            verificar(quinto["encolados"] == 1 and recibidos(email_c) == 1,
+                      "si el mismo paciente vuelve a tomar el turno, recibe el recordatorio")
+
+        mail_log.detener_log()
+        mail_log._spool.cerrar()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Prueba del envío masivo por SendGrid (MailService.enviar_lote) contra una API local.
+
+Ejecución (desde la raíz del repo):
+    python ./tests/sendgrid_lote_local.py --destinatarios 2500
+
+Verifica que los destinatarios se agrupan de a 1000 por pedido con sus sustituciones, que solo
+se reintentan los grupos con errores transitorios y que un grupo rechazado no afecta a los demás.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datos_sinteticos import preparar_rutas
+from servidores_locales import ServidorSendGridLocal
+
+preparar_rutas()
+
+from mail_service import MailService
+from sendgrid_cliente import cerrar_clientes
+
+ASUNTO = "Recordatorio de turno - %fecha%"
+CUERPO = "Hola %nombre%, le recordamos su turno del %fecha% con %medico%."
+
+
+def destinatarios(cantidad):
+    return [(f"paciente{i}@example.com",
+             {"nombre": f"Paciente {i}", "fecha": f"2025-12-{1 + i % 28:02d} 10:00", "medico": "Dra. Pérez"})
+            for i in range(cantidad)]
+
+
+def configuracion(servidor):
+    return {'SENDGRID_API_KEY': 'clave-local', 'SENDGRID_API_URL': servidor.url, 'FROM_EMAIL': 'clinica@example.com'}
+
+
+def verificar(condicion, mensaje):
+    print(("[OK] " if condicion else "[FALLO] ") + mensaje)
+    if not condicion:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--destinatarios', type=int, default=2500)
+    args = parser.parse_args()
+    n = args.destinatarios
+    lista = destinatarios(n)
+    grupos = -(-n // MailService.MAX_DESTINATARIOS_POR_PEDIDO)
+
+    with ServidorSendGridLocal(supresiones={"bounces": ["paciente7@example.com"]}) as servidor:
+        inicio = time.perf_counter()
+        resultado = MailService.enviar_lote(lista, ASUNTO, CUERPO, configuracion(servidor))
+        segundos = time.perf_counter() - inicio
+        print(f"{len(resultado['enviados'])} enviados en {resultado['pedidos']} pedidos "
+              f"({servidor.contadores['conexiones']} conexiones) en {segundos:.3f} s")
+        verificar(resultado['pedidos'] == grupos and len(servidor.envios) == grupos,
+                  f"{grupos} pedidos de hasta {MailService.MAX_DESTINATARIOS_POR_PEDIDO} destinatarios")
+        verificar(resultado['suprimidos'] == ["paciente7@example.com"] and len(resultado['enviados']) == n - 1,
+                  "la dirección suprimida no se envía")
+        personalization = servidor.envios[0]["personalizations"][3]
+        renderizado = CUERPO
+        for etiqueta, valor in personalization["substitutions"].items():
+            renderizado = renderizado.replace(etiqueta, valor)
+        verificar(personalization["to"][0]["email"] == "paciente3@example.com"
+                  and renderizado == MailService.aplicar_sustituciones(CUERPO, lista[3][1]),
+                  "cada destinatario lleva sus propias sustituciones")
+    cerrar_clientes()
+
+    with ServidorSendGridLocal() as servidor:
+        # 1er grupo: 503 y luego OK; 2do grupo: 429 (Retry-After) y luego OK; 3er grupo: 400 (no se reintenta)
+        servidor.respuestas_envio = [503, 202, 429, 202, 400]
+        resultado = MailService.enviar_lote(lista, ASUNTO, CUERPO, configuracion(servidor), espera_base=0.05)
+        print(f"Con errores: {len(resultado['enviados'])} enviados, {len(resultado['fallidos'])} fallidos, "
+              f"{resultado['pedidos']} pedidos")
+        aceptados = sum(len(envio["personalizations"]) for envio in servidor.envios)
+        verificar(resultado['pedidos'] == grupos + 2 and aceptados == len(resultado['enviados']),
+                  "solo se reintentan los grupos con error transitorio, sin duplicar envíos")
+        verificar(len(resultado['fallidos']) == n - 2 * MailService.MAX_DESTINATARIOS_POR_PEDIDO,
+                  "un grupo rechazado (400) no afecta a los demás")
+    cerrar_clientes()
+
+    resultado = MailService.enviar_lote(lista[:3], ASUNTO, CUERPO, {'SENDGRID_API_KEY': None, 'SMTP_HOST': None})
+    verificar(len(resultado['enviados']) == 3, "sin SendGrid se envía uno por uno (simulación)")
+
+
+if __name__ == '__main__':
+    main()
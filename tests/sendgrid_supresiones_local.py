@@ -0,0 +1,127 @@
+"""
+Prueba de la caché de supresiones de SendGrid (servicios/sendgrid_cliente.py) contra una API local.
+
+Ejecución (desde la raíz del repo):
+    python ./tests/sendgrid_supresiones_local.py --mensajes 200
+
+Envía mensajes con MailService a un ServidorSendGridLocal y muestra cuántos pedidos HTTP y
+conexiones TCP hicieron falta. Antes eran 3 GET de supresiones + 1 POST por mensaje, cada uno
+con su propia conexión. También verifica que con muchos envíos a la vez las listas se
+descargan una sola vez (y que mientras se vuelven a descargar se siguen usando las anteriores).
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datos_sinteticos import preparar_rutas
+from servidores_locales import ServidorSendGridLocal
+
+preparar_rutas()
+
+from mail_service import MailService
+from sendgrid_cliente import obtener_cliente, cerrar_clientes
+
+
+def configuracion(servidor, **extra):
+    config = {'SENDGRID_API_KEY': 'clave-local', 'SENDGRID_API_URL': servidor.url,
+              'FROM_EMAIL': 'clinica@example.com', 'SMTP_HOST': None}
+    config.update(extra)
+    return config
+
+
+def enviar(config, destinatarios):
+    return sum(MailService.enviar_mensaje(d, "Prueba", "Hola", config) for d in destinatarios)
+
+
+def consultar_a_la_vez(cache, destinatarios):
+    """Consulta cada destinatario desde un hilo propio, todos juntos. Retorna los segundos de cada uno."""
+    barrera = threading.Barrier(len(destinatarios))
+    duraciones = []
+
+    def consultar(email):
+        barrera.wait()
+        inicio = time.perf_counter()
+        cache.tipos(email)
+        duraciones.append(time.perf_counter() - inicio)
+
+    hilos = [threading.Thread(target=consultar, args=(d,)) for d in destinatarios]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return duraciones
+
+
+def verificar(condicion, mensaje):
+    print(("[OK] " if condicion else "[FALLO] ") + mensaje)
+    if not condicion:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mensajes', type=int, default=200)
+    args = parser.parse_args()
+    n = args.mensajes
+    destinatarios = [f"paciente{i % 20}@example.com" for i in range(n)]
+    supresiones = {"bounces": ["rebotado@example.com"], "global": ["baja@example.com"]}
+
+    with ServidorSendGridLocal(supresiones=supresiones) as servidor:
+        enviados = enviar(configuracion(servidor), destinatarios)
+        cache = obtener_cliente('clave-local', servidor.url).supresiones
+        print(f"Listas completas: {enviados} enviados, {servidor.contadores['pedidos']} pedidos HTTP "
+              f"({servidor.contadores['listados']} listados, {servidor.contadores['consultas']} consultas puntuales), "
+              f"{servidor.contadores['conexiones']} conexiones | sin caché serían {4 * n} pedidos")
+        print(f"    caché: {cache.estadisticas()}")
+        verificar(servidor.contadores['consultas'] == 0 and servidor.contadores['listados'] == 3,
+                  "una descarga por lista y ninguna consulta por mensaje")
+        verificar(cache.tipos("Rebotado@example.com") == ("bounces",) and cache.tipos("baja@example.com") == ("global",),
+                  "las direcciones suprimidas se detectan desde la caché")
+        verificar(servidor.contadores['conexiones'] <= 2, "la sesión HTTP se reutiliza (keep-alive)")
+
+        enviar(configuracion(servidor, ALLOW_SENDGRID_UNSUPPRESS='true'), ["rebotado@example.com"])
+        verificar(cache.tipos("rebotado@example.com") == () and not servidor.supresiones["bounces"],
+                  "quitar la supresión invalida la entrada de la caché")
+    cerrar_clientes()
+
+    with ServidorSendGridLocal(supresiones=supresiones, listas_prohibidas=True) as servidor:
+        enviar(configuracion(servidor), destinatarios + ["baja@example.com"])
+        cache = obtener_cliente('clave-local', servidor.url).supresiones
+        distintos = len(set(destinatarios)) + 1
+        print(f"Sin permiso para listar: {servidor.contadores['consultas']} consultas puntuales para "
+              f"{distintos} direcciones distintas")
+        verificar(servidor.contadores['consultas'] == 3 * distintos,
+                  "cada dirección se consulta una sola vez (caché con TTL, también la negativa)")
+        verificar(cache.tipos("baja@example.com") == ("global",), "la supresión puntual queda en caché")
+    cerrar_clientes()
+
+    # Muchos envíos a la vez con las listas vencidas: una sola descarga
+    with ServidorSendGridLocal(supresiones=supresiones) as servidor:
+        cliente = obtener_cliente('clave-local', servidor.url)
+        listar = cliente.listar_supresiones
+
+        def listar_lento(tipo):
+            time.sleep(0.1)
+            return listar(tipo)
+
+        cliente.listar_supresiones = listar_lento
+        cache = cliente.supresiones
+        consultar_a_la_vez(cache, [f"concurrente{i}@example.com" for i in range(20)] + ["baja@example.com"])
+        print(f"Concurrentes: {cache.estadisticas()}, {servidor.contadores['listados']} listados")
+        verificar(cache.refrescos == 1 and servidor.contadores['listados'] == 3 and servidor.contadores['consultas'] == 0,
+                  "la primera descarga la hace uno solo y los demás la esperan")
+        cache._listas_vencen = cache._proximo_refresco = 0.0
+        duraciones = consultar_a_la_vez(cache, [f"concurrente{i}@example.com" for i in range(20)])
+        print(f"    con las listas vencidas: la más rápida tardó {min(duraciones) * 1000:.0f} ms, "
+              f"la más lenta {max(duraciones) * 1000:.0f} ms")
+        verificar(cache.refrescos == 2 and servidor.contadores['listados'] == 6 and servidor.contadores['consultas'] == 0,
+                  "con las listas vencidas se vuelven a descargar una sola vez")
+        verificar(sorted(duraciones)[-2] < 0.1, "mientras tanto los demás usan las listas anteriores sin esperar")
+    cerrar_clientes()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+"""
+Servidores locales de prueba para los scripts de mail (sin red ni cuentas reales).
+
+- ServidorSMTPLocal: servidor SMTP mínimo al estilo de aiosmtpd (EHLO, AUTH PLAIN/LOGIN,
+  MAIL, RCPT, DATA, RSET, NOOP, QUIT) que guarda los mensajes en memoria y cuenta las
+  sesiones abiertas. Con `cortar_cada=N` cierra la conexión después de N mensajes para
+  probar la reconexión. No soporta STARTTLS: usar SMTP_TLS=none.
+- ServidorSendGridLocal: API HTTP mínima de SendGrid (POST /v3/mail/send y las listas de
+  supresión bounces / blocks / unsubscribes, con consulta y borrado por dirección). Guarda los
+  payloads recibidos y cuenta pedidos y conexiones TCP (keep-alive). `respuestas_envio` es una
+  lista de códigos HTTP a devolver en los próximos envíos (por ej. [503] para forzar un
+  reintento; un 429 lleva Retry-After: 0) y `listas_prohibidas=True` hace que listar supresiones devuelva 403.
+
+Los dos aceptan `demora` (segundos) para simular la latencia de un proveedor real: el SMTP
+tarda eso en aceptar cada mensaje (DATA) y SendGrid en responder cada envío.
+
+Uso desde otro script de tests:
+    from servidores_locales import ServidorSMTPLocal
+    with ServidorSMTPLocal() as smtp:
+        ... enviar a ('127.0.0.1', smtp.puerto) ...
+        print(len(smtp.mensajes), smtp.sesiones)
+    with ServidorSendGridLocal(supresiones={"bounces": ["a@x.com"]}) as sg:
+        ... SENDGRID_API_URL = sg.url ...
+"""
+import json
+import time
+import threading
+import socketserver
+from urllib.parse import urlsplit, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _SesionSMTP(socketserver.StreamRequestHandler):
+    def _responder(self, linea):
+        self.wfile.write((linea + "\r\n").encode("ascii"))
+
+    def handle(self):
+        servidor = self.server.servidor_local
+        servidor._contar_sesion()
+        self._responder("220 localhost ESMTP prueba")
+        remitente, destinatarios, enviados = None, [], 0
+        while True:
+            linea = self.rfile.readline()
+            if not linea:
+                return
+            comando = linea.decode("utf-8", "replace").strip()
+            verbo = comando.split(" ", 1)[0].upper()
+            if verbo in ("EHLO", "HELO"):
+                self.wfile.write(b"250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+            elif verbo == "AUTH":
+                partes = comando.split()
+                if len(partes) >= 2 and partes[1].upper() == "LOGIN":
+                    # usuario y clave en dos líneas (se aceptan cualquiera)
+                    if len(partes) == 2:
+                        self._responder("334 VXNlcm5hbWU6")
+                        self.rfile.readline()
+                    self._responder("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self._responder("235 2.7.0 Autenticado")
+            elif verbo == "MAIL":
+                remitente, destinatarios = comando[10:].strip(), []
+                self._responder("250 OK")
+            elif verbo == "RCPT":
+                destinatarios.append(comando[8:].strip())
+                self._responder("250 OK")
+            elif verbo == "DATA":
+                self._responder("354 Terminar con <CRLF>.<CRLF>")
+                datos = []
+                while True:
+                    linea_datos = self.rfile.readline()
+                    if not linea_datos or linea_datos in (b".\r\n", b".\n"):
+                        break
+                    datos.append(linea_datos)
+                if servidor.demora:
+                    time.sleep(servidor.demora)
+                servidor._guardar(remitente, destinatarios, b"".join(datos))
+                enviados += 1
+                self._responder("250 OK encolado")
+                if servidor.cortar_cada and enviados >= servidor.cortar_cada:
+                    return  # cierra la conexión sin avisar
+            elif verbo in ("RSET", "NOOP"):
+                self._responder("250 OK")
+            elif verbo == "QUIT":
+                self._responder("221 Chau")
+                return
+            else:
+                self._responder("502 Comando no implementado")
+
+
+class _ServidorTCP(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class ServidorSMTPLocal:
+    def __init__(self, host="127.0.0.1", puerto=0, cortar_cada=None, demora=0):
+        self.cortar_cada = cortar_cada
+        self.demora = demora
+        self.mensajes = []
+        self.sesiones = 0
+        self._lock = threading.Lock()
+        self._servidor = _ServidorTCP((host, puerto), _SesionSMTP)
+        self._servidor.servidor_local = self
+        self.host, self.puerto = self._servidor.server_address
+        self._hilo = None
+
+    def _contar_sesion(self):
+        with self._lock:
+            self.sesiones += 1
+
+    def _guardar(self, remitente, destinatarios, datos):
+        with self._lock:
+            self.mensajes.append({"de": remitente, "para": destinatarios, "datos": datos})
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+
+class _PedidoSendGrid(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # mantiene la conexión abierta entre pedidos
+
+    def setup(self):
+        super().setup()
+        self.server.servidor_local._contar("conexiones")
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, estado, cuerpo=None, encabezados=None):
+        datos = json.dumps(cuerpo).encode("utf-8") if cuerpo is not None else b""
+        self.send_response(estado)
+        for clave, valor in (encabezados or {}).items():
+            self.send_header(clave, valor)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _lista(self, ruta):
+        for tipo, prefijos in ServidorSendGridLocal.RUTAS.items():
+            for prefijo in prefijos:
+                if ruta == prefijo:
+                    return tipo, None
+                if ruta.startswith(prefijo + "/"):
+                    return tipo, unquote(ruta[len(prefijo) + 1:]).lower()
+        return None, None
+
+    def do_GET(self):
+        servidor = self.server.servidor_local
+        servidor._contar("pedidos")
+        partes = urlsplit(self.path)
+        tipo, email = self._lista(partes.path)
+        if tipo is None:
+            return self._responder(404, {"errors": [{"message": "no existe"}]})
+        emails = servidor.supresiones.get(tipo, set())
+        if email is None:
+            if servidor.listas_prohibidas:
+                return self._responder(403, {"errors": [{"message": "access forbidden"}]})
+            servidor._contar("listados")
+            consulta = parse_qs(partes.query)
+            limite = int(consulta.get("limit", ["500"])[0])
+            offset = int(consulta.get("offset", ["0"])[0])
+            pagina = sorted(emails)[offset:offset + limite]
+            return self._responder(200, [{"email": e, "created": 0} for e in pagina])
+        servidor._contar("consultas")
+        if tipo == "global":
+            return self._responder(200, {"recipient_email": email} if email in emails else {})
+        return self._responder(200, [{"email": email, "created": 0}] if email in emails else [])
+
+    def do_DELETE(self):
+        servidor = self.server.servidor_local
+        servidor._contar("pedidos")
+        tipo, email = self._lista(urlsplit(self.path).path)
+        if tipo is None or email is None:
+            return self._responder(404, {"errors": [{"message": "no existe"}]})
+        with servidor._lock:
+            servidor.supresiones.get(tipo, set()).discard(email)
+        self._responder(204)
+
+    def do_POST(self):
+        servidor = self.server.servidor_local
+        servidor._contar("pedidos")
+        largo = int(self.headers.get("Content-Length") or 0)
+        cuerpo = self.rfile.read(largo)
+        if urlsplit(self.path).path != "/v3/mail/send":
+            return self._responder(404, {"errors": [{"message": "no existe"}]})
+        if servidor.demora:
+            time.sleep(servidor.demora)
+        with servidor._lock:
+            estado = servidor.respuestas_envio.pop(0) if servidor.respuestas_envio else 202
+            if estado == 202:
+                servidor.envios.append(json.loads(cuerpo))
+                id_mensaje = f"local-{len(servidor.envios)}"
+        if estado != 202:
+            encabezados = {"Retry-After": "0"} if estado == 429 else None
+            return self._responder(estado, {"errors": [{"message": f"error simulado {estado}"}]}, encabezados)
+        self._responder(202, encabezados={"X-Message-Id": id_mensaje})
+
+
+class _ServidorHTTP(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class ServidorSendGridLocal:
+    RUTAS = {
+        "bounces": ("/v3/suppression/bounces",),
+        "blocks": ("/v3/suppression/blocks",),
+        "global": ("/v3/suppression/unsubscribes", "/v3/asm/suppressions/global"),
+    }
+
+    def __init__(self, host="127.0.0.1", puerto=0, supresiones=None, listas_prohibidas=False, demora=0):
+        self.demora = demora
+        self.supresiones = {tipo: {e.lower() for e in emails} for tipo, emails in (supresiones or {}).items()}
+        self.listas_prohibidas = listas_prohibidas
+        self.respuestas_envio = []
+        self.envios = []
+        self.contadores = {"conexiones": 0, "pedidos": 0, "listados": 0, "consultas": 0}
+        self._lock = threading.Lock()
+        self._servidor = _ServidorHTTP((host, puerto), _PedidoSendGrid)
+        self._servidor.servidor_local = self
+        self.host, self.puerto = self._servidor.server_address
+        self.url = f"http://{self.host}:{self.puerto}"
+        self._hilo = None
+
+    def _contar(self, nombre):
+        with self._lock:
+            self.contadores[nombre] += 1
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
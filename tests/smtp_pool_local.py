@@ -0,0 +1,140 @@
+"""
+Prueba del pool de sesiones SMTP (servicios/smtp_pool.py) contra un servidor SMTP local.
+
+Ejecución (desde la raíz del repo):
+    python ./tests/smtp_pool_local.py --mensajes 200
+
+Compara una conexión + login por mensaje (comportamiento anterior) con el pool, muestra
+cuántas sesiones abrió el servidor y el throughput por conexión, y verifica que el pool
+reconecta cuando el servidor corta la sesión y que cierra las sesiones que no pudo abrir.
+"""
+import os
+import sys
+import time
+import smtplib
+import argparse
+import threading
+import contextlib
+from email.message import EmailMessage
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datos_sinteticos import preparar_rutas
+from servidores_locales import ServidorSMTPLocal
+
+preparar_rutas()
+
+from smtp_pool import PoolSMTP
+from mail_service import MailService
+
+
+def armar_mensaje(i):
+    msg = EmailMessage()
+    msg['Subject'] = f"Prueba {i}"
+    msg['From'] = "clinica@example.com"
+    msg['To'] = f"paciente{i}@example.com"
+    msg.set_content(f"Mensaje de prueba número {i}.")
+    return msg
+
+
+def sin_pool(servidor, cantidad):
+    inicio = time.perf_counter()
+    for i in range(cantidad):
+        with smtplib.SMTP(servidor.host, servidor.puerto, timeout=15) as sesion:
+            sesion.login("usuario", "clave")
+            sesion.send_message(armar_mensaje(i))
+    return time.perf_counter() - inicio
+
+
+def con_pool(servidor, cantidad, tamanio=1, hilos=1):
+    pool = PoolSMTP(servidor.host, servidor.puerto, "usuario", "clave", tls="none", tamanio=tamanio)
+    indices = iter(range(cantidad))
+    lock = threading.Lock()
+
+    def trabajar():
+        while True:
+            with lock:
+                i = next(indices, None)
+            if i is None:
+                return
+            pool.enviar(armar_mensaje(i))
+
+    inicio = time.perf_counter()
+    trabajadores = [threading.Thread(target=trabajar) for _ in range(hilos)]
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    segundos = time.perf_counter() - inicio
+    estadisticas = pool.estadisticas()
+    pool.cerrar()
+    return segundos, estadisticas
+
+
+def verificar(condicion, mensaje):
+    print(("[OK] " if condicion else "[FALLO] ") + mensaje)
+    if not condicion:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mensajes', type=int, default=200)
+    args = parser.parse_args()
+    n = args.mensajes
+
+    with ServidorSMTPLocal() as servidor:
+        segundos = sin_pool(servidor, n)
+        print(f"Sin pool:            {n} mensajes en {segundos:.3f} s ({n / segundos:.0f} msg/s), {servidor.sesiones} sesiones")
+        verificar(servidor.sesiones == n, "una sesión por mensaje sin pool")
+
+    with ServidorSMTPLocal() as servidor:
+        segundos, estadisticas = con_pool(servidor, n)
+        print(f"Pool de 1:           {n} mensajes en {segundos:.3f} s ({n / segundos:.0f} msg/s), {servidor.sesiones} sesiones")
+        verificar(servidor.sesiones == 1 and len(servidor.mensajes) == n, "una sola sesión para todos los mensajes")
+
+    with ServidorSMTPLocal() as servidor:
+        segundos, estadisticas = con_pool(servidor, n, tamanio=2, hilos=4)
+        print(f"Pool de 2, 4 hilos:  {n} mensajes en {segundos:.3f} s ({n / segundos:.0f} msg/s), {servidor.sesiones} sesiones")
+        for conexion in estadisticas["conexiones"]:
+            print(f"    conexión {conexion['id']}: {conexion['mensajes']} mensajes, "
+                  f"{conexion['mensajes_por_segundo']} msg/s, {conexion['bytes']} bytes")
+        verificar(servidor.sesiones <= 2 and len(servidor.mensajes) == n, "como mucho 2 sesiones con 4 hilos")
+
+    with ServidorSMTPLocal(cortar_cada=25) as servidor:
+        segundos, estadisticas = con_pool(servidor, n)
+        print(f"Servidor que corta:  {n} mensajes, {servidor.sesiones} sesiones, "
+              f"{estadisticas['reconexiones']} reconexiones")
+        verificar(len(servidor.mensajes) == n, "todos los mensajes entregados pese a los cortes")
+
+    with ServidorSMTPLocal() as servidor:
+        config = {'SMTP_HOST': servidor.host, 'SMTP_PORT': str(servidor.puerto), 'SMTP_USER': 'usuario',
+                  'SMTP_PASS': 'clave', 'SMTP_TLS': 'none', 'FROM_EMAIL': 'clinica@example.com',
+                  'SENDGRID_API_KEY': None}
+        enviados = sum(MailService.enviar_mensaje(f"paciente{i}@example.com", "Prueba", "Hola", config) for i in range(10))
+        verificar(enviados == 10 and servidor.sesiones == 1, "MailService reutiliza la sesión SMTP entre envíos")
+
+    # Servidor sin TLS en modo 'auto': falla STARTTLS (y después SSL) y la sesión conectada se cierra
+    sesiones = []
+    starttls = smtplib.SMTP.starttls
+
+    def starttls_registrado(self, *args, **kwargs):
+        sesiones.append(self)
+        return starttls(self, *args, **kwargs)
+
+    smtplib.SMTP.starttls = starttls_registrado
+    try:
+        # (el servidor local informa en stderr la conexión cortada por el intento SSL)
+        with ServidorSMTPLocal() as servidor, open(os.devnull, "w") as nulo, contextlib.redirect_stderr(nulo):
+            try:
+                PoolSMTP(servidor.host, servidor.puerto, "usuario", "clave", tls="auto")._abrir()
+                abierta = True
+            except (smtplib.SMTPException, OSError):
+                abierta = False
+    finally:
+        smtplib.SMTP.starttls = starttls
+    verificar(not abierta and len(sesiones) == 1 and sesiones[0].sock is None,
+              "si falla STARTTLS en modo 'auto' la sesión SMTP se cierra")
+
+
+if __name__ == '__main__':
+    main()